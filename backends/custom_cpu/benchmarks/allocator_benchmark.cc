@@ -0,0 +1,242 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Replays the allocation trace of one LeNet/MNIST training step (batch 64,
+// forward, backward and an Adam update) against the caching allocator and
+// against plain malloc/free, which is what the runtime used before.
+//
+//   ./allocator_benchmark [steps] [batch_size]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "runtime/allocator.h"
+#include "runtime/thread_pool.h"
+
+namespace {
+
+struct Event {
+  int id;
+  size_t size;  // 0 frees `id`
+};
+
+class TraceBuilder {
+ public:
+  int Alloc(size_t numel) {
+    events_.push_back({next_id_, numel * sizeof(float)});
+    return next_id_++;
+  }
+  void Free(int id) { events_.push_back({id, 0}); }
+  // A temporary that an op allocates and frees before returning.
+  void Scratch(size_t numel) { Free(Alloc(numel)); }
+
+  std::vector<Event> Finish() { return events_; }
+  int NumIds() const { return next_id_; }
+
+ private:
+  std::vector<Event> events_;
+  int next_id_ = 0;
+};
+
+std::vector<Event> MnistTrainingStep(size_t n, int* num_ids) {
+  TraceBuilder t;
+  // Parameters live across steps and are not part of the trace; only their
+  // gradients and optimizer temporaries are.
+  const size_t params[] = {
+      6 * 9, 6, 16 * 150, 16, 400 * 120, 120, 120 * 84, 84, 84 * 10, 10};
+
+  // Forward.
+  int x = t.Alloc(n * 784);
+  int label = t.Alloc(n);
+  t.Scratch(n * 9 * 784);  // im2col
+  int conv1 = t.Alloc(n * 6 * 784);
+  int relu1 = t.Alloc(n * 6 * 784);
+  int pool1 = t.Alloc(n * 6 * 196);
+  int mask1 = t.Alloc(n * 6 * 196);
+  t.Scratch(n * 150 * 100);  // im2col
+  int conv2 = t.Alloc(n * 16 * 100);
+  int relu2 = t.Alloc(n * 16 * 100);
+  int pool2 = t.Alloc(n * 400);
+  int mask2 = t.Alloc(n * 400);
+  int fc1 = t.Alloc(n * 120);
+  int relu3 = t.Alloc(n * 120);
+  int fc2 = t.Alloc(n * 84);
+  int relu4 = t.Alloc(n * 84);
+  int fc3 = t.Alloc(n * 10);
+  int softmax = t.Alloc(n * 10);
+  int loss = t.Alloc(n);
+  int mean = t.Alloc(1);
+
+  // Backward, freeing activations as soon as their grads are done.
+  int d_mean = t.Alloc(1);
+  int d_loss = t.Alloc(n);
+  t.Free(d_mean);
+  t.Free(mean);
+  int d_fc3 = t.Alloc(n * 10);
+  t.Free(d_loss);
+  t.Free(loss);
+  t.Free(softmax);
+  t.Free(label);
+  std::vector<int> grads;
+  grads.push_back(t.Alloc(params[8]));
+  grads.push_back(t.Alloc(params[9]));
+  int d_relu4 = t.Alloc(n * 84);
+  t.Free(d_fc3);
+  t.Free(fc3);
+  int d_fc2 = t.Alloc(n * 84);
+  t.Free(d_relu4);
+  t.Free(relu4);
+  grads.push_back(t.Alloc(params[6]));
+  grads.push_back(t.Alloc(params[7]));
+  int d_relu3 = t.Alloc(n * 120);
+  t.Free(d_fc2);
+  t.Free(fc2);
+  int d_fc1 = t.Alloc(n * 120);
+  t.Free(d_relu3);
+  t.Free(relu3);
+  grads.push_back(t.Alloc(params[4]));
+  grads.push_back(t.Alloc(params[5]));
+  int d_pool2 = t.Alloc(n * 400);
+  t.Free(d_fc1);
+  t.Free(fc1);
+  int d_relu2 = t.Alloc(n * 16 * 100);
+  t.Free(d_pool2);
+  t.Free(mask2);
+  t.Free(pool2);
+  int d_conv2 = t.Alloc(n * 16 * 100);
+  t.Free(d_relu2);
+  t.Free(relu2);
+  t.Scratch(n * 150 * 100);  // im2col
+  t.Scratch(n * 150 * 100);  // col2im
+  grads.push_back(t.Alloc(params[2]));
+  grads.push_back(t.Alloc(params[3]));
+  int d_pool1 = t.Alloc(n * 6 * 196);
+  t.Free(d_conv2);
+  t.Free(conv2);
+  int d_relu1 = t.Alloc(n * 6 * 784);
+  t.Free(d_pool1);
+  t.Free(mask1);
+  t.Free(pool1);
+  int d_conv1 = t.Alloc(n * 6 * 784);
+  t.Free(d_relu1);
+  t.Free(relu1);
+  t.Scratch(n * 9 * 784);  // im2col
+  grads.push_back(t.Alloc(params[0]));
+  grads.push_back(t.Alloc(params[1]));
+  t.Free(d_conv1);
+  t.Free(conv1);
+  t.Free(x);
+
+  // Adam: a few temporaries per parameter, then the grads go away.
+  for (size_t i = 0; i < grads.size(); ++i) {
+    int g2 = t.Alloc(params[i]);
+    t.Scratch(params[i]);
+    t.Free(g2);
+  }
+  for (auto g : grads) t.Free(g);
+
+  *num_ids = t.NumIds();
+  return t.Finish();
+}
+
+template <typename AllocFn, typename FreeFn>
+void Replay(const std::vector<Event>& trace,
+            int num_ids,
+            int steps,
+            AllocFn alloc,
+            FreeFn free_fn) {
+  std::vector<void*> ptrs(num_ids);
+  std::vector<size_t> sizes(num_ids);
+  for (int s = 0; s < steps; ++s) {
+    for (const auto& e : trace) {
+      if (e.size) {
+        auto* p = static_cast<char*>(alloc(e.size));
+        // Touch every page like a kernel writing its output would.
+        for (size_t off = 0; off < e.size; off += 4096) p[off] = 1;
+        ptrs[e.id] = p;
+        sizes[e.id] = e.size;
+      } else {
+        free_fn(ptrs[e.id], sizes[e.id]);
+      }
+    }
+  }
+}
+
+template <typename F>
+double Seconds(F&& fn) {
+  auto start = std::chrono::steady_clock::now();
+  fn();
+  std::chrono::duration<double> elapsed =
+      std::chrono::steady_clock::now() - start;
+  return elapsed.count();
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int steps = argc > 1 ? atoi(argv[1]) : 200;
+  size_t batch = argc > 2 ? atoi(argv[2]) : 64;
+  int num_ids = 0;
+  auto trace = MnistTrainingStep(batch, &num_ids);
+  size_t allocs = 0, bytes = 0;
+  for (const auto& e : trace) {
+    if (e.size) {
+      ++allocs;
+      bytes += e.size;
+    }
+  }
+  int threads = custom_cpu::GetThreadPool()->NumThreads();
+  printf("threads: %d  batch %zu: %zu allocations, %.2f MB per step\n",
+         threads,
+         batch,
+         allocs,
+         bytes / 1e6);
+
+  auto sys_alloc = [](size_t size) { return malloc(size); };
+  auto sys_free = [](void* p, size_t) { free(p); };
+  auto cached_alloc = [](size_t size) {
+    return custom_cpu::CachedAllocate(size);
+  };
+  auto cached_free = [](void* p, size_t size) {
+    custom_cpu::CachedFree(p, size);
+  };
+
+  // Every pool thread replays its own copy of the trace, as concurrent
+  // executors would.
+  auto replay_all = [&](bool cached) {
+    custom_cpu::GetThreadPool()->Run(threads, [&](int64_t) {
+      if (cached) {
+        Replay(trace, num_ids, steps, cached_alloc, cached_free);
+      } else {
+        Replay(trace, num_ids, steps, sys_alloc, sys_free);
+      }
+    });
+  };
+  double t_ref = Seconds([&] { replay_all(false); });
+  double t_new = Seconds([&] { replay_all(true); });
+
+  auto stats = custom_cpu::GetAllocatorStats();
+  printf("malloc  %8.2f us/step\n", t_ref / steps * 1e6);
+  printf("cached  %8.2f us/step  speedup %5.2fx\n",
+         t_new / steps * 1e6,
+         t_ref / t_new);
+  printf("in use %.2f MB, cached %.2f MB, peak in use %.2f MB\n",
+         stats.in_use_bytes / 1e6,
+         stats.cached_bytes / 1e6,
+         stats.peak_in_use_bytes / 1e6);
+  return 0;
+}
@@ -0,0 +1,176 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the paged attention against attention over a dense cache of
+// [batch, kv_heads, max_seq_len, head_dim] that materializes each row of
+// scores, for a prefill and a decode step, and reports the cache memory
+// each layout needs for the live tokens.
+//
+//   ./attention_benchmark [repeats] [batch] [context] [max_seq_len]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "kernels/funcs/paged_attention.h"
+
+namespace {
+
+constexpr int64_t kHeads = 16;
+constexpr int64_t kKvHeads = 4;
+constexpr int64_t kHeadDim = 128;
+constexpr int64_t kBlockSize = 64;
+
+// Causal attention of `len` queries at positions past .. past + len - 1 of
+// every sequence over a dense cache.
+void ReferenceAttention(const float* q,
+                        const float* k_cache,
+                        const float* v_cache,
+                        int64_t batch,
+                        int64_t past,
+                        int64_t len,
+                        int64_t max_seq_len,
+                        float* out) {
+  const int64_t d = kHeadDim;
+  custom_cpu::ParallelFor(0, batch * kHeads, 1, [&](int64_t b0, int64_t e0) {
+    std::vector<float> scores(max_seq_len);
+    for (auto bh = b0; bh < e0; ++bh) {
+      const int64_t b = bh / kHeads, h = bh % kHeads;
+      const int64_t kvh = h / (kHeads / kKvHeads);
+      const float* kb = k_cache + (b * kKvHeads + kvh) * max_seq_len * d;
+      const float* vb = v_cache + (b * kKvHeads + kvh) * max_seq_len * d;
+      for (int64_t i = 0; i < len; ++i) {
+        const float* qi = q + ((b * len + i) * kHeads + h) * d;
+        const int64_t keys = past + i + 1;
+        float max = -1e30f;
+        for (int64_t k = 0; k < keys; ++k) {
+          float s = 0;
+          for (int64_t j = 0; j < d; ++j) s += qi[j] * kb[k * d + j];
+          scores[k] = s / std::sqrt(static_cast<float>(d));
+          max = std::max(max, scores[k]);
+        }
+        float sum = 0;
+        for (int64_t k = 0; k < keys; ++k) {
+          scores[k] = std::exp(scores[k] - max);
+          sum += scores[k];
+        }
+        float* o = out + ((b * len + i) * kHeads + h) * d;
+        std::fill(o, o + d, 0.f);
+        for (int64_t k = 0; k < keys; ++k) {
+          for (int64_t j = 0; j < d; ++j) o[j] += scores[k] * vb[k * d + j];
+        }
+        for (int64_t j = 0; j < d; ++j) o[j] /= sum;
+      }
+    }
+  });
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+// One step of `len` tokens per sequence after `past` cached ones.
+void RunStep(int repeats,
+             int64_t batch,
+             int64_t past,
+             int64_t len,
+             int64_t max_seq_len) {
+  const int64_t d = kHeadDim;
+  const int64_t width = (kHeads + 2 * kKvHeads) * d;
+  const int64_t tokens = batch * len;
+  const int64_t blocks_per_seq = (past + len + kBlockSize - 1) / kBlockSize;
+  const int64_t cache_size = batch * blocks_per_seq * kKvHeads * kBlockSize * d;
+  std::vector<float> key_cache(cache_size, 0.01f), value_cache(cache_size, 1);
+  std::vector<int32_t> block_tables(batch * blocks_per_seq);
+  for (size_t i = 0; i < block_tables.size(); ++i) block_tables[i] = i;
+  std::vector<int32_t> enc(batch, past ? 0 : len), dec(batch, past);
+  std::vector<int32_t> this_time(batch, len), cu(batch + 1);
+  for (int64_t b = 0; b <= batch; ++b) cu[b] = b * len;
+  std::vector<float> qkv(tokens * width, 0.02f), qkv_out(tokens * width);
+  std::vector<float> out(tokens * kHeads * d);
+
+  custom_kernel::funcs::PagedAttentionArgs<float> args = {};
+  args.batch = batch;
+  args.num_heads = kHeads;
+  args.kv_num_heads = kKvHeads;
+  args.head_dim = d;
+  args.block_size = kBlockSize;
+  args.max_blocks_per_seq = blocks_per_seq;
+  args.seq_lens_encoder = enc.data();
+  args.seq_lens_decoder = dec.data();
+  args.seq_lens_this_time = this_time.data();
+  args.cu_seqlens_q = cu.data();
+  args.block_tables = block_tables.data();
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::PagedAttentionWriteCache(
+        args, qkv.data(), qkv_out.data(), key_cache.data(), value_cache.data());
+    custom_kernel::funcs::PagedAttention(
+        args, qkv_out.data(), key_cache.data(), value_cache.data(), out.data());
+  });
+
+  const int64_t dense_size = batch * kKvHeads * max_seq_len * d;
+  std::vector<float> dense_k(dense_size, 0.01f), dense_v(dense_size, 1);
+  std::vector<float> q(tokens * kHeads * d, 0.02f);
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceAttention(q.data(),
+                       dense_k.data(),
+                       dense_v.data(),
+                       batch,
+                       past,
+                       len,
+                       max_seq_len,
+                       out.data());
+  });
+  printf(
+      "%-8s past %5ld len %5ld  dense %8.3f ms  paged %8.3f ms"
+      "  speedup %5.2fx  cache MB: dense %7.1f paged %7.1f\n",
+      past ? "decode" : "prefill",
+      past,
+      len,
+      t_ref * 1e3,
+      t_new * 1e3,
+      t_ref / t_new,
+      2. * dense_size * sizeof(float) / (1 << 20),
+      2. * cache_size * sizeof(float) / (1 << 20));
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  int64_t batch = argc > 2 ? atoll(argv[2]) : 8;
+  int64_t context = argc > 3 ? atoll(argv[3]) : 1024;
+  int64_t max_seq_len = argc > 4 ? atoll(argv[4]) : 4096;
+  printf("threads: %d  batch: %ld  heads: %ld/%ld x %ld\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         batch,
+         kHeads,
+         kKvHeads,
+         kHeadDim);
+  RunStep(repeats, batch, 0, context, max_seq_len);
+  RunStep(repeats, batch, context, 1, max_seq_len);
+  return 0;
+}
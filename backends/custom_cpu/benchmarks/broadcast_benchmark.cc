@@ -0,0 +1,158 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the stride-based broadcast engine used by the elementwise and
+// compare kernels against the previous BroadcastTo-then-loop implementation.
+//
+//   ./broadcast_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/broadcast.h"
+
+namespace {
+
+// phi::BroadcastTo before the stride-based engine was introduced, minus the
+// DenseTensor plumbing. Returns `in` itself when no broadcast is needed and a
+// materialized full-size copy otherwise.
+const float* ReferenceBroadcastTo(const std::vector<float>& in,
+                                  const std::vector<int64_t>& in_dims,
+                                  const std::vector<int64_t>& out_dims,
+                                  std::vector<float>* out) {
+  if (in_dims == out_dims) return in.data();
+  std::vector<size_t> tmp_dims(out_dims.size() - in_dims.size(), 1);
+  tmp_dims.insert(tmp_dims.end(), in_dims.cbegin(), in_dims.cend());
+  size_t numel = 1;
+  for (auto d : out_dims) numel *= d;
+  out->resize(numel);
+
+  std::vector<size_t> index(out_dims.size(), 0);
+  std::vector<size_t> in_step(tmp_dims.size(), 1);
+  std::vector<size_t> out_step(out_dims.size(), 1);
+  for (auto i = tmp_dims.size() - 1; i > 0; --i) {
+    in_step[i - 1] = in_step[i] * tmp_dims[i];
+    out_step[i - 1] = out_step[i] * out_dims[i];
+  }
+  for (size_t i = 0; i < numel; ++i) {
+    size_t src = 0, dst = 0;
+    for (size_t j = 0; j < tmp_dims.size(); ++j) {
+      src += (tmp_dims[j] == 1 ? 0 : index[j]) * in_step[j];
+      dst += index[j] * out_step[j];
+    }
+    (*out)[dst] = in[src];
+    index.back()++;
+    for (auto j = index.size() - 1; j > 0; --j) {
+      if (index[j] >= static_cast<size_t>(out_dims[j])) {
+        index[j] = 0;
+        index[j - 1]++;
+      } else {
+        break;
+      }
+    }
+  }
+  return out->data();
+}
+
+struct Case {
+  const char* name;
+  std::vector<int64_t> x_dims;
+  std::vector<int64_t> y_dims;
+};
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+int64_t Numel(const std::vector<int64_t>& dims) {
+  int64_t n = 1;
+  for (auto d : dims) n *= d;
+  return n;
+}
+
+void Run(const Case& c, int repeats) {
+  std::mt19937 gen(2024);
+  std::uniform_real_distribution<float> dist(-1, 1);
+  std::vector<float> x(Numel(c.x_dims)), y(Numel(c.y_dims));
+  for (auto& v : x) v = dist(gen);
+  for (auto& v : y) v = dist(gen);
+  const auto& out_dims = c.x_dims;
+  std::vector<float> out(Numel(out_dims)), ref(out.size());
+
+  size_t temp_bytes = 0;
+  double t_ref = BestSeconds(1, [&] {
+    std::vector<float> tmp_x, tmp_y;
+    auto px = ReferenceBroadcastTo(x, c.x_dims, out_dims, &tmp_x);
+    auto py = ReferenceBroadcastTo(y, c.y_dims, out_dims, &tmp_y);
+    temp_bytes = (tmp_x.size() + tmp_y.size()) * sizeof(float);
+    for (size_t i = 0; i < ref.size(); ++i) ref[i] = px[i] + py[i];
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::BroadcastBinary(
+        x.data(),
+        c.x_dims,
+        y.data(),
+        c.y_dims,
+        out.data(),
+        out_dims,
+        -1,
+        [](float a, float b) { return a + b; });
+  });
+
+  int mismatches = 0;
+  for (size_t i = 0; i < out.size(); ++i) mismatches += out[i] != ref[i];
+  double bytes = (x.size() + y.size() + out.size()) * sizeof(float);
+  printf(
+      "%-12s ref %9.3f ms (%7.2f MB temp)  strided %8.3f ms %7.2f GB/s  "
+      "speedup %6.1fx  mismatches %d\n",
+      c.name,
+      t_ref * 1e3,
+      temp_bytes / 1e6,
+      t_new * 1e3,
+      bytes / t_new * 1e-9,
+      t_ref / t_new,
+      mismatches);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 10;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  const Case cases[] = {
+      {"same_shape", {64, 512, 512}, {64, 512, 512}},
+      {"scalar", {64, 512, 512}, {1}},
+      {"bias", {8192, 2048}, {2048}},
+      {"row", {2048, 2048}, {2048, 1}},
+      {"channel", {32, 256, 56, 56}, {1, 256, 1, 1}},
+      {"outer", {1024, 1, 1024}, {1, 1024, 1}},
+  };
+  for (const auto& c : cases) {
+    Run(c, repeats);
+  }
+  return 0;
+}
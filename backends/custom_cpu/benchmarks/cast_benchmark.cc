@@ -0,0 +1,200 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Conversions between float and the 16-bit floats, as the cast kernel and
+// the 16-bit softmax run them. For float16, a scalar conversion with
+// branches for subnormals, inf and NaN is compared with the branch-free
+// loops of funcs/convert.h, which vectorize; bfloat16 is a shift either
+// way and its scalar loop calls the same function element by element. All
+// run over the intra-op pool; a parallel copy of as many bytes is the
+// bandwidth bound.
+//
+//   ./cast_benchmark [repeats] [numel]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <functional>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/convert.h"
+#include "runtime/thread_pool.h"
+
+namespace {
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+uint16_t BranchyFloatToFp16(float f) {
+  uint32_t u;
+  std::memcpy(&u, &f, sizeof(u));
+  const uint16_t sign = (u >> 16) & 0x8000;
+  const int32_t exp = static_cast<int32_t>((u >> 23) & 0xFF) - 127 + 15;
+  uint32_t mant = u & 0x7FFFFF;
+  if (((u >> 23) & 0xFF) == 0xFF) {
+    return sign | 0x7C00 | (mant ? 0x200 : 0);
+  }
+  if (exp >= 31) return sign | 0x7C00;
+  if (exp <= 0) {
+    if (exp < -10) return sign;
+    mant |= 0x800000;
+    const int shift = 14 - exp;
+    uint32_t h = mant >> shift;
+    const uint32_t rest = mant & ((1u << shift) - 1);
+    const uint32_t half = 1u << (shift - 1);
+    if (rest > half || (rest == half && (h & 1))) ++h;
+    return sign | h;
+  }
+  uint32_t h = (exp << 10) | (mant >> 13);
+  const uint32_t rest = mant & 0x1FFF;
+  if (rest > 0x1000 || (rest == 0x1000 && (h & 1))) ++h;
+  return sign | h;
+}
+
+float BranchyFp16ToFloat(uint16_t h) {
+  const uint32_t sign = static_cast<uint32_t>(h & 0x8000) << 16;
+  uint32_t exp = (h >> 10) & 0x1F;
+  uint32_t mant = h & 0x3FF;
+  uint32_t u;
+  if (exp == 0x1F) {
+    u = sign | 0x7F800000 | (mant << 13);
+  } else if (exp != 0) {
+    u = sign | ((exp + 127 - 15) << 23) | (mant << 13);
+  } else if (mant == 0) {
+    u = sign;
+  } else {
+    exp = 127 - 14;
+    while (!(mant & 0x400)) {
+      mant <<= 1;
+      --exp;
+    }
+    u = sign | (exp << 23) | ((mant & 0x3FF) << 13);
+  }
+  float f;
+  std::memcpy(&f, &u, sizeof(f));
+  return f;
+}
+
+template <typename In, typename Out, typename Scalar, typename Vector>
+void Run(const char* name,
+         int repeats,
+         const std::vector<In>& in,
+         Scalar scalar,
+         Vector vector) {
+  const int64_t n = in.size();
+  std::vector<Out> out(n);
+  auto parallel = [&](const std::function<void(int64_t, int64_t)>& fn) {
+    custom_cpu::ParallelFor(0, n, custom_cpu::kDefaultGrainSize, fn);
+  };
+  double t_scalar = BestSeconds(repeats, [&] {
+    parallel([&](int64_t begin, int64_t end) {
+      const In* src = in.data();
+      Out* dst = out.data();
+      for (int64_t i = begin; i < end; ++i) dst[i] = scalar(src[i]);
+    });
+  });
+  std::vector<Out> check(out);
+  double t_vector = BestSeconds(repeats, [&] {
+    parallel([&](int64_t begin, int64_t end) {
+      vector(in.data() + begin, out.data() + begin, end - begin);
+    });
+  });
+  const bool same = std::memcmp(check.data(), out.data(), n * sizeof(Out)) == 0;
+  const int64_t bytes = n * (sizeof(In) + sizeof(Out));
+  std::vector<char> src(bytes / 2), dst(bytes / 2);
+  double t_copy = BestSeconds(repeats, [&] {
+    custom_cpu::ParallelFor(
+        0,
+        bytes / 2,
+        custom_cpu::kDefaultGrainSize * 16,
+        [&](int64_t begin, int64_t end) {
+          std::memcpy(dst.data() + begin, src.data() + begin, end - begin);
+        });
+  });
+  printf(
+      "%-10s scalar %6.1f GB/s  vectorized %6.1f GB/s  speedup %5.2fx"
+      "  copy %6.1f GB/s%s\n",
+      name,
+      bytes / t_scalar * 1e-9,
+      bytes / t_vector * 1e-9,
+      t_scalar / t_vector,
+      bytes / t_copy * 1e-9,
+      same ? "" : "  MISMATCH");
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  namespace funcs = custom_kernel::funcs;
+  int repeats = argc > 1 ? atoi(argv[1]) : 10;
+  int64_t numel = argc > 2 ? atoll(argv[2]) : 1 << 24;
+  printf("threads: %d  numel: %ld\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         numel);
+  // Activations: mostly normal values, a few subnormal in fp16.
+  std::mt19937 gen(0);
+  std::normal_distribution<float> normal(0.f, 2.f);
+  std::vector<float> floats(numel);
+  for (auto& v : floats) v = normal(gen);
+  std::vector<uint16_t> fp16(numel), bf16(numel);
+  funcs::FloatToFp16(floats.data(), fp16.data(), numel);
+  funcs::FloatToBf16(floats.data(), bf16.data(), numel);
+
+  Run<float, uint16_t>("f32->fp16",
+                       repeats,
+                       floats,
+                       BranchyFloatToFp16,
+                       [](const float* in, uint16_t* out, int64_t n) {
+                         funcs::FloatToFp16(in, out, n);
+                       });
+  Run<uint16_t, float>("fp16->f32",
+                       repeats,
+                       fp16,
+                       BranchyFp16ToFloat,
+                       [](const uint16_t* in, float* out, int64_t n) {
+                         funcs::Fp16ToFloat(in, out, n);
+                       });
+  Run<float, uint16_t>(
+      "f32->bf16",
+      repeats,
+      floats,
+      [](float f) { return funcs::FloatToBf16(f); },
+      [](const float* in, uint16_t* out, int64_t n) {
+        funcs::FloatToBf16(in, out, n);
+      });
+  Run<uint16_t, float>(
+      "bf16->f32",
+      repeats,
+      bf16,
+      [](uint16_t h) { return funcs::Bf16ToFloat(h); },
+      [](const uint16_t* in, float* out, int64_t n) {
+        funcs::Bf16ToFloat(in, out, n);
+      });
+  return 0;
+}
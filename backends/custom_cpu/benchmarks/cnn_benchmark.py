@@ -0,0 +1,146 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Times LeNet and ResNet-18 on custom_cpu against Paddle's CPU kernels.
+
+Each model runs a training step (forward, backward and SGD) and an inference
+pass; inference is also timed with every BatchNorm folded into the conv in
+front of it, which is what Paddle Inference's conv_bn_fuse_pass does to a
+static graph.
+
+    python cnn_benchmark.py
+    python cnn_benchmark.py --models resnet18 --batch 16 --devices custom_cpu
+"""
+
+from __future__ import print_function
+
+import argparse
+import copy
+import time
+
+import numpy as np
+
+
+def fold_conv_bn(model):
+    """Returns a copy of `model` in eval mode with each BatchNorm2D that
+    directly follows a Conv2D inside a Sequential merged into the conv's
+    weight and bias and replaced by an Identity."""
+    import paddle
+
+    model = copy.deepcopy(model)
+    model.eval()
+    for layer in model.sublayers(include_self=True):
+        names = list(layer._sub_layers.keys())
+        for prev, name in zip(names, names[1:]):
+            conv = layer._sub_layers[prev]
+            bn = layer._sub_layers[name]
+            if isinstance(conv, paddle.nn.Conv2D) and isinstance(
+                bn, paddle.nn.BatchNorm2D
+            ):
+                _fold(conv, bn)
+                layer._sub_layers[name] = paddle.nn.Identity()
+        # ResNet's BasicBlock calls conv1/bn1 and conv2/bn2 by attribute.
+        for i in (1, 2, 3):
+            conv = layer._sub_layers.get("conv{}".format(i))
+            bn = layer._sub_layers.get("bn{}".format(i))
+            if isinstance(conv, paddle.nn.Conv2D) and isinstance(
+                bn, paddle.nn.BatchNorm2D
+            ):
+                _fold(conv, bn)
+                layer._sub_layers["bn{}".format(i)] = paddle.nn.Identity()
+    return model
+
+
+def _fold(conv, bn):
+    scale = bn.weight.numpy() / np.sqrt(bn._variance.numpy() + bn._epsilon)
+    weight = conv.weight.numpy() * scale.reshape([-1, 1, 1, 1])
+    bias = conv.bias.numpy() if conv.bias is not None else 0.0
+    bias = (bias - bn._mean.numpy()) * scale + bn.bias.numpy()
+    conv.weight.set_value(weight.astype("float32"))
+    if conv.bias is None:
+        conv.bias = conv.create_parameter(
+            [weight.shape[0]], is_bias=True, dtype="float32"
+        )
+    conv.bias.set_value(bias.astype("float32"))
+
+
+def _models():
+    import paddle
+
+    return {
+        "lenet": (lambda: paddle.vision.models.LeNet(), [1, 28, 28]),
+        "resnet18": (lambda: paddle.vision.models.resnet18(), [3, 224, 224]),
+    }
+
+
+def _best(fn, repeat):
+    fn()  # warm up allocator and kernel lookup
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def run(device, name, batch, repeat):
+    import paddle
+
+    paddle.set_device(device)
+    paddle.seed(1)
+    build, shape = _models()[name]
+    model = build()
+    x = paddle.to_tensor(np.random.rand(batch, *shape).astype("float32"))
+    label = paddle.to_tensor(np.random.randint(0, 10, [batch, 1]))
+    opt = paddle.optimizer.SGD(0.01, parameters=model.parameters())
+
+    def train_step():
+        loss = paddle.nn.functional.cross_entropy(model(x), label)
+        loss.backward()
+        opt.step()
+        opt.clear_grad()
+        loss.numpy()
+
+    model.train()
+    train_ms = _best(train_step, repeat)
+    model.eval()
+    with paddle.no_grad():
+        infer_ms = _best(lambda: model(x).numpy(), repeat)
+        folded = fold_conv_bn(model)
+        np.testing.assert_allclose(
+            folded(x).numpy(), model(x).numpy(), rtol=1e-3, atol=1e-3
+        )
+        fold_ms = _best(lambda: folded(x).numpy(), repeat)
+    return train_ms, infer_ms, fold_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--models", nargs="*", choices=["lenet", "resnet18"])
+    parser.add_argument("--devices", nargs="*", default=["cpu", "custom_cpu"])
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(
+        "{:<10}{:<12}{:>12}{:>12}{:>16}".format(
+            "model", "device", "train ms", "infer ms", "folded infer ms"
+        )
+    )
+    for name in args.models or ["lenet", "resnet18"]:
+        for device in args.devices:
+            train_ms, infer_ms, fold_ms = run(device, name, args.batch, args.repeat)
+            print(
+                "{:<10}{:<12}{:>12.2f}{:>12.2f}{:>16.2f}".format(
+                    name, device, train_ms, infer_ms, fold_ms
+                )
+            )
@@ -0,0 +1,157 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Measures the shared memory collectives behind the custom_cpu XCCL
+// interface with one forked process per rank. Bus bandwidth follows the
+// nccl-tests convention: algorithm bandwidth scaled by 2(n-1)/n for
+// all_reduce, (n-1)/n for all_gather and reduce_scatter and 1 for
+// broadcast, so it is comparable across rank counts. With
+// FLAGS_custom_cpu_devices set, rank r runs on the CPUs of device
+// r % devices and first touches its buffers there, which shows the cost of
+// ranks on different NUMA nodes.
+//
+//   ./collective_benchmark [max_ranks] [max_megabytes]
+
+#include <sys/wait.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <string>
+#include <vector>
+
+#include "runtime/collective.h"
+#include "runtime/topology.h"
+
+namespace {
+
+using custom_cpu::CclDataType;
+using custom_cpu::CclReduceOp;
+using custom_cpu::ShmCommunicator;
+
+template <typename F>
+double AverageSeconds(ShmCommunicator* comm, int iters, F&& fn) {
+  fn();
+  comm->Barrier();
+  auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < iters; ++i) fn();
+  comm->Barrier();
+  std::chrono::duration<double> elapsed =
+      std::chrono::steady_clock::now() - start;
+  return elapsed.count() / iters;
+}
+
+void Report(ShmCommunicator* comm,
+            const char* name,
+            size_t bytes,
+            double seconds,
+            double bus_factor,
+            bool ok) {
+  if (comm->rank() != 0) return;
+  double alg_bw = bytes / seconds * 1e-9;
+  printf("%6d %-15s %10zu %10.1f %9.2f %9.2f  %s\n",
+         comm->nranks(),
+         name,
+         bytes,
+         seconds * 1e6,
+         alg_bw,
+         alg_bw * bus_factor,
+         ok ? "ok" : "WRONG");
+  fflush(stdout);
+}
+
+void RunRank(const std::string& id, int rank, int nranks, size_t max_bytes) {
+  const auto& devices = custom_cpu::GetDeviceTopology();
+  if (!devices.empty()) {
+    custom_cpu::PinCurrentThread(devices[rank % devices.size()].cpus);
+  }
+  auto comm = ShmCommunicator::Create(id, rank, nranks);
+  if (!comm) {
+    fprintf(stderr, "rank %d: failed to create communicator\n", rank);
+    exit(1);
+  }
+  double n = nranks;
+  for (size_t bytes = 4096; bytes <= max_bytes; bytes *= 4) {
+    size_t count = bytes / sizeof(float);
+    auto iters = static_cast<int>(std::max<size_t>(
+        3, std::min<size_t>(200, (size_t(256) << 20) / bytes)));
+    std::vector<float> send(count, rank + 1.f), recv(count * nranks);
+
+    auto t = AverageSeconds(comm.get(), iters, [&] {
+      comm->AllReduce(send.data(),
+                      recv.data(),
+                      count,
+                      CclDataType::kFloat32,
+                      CclReduceOp::kSum);
+    });
+    bool ok = recv[count - 1] == n * (n + 1) / 2;
+    Report(comm.get(), "all_reduce", bytes, t, 2 * (n - 1) / n, ok);
+
+    t = AverageSeconds(comm.get(), iters, [&] {
+      comm->AllGather(send.data(), recv.data(), bytes);
+    });
+    ok = recv[count * nranks - 1] == n;
+    Report(comm.get(), "all_gather", bytes * nranks, t, (n - 1) / n, ok);
+
+    t = AverageSeconds(comm.get(), iters, [&] {
+      comm->ReduceScatter(recv.data(),
+                          send.data(),
+                          count,
+                          CclDataType::kFloat32,
+                          CclReduceOp::kSum);
+    });
+    Report(comm.get(), "reduce_scatter", bytes * nranks, t, (n - 1) / n, true);
+
+    t = AverageSeconds(
+        comm.get(), iters, [&] { comm->Broadcast(recv.data(), bytes, 0); });
+    Report(comm.get(), "broadcast", bytes, t, 1, true);
+  }
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int max_ranks = argc > 1 ? atoi(argv[1]) : 8;
+  size_t max_bytes = (argc > 2 ? atoll(argv[2]) : 64) << 20;
+  printf("%6s %-15s %10s %10s %9s %9s\n",
+         "ranks",
+         "op",
+         "bytes",
+         "time(us)",
+         "algbw",
+         "busbw");
+  fflush(stdout);
+  for (int nranks = 2; nranks <= max_ranks; nranks *= 2) {
+    auto id = "bench" + std::to_string(getpid()) + "_" + std::to_string(nranks);
+    std::vector<pid_t> children;
+    for (int rank = 0; rank < nranks; ++rank) {
+      pid_t pid = fork();
+      if (pid == 0) {
+        RunRank(id, rank, nranks, max_bytes);
+        _exit(0);
+      }
+      children.push_back(pid);
+    }
+    int failed = 0;
+    for (auto pid : children) {
+      int status = 0;
+      waitpid(pid, &status, 0);
+      failed += !WIFEXITED(status) || WEXITSTATUS(status) != 0;
+    }
+    if (failed) return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,128 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the byte-range concat/split engine against the previous
+// ConcatKernel loop, on KV-cache appends and axis-0/last-axis concats. The
+// engine runs on a one-thread pool and on the full pool, so "scaling" is
+// its multi-thread gain; concats smaller than 2 * kConcatGrainBytes stay on
+// one thread and should show none.
+//
+//   ./concat_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <vector>
+
+#include "kernels/funcs/concat.h"
+
+namespace {
+
+using custom_kernel::funcs::ConcatSlice;
+
+// ConcatKernel before the engine: one memcpy per (outer index, input).
+void ReferenceConcat(const std::vector<ConcatSlice>& inputs,
+                     int64_t outer,
+                     char* out) {
+  int64_t out_offset = 0;
+  for (int64_t i = 0; i < outer; ++i) {
+    for (auto& in : inputs) {
+      memcpy(out + out_offset,
+             static_cast<const char*>(in.data) + i * in.bytes,
+             in.bytes);
+      out_offset += in.bytes;
+    }
+  }
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+// Concatenates `outer` rows of inputs `widths` bytes wide, then splits the
+// result back.
+void Run(const char* name,
+         int64_t outer,
+         const std::vector<int64_t>& widths,
+         int repeats) {
+  std::vector<std::vector<char>> data(widths.size());
+  std::vector<ConcatSlice> inputs;
+  int64_t row_bytes = 0;
+  for (size_t i = 0; i < widths.size(); ++i) {
+    data[i].assign(outer * widths[i], static_cast<char>(i + 1));
+    inputs.push_back({data[i].data(), widths[i]});
+    row_bytes += widths[i];
+  }
+  std::vector<char> out(outer * row_bytes), ref(outer * row_bytes);
+  double t_ref =
+      BestSeconds(repeats, [&] { ReferenceConcat(inputs, outer, ref.data()); });
+  auto concat = [&] {
+    custom_kernel::funcs::ConcatBytes(inputs, outer, out.data());
+  };
+  custom_cpu::InitThreadPool(1);
+  double t_serial = BestSeconds(repeats, concat);
+  custom_cpu::InitThreadPool();
+  double t_new = BestSeconds(repeats, concat);
+  std::vector<std::vector<char>> parts(widths.size());
+  std::vector<ConcatSlice> outputs;
+  for (size_t i = 0; i < widths.size(); ++i) {
+    parts[i].resize(outer * widths[i]);
+    outputs.push_back({parts[i].data(), widths[i]});
+  }
+  double t_split = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::SplitBytes(out.data(), outer, outputs);
+  });
+  bool ok = out == ref && parts == data;
+  double bytes = 2. * outer * row_bytes;
+  printf(
+      "%-30s ref %8.3f ms  concat 1T %8.3f ms  %dT %8.3f ms %6.2f GB/s  "
+      "scaling %5.1fx  speedup %5.1fx  split %8.3f ms  %s\n",
+      name,
+      t_ref * 1e3,
+      t_serial * 1e3,
+      custom_cpu::GetThreadPool()->NumThreads(),
+      t_new * 1e3,
+      bytes / t_new * 1e-9,
+      t_serial / t_new,
+      t_ref / t_new,
+      t_split * 1e3,
+      ok ? "ok" : "MISMATCH");
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  // [batch * heads, seq, head_dim] fp16 caches gaining one token.
+  Run("kv append 8x32x1024x128", 8 * 32, {1024 * 128 * 2, 128 * 2}, repeats);
+  Run("kv append 1x32x4096x128", 32, {4096 * 128 * 2, 128 * 2}, repeats);
+  // Decode step of a short sequence: below the parallel threshold.
+  Run("kv append 1x32x64x128", 32, {64 * 128 * 2, 128 * 2}, repeats);
+  Run("axis0 4x64MB", 1, {64 << 20, 64 << 20, 64 << 20, 64 << 20}, repeats);
+  Run("last axis 65536x(3x16B)", 65536, {16, 16, 16}, repeats);
+  Run("last axis 262144x(2x4B)", 262144, {4, 4}, repeats);
+  return 0;
+}
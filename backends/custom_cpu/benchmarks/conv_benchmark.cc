@@ -0,0 +1,173 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the im2col + GEMM conv2d against a direct loop convolution on
+// the layers of LeNet and ResNet-18, forward and backward, in both layouts.
+//
+//   ./conv_benchmark [repeats] [batch]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "kernels/funcs/conv.h"
+
+namespace {
+
+using custom_kernel::funcs::Conv2dShape;
+
+// out[n][oc][oh][ow] summed tap by tap, parallel over output planes.
+void ReferenceConv(const Conv2dShape& s,
+                   const float* x,
+                   const float* w,
+                   float* out) {
+  const int64_t cg = s.in_channels / s.groups;
+  const int64_t ocg = s.out_channels / s.groups;
+  custom_cpu::ParallelFor(
+      0, s.batch * s.out_channels, 1, [&](int64_t b, int64_t e) {
+        for (int64_t p = b; p < e; ++p) {
+          const int64_t n = p / s.out_channels;
+          const int64_t oc = p % s.out_channels;
+          const int64_t g = oc / ocg;
+          for (int64_t oh = 0; oh < s.out_h; ++oh) {
+            for (int64_t ow = 0; ow < s.out_w; ++ow) {
+              float acc = 0;
+              for (int64_t c = 0; c < cg; ++c) {
+                const int64_t ic = g * cg + c;
+                for (int64_t kh = 0; kh < s.kernel_h; ++kh) {
+                  const int64_t ih =
+                      oh * s.stride_h - s.pad_top + kh * s.dilation_h;
+                  if (ih < 0 || ih >= s.in_h) continue;
+                  for (int64_t kw = 0; kw < s.kernel_w; ++kw) {
+                    const int64_t iw =
+                        ow * s.stride_w - s.pad_left + kw * s.dilation_w;
+                    if (iw < 0 || iw >= s.in_w) continue;
+                    const int64_t xi =
+                        s.channel_last ? ((n * s.in_h + ih) * s.in_w + iw) *
+                                                 s.in_channels +
+                                             ic
+                                       : ((n * s.in_channels + ic) * s.in_h +
+                                          ih) * s.in_w +
+                                             iw;
+                    acc +=
+                        x[xi] *
+                        w[((oc * cg + c) * s.kernel_h + kh) * s.kernel_w + kw];
+                  }
+                }
+              }
+              const int64_t oi =
+                  s.channel_last
+                      ? ((n * s.out_h + oh) * s.out_w + ow) * s.out_channels +
+                            oc
+                      : ((n * s.out_channels + oc) * s.out_h + oh) * s.out_w +
+                            ow;
+              out[oi] = acc;
+            }
+          }
+        }
+      });
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+struct Layer {
+  const char* name;
+  int64_t c, h, oc, k, stride, pad;
+};
+
+Conv2dShape MakeShape(const Layer& l, int64_t batch, bool channel_last) {
+  const int64_t out = (l.h + 2 * l.pad - l.k) / l.stride + 1;
+  return {batch,
+          l.c,
+          l.h,
+          l.h,
+          l.oc,
+          out,
+          out,
+          l.k,
+          l.k,
+          l.stride,
+          l.stride,
+          l.pad,
+          l.pad,
+          1,
+          1,
+          1,
+          channel_last};
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  int64_t batch = argc > 2 ? atoll(argv[2]) : 8;
+  printf("threads: %d  batch: %ld\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         batch);
+  const Layer layers[] = {
+      {"lenet conv1 5x5", 1, 28, 6, 5, 1, 2},
+      {"lenet conv2 5x5", 6, 14, 16, 5, 1, 0},
+      {"resnet conv1 7x7/2", 3, 224, 64, 7, 2, 3},
+      {"resnet layer1 3x3", 64, 56, 64, 3, 1, 1},
+      {"resnet layer2 3x3/2", 64, 56, 128, 3, 2, 1},
+      {"resnet layer3 3x3", 256, 14, 256, 3, 1, 1},
+      {"resnet down 1x1/2", 256, 14, 512, 1, 2, 0},
+      {"resnet layer4 3x3", 512, 7, 512, 3, 1, 1},
+  };
+  for (bool channel_last : {false, true}) {
+    for (const auto& l : layers) {
+      auto s = MakeShape(l, batch, channel_last);
+      std::vector<float> x(s.batch * s.in_channels * s.in_h * s.in_w, 0.5f);
+      std::vector<float> w(s.out_channels * s.in_channels * l.k * l.k, 0.25f);
+      std::vector<float> out(s.batch * s.out_channels * s.out_h * s.out_w);
+      std::vector<float> dx(x.size()), dw(w.size());
+      const double flops = 2. * s.batch * s.out_channels * s.out_h * s.out_w *
+                           s.in_channels * l.k * l.k;
+      double t_ref = BestSeconds(
+          repeats, [&] { ReferenceConv(s, x.data(), w.data(), out.data()); });
+      double t_fwd = BestSeconds(repeats, [&] {
+        custom_kernel::funcs::Conv2dForward(s, x.data(), w.data(), out.data());
+      });
+      double t_bwd = BestSeconds(repeats, [&] {
+        custom_kernel::funcs::Conv2dBackward(
+            s, x.data(), w.data(), out.data(), dx.data(), dw.data());
+      });
+      printf(
+          "%s %-20s ref %8.3f ms  fwd %8.3f ms %6.1f GFLOP/s  speedup "
+          "%5.1fx  bwd %8.3f ms %6.1f GFLOP/s\n",
+          channel_last ? "NHWC" : "NCHW",
+          l.name,
+          t_ref * 1e3,
+          t_fwd * 1e3,
+          flops / t_fwd * 1e-9,
+          t_ref / t_fwd,
+          t_bwd * 1e3,
+          2 * flops / t_bwd * 1e-9);
+    }
+  }
+  return 0;
+}
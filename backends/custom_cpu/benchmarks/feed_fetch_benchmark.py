@@ -0,0 +1,98 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures feed/fetch latency of a static program on custom_cpu with and
+without FLAGS_custom_cpu_zero_copy_memcpy.
+
+The executor moves fed tensors to the device with memcpy_h2d and fetched
+ones back with memcpy_d2h. The flag is read once, so each mode runs in its
+own child process.
+
+    python feed_fetch_benchmark.py                  # 1 MB to 1 GB
+    python feed_fetch_benchmark.py --mb 1 64 --repeat 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def run_child(sizes_mb, repeat):
+    import paddle
+
+    paddle.enable_static()
+    place = paddle.CustomPlace("custom_cpu", 0)
+    exe = paddle.static.Executor(place)
+    result = {}
+    for mb in sizes_mb:
+        numel = mb * (1 << 20) // 4
+        main = paddle.static.Program()
+        startup = paddle.static.Program()
+        with paddle.static.program_guard(main, startup):
+            x = paddle.static.data(name="x", shape=[numel], dtype="float32")
+            y = paddle.reshape(x, [-1, 256])
+        # Feeding a tensor that already lives on the host skips the numpy
+        # conversion, so only the executor's copies are measured.
+        feed = paddle.base.core.LoDTensor()
+        feed.set(np.ones([numel], dtype="float32"), paddle.CPUPlace())
+        exe.run(startup)
+        exe.run(main, feed={"x": feed}, fetch_list=[y], return_numpy=False)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            exe.run(main, feed={"x": feed}, fetch_list=[y], return_numpy=False)
+            best = min(best, time.perf_counter() - start)
+        result[str(mb)] = best * 1e3
+    print(json.dumps(result))
+
+
+def run_parent(args):
+    timings = {}
+    for zero_copy in (0, 1):
+        env = dict(os.environ, FLAGS_custom_cpu_zero_copy_memcpy=str(zero_copy))
+        out = subprocess.check_output(
+            [sys.executable, __file__, "--child", "--repeat", str(args.repeat)]
+            + ["--mb"]
+            + [str(mb) for mb in args.mb],
+            env=env,
+        )
+        timings[zero_copy] = json.loads(out.decode().strip().splitlines()[-1])
+
+    print("{:>8}{:>14}{:>14}{:>10}".format("MB", "copy ms", "zero-copy ms", "speedup"))
+    for mb in args.mb:
+        copy_ms = timings[0][str(mb)]
+        zero_ms = timings[1][str(mb)]
+        print(
+            "{:>8}{:>14.3f}{:>14.3f}{:>9.1f}x".format(
+                mb, copy_ms, zero_ms, copy_ms / zero_ms
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, nargs="*", default=[1, 16, 256, 1024])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.mb, args.repeat)
+    else:
+        run_parent(args)
@@ -0,0 +1,160 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the packed GEMM engine used by the matmul kernels against the
+// previous triple loop implementation.
+//
+//   ./gemm_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/gemm.h"
+
+namespace {
+
+// The matmul kernel before the packed engine was introduced.
+template <typename T>
+void ReferenceBatchedGEMM(bool trans_x,
+                          bool trans_y,
+                          size_t M,
+                          size_t K,
+                          size_t N,
+                          const T* x,
+                          const T* y,
+                          T* out,
+                          size_t batch_size) {
+  memset(out, 0, sizeof(T) * batch_size * M * N);
+  for (size_t bs = 0; bs < batch_size; ++bs) {
+    for (size_t m = 0; m < M; ++m) {
+      for (size_t n = 0; n < N; ++n) {
+        auto* out_data = &out[bs * M * N + m * N + n];
+        for (size_t k = 0; k < K; ++k) {
+          auto x_dat =
+              trans_x ? x[bs * M * K + k * M + m] : x[bs * M * K + m * K + k];
+          auto y_dat =
+              trans_y ? y[bs * K * N + n * K + k] : y[bs * K * N + k * N + n];
+          *out_data += x_dat * y_dat;
+        }
+      }
+    }
+  }
+}
+
+struct Shape {
+  const char* name;
+  int64_t batch;
+  int64_t M;
+  int64_t N;
+  int64_t K;
+  bool trans_x;
+  bool trans_y;
+};
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+template <typename T>
+void Run(const Shape& s, int repeats) {
+  std::mt19937 gen(2024);
+  std::uniform_real_distribution<T> dist(-1, 1);
+  std::vector<T> x(s.batch * s.M * s.K), y(s.batch * s.K * s.N);
+  std::vector<T> out(s.batch * s.M * s.N), ref(out.size());
+  for (auto& v : x) v = dist(gen);
+  for (auto& v : y) v = dist(gen);
+
+  custom_kernel::funcs::GemmOperand<const T> a{
+      x.data(), s.M * s.K, s.trans_x ? 1 : s.K, s.trans_x ? s.M : 1};
+  custom_kernel::funcs::GemmOperand<const T> b{
+      y.data(), s.K * s.N, s.trans_y ? 1 : s.N, s.trans_y ? s.K : 1};
+  custom_kernel::funcs::GemmOperand<T> c{out.data(), s.M * s.N, s.N, 1};
+
+  double flops = 2.0 * s.batch * s.M * s.N * s.K;
+  double t_ref = BestSeconds(1, [&] {
+    ReferenceBatchedGEMM<T>(s.trans_x,
+                            s.trans_y,
+                            s.M,
+                            s.K,
+                            s.N,
+                            x.data(),
+                            y.data(),
+                            ref.data(),
+                            s.batch);
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::BatchedGemm<T>(
+        s.batch, s.M, s.N, s.K, T(1), a, b, T(0), c);
+  });
+
+  double max_diff = 0;
+  for (size_t i = 0; i < out.size(); ++i) {
+    max_diff = std::max<double>(max_diff, std::abs(out[i] - ref[i]));
+  }
+  printf(
+      "%-10s %-8s %5ld x %5ld x %5ld x %5ld  ref %8.2f GFLOP/s  "
+      "packed %8.2f GFLOP/s  speedup %7.1fx  max_diff %.2e\n",
+      s.name,
+      sizeof(T) == 4 ? "float32" : "float64",
+      static_cast<long>(s.batch),  // NOLINT
+      static_cast<long>(s.M),      // NOLINT
+      static_cast<long>(s.N),      // NOLINT
+      static_cast<long>(s.K),      // NOLINT
+      flops / t_ref * 1e-9,
+      flops / t_new * 1e-9,
+      t_ref / t_new,
+      max_diff);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  const Shape shapes[] = {
+      {"square", 1, 256, 256, 256, false, false},
+      {"square", 1, 512, 512, 512, false, false},
+      {"square", 1, 1024, 1024, 1024, false, false},
+      {"square_tt", 1, 1024, 1024, 1024, true, true},
+      {"skinny", 1, 1, 4096, 4096, false, false},
+      {"skinny", 1, 64, 4096, 1024, false, true},
+      {"skinny", 1, 4096, 16, 1024, false, false},
+      {"tall_k", 1, 64, 64, 65536, false, false},
+      {"batched", 64, 128, 128, 64, false, true},
+      {"batched", 32, 256, 64, 256, false, false},
+      {"batched", 512, 16, 16, 16, false, false},
+  };
+  for (const auto& s : shapes) {
+    Run<float>(s, repeats);
+  }
+  for (const auto& s : shapes) {
+    Run<double>(s, repeats);
+  }
+  return 0;
+}
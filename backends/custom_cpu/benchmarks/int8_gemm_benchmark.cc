@@ -0,0 +1,113 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the a8w8 linear layer, the int8 GEMM with its per-channel
+// dequantization fused in, against the fp32 packed GEMM on the same shapes,
+// with and without the VNNI dot product. Decode shapes stream the weights
+// once, so their time follows the bytes of the weights: 4x fewer for int8.
+//
+//   ./int8_gemm_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/gemm.h"
+#include "kernels/funcs/quant.h"
+
+namespace {
+
+struct Shape {
+  const char* name;
+  int64_t M, N, K;
+};
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+void Run(const Shape& s, int repeats) {
+  std::mt19937 gen(2024);
+  std::uniform_int_distribution<int> dist(-127, 127);
+  std::vector<int8_t> x(s.M * s.K), w(s.N * s.K);
+  for (auto& v : x) v = static_cast<int8_t>(dist(gen));
+  for (auto& v : w) v = static_cast<int8_t>(dist(gen));
+  std::vector<float> xf(x.begin(), x.end()), wf(w.begin(), w.end());
+  std::vector<float> scale(s.N, 1.f), out(s.M * s.N), ref(s.M * s.N);
+
+  // The fp32 weights are [N, K] as well, read transposed.
+  custom_kernel::funcs::GemmOperand<const float> a{xf.data(), 0, s.K, 1};
+  custom_kernel::funcs::GemmOperand<const float> b{wf.data(), 0, 1, s.K};
+  custom_kernel::funcs::GemmOperand<float> c{ref.data(), 0, s.N, 1};
+  double t_fp32 = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::Gemm<float>(s.M, s.N, s.K, 1.f, a, b, 0.f, c);
+  });
+  double t_scalar = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::detail::GemmInt8(
+        s.M, s.N, s.K, x.data(), w.data(), scale.data(), out.data(), false);
+  });
+  double t_int8 = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::GemmInt8(
+        s.M, s.N, s.K, x.data(), w.data(), scale.data(), out.data());
+  });
+
+  double max_diff = 0;
+  for (size_t i = 0; i < out.size(); ++i) {
+    max_diff = std::max<double>(max_diff, std::abs(out[i] - ref[i]));
+  }
+  double ops = 2.0 * s.M * s.N * s.K;
+  printf(
+      "%-8s %5ld x %5ld x %5ld  fp32 %8.2f GOP/s  int8 scalar %8.2f "
+      "GOP/s  int8 %8.2f GOP/s  speedup %5.1fx  max_diff %.1e\n",
+      s.name,
+      static_cast<long>(s.M),  // NOLINT
+      static_cast<long>(s.N),  // NOLINT
+      static_cast<long>(s.K),  // NOLINT
+      ops / t_fp32 * 1e-9,
+      ops / t_scalar * 1e-9,
+      ops / t_int8 * 1e-9,
+      t_fp32 / t_int8,
+      max_diff);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  printf("threads: %d  vnni: %d\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         static_cast<int>(custom_kernel::funcs::detail::HasAvx512Vnni()));
+  const Shape shapes[] = {
+      {"decode", 1, 4096, 4096},
+      {"decode", 8, 4096, 4096},
+      {"decode", 16, 11008, 4096},
+      {"prefill", 128, 4096, 4096},
+      {"prefill", 512, 1024, 1024},
+  };
+  for (const auto& s : shapes) Run(s, repeats);
+  return 0;
+}
@@ -0,0 +1,132 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures how custom_cpu kernels scale with the intra-op thread pool.
+
+The pool size is fixed when the plugin is loaded, so every thread count runs
+in its own child process with FLAGS_custom_cpu_num_threads set.
+
+    python kernel_scaling_benchmark.py                # 1/2/4/8/N threads
+    python kernel_scaling_benchmark.py --threads 1 16 --ops add softmax
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SHAPE = [4096, 4096]
+
+
+def _ops():
+    import paddle
+
+    def rand(shape=SHAPE, dtype="float32"):
+        return paddle.to_tensor(np.random.rand(*shape).astype(dtype))
+
+    x, y = rand(), rand()
+    x3 = rand([64, 256, 1024])
+    strided = x.transpose([1, 0])
+    return {
+        "add": lambda: paddle.add(x, y),
+        "multiply": lambda: paddle.multiply(x, y),
+        "equal": lambda: paddle.equal(x, y),
+        "sum": lambda: paddle.sum(x, axis=-1),
+        "mean": lambda: paddle.mean(x, axis=0),
+        "max": lambda: paddle.max(x, axis=-1),
+        "softmax": lambda: paddle.nn.functional.softmax(x, axis=-1),
+        "cast": lambda: paddle.cast(x, "float64"),
+        "transpose": lambda: paddle.transpose(x3, [0, 2, 1]),
+        "contiguous": lambda: strided.contiguous(),
+        "uniform": lambda: paddle.uniform(SHAPE, min=-1.0, max=1.0),
+    }
+
+
+def run_child(op_names, repeat):
+    import paddle
+
+    paddle.set_device("custom_cpu")
+    ops = _ops()
+    result = {}
+    for name in op_names:
+        fn = ops[name]
+        fn().numpy()  # warm up allocator and kernel lookup
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn().numpy()
+            best = min(best, time.perf_counter() - start)
+        result[name] = best * 1e3
+    print(json.dumps(result))
+
+
+def run_parent(args):
+    threads = args.threads or sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    op_names = args.ops or list(_ops_names())
+    timings = {}
+    for n in threads:
+        env = dict(os.environ, FLAGS_custom_cpu_num_threads=str(n))
+        out = subprocess.check_output(
+            [sys.executable, __file__, "--child", "--repeat", str(args.repeat)]
+            + ["--ops"]
+            + op_names,
+            env=env,
+        )
+        timings[n] = json.loads(out.decode().strip().splitlines()[-1])
+
+    header = "{:<12}".format("op") + "".join(
+        "{:>16}".format("{} thr ms (x)".format(n)) for n in threads
+    )
+    print(header)
+    for name in op_names:
+        base = timings[threads[0]][name]
+        row = "{:<12}".format(name)
+        for n in threads:
+            ms = timings[n][name]
+            row += "{:>16}".format("{:.2f} ({:.1f})".format(ms, base / ms))
+        print(row)
+
+
+def _ops_names():
+    return [
+        "add",
+        "multiply",
+        "equal",
+        "sum",
+        "mean",
+        "max",
+        "softmax",
+        "cast",
+        "transpose",
+        "contiguous",
+        "uniform",
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, nargs="*")
+    parser.add_argument("--ops", nargs="*", choices=_ops_names())
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.ops or _ops_names(), args.repeat)
+    else:
+        run_parent(args)
@@ -0,0 +1,154 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the fused residual + layer/rms norm against the unfused graph it
+// replaces: an add for the bias, an add for the residual and a norm that
+// takes a pass for the statistics and one for the output, each a separate
+// parallel op over the activations.
+//
+//   ./norm_benchmark [repeats] [tokens] [hidden]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "kernels/funcs/norm.h"
+
+namespace {
+
+void ReferenceAdd(const float* a, const float* b, int64_t n, float* out) {
+  custom_cpu::ParallelFor(
+      0, n, custom_cpu::kDefaultGrainSize, [&](int64_t begin, int64_t end) {
+        for (auto i = begin; i < end; ++i) out[i] = a[i] + b[i];
+      });
+}
+
+// out = a + bias, with bias broadcast over the rows.
+void ReferenceBiasAdd(
+    const float* a, const float* bias, int64_t rows, int64_t cols, float* out) {
+  custom_cpu::ParallelFor(0, rows, 1, [&](int64_t b, int64_t e) {
+    for (auto r = b; r < e; ++r) {
+      for (int64_t i = 0; i < cols; ++i) {
+        out[r * cols + i] = a[r * cols + i] + bias[i];
+      }
+    }
+  });
+}
+
+void ReferenceNorm(const float* z,
+                   const float* w,
+                   int64_t rows,
+                   int64_t cols,
+                   bool rms,
+                   float* out) {
+  std::vector<float> mean(rows), rstd(rows);
+  custom_cpu::ParallelFor(0, rows, 1, [&](int64_t b, int64_t e) {
+    for (auto r = b; r < e; ++r) {
+      const float* row = z + r * cols;
+      double sum = 0, sq = 0;
+      for (int64_t i = 0; i < cols; ++i) sum += row[i];
+      const double mu = rms ? 0. : sum / cols;
+      for (int64_t i = 0; i < cols; ++i) sq += (row[i] - mu) * (row[i] - mu);
+      mean[r] = mu;
+      rstd[r] = 1. / std::sqrt(sq / cols + 1e-5);
+    }
+  });
+  custom_cpu::ParallelFor(0, rows, 1, [&](int64_t b, int64_t e) {
+    for (auto r = b; r < e; ++r) {
+      for (int64_t i = 0; i < cols; ++i) {
+        out[r * cols + i] = (z[r * cols + i] - mean[r]) * rstd[r] * w[i];
+      }
+    }
+  });
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 10;
+  int64_t rows = argc > 2 ? atoll(argv[2]) : 2048;
+  int64_t cols = argc > 3 ? atoll(argv[3]) : 4096;
+  printf("threads: %d  tokens: %ld  hidden: %ld\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         rows,
+         cols);
+  const int64_t n = rows * cols;
+  std::vector<float> x(n, 0.5f), bias(cols, 0.25f), residual(n, 1.f);
+  std::vector<float> w(cols, 2.f);
+  std::vector<float> tmp(n), residual_out(n), out(n), dy(n, 1.f), dx(n);
+  std::vector<float> dw(cols), mean(rows), rstd(rows);
+  for (bool rms : {false, true}) {
+    double t_ref = BestSeconds(repeats, [&] {
+      ReferenceBiasAdd(x.data(), bias.data(), rows, cols, tmp.data());
+      ReferenceAdd(tmp.data(), residual.data(), n, residual_out.data());
+      ReferenceNorm(residual_out.data(), w.data(), rows, cols, rms, out.data());
+    });
+    custom_kernel::funcs::NormArgs<float> args = {};
+    args.rows = rows;
+    args.cols = cols;
+    args.x = x.data();
+    args.bias = bias.data();
+    args.residual = residual.data();
+    args.residual_alpha = 1.f;
+    args.weight = w.data();
+    args.epsilon = 1e-5f;
+    args.rms = rms;
+    double t_new = BestSeconds(repeats, [&] {
+      custom_kernel::funcs::NormForward<float, float, float>(
+          args,
+          out.data(),
+          residual_out.data(),
+          mean.data(),
+          nullptr,
+          rstd.data());
+    });
+    double t_bwd = BestSeconds(repeats, [&] {
+      custom_kernel::funcs::NormBackward<float, float>(args,
+                                                       mean.data(),
+                                                       rstd.data(),
+                                                       dy.data(),
+                                                       dx.data(),
+                                                       dw.data(),
+                                                       nullptr);
+    });
+    // Fused: read x and residual, write residual_out and out.
+    const double bytes = 4. * n * sizeof(float);
+    printf(
+        "%-10s ref %8.3f ms  fused %8.3f ms %6.1f GB/s  speedup %5.2fx"
+        "  backward %8.3f ms\n",
+        rms ? "rms_norm" : "layer_norm",
+        t_ref * 1e3,
+        t_new * 1e3,
+        bytes / t_new * 1e-9,
+        t_ref / t_new,
+        t_bwd * 1e3);
+  }
+  return 0;
+}
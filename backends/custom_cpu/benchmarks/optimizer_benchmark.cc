@@ -0,0 +1,187 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// One AdamW step over a model split into many parameter tensors: one
+// launch per tensor with a plain loop, as the optimizer ops ran before,
+// against the fused multi-tensor update, for float parameters and for
+// bfloat16 parameters with float master weights. The step is bound by
+// memory traffic, so the fused update is also compared with a parallel
+// copy of as many bytes.
+//
+//   ./optimizer_benchmark [repeats] [params] [tensors]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <vector>
+
+#include "kernels/funcs/optimizer.h"
+
+namespace {
+
+struct Bfloat16 {
+  uint16_t bits;
+
+  Bfloat16() = default;
+  explicit Bfloat16(float f) {
+    uint32_t u;
+    std::memcpy(&u, &f, sizeof(u));
+    bits = static_cast<uint16_t>((u + 0x7fff + ((u >> 16) & 1)) >> 16);
+  }
+  explicit operator float() const {
+    uint32_t u = static_cast<uint32_t>(bits) << 16;
+    float f;
+    std::memcpy(&f, &u, sizeof(f));
+    return f;
+  }
+};
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+// Tensor sizes of a model with `params` parameters in `tensors` tensors:
+// weights with biases and norm scales of 1/64 their size in between.
+std::vector<int64_t> TensorSizes(int64_t params, int64_t tensors) {
+  const int64_t pairs = std::max<int64_t>(tensors / 2, 1);
+  const int64_t weight = params / pairs * 64 / 65;
+  std::vector<int64_t> sizes;
+  int64_t left = params;
+  for (int64_t i = 0; i < pairs; ++i) {
+    const int64_t small = i + 1 == pairs ? left - weight : weight / 64;
+    sizes.push_back(weight);
+    sizes.push_back(small);
+    left -= weight + small;
+  }
+  return sizes;
+}
+
+// The per-tensor AdamW loop of the previous optimizer kernels.
+template <typename T, typename MT>
+void ReferenceAdamW(const custom_kernel::funcs::AdamTensor<T, MT>& t,
+                    MT lr,
+                    MT beta1,
+                    MT beta2,
+                    MT epsilon,
+                    MT beta1_pow,
+                    MT beta2_pow,
+                    MT coeff) {
+  const MT lr_t = lr * std::sqrt(1 - beta2_pow) / (1 - beta1_pow);
+  for (int64_t i = 0; i < t.numel; ++i) {
+    MT p = t.master_param ? t.master_param[i] : static_cast<MT>(t.param[i]);
+    const MT g = static_cast<MT>(t.grad[i]);
+    p -= lr * coeff * p;
+    const MT m1 = beta1 * t.moment1[i] + (1 - beta1) * g;
+    const MT m2 = beta2 * t.moment2[i] + (1 - beta2) * g * g;
+    p -= lr_t * (m1 / (std::sqrt(m2) + epsilon * std::sqrt(1 - beta2_pow)));
+    t.moment1_out[i] = m1;
+    t.moment2_out[i] = m2;
+    if (t.master_param_out) t.master_param_out[i] = p;
+    t.param_out[i] = static_cast<T>(p);
+  }
+}
+
+template <typename T>
+void Run(const char* name,
+         int repeats,
+         const std::vector<int64_t>& sizes,
+         bool master) {
+  int64_t n = 0;
+  for (auto size : sizes) n += size;
+  std::vector<T> param(n, T(0.5f)), grad(n, T(0.01f));
+  std::vector<float> moment1(n, 0.f), moment2(n, 0.f);
+  std::vector<float> master_param(master ? n : 0, 0.5f);
+  std::vector<custom_kernel::funcs::AdamTensor<T, float>> tensors;
+  auto step = custom_kernel::funcs::MakeAdamStep<float>(
+      1e-3f, 0.9f, 0.999f, 1e-8f, 0.9f, 0.999f, 0.01f);
+  int64_t offset = 0;
+  for (auto size : sizes) {
+    custom_kernel::funcs::AdamTensor<T, float> t = {};
+    t.numel = size;
+    t.param = t.param_out = param.data() + offset;
+    t.grad = grad.data() + offset;
+    t.moment1 = t.moment1_out = moment1.data() + offset;
+    t.moment2 = t.moment2_out = moment2.data() + offset;
+    if (master) {
+      t.master_param = t.master_param_out = master_param.data() + offset;
+    }
+    t.step = step;
+    tensors.push_back(t);
+    offset += size;
+  }
+
+  double t_ref = BestSeconds(repeats, [&] {
+    for (const auto& t : tensors) {
+      custom_cpu::ParallelFor(0, 1, 1, [&](int64_t, int64_t) {
+        ReferenceAdamW<T, float>(
+            t, 1e-3f, 0.9f, 0.999f, 1e-8f, 0.9f, 0.999f, 0.01f);
+      });
+    }
+  });
+  double t_new = BestSeconds(
+      repeats, [&] { custom_kernel::funcs::AdamUpdate<T, float>(tensors); });
+
+  // Read param, grad, the moments and the master weights, write all but
+  // grad back.
+  const int64_t read = n * (2 * sizeof(T) + (master ? 12 : 8));
+  const int64_t bytes = 2 * read - n * sizeof(T);
+  std::vector<char> src(bytes / 2), dst(bytes / 2);
+  double t_copy = BestSeconds(repeats, [&] {
+    custom_cpu::ParallelFor(
+        0,
+        bytes / 2,
+        custom_cpu::kDefaultGrainSize * 16,
+        [&](int64_t begin, int64_t end) {
+          std::memcpy(dst.data() + begin, src.data() + begin, end - begin);
+        });
+  });
+  printf(
+      "%-14s per-tensor %8.2f ms  fused %8.2f ms %6.1f GB/s  speedup %5.2fx"
+      "  copy %6.1f GB/s\n",
+      name,
+      t_ref * 1e3,
+      t_new * 1e3,
+      bytes / t_new * 1e-9,
+      t_ref / t_new,
+      bytes / t_copy * 1e-9);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  int64_t params = argc > 2 ? atoll(argv[2]) : 100000000;
+  int64_t num_tensors = argc > 3 ? atoll(argv[3]) : 400;
+  auto sizes = TensorSizes(params, num_tensors);
+  printf("threads: %d  params: %ld  tensors: %zu\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         params,
+         sizes.size());
+  Run<float>("adamw fp32", repeats, sizes, false);
+  Run<Bfloat16>("adamw bf16+fp32", repeats, sizes, true);
+  return 0;
+}
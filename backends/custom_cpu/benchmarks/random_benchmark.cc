@@ -0,0 +1,131 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the Philox fills against the per-block mt19937_64 fill the
+// uniform kernel used before, on parameter-sized tensors, and reports what
+// initializing a model of a given size would cost.
+//
+//   ./random_benchmark [repeats] [model_params]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/philox.h"
+
+namespace {
+
+constexpr int64_t kReferenceBlockSize = 1 << 16;
+
+// UniformRealDistribution before Philox: one engine per block.
+template <typename T, typename Dist>
+void ReferenceFill(T* data, int64_t size, Dist proto, int seed) {
+  auto num_blocks = (size + kReferenceBlockSize - 1) / kReferenceBlockSize;
+  custom_cpu::ParallelFor(0, num_blocks, 1, [&](int64_t begin, int64_t end) {
+    Dist dist(proto);
+    for (auto block = begin; block < end; ++block) {
+      std::seed_seq seq{static_cast<uint32_t>(seed),
+                        static_cast<uint32_t>(block),
+                        static_cast<uint32_t>(block >> 32)};
+      std::mt19937_64 engine(seq);
+      dist.reset();
+      auto block_end = std::min(size, (block + 1) * kReferenceBlockSize);
+      for (auto i = block * kReferenceBlockSize; i < block_end; ++i) {
+        data[i] = dist(engine);
+      }
+    }
+  });
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+void Report(const char* name,
+            int64_t n,
+            double t_ref,
+            double t_new,
+            int64_t model_params) {
+  printf(
+      "%-24s ref %8.3f ms  philox %8.3f ms %7.2f Gvals/s  speedup %5.1fx"
+      "  %ldM params: ref %6.1f s, philox %6.1f s\n",
+      name,
+      t_ref * 1e3,
+      t_new * 1e3,
+      n / t_new * 1e-9,
+      t_ref / t_new,
+      model_params / 1000000,
+      t_ref / n * model_params,
+      t_new / n * model_params);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  int64_t model_params = argc > 2 ? atoll(argv[2]) : 1000000000;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  const int64_t n = 16 << 20;
+  std::vector<float> data(n);
+  std::vector<double> data64(n);
+
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceFill(
+        data.data(), n, std::uniform_real_distribution<float>(-1, 1), 10);
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::UniformFill<float>(10, data.data(), n, -1, 1);
+  });
+  Report("uniform fp32", n, t_ref, t_new, model_params);
+
+  t_ref = BestSeconds(repeats, [&] {
+    ReferenceFill(
+        data64.data(), n, std::uniform_real_distribution<double>(-1, 1), 10);
+  });
+  t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::UniformFill<double>(10, data64.data(), n, -1, 1);
+  });
+  Report("uniform fp64", n, t_ref, t_new, model_params);
+
+  t_ref = BestSeconds(repeats, [&] {
+    ReferenceFill(
+        data.data(), n, std::normal_distribution<float>(0, 0.02f), 10);
+  });
+  t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::GaussianFill<float>(10, data.data(), n, 0, 0.02f);
+  });
+  Report("gaussian fp32", n, t_ref, t_new, model_params);
+
+  std::vector<uint8_t> mask(n);
+  t_ref = BestSeconds(repeats, [&] {
+    ReferenceFill(mask.data(), n, std::bernoulli_distribution(0.9), 10);
+  });
+  t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::KeepMaskFill(10, mask.data(), n, 0.1f);
+  });
+  Report("dropout mask", n, t_ref, t_new, model_params);
+  return 0;
+}
@@ -0,0 +1,150 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the dimension-collapsing reduction engine used by the reduce
+// kernels against the previous per-element odometer implementation.
+//
+//   ./reduce_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/reduce.h"
+
+namespace {
+
+// SumRawKernel before the reduction engine was introduced.
+void ReferenceSum(const std::vector<float>& x,
+                  const std::vector<int64_t>& x_dims,
+                  const std::vector<int64_t>& reduce_dims,
+                  std::vector<float>* out) {
+  auto out_dims(x_dims);
+  for (auto d : reduce_dims) {
+    out_dims[d] = 1;
+  }
+  std::vector<size_t> index(x_dims.size(), 0);
+  std::vector<size_t> step(x_dims.size(), 1);
+  std::vector<size_t> dst_step = step;
+  for (auto i = x_dims.size() - 1; i > 0; --i) {
+    step[i - 1] = step[i] * x_dims[i];
+    dst_step[i - 1] = dst_step[i] * out_dims[i];
+  }
+  for (auto d : reduce_dims) {
+    dst_step[d] = 0;
+  }
+  std::fill(out->begin(), out->end(), 0.f);
+  for (size_t i = 0; i < x.size(); ++i) {
+    size_t dst = 0, src = 0;
+    for (size_t j = 0; j < index.size(); ++j) {
+      dst += dst_step[j] * index[j];
+      src += step[j] * index[j];
+    }
+    (*out)[dst] += x[src];
+    index.back()++;
+    for (auto j = index.size() - 1; j > 0; --j) {
+      if (index[j] >= static_cast<size_t>(x_dims[j])) {
+        index[j] = 0;
+        index[j - 1]++;
+      } else {
+        break;
+      }
+    }
+  }
+}
+
+struct Case {
+  const char* name;
+  std::vector<int64_t> x_dims;
+  std::vector<int64_t> reduce_dims;
+};
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+void Run(const Case& c, int repeats) {
+  std::mt19937 gen(2024);
+  std::uniform_real_distribution<float> dist(-1, 1);
+  int64_t numel = 1, out_numel = 1;
+  std::vector<bool> reduced(c.x_dims.size(), false);
+  for (auto d : c.reduce_dims) reduced[d] = true;
+  for (size_t i = 0; i < c.x_dims.size(); ++i) {
+    numel *= c.x_dims[i];
+    if (!reduced[i]) out_numel *= c.x_dims[i];
+  }
+  std::vector<float> x(numel), out(out_numel), ref(out_numel);
+  for (auto& v : x) v = dist(gen);
+
+  double t_ref =
+      BestSeconds(1, [&] { ReferenceSum(x, c.x_dims, c.reduce_dims, &ref); });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::Reduce(
+        x.data(),
+        c.x_dims,
+        reduced,
+        out.data(),
+        0.0,
+        custom_kernel::funcs::SumReducer(),
+        [](double acc) { return static_cast<float>(acc); });
+  });
+
+  double max_diff = 0;
+  for (int64_t i = 0; i < out_numel; ++i) {
+    max_diff = std::max<double>(max_diff, std::abs(out[i] - ref[i]));
+  }
+  double bytes = (numel + out_numel) * sizeof(float);
+  printf(
+      "%-14s ref %9.2f ms  engine %8.3f ms %7.2f GB/s  speedup %7.1fx  "
+      "max_diff %.2e\n",
+      c.name,
+      t_ref * 1e3,
+      t_new * 1e3,
+      bytes / t_new * 1e-9,
+      t_ref / t_new,
+      max_diff);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 10;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  const Case cases[] = {
+      {"last_axis", {4096, 4096}, {1}},
+      {"first_axis", {4096, 4096}, {0}},
+      {"all", {4096, 4096}, {0, 1}},
+      {"nchw_to_c", {32, 64, 56, 56}, {0, 2, 3}},
+      {"middle", {64, 1024, 256}, {1}},
+      {"skinny_rows", {1048576, 16}, {1}},
+  };
+  for (const auto& c : cases) {
+    Run(c, repeats);
+  }
+  return 0;
+}
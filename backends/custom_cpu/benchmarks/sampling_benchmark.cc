@@ -0,0 +1,135 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Per-token latency of top-p sampling over a language model vocabulary:
+// the sort-based recipe, which orders the whole row, takes the prefix sum
+// and samples from the prefix, against the radix threshold search of
+// funcs::TopPSampling, which never sorts the row.
+//
+//   ./sampling_benchmark [repeats] [bsz] [top_p] [logit_spread]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <numeric>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/sampling.h"
+
+namespace {
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+// Softmax of normal logits. A spread of 4 leaves an entropy of about four
+// nats over a large vocabulary, in the range of a chat model's next token;
+// smaller spreads flatten the row and grow the nucleus.
+std::vector<float> MakeProbs(int64_t bsz, int64_t vocab, float spread) {
+  std::mt19937 gen(0);
+  std::normal_distribution<float> logit(0.f, spread);
+  std::vector<float> probs(bsz * vocab);
+  for (int64_t b = 0; b < bsz; ++b) {
+    float* row = probs.data() + b * vocab;
+    double sum = 0;
+    for (int64_t i = 0; i < vocab; ++i) {
+      row[i] = std::exp(logit(gen));
+      sum += row[i];
+    }
+    for (int64_t i = 0; i < vocab; ++i) row[i] /= sum;
+  }
+  return probs;
+}
+
+void SortSampling(
+    const float* probs, int64_t bsz, int64_t vocab, float top_p, int64_t* ids) {
+  custom_cpu::ParallelFor(0, bsz, 1, [&](int64_t begin, int64_t end) {
+    std::mt19937 gen(begin);
+    std::vector<int64_t> order(vocab);
+    std::vector<float> cumsum(vocab);
+    for (int64_t b = begin; b < end; ++b) {
+      const float* row = probs + b * vocab;
+      std::iota(order.begin(), order.end(), 0);
+      std::sort(order.begin(), order.end(), [&](int64_t i, int64_t j) {
+        return row[i] > row[j];
+      });
+      float running = 0;
+      int64_t n = 0;
+      while (n < vocab && (n == 0 || cumsum[n - 1] < top_p)) {
+        running += row[order[n]];
+        cumsum[n++] = running;
+      }
+      const float u = std::uniform_real_distribution<float>(0, running)(gen);
+      ids[b] = order[std::upper_bound(cumsum.begin(), cumsum.begin() + n, u) -
+                     cumsum.begin()];
+    }
+  });
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 10;
+  int64_t bsz = argc > 2 ? atoll(argv[2]) : 1;
+  float top_p = argc > 3 ? atof(argv[3]) : 0.8f;
+  float spread = argc > 4 ? atof(argv[4]) : 4.f;
+  printf("threads: %d  bsz: %ld  top_p: %.2f  logit spread: %.1f\n",
+         custom_cpu::GetThreadPool()->NumThreads(),
+         bsz,
+         top_p,
+         spread);
+  for (int64_t vocab : {32000, 151936}) {
+    auto probs = MakeProbs(bsz, vocab, spread);
+    std::vector<float> ps(bsz, top_p), out(bsz);
+    std::vector<int64_t> ids(bsz);
+    double t_sort = BestSeconds(repeats, [&] {
+      SortSampling(probs.data(), bsz, vocab, top_p, ids.data());
+    });
+    custom_kernel::funcs::TopPSamplingArgs<float> args = {};
+    args.bsz = bsz;
+    args.vocab = vocab;
+    args.probs = probs.data();
+    args.top_p = ps.data();
+    double t_radix = BestSeconds(repeats, [&] {
+      args.seed = custom_kernel::funcs::PhiloxSeedFor(0, bsz);
+      custom_kernel::funcs::TopPSampling<float>(args, out.data(), ids.data());
+    });
+    args.top_k = 50;
+    double t_top_k = BestSeconds(repeats, [&] {
+      args.seed = custom_kernel::funcs::PhiloxSeedFor(0, bsz);
+      custom_kernel::funcs::TopPSampling<float>(args, out.data(), ids.data());
+    });
+    printf(
+        "vocab %6ld  sort %9.1f us/token  radix %7.1f us/token  speedup "
+        "%6.1fx  radix top_k=50 %7.1f us/token\n",
+        vocab,
+        t_sort * 1e6 / bsz,
+        t_radix * 1e6 / bsz,
+        t_sort / t_radix,
+        t_top_k * 1e6 / bsz);
+  }
+  return 0;
+}
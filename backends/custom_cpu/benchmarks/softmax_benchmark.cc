@@ -0,0 +1,239 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the vectorized softmax and fused softmax cross entropy engines
+// against the previous four-pass softmax and the separate cross entropy it
+// fed, on vocab-sized rows.
+//
+//   ./softmax_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/softmax.h"
+
+namespace {
+
+// Softmax before the vectorized engine was introduced.
+void ReferenceSoftmax(
+    int axis_dim, const float* in, float* out, size_t M, size_t N) {
+  int64_t remain = N / axis_dim;
+  auto grain = std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / axis_dim);
+  custom_cpu::ParallelFor(
+      0, M * remain, grain, [&](int64_t begin, int64_t end) {
+        std::vector<float> exps(axis_dim);
+        for (auto row = begin; row < end; ++row) {
+          auto in_row = in + (row / remain) * N + row % remain;
+          auto out_row = out + (row / remain) * N + row % remain;
+          float max_val = in_row[0];
+          for (int j = 0; j < axis_dim; ++j) {
+            max_val = std::max(max_val, in_row[j * remain]);
+          }
+          float sum = 0;
+          for (int j = 0; j < axis_dim; ++j) {
+            auto shifted = in_row[j * remain] - max_val;
+            exps[j] = std::exp(shifted < -64.f ? -64.f : shifted);
+            sum += exps[j];
+          }
+          for (int j = 0; j < axis_dim; ++j) {
+            out_row[j * remain] = exps[j] / sum;
+          }
+        }
+      });
+}
+
+// Hard label CrossEntropy that ran on the softmax output.
+void ReferenceCrossEntropy(const float* prob,
+                           const int64_t* label,
+                           size_t batch_size,
+                           size_t num_classes,
+                           float* out) {
+  for (size_t i = 0; i < batch_size; ++i) {
+    auto p = prob[i * num_classes + label[i]];
+    out[i] = -std::max(std::log(p), -1e20f);
+  }
+}
+
+// CrossEntropyWithSoftmaxGradCPUKernel for hard labels.
+void ReferenceCrossEntropyGrad(const float* softmax,
+                               const int64_t* label,
+                               const float* loss_grad,
+                               int n,
+                               int d,
+                               float* logit_grad) {
+  memcpy(logit_grad, softmax, sizeof(float) * n * d);
+  for (int i = 0; i < n; ++i) {
+    for (int j = 0; j < d; ++j) {
+      logit_grad[i * d + j] = loss_grad[i] * logit_grad[i * d + j];
+    }
+  }
+  for (int i = 0; i < n; ++i) {
+    logit_grad[i * d + label[i]] -= loss_grad[i];
+  }
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+// Largest difference relative to the largest reference magnitude.
+double MaxDiff(const std::vector<float>& a, const std::vector<float>& b) {
+  double diff = 0, scale = 1e-30;
+  for (size_t i = 0; i < a.size(); ++i) {
+    diff = std::max<double>(diff, std::abs(a[i] - b[i]));
+    scale = std::max<double>(scale, std::abs(b[i]));
+  }
+  return diff / scale;
+}
+
+void Report(const char* name,
+            double t_ref,
+            double t_new,
+            double bytes,
+            double max_diff) {
+  printf(
+      "%-22s ref %8.2f ms  engine %8.2f ms %6.2f GB/s  speedup %5.1fx  "
+      "max_diff %.2e\n",
+      name,
+      t_ref * 1e3,
+      t_new * 1e3,
+      bytes / t_new * 1e-9,
+      t_ref / t_new,
+      max_diff);
+}
+
+std::vector<float> Logits(int64_t numel) {
+  std::mt19937 gen(2024);
+  std::normal_distribution<float> dist(0, 4);
+  std::vector<float> x(numel);
+  for (auto& v : x) v = dist(gen);
+  return x;
+}
+
+void RunSoftmax(int64_t outer, int64_t axis_dim, int64_t inner, int repeats) {
+  auto numel = outer * axis_dim * inner;
+  auto x = Logits(numel);
+  std::vector<float> out(numel), ref(numel);
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceSoftmax(axis_dim, x.data(), ref.data(), outer, axis_dim * inner);
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::SoftmaxForward(
+        x.data(), outer, axis_dim, inner, out.data());
+  });
+  char name[64];
+  snprintf(name,
+           sizeof(name),
+           "softmax %ldx%ldx%ld",
+           static_cast<long>(outer),     // NOLINT
+           static_cast<long>(axis_dim),  // NOLINT
+           static_cast<long>(inner));    // NOLINT
+  Report(name, t_ref, t_new, 2. * numel * sizeof(float), MaxDiff(out, ref));
+}
+
+void RunCrossEntropy(int64_t rows, int64_t vocab, int repeats) {
+  auto numel = rows * vocab;
+  auto x = Logits(numel);
+  std::vector<int64_t> label(rows);
+  std::mt19937 gen(7);
+  for (auto& l : label) l = gen() % vocab;
+  std::vector<float> softmax(numel), ref_softmax(numel);
+  std::vector<float> loss(rows), ref_loss(rows);
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceSoftmax(vocab, x.data(), ref_softmax.data(), rows, vocab);
+    ReferenceCrossEntropy(
+        ref_softmax.data(), label.data(), rows, vocab, ref_loss.data());
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::SoftmaxCrossEntropyForward(x.data(),
+                                                     label.data(),
+                                                     false,
+                                                     -100,
+                                                     rows,
+                                                     vocab,
+                                                     1,
+                                                     softmax.data(),
+                                                     loss.data());
+  });
+  char name[64];
+  snprintf(name,
+           sizeof(name),
+           "xent fwd %ldx%ld",
+           static_cast<long>(rows),    // NOLINT
+           static_cast<long>(vocab));  // NOLINT
+  Report(name,
+         t_ref,
+         t_new,
+         2. * numel * sizeof(float),
+         std::max(MaxDiff(loss, ref_loss), MaxDiff(softmax, ref_softmax)));
+
+  std::vector<float> loss_grad(rows, 1.f / rows);
+  std::vector<float> grad(numel), ref_grad(numel);
+  t_ref = BestSeconds(repeats, [&] {
+    ReferenceCrossEntropyGrad(ref_softmax.data(),
+                              label.data(),
+                              loss_grad.data(),
+                              rows,
+                              vocab,
+                              ref_grad.data());
+  });
+  t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::SoftmaxCrossEntropyBackward(ref_softmax.data(),
+                                                      label.data(),
+                                                      loss_grad.data(),
+                                                      false,
+                                                      -100,
+                                                      rows,
+                                                      vocab,
+                                                      1,
+                                                      grad.data());
+  });
+  snprintf(name,
+           sizeof(name),
+           "xent bwd %ldx%ld",
+           static_cast<long>(rows),    // NOLINT
+           static_cast<long>(vocab));  // NOLINT
+  Report(
+      name, t_ref, t_new, 2. * numel * sizeof(float), MaxDiff(grad, ref_grad));
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  RunSoftmax(64, 32768, 1, repeats);
+  RunSoftmax(32, 65536, 1, repeats);
+  RunSoftmax(16, 131072, 1, repeats);
+  RunSoftmax(1, 131072, 1, repeats);
+  RunSoftmax(32, 1000, 64, repeats);
+  RunCrossEntropy(64, 32768, repeats);
+  RunCrossEntropy(16, 131072, repeats);
+  return 0;
+}
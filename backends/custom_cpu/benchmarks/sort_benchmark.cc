@@ -0,0 +1,239 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the radix row sort and heap top-k engines against the previous
+// per-row std::sort argsort and a partial_sort top-k, on vocab-sized rows.
+//
+//   ./sort_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <utility>
+#include <vector>
+
+#include "kernels/funcs/sort.h"
+
+namespace {
+
+bool Before(float l, float r, bool descending) {
+  if (descending) {
+    return (std::isnan(l) && !std::isnan(r)) || (l > r);
+  }
+  return (!std::isnan(l) && std::isnan(r)) || (l < r);
+}
+
+// FullSort before the radix engine was introduced.
+void ReferenceSort(const float* x,
+                   int64_t rows,
+                   int64_t n,
+                   bool descending,
+                   float* out,
+                   int64_t* indices) {
+  for (int64_t i = 0; i < rows; ++i) {
+    std::vector<std::pair<float, int64_t>> col_vec;
+    col_vec.reserve(n);
+    for (int64_t j = 0; j < n; ++j) {
+      col_vec.push_back(std::pair<float, int64_t>(x[i * n + j], j));
+    }
+    std::sort(col_vec.begin(),
+              col_vec.end(),
+              [&](const std::pair<float, int64_t>& l,
+                  const std::pair<float, int64_t>& r) {
+                return Before(l.first, r.first, descending);
+              });
+    for (int64_t j = 0; j < n; ++j) {
+      out[i * n + j] = col_vec[j].first;
+      indices[i * n + j] = col_vec[j].second;
+    }
+  }
+}
+
+// Transposes the sorted axis of [outer, n, inner] to the end and back, as
+// argsort did for non-innermost axes.
+void ReferenceSortAxis(const float* x,
+                       int64_t outer,
+                       int64_t n,
+                       int64_t inner,
+                       float* out,
+                       int64_t* indices) {
+  std::vector<float> trans(outer * n * inner), sorted(trans.size());
+  std::vector<int64_t> ids(trans.size());
+  for (int64_t o = 0; o < outer; ++o) {
+    for (int64_t j = 0; j < n; ++j) {
+      for (int64_t c = 0; c < inner; ++c) {
+        trans[(o * inner + c) * n + j] = x[(o * n + j) * inner + c];
+      }
+    }
+  }
+  ReferenceSort(
+      trans.data(), outer * inner, n, false, sorted.data(), ids.data());
+  for (int64_t o = 0; o < outer; ++o) {
+    for (int64_t j = 0; j < n; ++j) {
+      for (int64_t c = 0; c < inner; ++c) {
+        out[(o * n + j) * inner + c] = sorted[(o * inner + c) * n + j];
+        indices[(o * n + j) * inner + c] = ids[(o * inner + c) * n + j];
+      }
+    }
+  }
+}
+
+// Top-k over a pair vector with std::partial_sort, as Paddle's CPU kernel
+// does.
+void ReferenceTopK(const float* x,
+                   int64_t rows,
+                   int64_t n,
+                   int64_t k,
+                   float* out,
+                   int64_t* indices) {
+  for (int64_t i = 0; i < rows; ++i) {
+    std::vector<std::pair<float, int64_t>> col_vec;
+    col_vec.reserve(n);
+    for (int64_t j = 0; j < n; ++j) {
+      col_vec.emplace_back(x[i * n + j], j);
+    }
+    std::partial_sort(col_vec.begin(),
+                      col_vec.begin() + k,
+                      col_vec.end(),
+                      [](const std::pair<float, int64_t>& l,
+                         const std::pair<float, int64_t>& r) {
+                        return Before(l.first, r.first, true);
+                      });
+    for (int64_t j = 0; j < k; ++j) {
+      out[i * k + j] = col_vec[j].first;
+      indices[i * k + j] = col_vec[j].second;
+    }
+  }
+}
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+// Number of positions whose values differ; indices may differ on ties.
+int64_t Mismatches(const std::vector<float>& a, const std::vector<float>& b) {
+  int64_t count = 0;
+  for (size_t i = 0; i < a.size(); ++i) count += a[i] != b[i];
+  return count;
+}
+
+void Report(const char* name, double t_ref, double t_new, int64_t bad) {
+  printf(
+      "%-26s ref %8.2f ms  engine %8.2f ms  speedup %5.1fx  "
+      "mismatches %ld\n",
+      name,
+      t_ref * 1e3,
+      t_new * 1e3,
+      t_ref / t_new,
+      static_cast<long>(bad));  // NOLINT
+}
+
+std::vector<float> Logits(int64_t numel) {
+  std::mt19937 gen(2024);
+  std::normal_distribution<float> dist(0, 4);
+  std::vector<float> x(numel);
+  for (auto& v : x) v = dist(gen);
+  return x;
+}
+
+void RunSort(int64_t rows, int64_t n, int repeats) {
+  auto x = Logits(rows * n);
+  std::vector<float> out(x.size()), ref(x.size());
+  std::vector<int64_t> ids(x.size()), ref_ids(x.size());
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceSort(x.data(), rows, n, true, ref.data(), ref_ids.data());
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::SortAlongAxis(
+        x.data(), rows, n, 1, true, out.data(), ids.data());
+  });
+  char name[64];
+  snprintf(name,
+           sizeof(name),
+           "argsort %ldx%ld",
+           static_cast<long>(rows),  // NOLINT
+           static_cast<long>(n));    // NOLINT
+  Report(name, t_ref, t_new, Mismatches(out, ref));
+}
+
+void RunSortAxis(int64_t outer, int64_t n, int64_t inner, int repeats) {
+  auto x = Logits(outer * n * inner);
+  std::vector<float> out(x.size()), ref(x.size());
+  std::vector<int64_t> ids(x.size()), ref_ids(x.size());
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceSortAxis(x.data(), outer, n, inner, ref.data(), ref_ids.data());
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::SortAlongAxis(
+        x.data(), outer, n, inner, false, out.data(), ids.data());
+  });
+  char name[64];
+  snprintf(name,
+           sizeof(name),
+           "argsort %ldx%ldx%ld",
+           static_cast<long>(outer),   // NOLINT
+           static_cast<long>(n),       // NOLINT
+           static_cast<long>(inner));  // NOLINT
+  Report(name, t_ref, t_new, Mismatches(out, ref));
+}
+
+void RunTopK(int64_t rows, int64_t n, int64_t k, int repeats) {
+  auto x = Logits(rows * n);
+  std::vector<float> out(rows * k), ref(rows * k);
+  std::vector<int64_t> ids(rows * k), ref_ids(rows * k);
+  double t_ref = BestSeconds(repeats, [&] {
+    ReferenceTopK(x.data(), rows, n, k, ref.data(), ref_ids.data());
+  });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::TopKAlongAxis(
+        x.data(), rows, n, 1, k, true, out.data(), ids.data());
+  });
+  char name[64];
+  snprintf(name,
+           sizeof(name),
+           "topk %ldx%ld k=%ld",
+           static_cast<long>(rows),  // NOLINT
+           static_cast<long>(n),     // NOLINT
+           static_cast<long>(k));    // NOLINT
+  Report(name, t_ref, t_new, Mismatches(out, ref));
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 5;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  RunSort(64, 32000, repeats);
+  RunSort(1024, 1000, repeats);
+  RunSortAxis(8, 1000, 256, repeats);
+  for (int64_t k : {1, 5, 10, 20, 50}) {
+    RunTopK(64, 32000, k, repeats);
+  }
+  for (int64_t k : {1, 50}) {
+    RunTopK(16, 152064, k, repeats);
+  }
+  return 0;
+}
@@ -0,0 +1,125 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the strided copy engine used by the transpose, contiguous and
+// strided_copy kernels against the previous per-element gather.
+//
+//   ./transpose_benchmark [repeats]
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/strided_copy.h"
+
+namespace {
+
+// TransposeKernel before the strided copy engine was introduced: one
+// div/mod index decomposition per output element.
+void ReferenceTranspose(const std::vector<float>& x,
+                        const std::vector<int64_t>& x_dims,
+                        const std::vector<int>& axis,
+                        std::vector<float>* out) {
+  auto rank = x_dims.size();
+  std::vector<int64_t> out_dims(rank), x_step(rank, 1);
+  for (size_t i = 0; i < rank; ++i) out_dims[i] = x_dims[axis[i]];
+  for (auto i = static_cast<int64_t>(rank) - 2; i >= 0; --i) {
+    x_step[i] = x_step[i + 1] * x_dims[i + 1];
+  }
+  for (size_t i = 0; i < x.size(); ++i) {
+    int64_t rem = i, src = 0;
+    for (auto j = static_cast<int64_t>(rank) - 1; j >= 0; --j) {
+      src += (rem % out_dims[j]) * x_step[axis[j]];
+      rem /= out_dims[j];
+    }
+    (*out)[i] = x[src];
+  }
+}
+
+struct Case {
+  const char* name;
+  std::vector<int64_t> x_dims;
+  std::vector<int> axis;
+};
+
+template <typename F>
+double BestSeconds(int repeats, F&& fn) {
+  double best = 1e30;
+  for (int i = 0; i < repeats; ++i) {
+    auto start = std::chrono::steady_clock::now();
+    fn();
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start;
+    best = std::min(best, elapsed.count());
+  }
+  return best;
+}
+
+void Run(const Case& c, int repeats) {
+  std::mt19937 gen(2024);
+  std::uniform_real_distribution<float> dist(-1, 1);
+  int64_t numel = 1;
+  for (auto d : c.x_dims) numel *= d;
+  std::vector<float> x(numel), out(numel), ref(numel);
+  for (auto& v : x) v = dist(gen);
+
+  std::vector<int64_t> out_dims(c.axis.size()), src_strides(c.axis.size());
+  auto x_strides = custom_kernel::funcs::ContiguousStrides(c.x_dims);
+  for (size_t i = 0; i < c.axis.size(); ++i) {
+    out_dims[i] = c.x_dims[c.axis[i]];
+    src_strides[i] = x_strides[c.axis[i]];
+  }
+  auto dst_strides = custom_kernel::funcs::ContiguousStrides(out_dims);
+
+  double t_ref =
+      BestSeconds(1, [&] { ReferenceTranspose(x, c.x_dims, c.axis, &ref); });
+  double t_new = BestSeconds(repeats, [&] {
+    custom_kernel::funcs::StridedCopy(
+        x.data(), src_strides, out.data(), dst_strides, out_dims);
+  });
+
+  int mismatches = 0;
+  for (int64_t i = 0; i < numel; ++i) mismatches += out[i] != ref[i];
+  double bytes = 2.0 * numel * sizeof(float);
+  printf(
+      "%-22s ref %9.2f ms  blocked %8.3f ms %7.2f GB/s  speedup %6.1fx  "
+      "mismatches %d\n",
+      c.name,
+      t_ref * 1e3,
+      t_new * 1e3,
+      bytes / t_new * 1e-9,
+      t_ref / t_new,
+      mismatches);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int repeats = argc > 1 ? atoi(argv[1]) : 10;
+  printf("threads: %d\n", custom_cpu::GetThreadPool()->NumThreads());
+  const Case cases[] = {
+      {"0213 [16,512,16,64]", {16, 512, 16, 64}, {0, 2, 1, 3}},
+      {"10 [4096,4096]", {4096, 4096}, {1, 0}},
+      {"10 [4099,1031]", {4099, 1031}, {1, 0}},
+      {"021 [64,512,512]", {64, 512, 512}, {0, 2, 1}},
+      {"0231 [32,64,56,56]", {32, 64, 56, 56}, {0, 2, 3, 1}},
+  };
+  for (const auto& c : cases) {
+    Run(c, repeats);
+  }
+  return 0;
+}
@@ -0,0 +1,77 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/quant.h"
+#include "paddle/extension.h"
+
+std::vector<std::vector<int64_t>> DequantInt8Shape(
+    const std::vector<int64_t>& input_shape) {
+  return {input_shape};
+}
+
+std::vector<paddle::DataType> DequantInt8Dtype(
+    const paddle::DataType& input_dtype,
+    const paddle::DataType& out_scale_dtype,
+    std::string dtype) {
+  paddle::DataType data_type;
+  if (dtype == "float32")
+    data_type = paddle::DataType::FLOAT32;
+  else if (dtype == "bfloat16")
+    data_type = paddle::DataType::BFLOAT16;
+  else if (dtype == "float16")
+    data_type = paddle::DataType::FLOAT16;
+  else
+    PD_THROW(
+        "NOT supported data type. "
+        "Only bfloat16, float16 and float32 are supported. ");
+  return {data_type};
+}
+
+// Scales the int32 accumulators of an int8 GEMM, [..., n], by the
+// per-channel out_scale [n].
+std::vector<paddle::Tensor> DequantInt8(const paddle::Tensor& input,
+                                        const paddle::Tensor& out_scale,
+                                        std::string dtype) {
+  PD_CHECK(input.dtype() == paddle::DataType::INT32,
+           "dequant_int8 takes the int32 output of an int8 GEMM.");
+  const int64_t cols = input.shape().empty() ? 1 : input.shape().back();
+  const int64_t rows = cols == 0 ? 0 : input.numel() / cols;
+  PD_CHECK(out_scale.numel() == cols,
+           "out_scale must have one value per column of the input.");
+  auto output_dtype = DequantInt8Dtype(input.dtype(), out_scale.dtype(), dtype);
+  auto output = paddle::empty(input.shape(), output_dtype[0], input.place());
+  auto run = [&](auto* out) {
+    custom_kernel::funcs::DequantizeInt32Rows(
+        rows, cols, input.data<int32_t>(), out_scale.data<float>(), out);
+  };
+  switch (output_dtype[0]) {
+    case paddle::DataType::BFLOAT16:
+      run(output.data<paddle::bfloat16>());
+      break;
+    case paddle::DataType::FLOAT16:
+      run(output.data<paddle::float16>());
+      break;
+    default:
+      run(output.data<float>());
+  }
+  return {output};
+}
+
+PD_BUILD_OP(dequant_int8)
+    .Inputs({"intput", "out_scale"})
+    .Outputs({"output"})
+    .Attrs({"dtype: std::string"})
+    .SetKernelFn(PD_KERNEL(DequantInt8))
+    .SetInferShapeFn(PD_INFER_SHAPE(DequantInt8Shape))
+    .SetInferDtypeFn(PD_INFER_DTYPE(DequantInt8Dtype));
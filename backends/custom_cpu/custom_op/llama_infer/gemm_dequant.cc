@@ -0,0 +1,91 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/quant.h"
+#include "paddle/extension.h"
+
+// out [..., n] = (x [..., k] * y [n, k]^T) * scale [n], the int8 GEMM of an
+// a8w8 linear layer with its per-channel dequantization fused in.
+std::vector<paddle::Tensor> GemmDequant(const paddle::Tensor& x,
+                                        const paddle::Tensor& y,
+                                        const paddle::Tensor& scale,
+                                        std::string out_dtype) {
+  PD_CHECK(x.dtype() == paddle::DataType::INT8 &&
+               y.dtype() == paddle::DataType::INT8,
+           "gemm_dequant takes int8 x and y.");
+  PD_CHECK(y.shape().size() == 2, "y must be [n, k].");
+  const int64_t n = y.shape()[0];
+  const int64_t k = y.shape()[1];
+  PD_CHECK(!x.shape().empty() && x.shape().back() == k,
+           "The last dimension of x must match y.");
+  PD_CHECK(scale.numel() == n, "scale must have one value per row of y.");
+  const int64_t m = k == 0 ? 0 : x.numel() / k;
+
+  auto out_shape = x.shape();
+  out_shape.back() = n;
+  paddle::DataType dtype;
+  if (out_dtype == "float32")
+    dtype = paddle::DataType::FLOAT32;
+  else if (out_dtype == "bfloat16")
+    dtype = paddle::DataType::BFLOAT16;
+  else if (out_dtype == "float16")
+    dtype = paddle::DataType::FLOAT16;
+  else
+    PD_THROW(
+        "NOT supported data type. "
+        "Only bfloat16, float16 and float32 are supported. ");
+  auto out = paddle::empty(out_shape, dtype, x.place());
+  auto run = [&](auto* c) {
+    custom_kernel::funcs::GemmInt8(
+        m, n, k, x.data<int8_t>(), y.data<int8_t>(), scale.data<float>(), c);
+  };
+  switch (dtype) {
+    case paddle::DataType::BFLOAT16:
+      run(out.data<paddle::bfloat16>());
+      break;
+    case paddle::DataType::FLOAT16:
+      run(out.data<paddle::float16>());
+      break;
+    default:
+      run(out.data<float>());
+  }
+  return {out};
+}
+
+std::vector<std::vector<int64_t>> GemmDequantShape(
+    const std::vector<int64_t>& x_shape,
+    const std::vector<int64_t>& y_shape,
+    const std::vector<int64_t>& scale_shape) {
+  auto out_shape = x_shape;
+  out_shape.back() = y_shape[0];
+  return {out_shape};
+}
+
+std::vector<paddle::DataType> GemmDequantDtype(
+    const paddle::DataType& x_dtype,
+    const paddle::DataType& y_dtype,
+    const paddle::DataType& scale_dtype,
+    std::string out_dtype) {
+  if (out_dtype == "bfloat16") return {paddle::DataType::BFLOAT16};
+  if (out_dtype == "float16") return {paddle::DataType::FLOAT16};
+  return {paddle::DataType::FLOAT32};
+}
+
+PD_BUILD_OP(gemm_dequant)
+    .Inputs({"x", "y", "scale"})
+    .Outputs({"out"})
+    .Attrs({"out_dtype: std::string"})
+    .SetKernelFn(PD_KERNEL(GemmDequant))
+    .SetInferShapeFn(PD_INFER_SHAPE(GemmDequantShape))
+    .SetInferDtypeFn(PD_INFER_DTYPE(GemmDequantDtype));
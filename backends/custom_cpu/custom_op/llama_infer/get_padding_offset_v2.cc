@@ -0,0 +1,88 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/decode.h"
+#include "paddle/extension.h"
+
+std::vector<paddle::Tensor> GetPaddingOffsetV2(
+    const paddle::Tensor& input_ids,
+    const paddle::Tensor& cum_offsets,
+    const paddle::Tensor& token_num,
+    const paddle::Tensor& seq_len) {
+  const int64_t bsz = input_ids.shape()[0];
+  const int64_t seq_length = input_ids.shape()[1];
+  // Device memory is host memory, so token_num is read in place rather
+  // than copied to the CPU place and synchronized.
+  const int64_t token_num_data = token_num.data<int64_t>()[0];
+  const int32_t* offsets = cum_offsets.data<int32_t>();
+  PD_CHECK(bsz == 0 || bsz * seq_length - offsets[bsz - 1] == token_num_data,
+           "token_num does not match seq_len and cum_offsets.");
+
+  auto place = input_ids.place();
+  auto x_remove_padding =
+      paddle::empty({token_num_data}, paddle::DataType::INT64, place);
+  auto cum_offsets_out =
+      paddle::empty(cum_offsets.shape(), paddle::DataType::INT32, place);
+  auto padding_offset =
+      paddle::empty({token_num_data}, paddle::DataType::INT32, place);
+  auto cu_seqlens_q = paddle::empty({bsz + 1}, paddle::DataType::INT32, place);
+  auto cu_seqlens_k = paddle::empty({bsz + 1}, paddle::DataType::INT32, place);
+  custom_kernel::funcs::GetPaddingOffset(bsz,
+                                         seq_length,
+                                         input_ids.data<int64_t>(),
+                                         offsets,
+                                         seq_len.data<int32_t>(),
+                                         x_remove_padding.data<int64_t>(),
+                                         cum_offsets_out.data<int32_t>(),
+                                         padding_offset.data<int32_t>(),
+                                         cu_seqlens_q.data<int32_t>(),
+                                         cu_seqlens_k.data<int32_t>());
+  return {x_remove_padding,
+          cum_offsets_out,
+          padding_offset,
+          cu_seqlens_q,
+          cu_seqlens_k};
+}
+
+std::vector<std::vector<int64_t>> GetPaddingOffsetV2InferShape(
+    const std::vector<int64_t>& input_ids_shape,
+    const std::vector<int64_t>& cum_offsets_shape,
+    const std::vector<int64_t>& token_num_shape,
+    const std::vector<int64_t>& seq_len_shape) {
+  int64_t bsz = seq_len_shape[0];
+  return {{-1}, {bsz}, {-1}, {bsz + 1}, {bsz + 1}};
+}
+
+std::vector<paddle::DataType> GetPaddingOffsetV2InferDtype(
+    const paddle::DataType& input_ids_dtype,
+    const paddle::DataType& cum_offsets_dtype,
+    const paddle::DataType& token_num_dtype,
+    const paddle::DataType& seq_len_dtype) {
+  return {input_ids_dtype,
+          seq_len_dtype,
+          seq_len_dtype,
+          seq_len_dtype,
+          seq_len_dtype};
+}
+
+PD_BUILD_OP(get_padding_offset_v2)
+    .Inputs({"input_ids", "cum_offsets", "token_num", "seq_len"})
+    .Outputs({"x_remove_padding",
+              "cum_offsets_out",
+              "padding_offset",
+              "cu_seqlens_q",
+              "cu_seqlens_k"})
+    .SetKernelFn(PD_KERNEL(GetPaddingOffsetV2))
+    .SetInferShapeFn(PD_INFER_SHAPE(GetPaddingOffsetV2InferShape))
+    .SetInferDtypeFn(PD_INFER_DTYPE(GetPaddingOffsetV2InferDtype));
@@ -0,0 +1,73 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/quant.h"
+#include "paddle/extension.h"
+
+std::vector<paddle::Tensor> QuantInt8(
+    const paddle::Tensor& input,
+    const paddle::optional<paddle::Tensor>& shift,
+    const paddle::optional<paddle::Tensor>& smooth,
+    float scale,
+    int32_t round_type,
+    float max_bound,
+    float min_bound) {
+  const int64_t cols = input.shape().empty() ? 1 : input.shape().back();
+  const int64_t rows = cols == 0 ? 0 : input.numel() / cols;
+  PD_CHECK(!shift || shift->numel() == cols,
+           "shift must have one value per column of the input.");
+  PD_CHECK(!smooth || smooth->numel() == cols,
+           "smooth must have one value per column of the input.");
+  auto output =
+      paddle::empty(input.shape(), paddle::DataType::INT8, input.place());
+  const custom_kernel::funcs::Int8Quant quant = {
+      scale, round_type, max_bound, min_bound};
+  PD_DISPATCH_FLOATING_AND_HALF_TYPES(
+      input.dtype(), "QuantInt8", ([&] {
+        custom_kernel::funcs::QuantizeInt8Rows(
+            rows,
+            cols,
+            input.data<data_t>(),
+            shift ? shift->data<data_t>() : nullptr,
+            smooth ? smooth->data<data_t>() : nullptr,
+            quant,
+            output.data<int8_t>());
+      }));
+  return {output};
+}
+
+std::vector<std::vector<int64_t>> QuantInt8Shape(
+    const std::vector<int64_t>& input_shape,
+    const paddle::optional<std::vector<int64_t>>& shift_shape,
+    const paddle::optional<std::vector<int64_t>>& smooth_shape) {
+  return {input_shape};
+}
+
+std::vector<paddle::DataType> QuantInt8Dtype(
+    const paddle::DataType& input_dtype,
+    const paddle::optional<paddle::DataType>& shift_dtype,
+    const paddle::optional<paddle::DataType>& smooth_dtype) {
+  return {paddle::DataType::INT8};
+}
+
+PD_BUILD_OP(quant_int8)
+    .Inputs({"intput", paddle::Optional("shift"), paddle::Optional("smooth")})
+    .Outputs({"output"})
+    .Attrs({"scale: float",
+            "round_type: int",
+            "max_bound: float",
+            "min_bound: float"})
+    .SetKernelFn(PD_KERNEL(QuantInt8))
+    .SetInferShapeFn(PD_INFER_SHAPE(QuantInt8Shape))
+    .SetInferDtypeFn(PD_INFER_DTYPE(QuantInt8Dtype));
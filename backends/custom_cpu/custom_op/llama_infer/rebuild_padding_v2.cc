@@ -0,0 +1,65 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/decode.h"
+#include "paddle/extension.h"
+
+std::vector<paddle::Tensor> RebuildPaddingV2(
+    const paddle::Tensor& tmp_out,      // [token_num, dim_embed]
+    const paddle::Tensor& cum_offsets,  // [bsz, 1]
+    const paddle::Tensor& seq_lens_decoder,
+    const paddle::Tensor& seq_lens_encoder,
+    int max_input_length) {
+  const int64_t dim_embed = tmp_out.shape().back();
+  const int64_t bsz = cum_offsets.shape()[0];
+  auto out = paddle::empty({bsz, dim_embed}, tmp_out.dtype(), tmp_out.place());
+  PD_DISPATCH_FLOATING_TYPES(tmp_out.dtype(), "RebuildPaddingV2", ([&] {
+                               custom_kernel::funcs::RebuildPadding(
+                                   bsz,
+                                   dim_embed,
+                                   max_input_length,
+                                   tmp_out.data<data_t>(),
+                                   cum_offsets.data<int32_t>(),
+                                   seq_lens_decoder.data<int32_t>(),
+                                   seq_lens_encoder.data<int32_t>(),
+                                   out.data<data_t>());
+                             }));
+  return {out};
+}
+
+std::vector<std::vector<int64_t>> RebuildPaddingV2InferShape(
+    const std::vector<int64_t>& tmp_out_shape,
+    const std::vector<int64_t>& cum_offsets_shape,
+    const std::vector<int64_t>& seq_lens_decoder_shape,
+    const std::vector<int64_t>& seq_lens_encoder_shape) {
+  int64_t bsz = cum_offsets_shape[0];
+  int64_t dim_embed = tmp_out_shape.back();
+  return {{bsz, dim_embed}};
+}
+
+std::vector<paddle::DataType> RebuildPaddingV2InferDtype(
+    const paddle::DataType& tmp_out_dtype,
+    const paddle::DataType& cum_offsets_dtype,
+    const paddle::DataType& seq_lens_decoder_dtype,
+    const paddle::DataType& seq_lens_encoder_dtype) {
+  return {tmp_out_dtype};
+}
+
+PD_BUILD_OP(rebuild_padding_v2)
+    .Inputs({"tmp_out", "cum_offsets", "seq_lens_decoder", "seq_lens_encoder"})
+    .Outputs({"out"})
+    .Attrs({"max_input_length: int"})
+    .SetKernelFn(PD_KERNEL(RebuildPaddingV2))
+    .SetInferShapeFn(PD_INFER_SHAPE(RebuildPaddingV2InferShape))
+    .SetInferDtypeFn(PD_INFER_DTYPE(RebuildPaddingV2InferDtype));
@@ -0,0 +1,148 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+#include "custom_op/llama_infer/step_scheduler.h"
+#include "paddle/extension.h"
+
+namespace {
+
+template <typename T>
+T* MutableData(const paddle::Tensor& t) {
+  return const_cast<T*>(t.data<T>());
+}
+
+}  // namespace
+
+// custom_cpu tensors live in host memory, so the scheduler that the device
+// plugins run on host copies works on them in place.
+void StepPaddle(const paddle::Tensor& stop_flags,
+                const paddle::Tensor& seq_lens_this_time,
+                const paddle::Tensor& ori_seq_lens_encoder,
+                const paddle::Tensor& seq_lens_encoder,
+                const paddle::Tensor& seq_lens_decoder,
+                const paddle::Tensor& block_tables,  // [bsz, block_num_per_seq]
+                const paddle::Tensor& encoder_block_lens,
+                const paddle::Tensor& is_block_step,
+                const paddle::Tensor& step_block_list,
+                const paddle::Tensor& step_lens,
+                const paddle::Tensor& recover_block_list,
+                const paddle::Tensor& recover_lens,
+                const paddle::Tensor& need_block_list,
+                const paddle::Tensor& need_block_len,
+                const paddle::Tensor& used_list_len,
+                const paddle::Tensor& free_list,
+                const paddle::Tensor& free_list_len,
+                const paddle::Tensor& input_ids,
+                const paddle::Tensor& pre_ids,
+                const paddle::Tensor& step_idx,
+                const paddle::Tensor& next_tokens,
+                const int block_size,
+                const int encoder_decoder_block_num,
+                const int64_t first_token_id) {
+  // Recovered sequences replay their own tokens, so first_token_id is
+  // unused here.
+  const auto& table_shape = block_tables.shape();
+  PD_CHECK(block_size > 0, "block_size must be positive, got ", block_size);
+  StepSchedulerState s;
+  s.bsz = static_cast<int>(table_shape[0]);
+  s.block_num_per_seq = static_cast<int>(table_shape[1]);
+  s.block_size = block_size;
+  s.encoder_decoder_block_num = encoder_decoder_block_num;
+  s.input_ids_len = input_ids.shape()[1];
+  s.pre_ids_len = pre_ids.shape()[1];
+  s.stop_flags = MutableData<bool>(stop_flags);
+  s.seq_lens_this_time = MutableData<int>(seq_lens_this_time);
+  s.ori_seq_lens_encoder = ori_seq_lens_encoder.data<int>();
+  s.seq_lens_encoder = MutableData<int>(seq_lens_encoder);
+  s.seq_lens_decoder = MutableData<int>(seq_lens_decoder);
+  s.block_tables = MutableData<int>(block_tables);
+  s.encoder_block_lens = MutableData<int>(encoder_block_lens);
+  s.is_block_step = MutableData<bool>(is_block_step);
+  s.step_block_list = MutableData<int>(step_block_list);
+  s.step_lens = MutableData<int>(step_lens);
+  s.recover_block_list = MutableData<int>(recover_block_list);
+  s.recover_lens = MutableData<int>(recover_lens);
+  s.need_block_list = MutableData<int>(need_block_list);
+  s.need_block_len = MutableData<int>(need_block_len);
+  s.used_list_len = MutableData<int>(used_list_len);
+  s.free_list = MutableData<int>(free_list);
+  s.free_list_len = MutableData<int>(free_list_len);
+  s.input_ids = MutableData<int64_t>(input_ids);
+  s.pre_ids = pre_ids.data<int64_t>();
+  s.step_idx = step_idx.data<int64_t>();
+  s.next_tokens = next_tokens.data<int64_t>();
+  PD_CHECK(*s.free_list_len <= free_list.numel(),
+           "free_list_len exceeds the free_list capacity");
+  StepSchedule(s);
+}
+
+PD_BUILD_OP(step_paddle)
+    .Inputs({"stop_flags",
+             "seq_lens_this_time",
+             "ori_seq_lens_encoder",
+             "seq_lens_encoder",
+             "seq_lens_decoder",
+             "block_tables",
+             "encoder_block_lens",
+             "is_block_step",
+             "step_block_list",
+             "step_lens",
+             "recover_block_list",
+             "recover_lens",
+             "need_block_list",
+             "need_block_len",
+             "used_list_len",
+             "free_list",
+             "free_list_len",
+             "input_ids",
+             "pre_ids",
+             "step_idx",
+             "next_tokens"})
+    .Attrs({"block_size: int",
+            "encoder_decoder_block_num: int",
+            "first_token_id: int64_t"})
+    .Outputs({"stop_flags_out",
+              "seq_lens_this_time_out",
+              "seq_lens_encoder_out",
+              "seq_lens_decoder_out",
+              "block_tables_out",
+              "encoder_block_lens_out",
+              "is_block_step_out",
+              "step_block_list_out",
+              "step_lens_out",
+              "recover_block_list_out",
+              "recover_lens_out",
+              "need_block_list_out",
+              "need_block_len_out",
+              "used_list_len_out",
+              "free_list_out",
+              "free_list_len_out",
+              "input_ids_out"})
+    .SetInplaceMap({{"stop_flags", "stop_flags_out"},
+                    {"seq_lens_this_time", "seq_lens_this_time_out"},
+                    {"seq_lens_encoder", "seq_lens_encoder_out"},
+                    {"seq_lens_decoder", "seq_lens_decoder_out"},
+                    {"block_tables", "block_tables_out"},
+                    {"encoder_block_lens", "encoder_block_lens_out"},
+                    {"is_block_step", "is_block_step_out"},
+                    {"step_block_list", "step_block_list_out"},
+                    {"step_lens", "step_lens_out"},
+                    {"recover_block_list", "recover_block_list_out"},
+                    {"recover_lens", "recover_lens_out"},
+                    {"need_block_list", "need_block_list_out"},
+                    {"need_block_len", "need_block_len_out"},
+                    {"used_list_len", "used_list_len_out"},
+                    {"free_list", "free_list_out"},
+                    {"free_list_len", "free_list_len_out"},
+                    {"input_ids", "input_ids_out"}})
+    .SetKernelFn(PD_KERNEL(StepPaddle));
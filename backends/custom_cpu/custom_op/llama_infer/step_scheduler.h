@@ -0,0 +1 @@
+../../../npu/custom_op/llama_infer/step_scheduler.h
\ No newline at end of file
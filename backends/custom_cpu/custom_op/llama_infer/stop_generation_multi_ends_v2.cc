@@ -0,0 +1,40 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/decode.h"
+#include "paddle/extension.h"
+
+void GetStopFlagsMultiV2(const paddle::Tensor& topk_ids,
+                         const paddle::Tensor& stop_flags,
+                         const paddle::Tensor& seq_lens,
+                         const paddle::Tensor& end_ids,
+                         const paddle::Tensor& next_tokens) {
+  PD_CHECK(end_ids.numel() > 0, "end_ids must not be empty.");
+  custom_kernel::funcs::SetStopValueMultiEnds(
+      stop_flags.numel(),
+      seq_lens.data<int32_t>(),
+      end_ids.data<int64_t>(),
+      end_ids.numel(),
+      const_cast<int64_t*>(topk_ids.data<int64_t>()),
+      const_cast<bool*>(stop_flags.data<bool>()),
+      const_cast<int64_t*>(next_tokens.data<int64_t>()));
+}
+
+PD_BUILD_OP(set_stop_value_multi_ends_v2)
+    .Inputs({"topk_ids", "stop_flags", "seq_lens", "end_ids", "next_tokens"})
+    .Outputs({"topk_ids_out", "stop_flags_out", "next_tokens_out"})
+    .SetInplaceMap({{"topk_ids", "topk_ids_out"},
+                    {"stop_flags", "stop_flags_out"},
+                    {"next_tokens", "next_tokens_out"}})
+    .SetKernelFn(PD_KERNEL(GetStopFlagsMultiV2));
@@ -0,0 +1,88 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/decode.h"
+#include "paddle/extension.h"
+
+template <typename T>
+void Penalize(const paddle::Tensor& pre_ids,
+              const paddle::Tensor& logits,
+              const paddle::Tensor& penalty_scores,
+              const paddle::Tensor& frequency_scores,
+              const paddle::Tensor& presence_scores,
+              const paddle::Tensor& temperatures,
+              const paddle::Tensor& bad_tokens,
+              const paddle::Tensor& cur_len,
+              const paddle::Tensor& min_len,
+              const paddle::Tensor& eos_token_id) {
+  custom_kernel::funcs::TokenPenaltyArgs<T> args;
+  args.bsz = logits.shape()[0];
+  args.vocab = logits.shape()[1];
+  args.pre_ids_len = pre_ids.shape()[1];
+  args.pre_ids = pre_ids.data<int64_t>();
+  args.penalty = penalty_scores.data<T>();
+  args.frequency = frequency_scores.data<T>();
+  args.presence = presence_scores.data<T>();
+  args.temperature = temperatures.data<T>();
+  args.bad_tokens = bad_tokens.data<int64_t>();
+  args.num_bad_tokens = bad_tokens.numel();
+  args.cur_len = cur_len.data<int64_t>();
+  args.min_len = min_len.data<int64_t>();
+  args.eos_ids = eos_token_id.data<int64_t>();
+  args.num_eos_ids = eos_token_id.numel();
+  custom_kernel::funcs::TokenPenaltyMultiScores(
+      args, const_cast<T*>(logits.data<T>()));
+}
+
+void TokenPenaltyMultiScoresV2(const paddle::Tensor& pre_ids,
+                               const paddle::Tensor& logits,
+                               const paddle::Tensor& penalty_scores,
+                               const paddle::Tensor& frequency_scores,
+                               const paddle::Tensor& presence_scores,
+                               const paddle::Tensor& temperatures,
+                               const paddle::Tensor& bad_tokens,
+                               const paddle::Tensor& cur_len,
+                               const paddle::Tensor& min_len,
+                               const paddle::Tensor& eos_token_id) {
+  PD_CHECK(logits.shape().size() == 2, "logits must be [bsz, vocab_size].");
+  PD_CHECK(pre_ids.shape()[0] == logits.shape()[0],
+           "pre_ids and logits differ in batch size.");
+  PD_DISPATCH_FLOATING_TYPES(logits.dtype(), "TokenPenaltyMultiScoresV2", ([&] {
+                               Penalize<data_t>(pre_ids,
+                                                logits,
+                                                penalty_scores,
+                                                frequency_scores,
+                                                presence_scores,
+                                                temperatures,
+                                                bad_tokens,
+                                                cur_len,
+                                                min_len,
+                                                eos_token_id);
+                             }));
+}
+
+PD_BUILD_OP(get_token_penalty_multi_scores_v2)
+    .Inputs({"pre_ids",
+             "logits",
+             "penalty_scores",
+             "frequency_scores",
+             "presence_scores",
+             "temperatures",
+             "bad_tokens",
+             "cur_len",
+             "min_len",
+             "eos_token_id"})
+    .Outputs({"logits_out"})
+    .SetInplaceMap({{"logits", "logits_out"}})
+    .SetKernelFn(PD_KERNEL(TokenPenaltyMultiScoresV2));
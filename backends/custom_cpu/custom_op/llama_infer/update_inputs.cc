@@ -0,0 +1,61 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/decode.h"
+#include "paddle/extension.h"
+
+void UpdateInputes(const paddle::Tensor& stop_flags,
+                   const paddle::Tensor& not_need_stop,  // cpu
+                   const paddle::Tensor& seq_lens_this_time,
+                   const paddle::Tensor& seq_lens_encoder,
+                   const paddle::Tensor& seq_lens_decoder,
+                   const paddle::Tensor& input_ids,
+                   const paddle::Tensor& stop_nums,
+                   const paddle::Tensor& next_tokens,
+                   const paddle::Tensor& is_block_step) {
+  const bool keep_going = custom_kernel::funcs::UpdateInputs(
+      stop_flags.numel(),
+      input_ids.shape()[1],
+      stop_flags.data<bool>(),
+      next_tokens.data<int64_t>(),
+      is_block_step.data<bool>(),
+      stop_nums.data<int64_t>()[0],
+      const_cast<int32_t*>(seq_lens_this_time.data<int32_t>()),
+      const_cast<int32_t*>(seq_lens_encoder.data<int32_t>()),
+      const_cast<int32_t*>(seq_lens_decoder.data<int32_t>()),
+      const_cast<int64_t*>(input_ids.data<int64_t>()));
+  const_cast<bool*>(not_need_stop.data<bool>())[0] = keep_going;
+}
+
+PD_BUILD_OP(update_inputs)
+    .Inputs({"stop_flags",
+             "not_need_stop",
+             "seq_lens_this_time",
+             "seq_lens_encoder",
+             "seq_lens_decoder",
+             "input_ids",
+             "stop_nums",
+             "next_tokens",
+             "is_block_step"})
+    .Outputs({"not_need_stop_out",
+              "seq_lens_this_time_out",
+              "seq_lens_encoder_out",
+              "seq_lens_decoder_out",
+              "input_ids_out"})
+    .SetInplaceMap({{"not_need_stop", "not_need_stop_out"},
+                    {"seq_lens_this_time", "seq_lens_this_time_out"},
+                    {"seq_lens_encoder", "seq_lens_encoder_out"},
+                    {"seq_lens_decoder", "seq_lens_decoder_out"},
+                    {"input_ids", "input_ids_out"}})
+    .SetKernelFn(PD_KERNEL(UpdateInputes));
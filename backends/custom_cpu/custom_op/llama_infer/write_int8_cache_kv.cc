@@ -0,0 +1,61 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/quant.h"
+#include "paddle/extension.h"
+
+void WriteInt8CacheKV(const paddle::Tensor& input_k,
+                      const paddle::Tensor& input_v,
+                      const paddle::Tensor& cache_kv,
+                      const paddle::Tensor& k_quant_scales,
+                      const paddle::Tensor& v_quant_scales,
+                      const paddle::Tensor& k_dequant_scales,
+                      const paddle::Tensor& v_dequant_scales) {
+  // input_k, input_v: [bsz, num_head, seq_len, dim_head]
+  // cache_kv: [2, bsz, num_head, max_seq_len, dim_head]
+  const auto& k_shape = input_k.shape();
+  const auto& cache_shape = cache_kv.shape();
+  PD_CHECK(k_shape.size() == 4 && cache_shape.size() == 5,
+           "input_k must be 4-D and cache_kv 5-D.");
+  PD_CHECK(cache_kv.dtype() == paddle::DataType::INT8,
+           "cache_kv must be int8.");
+  PD_CHECK(k_shape[2] <= cache_shape[3],
+           "The sequence is longer than the cache.");
+  PD_DISPATCH_FLOATING_AND_HALF_TYPES(
+      input_k.dtype(), "WriteInt8CacheKV", ([&] {
+        custom_kernel::funcs::WriteInt8CacheKV(
+            k_shape[0],
+            k_shape[1],
+            k_shape[2],
+            cache_shape[3],
+            k_shape[3],
+            input_k.data<data_t>(),
+            input_v.data<data_t>(),
+            k_quant_scales.data<float>(),
+            v_quant_scales.data<float>(),
+            const_cast<int8_t*>(cache_kv.data<int8_t>()));
+      }));
+}
+
+PD_BUILD_OP(write_int8_cache_kv)
+    .Inputs({"input_k",
+             "input_v",
+             "cache_kv",
+             "k_quant_scales",
+             "v_quant_scales",
+             "q_dequant_scales",
+             "v_dequant_scales"})
+    .Outputs({"cache_kv_out"})
+    .SetInplaceMap({{"cache_kv", "cache_kv_out"}})
+    .SetKernelFn(PD_KERNEL(WriteInt8CacheKV));
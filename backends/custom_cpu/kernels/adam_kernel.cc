@@ -0,0 +1,326 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include <algorithm>
+#include <vector>
+
+#include "kernels/funcs/optimizer.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+using AdamMT = typename funcs::OptimizerStateType<T>::type;
+
+// Points one tensor of an Adam step at its inputs and allocated outputs.
+// master_param is null unless the step runs in multi precision.
+template <typename T>
+funcs::AdamTensor<T, AdamMT<T>> MakeAdamTensor(
+    const phi::Context& dev_ctx,
+    const phi::DenseTensor& param,
+    const phi::DenseTensor& grad,
+    const phi::DenseTensor& moment1,
+    const phi::DenseTensor& moment2,
+    const phi::DenseTensor* master_param,
+    const funcs::AdamStep<AdamMT<T>>& step,
+    phi::DenseTensor* param_out,
+    phi::DenseTensor* moment1_out,
+    phi::DenseTensor* moment2_out,
+    phi::DenseTensor* master_param_out) {
+  using MT = AdamMT<T>;
+  funcs::AdamTensor<T, MT> t = {};
+  t.numel = param.numel();
+  t.param = param.data<T>();
+  t.grad = grad.data<T>();
+  t.moment1 = moment1.data<MT>();
+  t.moment2 = moment2.data<MT>();
+  t.param_out = dev_ctx.template Alloc<T>(param_out);
+  t.moment1_out = dev_ctx.template Alloc<MT>(moment1_out);
+  t.moment2_out = dev_ctx.template Alloc<MT>(moment2_out);
+  if (master_param) {
+    t.master_param = master_param->data<MT>();
+    t.master_param_out = dev_ctx.template Alloc<MT>(master_param_out);
+  }
+  t.step = step;
+  return t;
+}
+
+// Advances beta1_pow and beta2_pow by one step unless the caller keeps
+// them global. The powers are read before the outputs, which usually alias
+// them, are written.
+template <typename MT>
+void UpdateBetaPow(const phi::Context& dev_ctx,
+                   MT beta1,
+                   MT beta2,
+                   MT beta1_pow,
+                   MT beta2_pow,
+                   bool use_global_beta_pow,
+                   phi::DenseTensor* beta1_pow_out,
+                   phi::DenseTensor* beta2_pow_out) {
+  if (use_global_beta_pow) return;
+  *dev_ctx.template Alloc<MT>(beta1_pow_out) = beta1_pow * beta1;
+  *dev_ctx.template Alloc<MT>(beta2_pow_out) = beta2_pow * beta2;
+}
+
+// Copies `src` to `out` unless they share their data.
+template <typename T>
+void CopyIfNotSame(const phi::Context& dev_ctx,
+                   const phi::DenseTensor& src,
+                   phi::DenseTensor* out) {
+  if (!out) return;
+  const T* from = src.data<T>();
+  T* to = dev_ctx.template Alloc<T>(out);
+  if (from != to) std::copy_n(from, src.numel(), to);
+}
+
+template <typename T>
+void AdamwKernel(const phi::Context& dev_ctx,
+                 const phi::DenseTensor& param,
+                 const phi::DenseTensor& grad,
+                 const phi::DenseTensor& learning_rate,
+                 const phi::DenseTensor& moment1,
+                 const phi::DenseTensor& moment2,
+                 const phi::DenseTensor& beta1_pow,
+                 const phi::DenseTensor& beta2_pow,
+                 const paddle::optional<phi::DenseTensor>& master_param,
+                 const paddle::optional<phi::DenseTensor>& skip_update,
+                 const phi::Scalar& beta1,
+                 const phi::Scalar& beta2,
+                 const phi::Scalar& epsilon,
+                 float lr_ratio,
+                 float coeff,
+                 bool with_decay,
+                 bool lazy_mode,
+                 int64_t min_row_size_to_use_multithread,
+                 bool multi_precision,
+                 bool use_global_beta_pow,
+                 phi::DenseTensor* param_out,
+                 phi::DenseTensor* moment1_out,
+                 phi::DenseTensor* moment2_out,
+                 phi::DenseTensor* beta1_pow_out,
+                 phi::DenseTensor* beta2_pow_out,
+                 phi::DenseTensor* master_param_out) {
+  using MT = AdamMT<T>;
+  const phi::DenseTensor* master =
+      multi_precision ? master_param.get_ptr() : nullptr;
+  PD_CHECK(!multi_precision || master,
+           "adam with multi_precision needs the master_param input.");
+
+  const bool* skip = phi::OptionalData<bool>(skip_update);
+  if (skip && skip[0]) {
+    CopyIfNotSame<T>(dev_ctx, param, param_out);
+    CopyIfNotSame<MT>(dev_ctx, moment1, moment1_out);
+    CopyIfNotSame<MT>(dev_ctx, moment2, moment2_out);
+    if (master) CopyIfNotSame<MT>(dev_ctx, *master, master_param_out);
+    if (!use_global_beta_pow) {
+      CopyIfNotSame<MT>(dev_ctx, beta1_pow, beta1_pow_out);
+      CopyIfNotSame<MT>(dev_ctx, beta2_pow, beta2_pow_out);
+    }
+    return;
+  }
+
+  const MT beta1_value = beta1.to<MT>();
+  const MT beta2_value = beta2.to<MT>();
+  const MT beta1_pow_value = beta1_pow.data<MT>()[0];
+  const MT beta2_pow_value = beta2_pow.data<MT>()[0];
+  const MT lr =
+      learning_rate.data<MT>()[0] * static_cast<MT>(with_decay ? lr_ratio : 1);
+  const auto step =
+      funcs::MakeAdamStep<MT>(lr,
+                              beta1_value,
+                              beta2_value,
+                              epsilon.to<MT>(),
+                              beta1_pow_value,
+                              beta2_pow_value,
+                              with_decay ? static_cast<MT>(coeff) : MT(0));
+  funcs::AdamUpdate<T, MT>({MakeAdamTensor<T>(dev_ctx,
+                                              param,
+                                              grad,
+                                              moment1,
+                                              moment2,
+                                              master,
+                                              step,
+                                              param_out,
+                                              moment1_out,
+                                              moment2_out,
+                                              master_param_out)});
+  UpdateBetaPow(dev_ctx,
+                beta1_value,
+                beta2_value,
+                beta1_pow_value,
+                beta2_pow_value,
+                use_global_beta_pow,
+                beta1_pow_out,
+                beta2_pow_out);
+}
+
+template <typename T>
+void AdamKernel(const phi::Context& dev_ctx,
+                const phi::DenseTensor& param,
+                const phi::DenseTensor& grad,
+                const phi::DenseTensor& learning_rate,
+                const phi::DenseTensor& moment1,
+                const phi::DenseTensor& moment2,
+                const phi::DenseTensor& beta1_pow,
+                const phi::DenseTensor& beta2_pow,
+                const paddle::optional<phi::DenseTensor>& master_param,
+                const paddle::optional<phi::DenseTensor>& skip_update,
+                const phi::Scalar& beta1,
+                const phi::Scalar& beta2,
+                const phi::Scalar& epsilon,
+                bool lazy_mode,
+                int64_t min_row_size_to_use_multithread,
+                bool multi_precision,
+                bool use_global_beta_pow,
+                phi::DenseTensor* param_out,
+                phi::DenseTensor* moment1_out,
+                phi::DenseTensor* moment2_out,
+                phi::DenseTensor* beta1_pow_out,
+                phi::DenseTensor* beta2_pow_out,
+                phi::DenseTensor* master_param_out) {
+  AdamwKernel<T>(dev_ctx,
+                 param,
+                 grad,
+                 learning_rate,
+                 moment1,
+                 moment2,
+                 beta1_pow,
+                 beta2_pow,
+                 master_param,
+                 skip_update,
+                 beta1,
+                 beta2,
+                 epsilon,
+                 1.0f,
+                 0.0f,
+                 false,
+                 lazy_mode,
+                 min_row_size_to_use_multithread,
+                 multi_precision,
+                 use_global_beta_pow,
+                 param_out,
+                 moment1_out,
+                 moment2_out,
+                 beta1_pow_out,
+                 beta2_pow_out,
+                 master_param_out);
+}
+
+// Updates every parameter of the list in one parallel region. Each has its
+// own learning rate and beta powers.
+template <typename T>
+void MergedAdamKernel(const phi::Context& dev_ctx,
+                      const std::vector<const phi::DenseTensor*>& param,
+                      const std::vector<const phi::DenseTensor*>& grad,
+                      const std::vector<const phi::DenseTensor*>& learning_rate,
+                      const std::vector<const phi::DenseTensor*>& moment1,
+                      const std::vector<const phi::DenseTensor*>& moment2,
+                      const std::vector<const phi::DenseTensor*>& beta1_pow,
+                      const std::vector<const phi::DenseTensor*>& beta2_pow,
+                      const std::vector<const phi::DenseTensor*>& master_param,
+                      const phi::Scalar& beta1,
+                      const phi::Scalar& beta2,
+                      const phi::Scalar& epsilon,
+                      bool multi_precision,
+                      bool use_global_beta_pow,
+                      std::vector<phi::DenseTensor*> param_out,
+                      std::vector<phi::DenseTensor*> moment1_out,
+                      std::vector<phi::DenseTensor*> moment2_out,
+                      std::vector<phi::DenseTensor*> beta1_pow_out,
+                      std::vector<phi::DenseTensor*> beta2_pow_out,
+                      std::vector<phi::DenseTensor*> master_param_out) {
+  using MT = AdamMT<T>;
+  const size_t n = param.size();
+  PD_CHECK(grad.size() == n && learning_rate.size() == n &&
+               moment1.size() == n && moment2.size() == n &&
+               beta1_pow.size() == n && beta2_pow.size() == n,
+           "merged_adam needs as many grad, learning_rate, moment and beta "
+           "pow tensors as params (%d).",
+           static_cast<int>(n));
+  // phi::capi passes an absent master_param as an empty list.
+  const bool masters = multi_precision && !master_param.empty();
+  PD_CHECK(!multi_precision || master_param.size() == n,
+           "merged_adam with multi_precision needs one master_param per "
+           "param.");
+
+  const MT beta1_value = beta1.to<MT>();
+  const MT beta2_value = beta2.to<MT>();
+  const MT epsilon_value = epsilon.to<MT>();
+  std::vector<funcs::AdamTensor<T, MT>> tensors;
+  std::vector<MT> beta1_pows(n), beta2_pows(n);
+  for (size_t i = 0; i < n; ++i) {
+    beta1_pows[i] = beta1_pow[i]->data<MT>()[0];
+    beta2_pows[i] = beta2_pow[i]->data<MT>()[0];
+    const auto step = funcs::MakeAdamStep<MT>(learning_rate[i]->data<MT>()[0],
+                                              beta1_value,
+                                              beta2_value,
+                                              epsilon_value,
+                                              beta1_pows[i],
+                                              beta2_pows[i],
+                                              MT(0));
+    tensors.push_back(
+        MakeAdamTensor<T>(dev_ctx,
+                          *param[i],
+                          *grad[i],
+                          *moment1[i],
+                          *moment2[i],
+                          masters ? master_param[i] : nullptr,
+                          step,
+                          param_out[i],
+                          moment1_out[i],
+                          moment2_out[i],
+                          masters ? master_param_out[i] : nullptr));
+  }
+  funcs::AdamUpdate<T, MT>(tensors);
+  for (size_t i = 0; i < n; ++i) {
+    UpdateBetaPow(dev_ctx,
+                  beta1_value,
+                  beta2_value,
+                  beta1_pows[i],
+                  beta2_pows[i],
+                  use_global_beta_pow,
+                  beta1_pow_out[i],
+                  beta2_pow_out[i]);
+  }
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(adam,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::AdamKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
+
+PD_BUILD_PHI_KERNEL(adamw,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::AdamwKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
+
+PD_BUILD_PHI_KERNEL(merged_adam,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MergedAdamKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
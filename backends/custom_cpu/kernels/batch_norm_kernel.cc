@@ -0,0 +1,241 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include <cmath>
+#include <vector>
+
+#include "kernels/funcs/batch_norm.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+inline funcs::BatchNormShape MakeBatchNormShape(
+    const std::vector<int64_t>& dims, const std::string& data_layout) {
+  PD_CHECK(dims.size() >= 2 && dims.size() <= 5,
+           "batch_norm expects a 2-D to 5-D input, but received %d-D.",
+           static_cast<int>(dims.size()));
+  funcs::BatchNormShape shape;
+  shape.channel_last = data_layout == "NHWC" || dims.size() == 2;
+  shape.batch = dims[0];
+  shape.channels = shape.channel_last ? dims.back() : dims[1];
+  shape.spatial = 1;
+  for (size_t i = 1; i < dims.size(); ++i) shape.spatial *= dims[i];
+  shape.spatial /= shape.channels ? shape.channels : 1;
+  return shape;
+}
+
+// Normalizes x into y with per channel mean and inverse std:
+// y = (x - mean) * inv_std * scale + bias.
+template <typename T>
+void BatchNormNormalize(const funcs::BatchNormShape& shape,
+                        const phi::DenseTensor& x,
+                        const T* scale,
+                        const T* bias,
+                        const double* mean,
+                        const double* inv_std,
+                        T* y) {
+  std::vector<T> a(shape.channels), b(shape.channels);
+  for (int64_t c = 0; c < shape.channels; ++c) {
+    const double gain = (scale ? scale[c] : 1.) * inv_std[c];
+    a[c] = static_cast<T>(gain);
+    b[c] = static_cast<T>((bias ? bias[c] : 0.) - mean[c] * gain);
+  }
+  funcs::BatchNormAffine(shape, x.data<T>(), a.data(), b.data(), y);
+}
+
+template <typename T>
+void BatchNormKernel(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& x,
+                     const phi::DenseTensor& mean,
+                     const phi::DenseTensor& variance,
+                     const paddle::optional<phi::DenseTensor>& scale,
+                     const paddle::optional<phi::DenseTensor>& bias,
+                     bool is_test,
+                     float momentum,
+                     float epsilon,
+                     const std::string& data_layout,
+                     bool use_global_stats,
+                     bool trainable_statistics,
+                     phi::DenseTensor* y,
+                     phi::DenseTensor* mean_out,
+                     phi::DenseTensor* variance_out,
+                     phi::DenseTensor* saved_mean,
+                     phi::DenseTensor* saved_variance,
+                     phi::DenseTensor* reserve_space) {
+  auto shape = MakeBatchNormShape(x.dims(), data_layout);
+  const int64_t C = shape.channels;
+  T* y_data = dev_ctx.template Alloc<T>(y);
+  T* mean_out_data = dev_ctx.template Alloc<T>(mean_out);
+  T* variance_out_data = dev_ctx.template Alloc<T>(variance_out);
+  T* saved_mean_data = dev_ctx.template Alloc<T>(saved_mean);
+  T* saved_variance_data = dev_ctx.template Alloc<T>(saved_variance);
+  const T* running_mean = mean.data<T>();
+  const T* running_variance = variance.data<T>();
+
+  const bool global_stats =
+      (is_test && !trainable_statistics) || use_global_stats;
+  std::vector<double> batch_mean(C), batch_variance(C), inv_std(C);
+  if (global_stats) {
+    for (int64_t c = 0; c < C; ++c) {
+      batch_mean[c] = running_mean[c];
+      batch_variance[c] = running_variance[c];
+    }
+  } else {
+    funcs::BatchNormStatistics(
+        shape, x.data<T>(), batch_mean.data(), batch_variance.data());
+  }
+  for (int64_t c = 0; c < C; ++c) {
+    inv_std[c] = 1. / std::sqrt(batch_variance[c] + epsilon);
+    saved_mean_data[c] = static_cast<T>(batch_mean[c]);
+    saved_variance_data[c] = static_cast<T>(inv_std[c]);
+    if (global_stats) {
+      mean_out_data[c] = running_mean[c];
+      variance_out_data[c] = running_variance[c];
+    } else {
+      mean_out_data[c] = static_cast<T>(running_mean[c] * momentum +
+                                        batch_mean[c] * (1. - momentum));
+      variance_out_data[c] = static_cast<T>(
+          running_variance[c] * momentum + batch_variance[c] * (1. - momentum));
+    }
+  }
+  BatchNormNormalize<T>(shape,
+                        x,
+                        phi::OptionalData<T>(scale),
+                        phi::OptionalData<T>(bias),
+                        batch_mean.data(),
+                        inv_std.data(),
+                        y_data);
+}
+
+template <typename T>
+void BatchNormInferKernel(const phi::Context& dev_ctx,
+                          const phi::DenseTensor& x,
+                          const phi::DenseTensor& mean,
+                          const phi::DenseTensor& variance,
+                          const phi::DenseTensor& scale,
+                          const phi::DenseTensor& bias,
+                          float momentum,
+                          float epsilon,
+                          const std::string& data_layout,
+                          phi::DenseTensor* y,
+                          phi::DenseTensor* mean_out,
+                          phi::DenseTensor* variance_out) {
+  auto shape = MakeBatchNormShape(x.dims(), data_layout);
+  const int64_t C = shape.channels;
+  T* y_data = dev_ctx.template Alloc<T>(y);
+  T* mean_out_data = dev_ctx.template Alloc<T>(mean_out);
+  T* variance_out_data = dev_ctx.template Alloc<T>(variance_out);
+  const T* running_mean = mean.data<T>();
+  const T* running_variance = variance.data<T>();
+  std::vector<double> batch_mean(C), inv_std(C);
+  for (int64_t c = 0; c < C; ++c) {
+    batch_mean[c] = running_mean[c];
+    inv_std[c] = 1. / std::sqrt(running_variance[c] + epsilon);
+    mean_out_data[c] = running_mean[c];
+    variance_out_data[c] = running_variance[c];
+  }
+  BatchNormNormalize<T>(shape,
+                        x,
+                        scale.data<T>(),
+                        bias.data<T>(),
+                        batch_mean.data(),
+                        inv_std.data(),
+                        y_data);
+}
+
+template <typename T>
+void BatchNormGradKernel(
+    const phi::Context& dev_ctx,
+    const phi::DenseTensor& x,
+    const paddle::optional<phi::DenseTensor>& scale,
+    const paddle::optional<phi::DenseTensor>& bias,
+    const paddle::optional<phi::DenseTensor>& mean,
+    const paddle::optional<phi::DenseTensor>& variance,
+    const phi::DenseTensor& saved_mean,
+    const phi::DenseTensor& saved_variance,
+    const paddle::optional<phi::DenseTensor>& reserve_space,
+    const phi::DenseTensor& y_grad,
+    float momentum,
+    float epsilon,
+    const std::string& data_layout,
+    bool is_test,
+    bool use_global_stats,
+    bool trainable_statistics,
+    phi::DenseTensor* x_grad,
+    phi::DenseTensor* scale_grad,
+    phi::DenseTensor* bias_grad) {
+  auto shape = MakeBatchNormShape(x.dims(), data_layout);
+  const int64_t C = shape.channels;
+  T* dx = x_grad ? dev_ctx.template Alloc<T>(x_grad) : nullptr;
+  T* dscale = scale_grad ? dev_ctx.template Alloc<T>(scale_grad) : nullptr;
+  T* dbias = bias_grad ? dev_ctx.template Alloc<T>(bias_grad) : nullptr;
+
+  // Running statistics are constants of the forward pass; batch statistics
+  // were saved by it, the variance as its inverse std.
+  const bool global_stats =
+      use_global_stats || (is_test && !trainable_statistics);
+  std::vector<double> mu(C), inv_std(C);
+  if (global_stats) {
+    const T* running_mean = phi::OptionalData<T>(mean);
+    const T* running_variance = phi::OptionalData<T>(variance);
+    PD_CHECK(running_mean && running_variance,
+             "batch_norm_grad with global statistics needs mean and "
+             "variance.");
+    for (int64_t c = 0; c < C; ++c) {
+      mu[c] = running_mean[c];
+      inv_std[c] = 1. / std::sqrt(running_variance[c] + epsilon);
+    }
+  } else {
+    const T* saved_mean_data = saved_mean.data<T>();
+    const T* saved_inv_std = saved_variance.data<T>();
+    for (int64_t c = 0; c < C; ++c) {
+      mu[c] = saved_mean_data[c];
+      inv_std[c] = saved_inv_std[c];
+    }
+  }
+  funcs::BatchNormBackward(shape,
+                           x.data<T>(),
+                           y_grad.data<T>(),
+                           mu.data(),
+                           inv_std.data(),
+                           phi::OptionalData<T>(scale),
+                           global_stats,
+                           dx,
+                           dscale,
+                           dbias);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(batch_norm,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BatchNormKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(batch_norm_infer,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BatchNormInferKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(batch_norm_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BatchNormGradKernel,
+                    float,
+                    double) {}
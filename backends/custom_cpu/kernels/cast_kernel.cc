@@ -12,11 +12,54 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <algorithm>
+#include <type_traits>
+
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
+#include "runtime/thread_pool.h"
 
 namespace custom_kernel {
 
+// Values a thread converts at a time through float when either side is a
+// 16-bit float; the tile stays in L1 between the two conversions.
+constexpr int64_t kCastTile = 1024;
+
+template <typename InT, typename OutT>
+void CastRange(const InT* in, OutT* out, int64_t n, std::false_type) {
+  for (int64_t i = 0; i < n; ++i) out[i] = static_cast<OutT>(in[i]);
+}
+
+template <typename InT, typename OutT>
+void CastRange(const InT* in, OutT* out, int64_t n, std::true_type) {
+  float tile[kCastTile];
+  for (int64_t i = 0; i < n; i += kCastTile) {
+    auto len = std::min(kCastTile, n - i);
+    phi::ToFloat(in + i, tile, len);
+    phi::FromFloat(tile, out + i, len);
+  }
+}
+
+template <typename InT, typename OutT>
+void CastRange(const InT* in, OutT* out, int64_t n) {
+  constexpr bool kThroughFloat =
+      phi::IsLowPrecision<InT>::value || phi::IsLowPrecision<OutT>::value;
+  CastRange(in, out, n, std::integral_constant<bool, kThroughFloat>());
+}
+
+template <typename T>
+void CastRange(const T* in, T* out, int64_t n) {
+  std::copy_n(in, n, out);
+}
+
+template <typename InT, typename OutT>
+void CastData(const InT* in, OutT* out, int64_t numel) {
+  custom_cpu::ParallelFor(
+      0, numel, custom_cpu::kDefaultGrainSize, [&](int64_t begin, int64_t end) {
+        CastRange(in + begin, out + begin, end - begin);
+      });
+}
+
 template <typename T>
 void CastKernel(const phi::Context& dev_ctx,
                 const phi::DenseTensor& x,
@@ -28,74 +71,52 @@ void CastKernel(const phi::Context& dev_ctx,
   switch (out_dtype) {
     case phi::DataType::BFLOAT16: {
       auto out_data = dev_ctx.template Alloc<phi::dtype::bfloat16>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] =
-            static_cast<phi::dtype::bfloat16>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::FLOAT16: {
       auto out_data = dev_ctx.template Alloc<phi::dtype::float16>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] =
-            static_cast<phi::dtype::float16>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::FLOAT32: {
       auto out_data = dev_ctx.template Alloc<float>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<float>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::FLOAT64: {
       auto out_data = dev_ctx.template Alloc<double>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<double>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::INT8: {
       auto out_data = dev_ctx.template Alloc<int8_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int8_t>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::INT16: {
       auto out_data = dev_ctx.template Alloc<int16_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int16_t>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::INT32: {
       auto out_data = dev_ctx.template Alloc<int32_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int32_t>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::INT64: {
       auto out_data = dev_ctx.template Alloc<int64_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int64_t>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::UINT8: {
       auto out_data = dev_ctx.template Alloc<uint8_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<uint8_t>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     case phi::DataType::BOOL: {
       auto out_data = dev_ctx.template Alloc<bool>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<bool>(static_cast<float>(x_data[i]));
-      }
+      CastData(x_data, out_data, numel);
       break;
     }
     default:
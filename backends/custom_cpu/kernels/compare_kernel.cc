@@ -14,37 +14,45 @@
 
 #include <cmath>
 
+#include "kernels/funcs/broadcast.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
 namespace custom_kernel {
 
+// Floating point values closer than 1e-8 compare equal.
+template <typename T>
+struct EqualFunctor {
+  bool operator()(const T a, const T b) const {
+    if (std::is_floating_point<T>::value) {
+      return fabs(static_cast<double>(a - b)) < 1e-8;
+    }
+    return a == b;
+  }
+};
+
+template <typename T>
+struct NotEqualFunctor {
+  bool operator()(const T a, const T b) const {
+    return !EqualFunctor<T>()(a, b);
+  }
+};
+
 template <typename T>
 void NotEqualRawKernel(const phi::Context& dev_ctx,
                        const phi::DenseTensor& x,
                        const phi::DenseTensor& y,
                        int axis,
                        phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    if (std::is_floating_point<T>::value) {
-      out_data[i] = static_cast<bool>(
-          fabs(static_cast<double>(x_data[i] - y_data[i])) >= 1e-8);
-    } else {
-      out_data[i] = x_data[i] != y_data[i];
-    }
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         NotEqualFunctor<T>());
 }
 
 template <typename T>
@@ -61,26 +69,15 @@ void EqualRawKernel(const phi::Context& dev_ctx,
                     const phi::DenseTensor& y,
                     int axis,
                     phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    if (std::is_floating_point<T>::value) {
-      out_data[i] = static_cast<bool>(
-          fabs(static_cast<double>(x_data[i] - y_data[i])) < 1e-8);
-    } else {
-      out_data[i] = x_data[i] == y_data[i];
-    }
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         EqualFunctor<T>());
 }
 
 template <typename T>
@@ -97,20 +94,15 @@ void LessThanRawKernel(const phi::Context& dev_ctx,
                        const phi::DenseTensor& y,
                        int axis,
                        phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] < y_data[i];
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return a < b; });
 }
 
 template <typename T>
@@ -127,20 +119,15 @@ void LessEqualRawKernel(const phi::Context& dev_ctx,
                         const phi::DenseTensor& y,
                         int axis,
                         phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] <= y_data[i];
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return a <= b; });
 }
 
 template <typename T>
@@ -157,20 +144,15 @@ void GreaterThanRawKernel(const phi::Context& dev_ctx,
                           const phi::DenseTensor& y,
                           int axis,
                           phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] > y_data[i];
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return a > b; });
 }
 
 template <typename T>
@@ -187,20 +169,15 @@ void GreaterEqualRawKernel(const phi::Context& dev_ctx,
                            const phi::DenseTensor& y,
                            int axis,
                            phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] >= y_data[i];
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return a >= b; });
 }
 
 template <typename T>
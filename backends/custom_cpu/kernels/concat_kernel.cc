@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/concat.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -39,19 +40,44 @@ void ConcatKernel(const phi::Context& dev_ctx,
   out->Resize(out_dims);
   dev_ctx.template Alloc<T>(out);
 
-  auto M = std::accumulate(
-      out_dims.cbegin(), out_dims.cbegin() + axis, 1, std::multiplies<int>());
-  auto N = std::accumulate(
-      out_dims.cbegin() + axis + 1, out_dims.cend(), 1, std::multiplies<int>());
-  auto out_offset = 0;
-  for (auto i = 0; i < M; ++i) {
-    for (auto j = 0; j < x.size(); ++j) {
-      memcpy(out->data<T>() + out_offset,
-             x[j]->data<T>() + i * N * x[j]->dims()[axis],
-             (N * x[j]->dims()[axis]) * sizeof(T));
-      out_offset += N * x[j]->dims()[axis];
+  const int64_t outer = phi::product(phi::slice_ddim(out_dims, 0, axis));
+  const int64_t inner = phi::product(
+      phi::slice_ddim(out_dims, axis + 1, static_cast<int>(out_dims.size())));
+  std::vector<funcs::ConcatSlice> slices;
+  slices.reserve(x.size());
+  for (auto* in : x) {
+    auto bytes = in->dims()[axis] * inner * static_cast<int64_t>(sizeof(T));
+    slices.push_back({in->numel() ? in->data<T>() : nullptr, bytes});
+  }
+  funcs::ConcatBytes(slices, outer, out->data<T>());
+}
+
+template <typename T>
+void ConcatGradKernel(const phi::Context& dev_ctx,
+                      const std::vector<const phi::DenseTensor*>& x,
+                      const phi::DenseTensor& out_grad,
+                      const phi::Scalar& axis_scalar,
+                      std::vector<phi::DenseTensor*> x_grad) {
+  int64_t axis = axis_scalar.to<int64_t>();
+  if (axis < 0) {
+    axis = axis + out_grad.dims().size();
+  }
+  auto out_dims = out_grad.dims();
+  const int64_t outer = phi::product(phi::slice_ddim(out_dims, 0, axis));
+  const int64_t inner = phi::product(
+      phi::slice_ddim(out_dims, axis + 1, static_cast<int>(out_dims.size())));
+  std::vector<funcs::ConcatSlice> slices;
+  slices.reserve(x.size());
+  for (size_t j = 0; j < x.size(); ++j) {
+    auto bytes = x[j]->dims()[axis] * inner * static_cast<int64_t>(sizeof(T));
+    void* data = nullptr;
+    if (x_grad[j] && x[j]->numel()) {
+      x_grad[j]->Resize(x[j]->dims());
+      data = dev_ctx.template Alloc<T>(x_grad[j]);
     }
+    slices.push_back({data, bytes});
   }
+  funcs::SplitBytes(out_grad.data<T>(), outer, slices);
 }
 
 }  // namespace custom_kernel
@@ -69,3 +95,17 @@ PD_BUILD_PHI_KERNEL(concat,
                     uint8_t,
                     phi::dtype::float16,
                     phi::dtype::bfloat16) {}
+
+PD_BUILD_PHI_KERNEL(concat_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::ConcatGradKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t,
+                    bool,
+                    int8_t,
+                    uint8_t,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
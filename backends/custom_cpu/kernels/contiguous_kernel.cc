@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/strided_copy.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
@@ -26,22 +27,12 @@ void ContiguousKernel(const phi::Context& dev_ctx,
 
   const T* input_data = input.data<T>();
   T* output_data = dev_ctx.template Alloc<T>(out);
-  int rank = input.dims().size();
   auto dims = input.dims();
-  auto input_stride = input.strides();
-  auto numel = input.numel();
-
-  for (int64_t i = 0; i < numel; i++) {
-    int64_t input_offset = 0;
-    int64_t index_tmp = i;
-    for (int dim = rank - 1; dim >= 0; --dim) {
-      int64_t mod = index_tmp % dims[dim];
-      index_tmp = index_tmp / dims[dim];
-      input_offset += mod * input_stride[dim];
-    }
-
-    output_data[i] = input_data[input_offset];
-  }
+  funcs::StridedCopy(input_data,
+                     input.strides(),
+                     output_data,
+                     funcs::ContiguousStrides(dims),
+                     dims);
 }
 }  // namespace custom_kernel
 
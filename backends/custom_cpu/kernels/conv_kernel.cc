@@ -0,0 +1,216 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/conv.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Resolves the conv2d attributes of `input` and `filter` producing
+// `out_dims` into the engine's shape.
+inline funcs::Conv2dShape MakeConv2dShape(
+    const std::vector<int64_t>& in_dims,
+    const std::vector<int64_t>& filter_dims,
+    const std::vector<int64_t>& out_dims,
+    const std::vector<int>& strides,
+    const std::vector<int>& paddings_t,
+    const std::string& padding_algorithm,
+    const std::vector<int>& dilations_t,
+    int groups,
+    const std::string& data_format) {
+  PD_CHECK(in_dims.size() == 4 && filter_dims.size() == 4,
+           "conv2d expects 4-D input and filter, but received %d-D and %d-D.",
+           static_cast<int>(in_dims.size()),
+           static_cast<int>(filter_dims.size()));
+  const bool channel_last = data_format == "NHWC";
+  const int64_t channels = channel_last ? in_dims[3] : in_dims[1];
+  groups = groups < 1 ? 1 : groups;
+  PD_CHECK(channels == filter_dims[1] * groups,
+           "The input has %ld channels, but the filter expects %ld with "
+           "groups = %d.",
+           channels,
+           filter_dims[1] * groups,
+           groups);
+  PD_CHECK(filter_dims[0] % groups == 0,
+           "The filter's output channels %ld must be divisible by groups %d.",
+           filter_dims[0],
+           groups);
+
+  auto paddings = paddings_t;
+  auto dilations = dilations_t;
+  std::vector<int64_t> data_dims =
+      channel_last ? std::vector<int64_t>{in_dims[1], in_dims[2]}
+                   : std::vector<int64_t>{in_dims[2], in_dims[3]};
+  std::vector<int> ksize = {static_cast<int>(filter_dims[2]),
+                            static_cast<int>(filter_dims[3])};
+  phi::UpdatePaddingAndDilation(
+      &paddings, &dilations, padding_algorithm, data_dims, strides, ksize);
+
+  funcs::Conv2dShape shape;
+  shape.batch = in_dims[0];
+  shape.in_channels = channels;
+  shape.in_h = data_dims[0];
+  shape.in_w = data_dims[1];
+  shape.out_channels = filter_dims[0];
+  shape.out_h = channel_last ? out_dims[1] : out_dims[2];
+  shape.out_w = channel_last ? out_dims[2] : out_dims[3];
+  shape.kernel_h = filter_dims[2];
+  shape.kernel_w = filter_dims[3];
+  shape.stride_h = strides[0];
+  shape.stride_w = strides[1];
+  shape.pad_top = paddings[0];
+  shape.pad_left = paddings[2];
+  shape.dilation_h = dilations[0];
+  shape.dilation_w = dilations[1];
+  shape.groups = groups;
+  shape.channel_last = channel_last;
+  return shape;
+}
+
+template <typename T>
+void Conv2dKernel(const phi::Context& dev_ctx,
+                  const phi::DenseTensor& input,
+                  const phi::DenseTensor& filter,
+                  const std::vector<int>& strides,
+                  const std::vector<int>& paddings,
+                  const std::string& padding_algorithm,
+                  const std::vector<int>& dilations,
+                  int groups,
+                  const std::string& data_format,
+                  phi::DenseTensor* out) {
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  auto shape = MakeConv2dShape(input.dims(),
+                               filter.dims(),
+                               out->dims(),
+                               strides,
+                               paddings,
+                               padding_algorithm,
+                               dilations,
+                               groups,
+                               data_format);
+  funcs::Conv2dForward(shape, input.data<T>(), filter.data<T>(), out_data);
+}
+
+template <typename T>
+void Conv2dGradKernel(const phi::Context& dev_ctx,
+                      const phi::DenseTensor& input,
+                      const phi::DenseTensor& filter,
+                      const phi::DenseTensor& out_grad,
+                      const std::vector<int>& strides,
+                      const std::vector<int>& paddings,
+                      const std::string& padding_algorithm,
+                      const std::vector<int>& dilations,
+                      int groups,
+                      const std::string& data_format,
+                      phi::DenseTensor* input_grad,
+                      phi::DenseTensor* filter_grad) {
+  T* dx = input_grad ? dev_ctx.template Alloc<T>(input_grad) : nullptr;
+  T* dfilter = filter_grad ? dev_ctx.template Alloc<T>(filter_grad) : nullptr;
+  auto shape = MakeConv2dShape(input.dims(),
+                               filter.dims(),
+                               out_grad.dims(),
+                               strides,
+                               paddings,
+                               padding_algorithm,
+                               dilations,
+                               groups,
+                               data_format);
+  funcs::Conv2dBackward(shape,
+                        input.data<T>(),
+                        filter.data<T>(),
+                        out_grad.data<T>(),
+                        dx,
+                        dfilter);
+}
+
+template <typename T>
+void DepthwiseConv2dKernel(const phi::Context& dev_ctx,
+                           const phi::DenseTensor& input,
+                           const phi::DenseTensor& filter,
+                           const std::vector<int>& strides,
+                           const std::vector<int>& paddings,
+                           const std::string& padding_algorithm,
+                           int groups,
+                           const std::vector<int>& dilations,
+                           const std::string& data_format,
+                           phi::DenseTensor* out) {
+  Conv2dKernel<T>(dev_ctx,
+                  input,
+                  filter,
+                  strides,
+                  paddings,
+                  padding_algorithm,
+                  dilations,
+                  groups,
+                  data_format,
+                  out);
+}
+
+template <typename T>
+void DepthwiseConv2dGradKernel(const phi::Context& dev_ctx,
+                               const phi::DenseTensor& input,
+                               const phi::DenseTensor& filter,
+                               const phi::DenseTensor& out_grad,
+                               const std::vector<int>& strides,
+                               const std::vector<int>& paddings,
+                               const std::string& padding_algorithm,
+                               int groups,
+                               const std::vector<int>& dilations,
+                               const std::string& data_format,
+                               phi::DenseTensor* input_grad,
+                               phi::DenseTensor* filter_grad) {
+  Conv2dGradKernel<T>(dev_ctx,
+                      input,
+                      filter,
+                      out_grad,
+                      strides,
+                      paddings,
+                      padding_algorithm,
+                      dilations,
+                      groups,
+                      data_format,
+                      input_grad,
+                      filter_grad);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(conv2d,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Conv2dKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(conv2d_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Conv2dGradKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(depthwise_conv2d,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DepthwiseConv2dKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(depthwise_conv2d_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DepthwiseConv2dGradKernel,
+                    float,
+                    double) {}
@@ -13,6 +13,7 @@
 // limitations under the License.
 
 #include "kernels.h"  //NOLINT
+#include "kernels/funcs/softmax.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -155,6 +156,56 @@ void CrossEntropyKernel(const phi::Context& dev_ctx,
   }
 }
 
+template <typename U>
+void CheckHardLabels(const U* label,
+                     int64_t numel,
+                     int ignore_index,
+                     int axis_dim) {
+  for (int64_t i = 0; i < numel; ++i) {
+    auto lbl = static_cast<int64_t>(label[i]);
+    if (lbl == ignore_index) continue;
+    PD_CHECK(lbl >= 0 && lbl < axis_dim,
+             "label value should be in [0, %d) when it is not equal to "
+             "ignore_index(%d), but received label value as %ld.",
+             axis_dim,
+             ignore_index,
+             lbl);
+  }
+}
+
+// Softmax and its cross entropy from one set of row statistics, so the
+// loss needs no log of the written probabilities.
+template <typename T, typename U>
+void FusedCrossEntropyWithSoftmax(const phi::DenseTensor& logits,
+                                  const phi::DenseTensor& label,
+                                  bool soft_label,
+                                  int ignore_index,
+                                  int axis,
+                                  T* softmax_data,
+                                  T* loss_data) {
+  const int rank = logits.dims().size();
+  const int axis_v = phi::funcs::CanonicalAxis(axis, rank);
+  const int axis_dim = logits.dims()[axis_v];
+  PD_CHECK(axis_dim > 0,
+           "The axis dimention should be larger than 0, but received "
+           "axis dimention is %d.",
+           axis_dim);
+  const int n = phi::funcs::SizeToAxis(axis_v, logits.dims());
+  const int d = phi::funcs::SizeFromAxis(axis_v, logits.dims());
+  if (!soft_label) {
+    CheckHardLabels(label.data<U>(), label.numel(), ignore_index, axis_dim);
+  }
+  funcs::SoftmaxCrossEntropyForward(logits.data<T>(),
+                                    label.data<U>(),
+                                    soft_label,
+                                    ignore_index,
+                                    n,
+                                    axis_dim,
+                                    d / axis_dim,
+                                    softmax_data,
+                                    loss_data);
+}
+
 template <typename T>
 void CrossEntropyWithSoftmaxKernel(const phi::Context& dev_ctx,
                                    const phi::DenseTensor& logits,
@@ -175,9 +226,38 @@ void CrossEntropyWithSoftmaxKernel(const phi::Context& dev_ctx,
     return;
   }
 
-  custom_kernel::SoftmaxKernel<T>(dev_ctx, logits, axis, softmax);
-  CrossEntropyKernel<T>(
-      dev_ctx, *softmax, label, soft_label, ignore_index, axis, loss);
+  auto softmax_data = dev_ctx.template Alloc<T>(softmax);
+  auto loss_data = dev_ctx.template Alloc<T>(loss);
+  if (logits.numel() == 0) {
+    return;
+  }
+  if (logits.dims().size() == 0) {
+    softmax_data[0] = static_cast<T>(1);
+    loss_data[0] = static_cast<T>(0);
+    return;
+  }
+
+  if (soft_label) {
+    FusedCrossEntropyWithSoftmax<T, T>(
+        logits, label, soft_label, ignore_index, axis, softmax_data, loss_data);
+  } else if (label.dtype() == phi::DataType::INT32) {
+    FusedCrossEntropyWithSoftmax<T, int32_t>(
+        logits, label, soft_label, ignore_index, axis, softmax_data, loss_data);
+  } else if (label.dtype() == phi::DataType::INT64) {
+    FusedCrossEntropyWithSoftmax<T, int64_t>(
+        logits, label, soft_label, ignore_index, axis, softmax_data, loss_data);
+  } else if (label.dtype() == phi::DataType::INT16) {
+    FusedCrossEntropyWithSoftmax<T, int16_t>(
+        logits, label, soft_label, ignore_index, axis, softmax_data, loss_data);
+  } else if (label.dtype() == phi::DataType::INT8) {
+    FusedCrossEntropyWithSoftmax<T, int8_t>(
+        logits, label, soft_label, ignore_index, axis, softmax_data, loss_data);
+  } else if (label.dtype() == phi::DataType::UINT8) {
+    FusedCrossEntropyWithSoftmax<T, uint8_t>(
+        logits, label, soft_label, ignore_index, axis, softmax_data, loss_data);
+  } else {
+    PD_CHECK(false, "The dtype of label must be int.");
+  }
 }
 
 template <typename T, typename LabelT>
@@ -198,7 +278,8 @@ void CrossEntropyWithSoftmaxGradCPUKernel(const phi::Context& dev_ctx,
   auto logits_grad_data = logits_grad->data<T>();
   auto softmax_data = softmax.data<T>();
 
-  if (logit_grad != &softmax || !use_softmax) {
+  // The fused use_softmax path reads softmax directly and may write over it.
+  if (!use_softmax && logit_grad != &softmax) {
     memcpy(logits_grad_data, softmax_data, softmax.numel() * sizeof(T));
   }
 
@@ -266,68 +347,16 @@ void CrossEntropyWithSoftmaxGradCPUKernel(const phi::Context& dev_ctx,
     }
     return;
   }
-  // for use_softmax=False, continue
-
-  if (soft_label) {
-    // when soft_label = True, ignore_index is not supported
-    for (auto i = 0; i < n; ++i) {
-      for (auto j = 0; j < axis_dim; ++j) {
-        for (auto k = 0; k < remain; ++k) {
-          auto index = i * d + j * remain + k;
-          auto l_index = i * remain + k;
-          logit_grad_data[index] = out_grad_data[l_index] *
-                                   (logit_grad_data[index] - label_data[index]);
-        }
-      }
-    }
-
-    // for each sample, i is sample id
-    // 1) compute dy/dx by p_j - y_j or P-Y, where j is class id,
-    // P=logit_grad_mat[i] is all class's probs, Y=lbl_mat[i] is
-    // all class's label
-    // 2) compute dy * dy/dx by   Chain rule, dy=out_grad_mat[i]
-    // for high dims, e.g. (n,c) or (n,d1,...,dm, c), compute grad by matrix
-    // operation
-
-  } else {
-    for (auto i = 0; i < n; ++i) {
-      for (auto j = 0; j < axis_dim; ++j) {
-        for (auto k = 0; k < remain; ++k) {
-          auto index = i * d + j * remain + k;
-          auto l_index = i * remain + k;
-
-          logit_grad_data[index] =
-              out_grad_data[l_index] * logit_grad_data[index];
-        }
-      }
-    }
-    for (int i = 0; i < n; ++i) {         // for each sample_1_dim
-      for (int j = 0; j < remain; j++) {  // for each sample_other_dims
-        int idx = i * remain + j;  // this sample's label_idx. for 1d case,
-                                   // remain=1 and j=0, so, idx = i
-        auto lbl = static_cast<int64_t>(label_data[idx]);
-        if (lbl == ignore_index) {
-          for (int k = 0; k < axis_dim; ++k) {  // for each class id's label
-            logit_grad_data[i * d + k * remain + j] = 0;
-          }
-        } else {
-          // only for this sample's label_idx, the label is 1, others is 0,
-          // so, only compute this label_idx's class
-          // for 1d case, remain=1 and j=0, so, [i * d + label_data[idx] *
-          // remain + j] = [i * d + label_data[idx]]
-          // let idx_x = i * d + label_data[idx] * remain + j,
-          //   logit_grad_data[idx_x] = logit_grad_data[idx_x] -
-          //   out_grad_data[idx]
-          // note: logit_grad_mat = logit_grad_mat * out_grad_mat
-          // so: logit_grad_data[idx_x] =  (logit_grad_data[idx_x] - 1) *
-          // out_grad_data[idx]
-          // means:           dy/dp * dy=   ( p - y ) * dy
-
-          logit_grad_data[i * d + lbl * remain + j] -= out_grad_data[idx];
-        }
-      }
-    }
-  }
+  // for use_softmax=True, logit_grad = loss_grad * (softmax - label)
+  funcs::SoftmaxCrossEntropyBackward(softmax_data,
+                                     label_data,
+                                     out_grad_data,
+                                     soft_label,
+                                     ignore_index,
+                                     n,
+                                     axis_dim,
+                                     remain,
+                                     logit_grad_data);
 }
 
 template <typename T>
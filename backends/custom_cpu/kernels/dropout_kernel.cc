@@ -0,0 +1,122 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/philox.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// out = x * scale, or x * mask * scale when mask is given.
+template <typename T>
+void ScaleByMask(
+    const T *x, const uint8_t *mask, T scale, int64_t numel, T *out) {
+  custom_cpu::ParallelFor(
+      0, numel, custom_cpu::kDefaultGrainSize, [&](int64_t b, int64_t e) {
+        if (mask) {
+          for (auto i = b; i < e; ++i) {
+            out[i] = x[i] * static_cast<T>(mask[i]) * scale;
+          }
+        } else {
+          for (auto i = b; i < e; ++i) out[i] = x[i] * scale;
+        }
+      });
+}
+
+template <typename T>
+void DropoutRawKernel(const phi::Context &dev_ctx,
+                      const phi::DenseTensor &x,
+                      const paddle::optional<phi::DenseTensor> &seed_tensor,
+                      const phi::Scalar &p,
+                      bool is_test,
+                      const std::string &mode,
+                      int seed,
+                      bool fix_seed,
+                      phi::DenseTensor *out,
+                      phi::DenseTensor *mask) {
+  auto dropout_prob = p.to<float>();
+  bool upscale_in_train = (mode == "upscale_in_train");
+  auto numel = x.numel();
+  auto x_data = x.data<T>();
+  T *out_data = dev_ctx.template Alloc<T>(out);
+
+  if (is_test) {
+    T scale = upscale_in_train ? T(1) : static_cast<T>(1.0f - dropout_prob);
+    ScaleByMask<T>(x_data, nullptr, scale, numel, out_data);
+    return;
+  }
+
+  auto mask_data = dev_ctx.template Alloc<uint8_t>(mask);
+  if (upscale_in_train && dropout_prob == 1.0f) {
+    std::fill(mask_data, mask_data + numel, static_cast<uint8_t>(0));
+    std::fill(out_data, out_data + numel, T(0));
+    return;
+  }
+  // Without a seed, draws come from the plugin's default stream.
+  int64_t seed_data = 0;
+  if (seed_tensor) {
+    seed_data = *seed_tensor->data<int>();
+  } else if (fix_seed) {
+    seed_data = seed;
+  }
+  funcs::KeepMaskFill(seed_data, mask_data, numel, dropout_prob);
+  T scale =
+      upscale_in_train ? static_cast<T>(1.0f / (1.0f - dropout_prob)) : T(1);
+  ScaleByMask<T>(x_data, mask_data, scale, numel, out_data);
+}
+
+template <typename T>
+void DropoutGradRawKernel(const phi::Context &dev_ctx,
+                          const phi::DenseTensor &mask,
+                          const phi::DenseTensor &out_grad,
+                          const phi::Scalar &p,
+                          bool is_test,
+                          const std::string &mode,
+                          phi::DenseTensor *x_grad) {
+  auto dropout_prob = p.to<float>();
+  bool upscale_in_train = (mode == "upscale_in_train");
+  auto numel = out_grad.numel();
+  auto dout = out_grad.data<T>();
+  T *dx = dev_ctx.template Alloc<T>(x_grad);
+
+  if (is_test) {
+    T scale = upscale_in_train ? T(1) : static_cast<T>(1.0f - dropout_prob);
+    ScaleByMask<T>(dout, nullptr, scale, numel, dx);
+    return;
+  }
+  if (upscale_in_train && dropout_prob == 1.0f) {
+    std::fill(dx, dx + numel, T(0));
+    return;
+  }
+  T scale =
+      upscale_in_train ? static_cast<T>(1.0f / (1.0f - dropout_prob)) : T(1);
+  ScaleByMask<T>(dout, mask.data<uint8_t>(), scale, numel, dx);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(dropout,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DropoutRawKernel,
+                    float,
+                    double) {
+  kernel->OutputAt(1).SetDataType(phi::DataType::UINT8);
+}
+
+PD_BUILD_PHI_KERNEL(dropout_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DropoutGradRawKernel,
+                    float,
+                    double) {}
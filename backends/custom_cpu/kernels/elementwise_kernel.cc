@@ -12,6 +12,9 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <algorithm>
+
+#include "kernels/funcs/broadcast.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -23,20 +26,15 @@ void MultiplyRawKernel(const phi::Context& dev_ctx,
                        const phi::DenseTensor& y,
                        int axis,
                        phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] * y_data[i];
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return a * b; });
 }
 
 template <typename T>
@@ -54,21 +52,15 @@ void AddRawKernel(const phi::Context& dev_ctx,
                   const phi::DenseTensor& y,
                   int axis,
                   phi::DenseTensor* out) {
-  dev_ctx.template Alloc<T>(out);
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] + y_data[i];
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return a + b; });
 }
 
 template <typename T>
@@ -86,21 +78,15 @@ void MaxRawKernel(const phi::Context& dev_ctx,
                   const phi::DenseTensor& y,
                   int axis,
                   phi::DenseTensor* out) {
-  dev_ctx.template Alloc<T>(out);
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = std::max(x_data[i], y_data[i]);
-  }
+  funcs::BroadcastBinary(x.data<T>(),
+                         x.dims(),
+                         y.data<T>(),
+                         y.dims(),
+                         out_data,
+                         phi::BroadcastDims(axis, x.dims(), y.dims()),
+                         axis,
+                         [](T a, T b) { return std::max(a, b); });
 }
 
 template <typename T>
@@ -121,7 +107,9 @@ PD_BUILD_PHI_KERNEL(multiply_raw,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(multiply,
                     custom_cpu,
@@ -130,7 +118,9 @@ PD_BUILD_PHI_KERNEL(multiply,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(add_raw,
                     custom_cpu,
@@ -139,7 +129,9 @@ PD_BUILD_PHI_KERNEL(add_raw,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(add,
                     custom_cpu,
@@ -148,7 +140,9 @@ PD_BUILD_PHI_KERNEL(add,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(maximum_raw,
                     custom_cpu,
@@ -157,7 +151,9 @@ PD_BUILD_PHI_KERNEL(maximum_raw,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(maximum,
                     custom_cpu,
@@ -166,4 +162,6 @@ PD_BUILD_PHI_KERNEL(maximum,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
@@ -0,0 +1,196 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Channels one NHWC reduction task owns.
+constexpr int64_t kBatchNormChannelBlock = 16;
+
+// A tensor normalized per channel: [N, C, S] where S is the product of the
+// spatial dims, or [N, S, C] when channel_last.
+struct BatchNormShape {
+  int64_t batch;
+  int64_t channels;
+  int64_t spatial;
+  bool channel_last;
+};
+
+namespace detail {
+
+// For every channel c, zeroes acc[c * K, c * K + K) and calls
+// fn(c, i, acc + c * K) for the index i of each of its elements. A task
+// owns whole channels, summing into locals, so the result does not depend
+// on the thread count.
+template <int K, typename Fn>
+void ReducePerChannel(const BatchNormShape& s, double* acc, Fn fn) {
+  const int64_t per_channel = s.batch * s.spatial;
+  if (!s.channel_last) {
+    const int64_t grain =
+        std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (per_channel + 1));
+    custom_cpu::ParallelFor(0, s.channels, grain, [&](int64_t b, int64_t e) {
+      for (int64_t c = b; c < e; ++c) {
+        double local[K] = {};
+        for (int64_t n = 0; n < s.batch; ++n) {
+          const int64_t base = (n * s.channels + c) * s.spatial;
+          for (int64_t i = base; i < base + s.spatial; ++i) fn(c, i, local);
+        }
+        std::copy(local, local + K, acc + c * K);
+      }
+    });
+    return;
+  }
+  const int64_t blocks =
+      (s.channels + kBatchNormChannelBlock - 1) / kBatchNormChannelBlock;
+  const int64_t grain =
+      std::max<int64_t>(1,
+                        custom_cpu::kDefaultGrainSize /
+                            (per_channel * kBatchNormChannelBlock + 1));
+  custom_cpu::ParallelFor(0, blocks, grain, [&](int64_t b, int64_t e) {
+    for (int64_t block = b; block < e; ++block) {
+      const int64_t c0 = block * kBatchNormChannelBlock;
+      const int64_t c1 = std::min(s.channels, c0 + kBatchNormChannelBlock);
+      double local[kBatchNormChannelBlock * K] = {};
+      for (int64_t r = 0; r < per_channel; ++r) {
+        const int64_t row = r * s.channels;
+        for (int64_t c = c0; c < c1; ++c) {
+          fn(c, row + c, local + (c - c0) * K);
+        }
+      }
+      std::copy(local, local + (c1 - c0) * K, acc + c0 * K);
+    }
+  });
+}
+
+// Calls fn(c, i) for every element i, of channel c, split across the pool.
+template <typename Fn>
+void ForEachElement(const BatchNormShape& s, Fn fn) {
+  if (!s.channel_last) {
+    const int64_t planes = s.batch * s.channels;
+    const int64_t grain =
+        std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (s.spatial + 1));
+    custom_cpu::ParallelFor(0, planes, grain, [&](int64_t b, int64_t e) {
+      for (int64_t p = b; p < e; ++p) {
+        const int64_t c = p % s.channels;
+        for (int64_t i = p * s.spatial; i < (p + 1) * s.spatial; ++i) {
+          fn(c, i);
+        }
+      }
+    });
+    return;
+  }
+  const int64_t rows = s.batch * s.spatial;
+  const int64_t grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (s.channels + 1));
+  custom_cpu::ParallelFor(0, rows, grain, [&](int64_t b, int64_t e) {
+    for (int64_t r = b; r < e; ++r) {
+      for (int64_t c = 0; c < s.channels; ++c) fn(c, r * s.channels + c);
+    }
+  });
+}
+
+}  // namespace detail
+
+// The per channel mean and biased variance of x, accumulated in double.
+template <typename T>
+void BatchNormStatistics(const BatchNormShape& s,
+                         const T* x,
+                         double* mean,
+                         double* variance) {
+  std::vector<double> acc(s.channels * 2);
+  detail::ReducePerChannel<2>(
+      s, acc.data(), [&](int64_t, int64_t i, double* sums) {
+        const double v = x[i];
+        sums[0] += v;
+        sums[1] += v * v;
+      });
+  const double count = static_cast<double>(s.batch * s.spatial);
+  for (int64_t c = 0; c < s.channels; ++c) {
+    mean[c] = count > 0 ? acc[2 * c] / count : 0.;
+    const double sq = count > 0 ? acc[2 * c + 1] / count : 0.;
+    variance[c] = std::max(0., sq - mean[c] * mean[c]);
+  }
+}
+
+// y = x * a[c] + b[c], the normalization folded into one affine map per
+// channel.
+template <typename T>
+void BatchNormAffine(
+    const BatchNormShape& s, const T* x, const T* a, const T* b, T* y) {
+  detail::ForEachElement(
+      s, [&](int64_t c, int64_t i) { y[i] = x[i] * a[c] + b[c]; });
+}
+
+// Gradients of y = (x - mean) * inv_std * scale + bias. dscale and dbias
+// may be null. With `fixed_stats` mean and inv_std are constants (running
+// statistics); otherwise they are the batch statistics of x and dx carries
+// their gradient too.
+template <typename T>
+void BatchNormBackward(const BatchNormShape& s,
+                       const T* x,
+                       const T* dy,
+                       const double* mean,
+                       const double* inv_std,
+                       const T* scale,
+                       bool fixed_stats,
+                       T* dx,
+                       T* dscale,
+                       T* dbias) {
+  std::vector<double> acc(s.channels * 2);
+  detail::ReducePerChannel<2>(
+      s, acc.data(), [&](int64_t c, int64_t i, double* sums) {
+        const double g = dy[i];
+        sums[0] += g;
+        sums[1] += g * (x[i] - mean[c]);
+      });
+  std::vector<double> sum_dy(s.channels), sum_dy_xmu(s.channels);
+  for (int64_t c = 0; c < s.channels; ++c) {
+    sum_dy[c] = acc[2 * c];
+    sum_dy_xmu[c] = acc[2 * c + 1];
+    if (dbias) dbias[c] = static_cast<T>(sum_dy[c]);
+    if (dscale) dscale[c] = static_cast<T>(sum_dy_xmu[c] * inv_std[c]);
+  }
+  if (!dx) return;
+  // dx = k[c] * dy + m[c] * (x - mu[c]) + o[c] per channel.
+  std::vector<T> k(s.channels), m(s.channels), o(s.channels), mu(s.channels);
+  const double count = static_cast<double>(s.batch * s.spatial);
+  for (int64_t c = 0; c < s.channels; ++c) {
+    const double gain = (scale ? scale[c] : 1.) * inv_std[c];
+    k[c] = static_cast<T>(gain);
+    mu[c] = static_cast<T>(mean[c]);
+    if (fixed_stats || count == 0) {
+      m[c] = T(0);
+      o[c] = T(0);
+      continue;
+    }
+    const double slope = gain * inv_std[c] * inv_std[c] * sum_dy_xmu[c] / count;
+    m[c] = static_cast<T>(-slope);
+    o[c] = static_cast<T>(-gain * sum_dy[c] / count);
+  }
+  detail::ForEachElement(s, [&](int64_t c, int64_t i) {
+    dx[i] = k[c] * dy[i] + m[c] * (x[i] - mu[c]) + o[c];
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,175 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Strides that read a contiguous tensor of shape in_dims as if it had been
+// broadcast to out_dims. in_dims is aligned at `axis` of out_dims (trailing
+// alignment when axis is -1 or the ranks match); broadcast dims get stride 0.
+inline std::vector<int64_t> BroadcastStrides(
+    const std::vector<int64_t>& in_dims,
+    const std::vector<int64_t>& out_dims,
+    int axis) {
+  auto in_rank = static_cast<int64_t>(in_dims.size());
+  auto out_rank = static_cast<int64_t>(out_dims.size());
+  auto offset = (axis == -1 || in_rank == out_rank) ? out_rank - in_rank : axis;
+  std::vector<int64_t> strides(out_rank, 0);
+  int64_t stride = 1;
+  for (auto i = in_rank - 1; i >= 0; --i) {
+    if (in_dims[i] != 1) {
+      strides[offset + i] = stride;
+    }
+    stride *= in_dims[i];
+  }
+  return strides;
+}
+
+namespace detail {
+
+// Drops size-1 dims and merges neighbouring dims that both inputs walk
+// linearly, so a same-shape or scalar operation ends up 1-D and a
+// last-dim bias add ends up 2-D. Leaves at least one dim.
+inline void CollapseBroadcastDims(std::vector<int64_t>* dims,
+                                  std::vector<int64_t>* x_strides,
+                                  std::vector<int64_t>* y_strides) {
+  std::vector<int64_t> new_dims, new_xs, new_ys;
+  for (size_t i = 0; i < dims->size(); ++i) {
+    auto d = (*dims)[i];
+    auto xs = (*x_strides)[i];
+    auto ys = (*y_strides)[i];
+    if (d == 1) continue;
+    if (!new_dims.empty() && new_xs.back() == xs * d &&
+        new_ys.back() == ys * d) {
+      new_dims.back() *= d;
+      new_xs.back() = xs;
+      new_ys.back() = ys;
+    } else {
+      new_dims.push_back(d);
+      new_xs.push_back(xs);
+      new_ys.push_back(ys);
+    }
+  }
+  if (new_dims.empty()) {
+    new_dims.push_back(1);
+    new_xs.push_back(0);
+    new_ys.push_back(0);
+  }
+  dims->swap(new_dims);
+  x_strides->swap(new_xs);
+  y_strides->swap(new_ys);
+}
+
+// The innermost loop, specialized for the stride patterns that show up in
+// practice so that the compiler can vectorize them.
+template <typename InT, typename OutT, typename Functor>
+inline void BinaryInnerLoop(const InT* x,
+                            int64_t x_stride,
+                            const InT* y,
+                            int64_t y_stride,
+                            OutT* out,
+                            int64_t n,
+                            Functor func) {
+  if (x_stride == 1 && y_stride == 1) {
+    for (int64_t i = 0; i < n; ++i) {
+      out[i] = func(x[i], y[i]);
+    }
+  } else if (x_stride == 1 && y_stride == 0) {
+    const InT b = *y;
+    for (int64_t i = 0; i < n; ++i) {
+      out[i] = func(x[i], b);
+    }
+  } else if (x_stride == 0 && y_stride == 1) {
+    const InT a = *x;
+    for (int64_t i = 0; i < n; ++i) {
+      out[i] = func(a, y[i]);
+    }
+  } else {
+    for (int64_t i = 0; i < n; ++i) {
+      out[i] = func(x[i * x_stride], y[i * y_stride]);
+    }
+  }
+}
+
+}  // namespace detail
+
+// out = func(x, y) with numpy-style broadcasting. Both inputs are read in
+// place through (possibly zero) strides, so no broadcast copy is made. out
+// is contiguous with shape out_dims and is split across the intra-op pool.
+template <typename InT, typename OutT, typename Functor>
+void BroadcastBinary(const InT* x,
+                     const std::vector<int64_t>& x_dims,
+                     const InT* y,
+                     const std::vector<int64_t>& y_dims,
+                     OutT* out,
+                     const std::vector<int64_t>& out_dims,
+                     int axis,
+                     Functor func) {
+  int64_t numel = 1;
+  for (auto d : out_dims) numel *= d;
+  if (numel <= 0) return;
+
+  auto dims = out_dims;
+  auto x_strides = BroadcastStrides(x_dims, out_dims, axis);
+  auto y_strides = BroadcastStrides(y_dims, out_dims, axis);
+  detail::CollapseBroadcastDims(&dims, &x_strides, &y_strides);
+  auto rank = static_cast<int64_t>(dims.size());
+  auto inner = dims.back();
+
+  custom_cpu::ParallelFor(
+      0, numel, custom_cpu::kDefaultGrainSize, [&](int64_t begin, int64_t end) {
+        std::vector<int64_t> index(rank, 0);
+        int64_t x_offset = 0;
+        int64_t y_offset = 0;
+        for (int64_t i = rank - 1, rem = begin; i >= 0; --i) {
+          index[i] = rem % dims[i];
+          rem /= dims[i];
+          x_offset += index[i] * x_strides[i];
+          y_offset += index[i] * y_strides[i];
+        }
+        for (auto pos = begin; pos < end;) {
+          auto n = std::min(inner - index[rank - 1], end - pos);
+          detail::BinaryInnerLoop(x + x_offset,
+                                  x_strides[rank - 1],
+                                  y + y_offset,
+                                  y_strides[rank - 1],
+                                  out + pos,
+                                  n,
+                                  func);
+          pos += n;
+          index[rank - 1] += n;
+          x_offset += n * x_strides[rank - 1];
+          y_offset += n * y_strides[rank - 1];
+          for (auto i = rank - 1; i > 0 && index[i] == dims[i]; --i) {
+            index[i] = 0;
+            x_offset -= dims[i] * x_strides[i];
+            y_offset -= dims[i] * y_strides[i];
+            ++index[i - 1];
+            x_offset += x_strides[i - 1];
+            y_offset += y_strides[i - 1];
+          }
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,160 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Bytes of the concatenated tensor copied by one task at least. A memcpy
+// moves bytes far faster than elementwise loops touch elements, so waking a
+// worker only pays off for much larger ranges than kDefaultGrainSize; below
+// twice this size a concat stays on the calling thread.
+constexpr int64_t kConcatGrainBytes = 1 << 20;
+
+// One input of concat or one output of split: `outer` runs of `bytes`
+// contiguous bytes, one per index of the dims before the axis. A null
+// `data` is skipped, for outputs nobody asked for.
+struct ConcatSlice {
+  void* data;
+  int64_t bytes;
+};
+
+namespace detail {
+
+// memcpy for the pieces of concat and split. Pieces of 4 to 16 bytes, such
+// as last-axis concats of a few floats, are common and short enough that
+// the call into the library memcpy costs more than the copy, so they move
+// as two overlapping words.
+template <typename W>
+inline void CopyOverlappingWords(char* dst, const char* src, int64_t len) {
+  W head, tail;
+  std::memcpy(&head, src, sizeof(W));
+  std::memcpy(&tail, src + len - sizeof(W), sizeof(W));
+  std::memcpy(dst, &head, sizeof(W));
+  std::memcpy(dst + len - sizeof(W), &tail, sizeof(W));
+}
+
+inline void CopyPiece(char* dst, const char* src, int64_t len) {
+  if (len >= 8 && len <= 16) {
+    CopyOverlappingWords<uint64_t>(dst, src, len);
+  } else if (len >= 4 && len < 8) {
+    CopyOverlappingWords<uint32_t>(dst, src, len);
+  } else {
+    std::memcpy(dst, src, len);
+  }
+}
+
+// Splits the bytes of the concatenated tensor, `outer` rows of the slices
+// side by side, into ranges of at least kConcatGrainBytes, and for each
+// piece of a slice in a range calls
+//   fn(slice, slice_offset, whole_offset, len)
+// with byte offsets into the slice and into the concatenated tensor.
+// Rows a task covers whole are walked slice by slice without searching;
+// with outer == 1 (axis 0) that is one call per slice unless a slice is
+// split between tasks.
+template <typename Fn>
+void ForEachSlicePiece(const std::vector<ConcatSlice>& slices,
+                       int64_t outer,
+                       Fn fn) {
+  std::vector<int64_t> offsets(slices.size() + 1, 0);
+  for (size_t i = 0; i < slices.size(); ++i) {
+    offsets[i + 1] = offsets[i] + slices[i].bytes;
+  }
+  const int64_t row_bytes = offsets.back();
+  if (outer == 0 || row_bytes == 0) return;
+  // Pieces of the row containing [pos, end), which must not cross a row.
+  auto partial_row = [&](int64_t pos, int64_t end) {
+    auto row = pos / row_bytes;
+    auto col = pos % row_bytes;
+    // The last slice starting at or before col; empty slices are passed
+    // over.
+    size_t s = std::upper_bound(offsets.begin(), offsets.end(), col) -
+               offsets.begin() - 1;
+    while (pos < end) {
+      auto len = std::min(offsets[s + 1] - col, end - pos);
+      if (len) fn(s, row * slices[s].bytes + col - offsets[s], pos, len);
+      pos += len;
+      col += len;
+      ++s;
+    }
+  };
+  custom_cpu::ParallelFor(
+      0, outer * row_bytes, kConcatGrainBytes, [&](int64_t b, int64_t e) {
+        auto row = (b + row_bytes - 1) / row_bytes;
+        auto full_begin = row * row_bytes;
+        if (full_begin >= e) {
+          partial_row(b, e);
+          return;
+        }
+        if (b < full_begin) partial_row(b, full_begin);
+        // Locals, so the copies, which may alias any memory, do not force
+        // the captures to be reloaded after every piece.
+        const ConcatSlice* slice = slices.data();
+        const int64_t* offset = offsets.data();
+        const size_t n = slices.size();
+        const int64_t stride = row_bytes;
+        auto copy = fn;
+        auto pos = full_begin;
+        for (; pos + stride <= e; pos += stride, ++row) {
+          for (size_t s = 0; s < n; ++s) {
+            const int64_t bytes = slice[s].bytes;
+            if (bytes) copy(s, row * bytes, pos + offset[s], bytes);
+          }
+        }
+        if (pos < e) partial_row(pos, e);
+      });
+}
+
+}  // namespace detail
+
+// Concatenates `inputs` into `out` along the axis they were sliced on.
+inline void ConcatBytes(const std::vector<ConcatSlice>& inputs,
+                        int64_t outer,
+                        void* out) {
+  auto dst = static_cast<char*>(out);
+  const ConcatSlice* in = inputs.data();
+  detail::ForEachSlicePiece(
+      inputs,
+      outer,
+      [=](size_t s, int64_t slice_offset, int64_t whole_offset, int64_t len) {
+        auto src = static_cast<const char*>(in[s].data);
+        if (src) detail::CopyPiece(dst + whole_offset, src + slice_offset, len);
+      });
+}
+
+// The inverse of ConcatBytes: copies the pieces of `x` into `outputs`.
+inline void SplitBytes(const void* x,
+                       int64_t outer,
+                       const std::vector<ConcatSlice>& outputs) {
+  auto src = static_cast<const char*>(x);
+  const ConcatSlice* out = outputs.data();
+  detail::ForEachSlicePiece(
+      outputs,
+      outer,
+      [=](size_t s, int64_t slice_offset, int64_t whole_offset, int64_t len) {
+        auto dst = static_cast<char*>(out[s].data);
+        if (dst) detail::CopyPiece(dst + slice_offset, src + whole_offset, len);
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,617 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <memory>
+#include <vector>
+
+#include "kernels/funcs/gemm.h"
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Bytes of im2col buffer filled per step at most; a step covers as many
+// images, or as many output pixels of one image, as fit.
+constexpr int64_t kConvColBytes = 1 << 22;
+
+// Output pixels per step never drop below this, whatever the budget says.
+constexpr int64_t kConvMinPixels = 64;
+
+// Channels col2im of an NHWC image scatters per task.
+constexpr int64_t kConvChannelBlock = 16;
+
+// A 2-D convolution. The input is [N, C, H, W] (or [N, H, W, C] when
+// channel_last), the filter [OC, C / groups, KH, KW] in either case, and
+// the output [N, OC, OH, OW] (or [N, OH, OW, OC]). Bottom and right padding
+// are implied by the output size.
+struct Conv2dShape {
+  int64_t batch;
+  int64_t in_channels;
+  int64_t in_h;
+  int64_t in_w;
+  int64_t out_channels;
+  int64_t out_h;
+  int64_t out_w;
+  int64_t kernel_h;
+  int64_t kernel_w;
+  int64_t stride_h;
+  int64_t stride_w;
+  int64_t pad_top;
+  int64_t pad_left;
+  int64_t dilation_h;
+  int64_t dilation_w;
+  int64_t groups;
+  bool channel_last;
+};
+
+namespace detail {
+
+// Sizes derived from a Conv2dShape, and how the work is cut into steps of
+// `images` whole images, or of `pixels` output pixels of one image.
+//
+// The GEMM per image and group multiplies the filter by the im2col matrix
+// `col`, which has one row per (channel, kernel tap) and one column per
+// output pixel for NCHW, and is transposed, with the taps outermost, for
+// NHWC. A 1x1 convolution with unit strides and no padding is `direct`:
+// the input already is that matrix and no col is built. For each kernel
+// column kw, the output columns [ow_lo[kw], ow_hi[kw]) are those whose
+// input column lies inside the image; the others read padding.
+struct ConvPlan {
+  int64_t cg;
+  int64_t ocg;
+  int64_t taps;
+  int64_t k;
+  int64_t in_pixels;
+  int64_t out_pixels;
+  bool direct;
+  int64_t pixels;
+  int64_t images;
+  std::vector<int64_t> ow_lo;
+  std::vector<int64_t> ow_hi;
+
+  template <typename T>
+  static ConvPlan Make(const Conv2dShape& s) {
+    ConvPlan p;
+    p.cg = s.in_channels / s.groups;
+    p.ocg = s.out_channels / s.groups;
+    p.taps = s.kernel_h * s.kernel_w;
+    p.k = p.cg * p.taps;
+    p.in_pixels = s.in_h * s.in_w;
+    p.out_pixels = s.out_h * s.out_w;
+    p.direct = p.taps == 1 && s.stride_h == 1 && s.stride_w == 1 &&
+               s.pad_top == 0 && s.pad_left == 0 && s.in_h == s.out_h &&
+               s.in_w == s.out_w;
+    const int64_t per_pixel =
+        std::max<int64_t>(1, s.groups * p.k * static_cast<int64_t>(sizeof(T)));
+    if (p.direct) {
+      p.pixels = p.out_pixels;
+      p.images = s.batch;
+    } else if (per_pixel * p.out_pixels <= kConvColBytes) {
+      p.pixels = p.out_pixels;
+      p.images = std::max<int64_t>(
+          1, std::min(s.batch, kConvColBytes / (per_pixel * p.out_pixels + 1)));
+    } else {
+      p.pixels = std::min(p.out_pixels,
+                          std::max(kConvMinPixels, kConvColBytes / per_pixel));
+      p.images = 1;
+    }
+    p.ow_lo.resize(s.kernel_w);
+    p.ow_hi.resize(s.kernel_w);
+    for (int64_t kw = 0; kw < s.kernel_w; ++kw) {
+      const int64_t iw0 = kw * s.dilation_w - s.pad_left;
+      p.ow_lo[kw] = std::min(s.out_w,
+                             iw0 >= 0 ? static_cast<int64_t>(0)
+                                      : (-iw0 + s.stride_w - 1) / s.stride_w);
+      p.ow_hi[kw] = std::max(
+          p.ow_lo[kw],
+          std::min(s.out_w, (s.in_w - iw0 + s.stride_w - 1) / s.stride_w));
+    }
+    return p;
+  }
+
+  // Elements of col per (image, group) item of a step.
+  int64_t ColItem() const { return k * pixels; }
+  int64_t ColSize(const Conv2dShape& s) const {
+    return direct ? 0 : images * s.groups * ColItem();
+  }
+};
+
+// Fills the NCHW col rows of input plane (n, c) of group g for output
+// pixels [p0, p1); row (c, kh, kw) of the item holds p1 - p0 entries, with
+// padding read as zero.
+template <typename T>
+void Im2ColPlane(const Conv2dShape& s,
+                 const ConvPlan& plan,
+                 const T* plane,
+                 int64_t p0,
+                 int64_t p1,
+                 T* rows) {
+  const int64_t len = p1 - p0;
+  for (int64_t kh = 0; kh < s.kernel_h; ++kh) {
+    for (int64_t kw = 0; kw < s.kernel_w; ++kw) {
+      T* row = rows + (kh * s.kernel_w + kw) * len;
+      const int64_t iw0 = kw * s.dilation_w - s.pad_left;
+      const int64_t ow_lo = plan.ow_lo[kw];
+      const int64_t ow_hi = plan.ow_hi[kw];
+      for (int64_t oh = p0 / s.out_w; oh * s.out_w < p1; ++oh) {
+        const int64_t begin = std::max<int64_t>(p0 - oh * s.out_w, 0);
+        const int64_t end = std::min(p1 - oh * s.out_w, s.out_w);
+        T* dst = row + oh * s.out_w - p0;
+        const int64_t ih = oh * s.stride_h - s.pad_top + kh * s.dilation_h;
+        if (ih < 0 || ih >= s.in_h) {
+          std::fill(dst + begin, dst + end, T(0));
+          continue;
+        }
+        const T* src = plane + ih * s.in_w;
+        const int64_t lo = std::max(begin, std::min(ow_lo, end));
+        const int64_t hi = std::max(lo, std::min(ow_hi, end));
+        std::fill(dst + begin, dst + lo, T(0));
+        if (s.stride_w == 1) {
+          std::copy(src + lo + iw0, src + hi + iw0, dst + lo);
+        } else {
+          for (int64_t ow = lo; ow < hi; ++ow) {
+            dst[ow] = src[ow * s.stride_w + iw0];
+          }
+        }
+        std::fill(dst + hi, dst + end, T(0));
+      }
+    }
+  }
+}
+
+// The adjoint of Im2ColPlane: adds the col rows back into the plane.
+template <typename T>
+void Col2ImPlane(const Conv2dShape& s,
+                 const ConvPlan& plan,
+                 const T* rows,
+                 int64_t p0,
+                 int64_t p1,
+                 T* plane) {
+  const int64_t len = p1 - p0;
+  for (int64_t kh = 0; kh < s.kernel_h; ++kh) {
+    for (int64_t kw = 0; kw < s.kernel_w; ++kw) {
+      const T* row = rows + (kh * s.kernel_w + kw) * len;
+      const int64_t iw0 = kw * s.dilation_w - s.pad_left;
+      for (int64_t oh = p0 / s.out_w; oh * s.out_w < p1; ++oh) {
+        const int64_t ih = oh * s.stride_h - s.pad_top + kh * s.dilation_h;
+        if (ih < 0 || ih >= s.in_h) continue;
+        // Only the columns that read the image get gradient.
+        const int64_t begin =
+            std::max(std::max<int64_t>(p0 - oh * s.out_w, 0), plan.ow_lo[kw]);
+        const int64_t end =
+            std::min(std::min(p1 - oh * s.out_w, s.out_w), plan.ow_hi[kw]);
+        const T* src = row + oh * s.out_w - p0;
+        T* dst = plane + ih * s.in_w;
+        for (int64_t ow = begin; ow < end; ++ow) {
+          dst[ow * s.stride_w + iw0] += src[ow];
+        }
+      }
+    }
+  }
+}
+
+// Fills the NHWC col row of output pixel p for image n and group g: the
+// taps in (kh, kw) order, each cg channels wide.
+template <typename T>
+void Im2ColPixel(const Conv2dShape& s,
+                 const ConvPlan& plan,
+                 const T* image,
+                 int64_t g,
+                 int64_t p,
+                 T* row) {
+  const int64_t oh = p / s.out_w;
+  const int64_t ow = p % s.out_w;
+  for (int64_t kh = 0; kh < s.kernel_h; ++kh) {
+    const int64_t ih = oh * s.stride_h - s.pad_top + kh * s.dilation_h;
+    for (int64_t kw = 0; kw < s.kernel_w; ++kw) {
+      const int64_t iw = ow * s.stride_w - s.pad_left + kw * s.dilation_w;
+      T* dst = row + (kh * s.kernel_w + kw) * plan.cg;
+      if (ih < 0 || ih >= s.in_h || iw < 0 || iw >= s.in_w) {
+        std::fill(dst, dst + plan.cg, T(0));
+      } else {
+        const T* src = image + (ih * s.in_w + iw) * s.in_channels + g * plan.cg;
+        std::copy(src, src + plan.cg, dst);
+      }
+    }
+  }
+}
+
+// Builds col for images [n0, n0 + count) and output pixels [p0, p1): item
+// (image, group) at col + (i * groups + g) * ColItem().
+template <typename T>
+void Im2Col(const Conv2dShape& s,
+            const ConvPlan& plan,
+            const T* x,
+            int64_t n0,
+            int64_t count,
+            int64_t p0,
+            int64_t p1,
+            T* col) {
+  const int64_t len = p1 - p0;
+  const int64_t image_size = s.in_channels * plan.in_pixels;
+  if (!s.channel_last) {
+    // One task per input plane; its rows are contiguous in the item.
+    const int64_t planes = count * s.in_channels;
+    const int64_t grain =
+        std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (plan.taps * len));
+    custom_cpu::ParallelFor(0, planes, grain, [&](int64_t b, int64_t e) {
+      for (int64_t item = b; item < e; ++item) {
+        const int64_t i = item / s.in_channels;
+        const int64_t c = item % s.in_channels;
+        const int64_t g = c / plan.cg;
+        T* rows = col + (i * s.groups + g) * plan.ColItem() +
+                  (c % plan.cg) * plan.taps * len;
+        Im2ColPlane(s,
+                    plan,
+                    x + (n0 + i) * image_size + c * plan.in_pixels,
+                    p0,
+                    p1,
+                    rows);
+      }
+    });
+    return;
+  }
+  const int64_t rows = count * s.groups * len;
+  const int64_t grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / plan.k);
+  custom_cpu::ParallelFor(0, rows, grain, [&](int64_t b, int64_t e) {
+    for (int64_t r = b; r < e; ++r) {
+      const int64_t item = r / len;
+      Im2ColPixel(s,
+                  plan,
+                  x + (n0 + item / s.groups) * image_size,
+                  item % s.groups,
+                  p0 + r % len,
+                  col + item * plan.ColItem() + r % len * plan.k);
+    }
+  });
+}
+
+// The adjoint of Im2Col, adding into dx.
+template <typename T>
+void Col2Im(const Conv2dShape& s,
+            const ConvPlan& plan,
+            const T* col,
+            int64_t n0,
+            int64_t count,
+            int64_t p0,
+            int64_t p1,
+            T* dx) {
+  const int64_t len = p1 - p0;
+  const int64_t image_size = s.in_channels * plan.in_pixels;
+  if (!s.channel_last) {
+    const int64_t planes = count * s.in_channels;
+    const int64_t grain =
+        std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (plan.taps * len));
+    custom_cpu::ParallelFor(0, planes, grain, [&](int64_t b, int64_t e) {
+      for (int64_t item = b; item < e; ++item) {
+        const int64_t i = item / s.in_channels;
+        const int64_t c = item % s.in_channels;
+        const int64_t g = c / plan.cg;
+        const T* rows = col + (i * s.groups + g) * plan.ColItem() +
+                        (c % plan.cg) * plan.taps * len;
+        Col2ImPlane(s,
+                    plan,
+                    rows,
+                    p0,
+                    p1,
+                    dx + (n0 + i) * image_size + c * plan.in_pixels);
+      }
+    });
+    return;
+  }
+  // Windows of neighbouring pixels overlap, so tasks own channel blocks of
+  // an image rather than pixels.
+  const int64_t blocks = (plan.cg + kConvChannelBlock - 1) / kConvChannelBlock;
+  const int64_t tasks = count * s.groups * blocks;
+  const int64_t grain = std::max<int64_t>(
+      1, custom_cpu::kDefaultGrainSize / (len * plan.taps * kConvChannelBlock));
+  custom_cpu::ParallelFor(0, tasks, grain, [&](int64_t b, int64_t e) {
+    for (int64_t task = b; task < e; ++task) {
+      const int64_t item = task / blocks;
+      const int64_t g = item % s.groups;
+      const int64_t c0 = task % blocks * kConvChannelBlock;
+      const int64_t c1 = std::min(plan.cg, c0 + kConvChannelBlock);
+      T* image = dx + (n0 + item / s.groups) * image_size + g * plan.cg;
+      const T* item_col = col + item * plan.ColItem();
+      for (int64_t q = 0; q < len; ++q) {
+        const int64_t oh = (p0 + q) / s.out_w;
+        const int64_t ow = (p0 + q) % s.out_w;
+        const T* row = item_col + q * plan.k;
+        for (int64_t kh = 0; kh < s.kernel_h; ++kh) {
+          const int64_t ih = oh * s.stride_h - s.pad_top + kh * s.dilation_h;
+          if (ih < 0 || ih >= s.in_h) continue;
+          for (int64_t kw = 0; kw < s.kernel_w; ++kw) {
+            const int64_t iw = ow * s.stride_w - s.pad_left + kw * s.dilation_w;
+            if (iw < 0 || iw >= s.in_w) continue;
+            const T* src = row + (kh * s.kernel_w + kw) * plan.cg;
+            T* dst = image + (ih * s.in_w + iw) * s.in_channels;
+            for (int64_t c = c0; c < c1; ++c) dst[c] += src[c];
+          }
+        }
+      }
+    }
+  });
+}
+
+// Calls fn(n0, count, p0, p1) for every step of the plan, in order.
+template <typename Fn>
+void ForEachConvStep(const Conv2dShape& s, const ConvPlan& plan, Fn fn) {
+  for (int64_t n0 = 0; n0 < s.batch; n0 += plan.images) {
+    const int64_t count = std::min(plan.images, s.batch - n0);
+    for (int64_t p0 = 0; p0 < plan.out_pixels; p0 += plan.pixels) {
+      fn(n0, count, p0, std::min(plan.out_pixels, p0 + plan.pixels));
+    }
+  }
+}
+
+// The col operand of image n for pixels starting at p0: the NCHW k x len
+// matrix, or the NHWC len x k one, with the batch stride stepping to the
+// next image, or to the next group when there are groups. Direct
+// convolutions read the input in place.
+template <typename T>
+GemmOperand<const T> ColOperand(const Conv2dShape& s,
+                                const ConvPlan& plan,
+                                const T* x,
+                                const T* col,
+                                int64_t n,
+                                int64_t p0,
+                                int64_t len) {
+  const int64_t image_size = s.in_channels * plan.in_pixels;
+  if (plan.direct) {
+    const T* base = x + n * image_size;
+    if (s.channel_last) {
+      return {base + p0 * s.in_channels,
+              s.groups == 1 ? image_size : plan.cg,
+              s.in_channels,
+              1};
+    }
+    return {base + p0,
+            s.groups == 1 ? image_size : plan.cg * plan.in_pixels,
+            plan.in_pixels,
+            1};
+  }
+  if (s.channel_last) return {col, plan.ColItem(), plan.k, 1};
+  return {col, plan.ColItem(), len, 1};
+}
+
+// Repacks the NHWC filter of every group as a k x ocg matrix with rows in
+// col order (kh, kw, c).
+template <typename T>
+std::unique_ptr<T[]> PackFilterNHWC(const Conv2dShape& s,
+                                    const ConvPlan& plan,
+                                    const T* filter) {
+  std::unique_ptr<T[]> packed(new T[s.out_channels * plan.k]);
+  for (int64_t g = 0; g < s.groups; ++g) {
+    T* dst = packed.get() + g * plan.k * plan.ocg;
+    for (int64_t o = 0; o < plan.ocg; ++o) {
+      const T* src = filter + (g * plan.ocg + o) * plan.k;
+      for (int64_t c = 0; c < plan.cg; ++c) {
+        for (int64_t t = 0; t < plan.taps; ++t) {
+          dst[(t * plan.cg + c) * plan.ocg + o] = src[c * plan.taps + t];
+        }
+      }
+    }
+  }
+  return packed;
+}
+
+}  // namespace detail
+
+// out = conv2d(x, filter), by im2col and GEMM.
+template <typename T>
+void Conv2dForward(const Conv2dShape& s, const T* x, const T* filter, T* out) {
+  auto plan = detail::ConvPlan::Make<T>(s);
+  std::unique_ptr<T[]> col(new T[plan.ColSize(s)]);
+  std::unique_ptr<T[]> packed;
+  if (s.channel_last) packed = detail::PackFilterNHWC(s, plan, filter);
+  const int64_t out_image = s.out_channels * plan.out_pixels;
+
+  detail::ForEachConvStep(
+      s, plan, [&](int64_t n0, int64_t count, int64_t p0, int64_t p1) {
+        const int64_t len = p1 - p0;
+        if (!plan.direct) {
+          detail::Im2Col(s, plan, x, n0, count, p0, p1, col.get());
+        }
+        // One GEMM over the images of the step, or over the groups of each
+        // image when there are groups.
+        const int64_t calls = s.groups == 1 ? 1 : count;
+        for (int64_t i = 0; i < calls; ++i) {
+          auto c = detail::ColOperand(s,
+                                      plan,
+                                      x,
+                                      col.get() + i * s.groups * plan.ColItem(),
+                                      n0 + i,
+                                      p0,
+                                      len);
+          const int64_t batch = s.groups == 1 ? count : s.groups;
+          T* o = out + (n0 + i) * out_image;
+          if (!s.channel_last) {
+            GemmOperand<const T> w{
+                filter, s.groups == 1 ? 0 : plan.ocg * plan.k, plan.k, 1};
+            GemmOperand<T> dst{
+                o + p0,
+                s.groups == 1 ? out_image : plan.ocg * plan.out_pixels,
+                plan.out_pixels,
+                1};
+            BatchedGemm<T>(batch, plan.ocg, len, plan.k, T(1), w, c, T(0), dst);
+          } else {
+            GemmOperand<const T> w{packed.get(),
+                                   s.groups == 1 ? 0 : plan.k * plan.ocg,
+                                   plan.ocg,
+                                   1};
+            GemmOperand<T> dst{o + p0 * s.out_channels,
+                               s.groups == 1 ? out_image : plan.ocg,
+                               s.out_channels,
+                               1};
+            BatchedGemm<T>(batch, len, plan.ocg, plan.k, T(1), c, w, T(0), dst);
+          }
+        }
+      });
+}
+
+// dx and dfilter of out = conv2d(x, filter) given dout; either may be null.
+// Each step's col is built once for the filter gradient and its dcol is
+// scattered into dx.
+template <typename T>
+void Conv2dBackward(const Conv2dShape& s,
+                    const T* x,
+                    const T* filter,
+                    const T* dout,
+                    T* dx,
+                    T* dfilter) {
+  if (!dx && !dfilter) return;
+  auto plan = detail::ConvPlan::Make<T>(s);
+  const int64_t col_size = plan.ColSize(s);
+  std::unique_ptr<T[]> col(new T[dfilter ? col_size : 0]);
+  std::unique_ptr<T[]> dcol(new T[dx ? col_size : 0]);
+  std::unique_ptr<T[]> packed, dpacked;
+  if (s.channel_last) {
+    if (dx) packed = detail::PackFilterNHWC(s, plan, filter);
+    if (dfilter) dpacked.reset(new T[s.out_channels * plan.k]);
+  }
+  T* dw = s.channel_last ? dpacked.get() : dfilter;
+  const int64_t image_size = s.in_channels * plan.in_pixels;
+  const int64_t out_image = s.out_channels * plan.out_pixels;
+  if (dx && !plan.direct) std::fill(dx, dx + s.batch * image_size, T(0));
+  if (dfilter && s.batch * plan.out_pixels == 0) {
+    std::fill(dw, dw + s.out_channels * plan.k, T(0));
+  }
+
+  bool first = true;
+  detail::ForEachConvStep(
+      s, plan, [&](int64_t n0, int64_t count, int64_t p0, int64_t p1) {
+        const int64_t len = p1 - p0;
+        if (dfilter && !plan.direct) {
+          detail::Im2Col(s, plan, x, n0, count, p0, p1, col.get());
+        }
+        // As in the forward pass: one GEMM over the images of the step, or over
+        // the groups of each image. With one group, the filter gradient of the
+        // images is summed by the batched GEMM itself.
+        const int64_t calls = s.groups == 1 ? 1 : count;
+        const int64_t batch = s.groups == 1 ? count : s.groups;
+        for (int64_t i = 0; i < calls; ++i) {
+          const int64_t item = i * s.groups * plan.ColItem();
+          const T* dy = dout + (n0 + i) * out_image;
+          const int64_t dw_stride = s.groups == 1 ? 0 : plan.ocg * plan.k;
+          const T beta = first ? T(0) : T(1);
+          if (!s.channel_last) {
+            GemmOperand<const T> dy_op{
+                dy + p0,
+                s.groups == 1 ? out_image : plan.ocg * plan.out_pixels,
+                plan.out_pixels,
+                1};
+            if (dfilter) {
+              auto c = detail::ColOperand(
+                  s, plan, x, col.get() + item, n0 + i, p0, len);
+              // dfilter[g] += dy[g] * col[g]^T
+              GemmOperand<const T> col_t{
+                  c.data, c.batch_stride, 1, c.row_stride};
+              BatchedGemm<T>(batch,
+                             plan.ocg,
+                             plan.k,
+                             len,
+                             T(1),
+                             dy_op,
+                             col_t,
+                             beta,
+                             GemmOperand<T>{dw, dw_stride, plan.k, 1});
+            }
+            if (dx) {
+              // dcol[g] = filter[g]^T * dy[g]
+              GemmOperand<const T> w_t{
+                  filter, s.groups == 1 ? 0 : plan.ocg * plan.k, 1, plan.k};
+              GemmOperand<T> dst =
+                  plan.direct
+                      ? GemmOperand<T>{dx + (n0 + i) * image_size + p0,
+                                       s.groups == 1 ? image_size
+                                                     : plan.cg * plan.in_pixels,
+                                       plan.in_pixels,
+                                       1}
+                      : GemmOperand<T>{
+                            dcol.get() + item, plan.ColItem(), len, 1};
+              BatchedGemm<T>(
+                  batch, plan.k, len, plan.ocg, T(1), w_t, dy_op, T(0), dst);
+            }
+          } else {
+            GemmOperand<const T> dy_op{dy + p0 * s.out_channels,
+                                       s.groups == 1 ? out_image : plan.ocg,
+                                       s.out_channels,
+                                       1};
+            if (dfilter) {
+              auto c = detail::ColOperand(
+                  s, plan, x, col.get() + item, n0 + i, p0, len);
+              // dpacked[g] += col[g]^T * dy[g]
+              GemmOperand<const T> col_t{
+                  c.data, c.batch_stride, 1, c.row_stride};
+              BatchedGemm<T>(batch,
+                             plan.k,
+                             plan.ocg,
+                             len,
+                             T(1),
+                             col_t,
+                             dy_op,
+                             beta,
+                             GemmOperand<T>{dw, dw_stride, plan.ocg, 1});
+            }
+            if (dx) {
+              // dcol[g] = dy[g] * packed[g]^T
+              GemmOperand<const T> w_t{packed.get(),
+                                       s.groups == 1 ? 0 : plan.k * plan.ocg,
+                                       1,
+                                       plan.ocg};
+              GemmOperand<T> dst =
+                  plan.direct
+                      ? GemmOperand<T>{dx + (n0 + i) * image_size +
+                                           p0 * s.in_channels,
+                                       s.groups == 1 ? image_size : plan.cg,
+                                       s.in_channels,
+                                       1}
+                      : GemmOperand<T>{
+                            dcol.get() + item, plan.ColItem(), plan.k, 1};
+              BatchedGemm<T>(
+                  batch, len, plan.k, plan.ocg, T(1), dy_op, w_t, T(0), dst);
+            }
+          }
+          first = false;
+        }
+        if (dx && !plan.direct) {
+          detail::Col2Im(s, plan, dcol.get(), n0, count, p0, p1, dx);
+        }
+      });
+
+  if (dfilter && s.channel_last) {
+    // Back from the packed (kh, kw, c) x ocg layout to [OC, C / groups,
+    // KH, KW].
+    for (int64_t g = 0; g < s.groups; ++g) {
+      const T* src = dpacked.get() + g * plan.k * plan.ocg;
+      for (int64_t o = 0; o < plan.ocg; ++o) {
+        T* dst = dfilter + (g * plan.ocg + o) * plan.k;
+        for (int64_t c = 0; c < plan.cg; ++c) {
+          for (int64_t t = 0; t < plan.taps; ++t) {
+            dst[c * plan.taps + t] = src[(t * plan.cg + c) * plan.ocg + o];
+          }
+        }
+      }
+    }
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
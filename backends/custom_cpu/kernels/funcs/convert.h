@@ -0,0 +1,125 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstdint>
+#include <cstring>
+
+// Conversions between float and the two 16-bit floating point formats,
+// on their bit patterns. The array versions have no branches, so the
+// compiler turns them into SIMD loops; the kernels run them over parallel
+// chunks of a tensor.
+//
+// bfloat16 keeps the upper half of the float and truncates, as
+// phi::dtype::bfloat16 converts on the host. float16 rounds to nearest
+// even, as the F16C instructions do; overflow gives inf and NaN stays a
+// quiet NaN.
+
+namespace custom_kernel {
+namespace funcs {
+
+namespace detail {
+
+inline uint32_t FloatToBits(float f) {
+  uint32_t bits;
+  std::memcpy(&bits, &f, sizeof(bits));
+  return bits;
+}
+
+inline float BitsToFloat(uint32_t bits) {
+  float f;
+  std::memcpy(&f, &bits, sizeof(f));
+  return f;
+}
+
+// cond ? a : b on masks. With the default -ftrapping-math GCC will not
+// if-convert a select between the results of float math, and the loop
+// would not vectorize.
+inline uint32_t Select(bool cond, uint32_t a, uint32_t b) {
+  const uint32_t mask = 0u - static_cast<uint32_t>(cond);
+  return (a & mask) | (b & ~mask);
+}
+
+}  // namespace detail
+
+inline float Bf16ToFloat(uint16_t h) {
+  return detail::BitsToFloat(static_cast<uint32_t>(h) << 16);
+}
+
+inline uint16_t FloatToBf16(float f) {
+  return static_cast<uint16_t>(detail::FloatToBits(f) >> 16);
+}
+
+inline float Fp16ToFloat(uint16_t h) {
+  constexpr uint32_t kExp = 0x7C00u << 13;
+  uint32_t bits = (h & 0x7FFFu) << 13;
+  const uint32_t exp = bits & kExp;
+  bits += (127u - 15u) << 23;
+  // Inf and NaN take the top float exponent. Subnormals are normalized by
+  // a float subtraction: with the exponent of 2^-14 set, the value is
+  // 2^-14 too large.
+  const uint32_t inf_nan = bits + ((128u - 16u) << 23);
+  const uint32_t subnormal = detail::FloatToBits(
+      detail::BitsToFloat(bits + (1u << 23)) - detail::BitsToFloat(113u << 23));
+  bits = detail::Select(
+      exp == kExp, inf_nan, detail::Select(exp == 0, subnormal, bits));
+  return detail::BitsToFloat(bits | static_cast<uint32_t>(h & 0x8000u) << 16);
+}
+
+inline uint16_t FloatToFp16(float f) {
+  constexpr uint32_t kInf = 255u << 23;
+  constexpr uint32_t kOverflow = (127u + 16u) << 23;       // 2^16
+  constexpr uint32_t kMinNormal = (127u - 14u) << 23;      // 2^-14
+  constexpr uint32_t kSubnormalMagic = (127u - 1u) << 23;  // 0.5
+  uint32_t bits = detail::FloatToBits(f);
+  const uint32_t sign = bits & 0x80000000u;
+  bits ^= sign;
+  // Results below 2^-14 are subnormal: adding 0.5 moves the 10 bits they
+  // keep to the bottom of the mantissa, and the float addition rounds them
+  // to nearest even.
+  const uint32_t subnormal =
+      detail::FloatToBits(detail::BitsToFloat(bits) +
+                          detail::BitsToFloat(kSubnormalMagic)) -
+      kSubnormalMagic;
+  // Normal results rebias the exponent and round to nearest even before the
+  // 13 dropped bits are shifted out; a carry may round up to inf.
+  const uint32_t normal =
+      (bits + ((15u - 127u) << 23) + 0xFFFu + ((bits >> 13) & 1u)) >> 13;
+  const uint32_t special = bits > kInf ? 0x7E00u : 0x7C00u;
+  const uint32_t h =
+      detail::Select(bits >= kOverflow,
+                     special,
+                     detail::Select(bits < kMinNormal, subnormal, normal));
+  return static_cast<uint16_t>(h | sign >> 16);
+}
+
+inline void Bf16ToFloat(const uint16_t* in, float* out, int64_t n) {
+  for (int64_t i = 0; i < n; ++i) out[i] = Bf16ToFloat(in[i]);
+}
+
+inline void FloatToBf16(const float* in, uint16_t* out, int64_t n) {
+  for (int64_t i = 0; i < n; ++i) out[i] = FloatToBf16(in[i]);
+}
+
+inline void Fp16ToFloat(const uint16_t* in, float* out, int64_t n) {
+  for (int64_t i = 0; i < n; ++i) out[i] = Fp16ToFloat(in[i]);
+}
+
+inline void FloatToFp16(const float* in, uint16_t* out, int64_t n) {
+  for (int64_t i = 0; i < n; ++i) out[i] = FloatToFp16(in[i]);
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,288 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+// Per-step bookkeeping of the LLM serving loop (custom_op/llama_infer).
+// Every function works in place on host buffers, splits the batch across
+// the intra-op pool and allocates nothing once warmed up.
+
+namespace custom_kernel {
+namespace funcs {
+
+// Logit masked out by the min length and bad word rules.
+constexpr float kMaskedLogit = -1e10f;
+
+namespace detail {
+
+// Sequences per task for loops that touch `per_seq` elements a sequence.
+inline int64_t DecodeGrain(int64_t per_seq) {
+  return std::max<int64_t>(
+      1, custom_cpu::kDefaultGrainSize / std::max<int64_t>(per_seq, 1));
+}
+
+// Occurrence counts of token ids in one row of pre_ids, indexed by id. The
+// counts are reset as they are consumed, so the buffer is all zeros between
+// rows and only grows with the vocabulary.
+inline std::vector<int32_t>* RepeatCounts(int64_t vocab) {
+  thread_local std::vector<int32_t> counts;
+  if (static_cast<int64_t>(counts.size()) < vocab) counts.resize(vocab, 0);
+  return &counts;
+}
+
+}  // namespace detail
+
+// Inputs of get_token_penalty_multi_scores_v2. pre_ids holds the tokens
+// generated so far, one row of pre_ids_len per sequence ending at the first
+// negative id. penalty, frequency, presence and temperature are per
+// sequence.
+template <typename T>
+struct TokenPenaltyArgs {
+  int64_t bsz;
+  int64_t vocab;
+  int64_t pre_ids_len;
+  const int64_t* pre_ids;
+  const T* penalty;
+  const T* frequency;
+  const T* presence;
+  const T* temperature;
+  const int64_t* bad_tokens;
+  int64_t num_bad_tokens;
+  const int64_t* cur_len;
+  const int64_t* min_len;
+  const int64_t* eos_ids;
+  int64_t num_eos_ids;
+};
+
+// Rewrites logits [bsz, vocab] in the order the serving loop expects:
+//  1. before min_len tokens are generated, the eos tokens are masked;
+//  2. a token generated c > 0 times is penalized: a positive logit is
+//     divided by penalty and a negative one multiplied by it, then
+//     frequency * c + presence is subtracted;
+//  3. the row is divided by temperature;
+//  4. the bad tokens are masked.
+template <typename T>
+void TokenPenaltyMultiScores(const TokenPenaltyArgs<T>& a, T* logits) {
+  custom_cpu::ParallelFor(0, a.bsz, 1, [&](int64_t begin, int64_t end) {
+    std::vector<int32_t>& counts = *detail::RepeatCounts(a.vocab);
+    for (int64_t b = begin; b < end; ++b) {
+      T* row = logits + b * a.vocab;
+      if (a.cur_len[b] < a.min_len[b]) {
+        for (int64_t i = 0; i < a.num_eos_ids; ++i) {
+          const int64_t id = a.eos_ids[i];
+          if (id >= 0 && id < a.vocab) row[id] = static_cast<T>(kMaskedLogit);
+        }
+      }
+
+      const int64_t* ids = a.pre_ids + b * a.pre_ids_len;
+      int64_t len = 0;
+      for (; len < a.pre_ids_len && ids[len] >= 0; ++len) {
+        if (ids[len] < a.vocab) ++counts[ids[len]];
+      }
+      const float alpha = static_cast<float>(a.penalty[b]);
+      const float beta = static_cast<float>(a.frequency[b]);
+      const float gamma = static_cast<float>(a.presence[b]);
+      for (int64_t i = 0; i < len; ++i) {
+        const int64_t id = ids[i];
+        if (id >= a.vocab || counts[id] == 0) continue;
+        float logit = static_cast<float>(row[id]);
+        logit = logit < 0 ? logit * alpha : logit / alpha;
+        row[id] = static_cast<T>(logit - beta * counts[id] - gamma);
+        counts[id] = 0;
+      }
+
+      const float inv_temperature = 1.0f / static_cast<float>(a.temperature[b]);
+      for (int64_t v = 0; v < a.vocab; ++v) {
+        row[v] = static_cast<T>(static_cast<float>(row[v]) * inv_temperature);
+      }
+      for (int64_t i = 0; i < a.num_bad_tokens; ++i) {
+        const int64_t id = a.bad_tokens[i];
+        if (id >= 0 && id < a.vocab) row[id] = static_cast<T>(kMaskedLogit);
+      }
+    }
+  });
+}
+
+// set_stop_value_multi_ends_v2: a stopped sequence emits end_ids[0], or -1
+// without touching next_tokens if it has no tokens in flight (seq_lens 0);
+// every other sequence emits its sampled token. A sequence whose token is
+// an end id stops.
+inline void SetStopValueMultiEnds(int64_t bsz,
+                                  const int32_t* seq_lens,
+                                  const int64_t* end_ids,
+                                  int64_t num_end_ids,
+                                  int64_t* topk_ids,
+                                  bool* stop_flags,
+                                  int64_t* next_tokens) {
+  custom_cpu::ParallelFor(0,
+                          bsz,
+                          detail::DecodeGrain(num_end_ids),
+                          [&](int64_t begin, int64_t end) {
+                            for (int64_t b = begin; b < end; ++b) {
+                              if (!stop_flags[b]) {
+                                next_tokens[b] = topk_ids[b];
+                              } else if (seq_lens[b] == 0) {
+                                topk_ids[b] = -1;
+                              } else {
+                                topk_ids[b] = end_ids[0];
+                                next_tokens[b] = end_ids[0];
+                              }
+                              for (int64_t i = 0; i < num_end_ids; ++i) {
+                                if (topk_ids[b] == end_ids[i]) {
+                                  stop_flags[b] = true;
+                                  break;
+                                }
+                              }
+                            }
+                          });
+}
+
+// get_padding_offset_v2. cum_offsets[b] is the padding of sequences 0..b of
+// input_ids [bsz, max_seq_len], whose rows hold seq_lens[b] tokens. Packs
+// the tokens into x_remove_padding [token_num], records for each token the
+// padding before it in padding_offset [token_num] and for each sequence in
+// cum_offsets_out [bsz], and writes the sequence boundaries of the packed
+// tokens to cu_seqlens_q and cu_seqlens_k [bsz + 1].
+inline void GetPaddingOffset(int64_t bsz,
+                             int64_t max_seq_len,
+                             const int64_t* input_ids,
+                             const int32_t* cum_offsets,
+                             const int32_t* seq_lens,
+                             int64_t* x_remove_padding,
+                             int32_t* cum_offsets_out,
+                             int32_t* padding_offset,
+                             int32_t* cu_seqlens_q,
+                             int32_t* cu_seqlens_k) {
+  cu_seqlens_q[0] = 0;
+  cu_seqlens_k[0] = 0;
+  custom_cpu::ParallelFor(
+      0,
+      bsz,
+      detail::DecodeGrain(max_seq_len),
+      [&](int64_t begin, int64_t end) {
+        for (int64_t b = begin; b < end; ++b) {
+          const int32_t offset = b == 0 ? 0 : cum_offsets[b - 1];
+          const int64_t first = b * max_seq_len - offset;
+          cum_offsets_out[b] = offset;
+          std::memcpy(x_remove_padding + first,
+                      input_ids + b * max_seq_len,
+                      seq_lens[b] * sizeof(int64_t));
+          std::fill_n(padding_offset + first, seq_lens[b], offset);
+          const int32_t next = (b + 1) * max_seq_len - cum_offsets[b];
+          cu_seqlens_q[b + 1] = next;
+          cu_seqlens_k[b + 1] = next;
+        }
+      });
+}
+
+// rebuild_padding_v2: gathers from tmp_out [token_num, dim] the row of the
+// last token of each sequence into out [bsz, dim], which is zero for
+// sequences that neither prefill nor decode. cum_offsets is
+// get_padding_offset_v2's cum_offsets_out.
+template <typename T>
+void RebuildPadding(int64_t bsz,
+                    int64_t dim,
+                    int64_t max_input_length,
+                    const T* tmp_out,
+                    const int32_t* cum_offsets,
+                    const int32_t* seq_lens_decoder,
+                    const int32_t* seq_lens_encoder,
+                    T* out) {
+  custom_cpu::ParallelFor(
+      0, bsz, detail::DecodeGrain(dim), [&](int64_t begin, int64_t end) {
+        for (int64_t b = begin; b < end; ++b) {
+          T* dst = out + b * dim;
+          if (seq_lens_decoder[b] == 0 && seq_lens_encoder[b] == 0) {
+            std::fill_n(dst, dim, static_cast<T>(0));
+            continue;
+          }
+          const int64_t last =
+              seq_lens_encoder[b] > 0 ? seq_lens_encoder[b] - 1 : 0;
+          const int64_t token = b * max_input_length - cum_offsets[b] + last;
+          std::copy_n(tmp_out + token * dim, dim, dst);
+        }
+      });
+}
+
+// update_inputs: advances every sequence that is not waiting for blocks by
+// one decode step. A stopped sequence gets no tokens; the others feed
+// next_tokens as the single input of the next step, and those that just
+// prefilled start decoding after their prompt. Returns whether fewer than
+// stop_nums sequences have stopped, counting blocked ones as running.
+inline bool UpdateInputs(int64_t bsz,
+                         int64_t input_ids_len,
+                         const bool* stop_flags,
+                         const int64_t* next_tokens,
+                         const bool* is_block_step,
+                         int64_t stop_nums,
+                         int32_t* seq_lens_this_time,
+                         int32_t* seq_lens_encoder,
+                         int32_t* seq_lens_decoder,
+                         int64_t* input_ids) {
+  custom_cpu::ParallelFor(
+      0, bsz, detail::DecodeGrain(1), [&](int64_t begin, int64_t end) {
+        for (int64_t b = begin; b < end; ++b) {
+          if (is_block_step[b]) continue;
+          const bool stop = stop_flags[b];
+          seq_lens_decoder[b] =
+              stop ? 0
+                   : (seq_lens_decoder[b] == 0 ? seq_lens_encoder[b]
+                                               : seq_lens_decoder[b] + 1);
+          seq_lens_this_time[b] = stop ? 0 : 1;
+          seq_lens_encoder[b] = 0;
+          input_ids[b * input_ids_len] = next_tokens[b];
+        }
+      });
+  int64_t stopped = 0;
+  for (int64_t b = 0; b < bsz; ++b) {
+    stopped += stop_flags[b] && !is_block_step[b];
+  }
+  return stopped < stop_nums;
+}
+
+// set_value_by_flags_and_idx_v2: records the token each running sequence
+// consumes this step, the last prompt token after a prefill or the fed-back
+// token when decoding, at pre_ids_all[b][step_idx[b]].
+inline void SetValueByFlagsAndIdx(int64_t bsz,
+                                  int64_t pre_ids_len,
+                                  int64_t input_ids_len,
+                                  const int64_t* input_ids,
+                                  const int32_t* seq_lens_encoder,
+                                  const int32_t* seq_lens_decoder,
+                                  const int64_t* step_idx,
+                                  const bool* stop_flags,
+                                  int64_t* pre_ids_all) {
+  custom_cpu::ParallelFor(
+      0, bsz, detail::DecodeGrain(1), [&](int64_t begin, int64_t end) {
+        for (int64_t b = begin; b < end; ++b) {
+          if (stop_flags[b]) continue;
+          if (seq_lens_encoder[b] == 0 && seq_lens_decoder[b] == 0) continue;
+          const int64_t step = step_idx[b];
+          if (step < 0 || step >= pre_ids_len) continue;
+          const int64_t* ids = input_ids + b * input_ids_len;
+          pre_ids_all[b * pre_ids_len + step] =
+              seq_lens_encoder[b] > 0 ? ids[seq_lens_encoder[b] - 1] : ids[0];
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,459 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <type_traits>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Cache blocking of the packed GEMM. MR x NR is the register tile of the
+// micro kernel, MC x KC the packed panel of A (sized for L2) and KC x NC the
+// packed panel of B (sized for L3).
+template <typename AccT>
+struct GemmBlocking {
+  static constexpr int64_t MR = 6;
+  static constexpr int64_t NR = 8;
+  static constexpr int64_t MC = 144;
+  static constexpr int64_t KC = 256;
+  static constexpr int64_t NC = 2048;
+};
+
+template <>
+struct GemmBlocking<double> {
+  static constexpr int64_t MR = 6;
+  static constexpr int64_t NR = 4;
+  static constexpr int64_t MC = 96;
+  static constexpr int64_t KC = 256;
+  static constexpr int64_t NC = 1024;
+};
+
+// Problems with at most this many multiply-adds skip packing.
+constexpr int64_t kNaiveGemmMaxFlops = 512;
+
+// Matrix-vector products are split into row chunks of this many rows.
+constexpr int64_t kGemvRowGrain = 64;
+
+// Describes a row-major view with arbitrary strides, so that transposed
+// operands and transposed outputs are handled without copies.
+template <typename T>
+struct GemmOperand {
+  T* data;
+  int64_t batch_stride;
+  int64_t row_stride;
+  int64_t col_stride;
+};
+
+namespace detail {
+
+template <typename T, typename AccT>
+void NaiveGemm(int64_t M,
+               int64_t N,
+               int64_t K,
+               AccT alpha,
+               const T* A,
+               int64_t a_rs,
+               int64_t a_cs,
+               const T* B,
+               int64_t b_rs,
+               int64_t b_cs,
+               bool accumulate,
+               AccT beta,
+               T* C,
+               int64_t c_rs,
+               int64_t c_cs) {
+  for (int64_t m = 0; m < M; ++m) {
+    for (int64_t n = 0; n < N; ++n) {
+      AccT sum = 0;
+      for (int64_t k = 0; k < K; ++k) {
+        sum += static_cast<AccT>(A[m * a_rs + k * a_cs]) *
+               static_cast<AccT>(B[k * b_rs + n * b_cs]);
+      }
+      T* c = C + m * c_rs + n * c_cs;
+      if (accumulate) {
+        *c = static_cast<T>(static_cast<AccT>(*c) + alpha * sum);
+      } else if (beta == AccT(0)) {
+        *c = static_cast<T>(alpha * sum);
+      } else {
+        *c = static_cast<T>(alpha * sum + beta * static_cast<AccT>(*c));
+      }
+    }
+  }
+}
+
+// y[i] = alpha * sum_k mat[i, k] * x[k] (+ beta * y[i]) for i in [lo, hi).
+// Walks the matrix along its contiguous dimension: one dot product per row
+// when rows are contiguous, axpy updates of a row accumulator otherwise.
+template <typename T, typename AccT>
+void Gemv(int64_t lo,
+          int64_t hi,
+          int64_t K,
+          AccT alpha,
+          const T* mat,
+          int64_t m_rs,
+          int64_t m_cs,
+          const T* x,
+          int64_t x_stride,
+          bool accumulate,
+          AccT beta,
+          T* y,
+          int64_t y_stride,
+          AccT* acc) {
+  const int64_t rows = hi - lo;
+  if (m_cs == 1 || m_rs != 1) {
+    for (int64_t i = 0; i < rows; ++i) {
+      const T* row = mat + (lo + i) * m_rs;
+      AccT sum = 0;
+      for (int64_t k = 0; k < K; ++k) {
+        sum += static_cast<AccT>(row[k * m_cs]) *
+               static_cast<AccT>(x[k * x_stride]);
+      }
+      acc[i] = sum;
+    }
+  } else {
+    std::fill(acc, acc + rows, AccT(0));
+    for (int64_t k = 0; k < K; ++k) {
+      const T* col = mat + lo + k * m_cs;
+      const AccT xv = static_cast<AccT>(x[k * x_stride]);
+      for (int64_t i = 0; i < rows; ++i) {
+        acc[i] += static_cast<AccT>(col[i]) * xv;
+      }
+    }
+  }
+  for (int64_t i = 0; i < rows; ++i) {
+    T* out = y + (lo + i) * y_stride;
+    if (accumulate) {
+      *out = static_cast<T>(static_cast<AccT>(*out) + alpha * acc[i]);
+    } else if (beta == AccT(0)) {
+      *out = static_cast<T>(alpha * acc[i]);
+    } else {
+      *out = static_cast<T>(alpha * acc[i] + beta * static_cast<AccT>(*out));
+    }
+  }
+}
+
+// Packs an mc x kc block of A into MR-row micro panels, k-major inside each
+// panel. Rows past mc are zero filled.
+template <typename T, typename AccT, int64_t MR>
+void PackA(
+    int64_t mc, int64_t kc, const T* A, int64_t a_rs, int64_t a_cs, AccT* buf) {
+  for (int64_t ir = 0; ir < mc; ir += MR) {
+    auto rows = std::min(MR, mc - ir);
+    const T* a = A + ir * a_rs;
+    if (rows == MR && a_rs == 1) {
+      for (int64_t k = 0; k < kc; ++k) {
+        const T* col = a + k * a_cs;
+        for (int64_t i = 0; i < MR; ++i) {
+          buf[i] = static_cast<AccT>(col[i]);
+        }
+        buf += MR;
+      }
+    } else {
+      for (int64_t k = 0; k < kc; ++k) {
+        for (int64_t i = 0; i < rows; ++i) {
+          buf[i] = static_cast<AccT>(a[i * a_rs + k * a_cs]);
+        }
+        for (int64_t i = rows; i < MR; ++i) {
+          buf[i] = AccT(0);
+        }
+        buf += MR;
+      }
+    }
+  }
+}
+
+// Packs a kc x nc block of B into NR-column micro panels, k-major inside each
+// panel. Columns past nc are zero filled.
+template <typename T, typename AccT, int64_t NR>
+void PackB(
+    int64_t kc, int64_t nc, const T* B, int64_t b_rs, int64_t b_cs, AccT* buf) {
+  for (int64_t jr = 0; jr < nc; jr += NR) {
+    auto cols = std::min(NR, nc - jr);
+    const T* b = B + jr * b_cs;
+    if (cols == NR && b_cs == 1) {
+      for (int64_t k = 0; k < kc; ++k) {
+        const T* row = b + k * b_rs;
+        for (int64_t j = 0; j < NR; ++j) {
+          buf[j] = static_cast<AccT>(row[j]);
+        }
+        buf += NR;
+      }
+    } else {
+      for (int64_t k = 0; k < kc; ++k) {
+        for (int64_t j = 0; j < cols; ++j) {
+          buf[j] = static_cast<AccT>(b[k * b_rs + j * b_cs]);
+        }
+        for (int64_t j = cols; j < NR; ++j) {
+          buf[j] = AccT(0);
+        }
+        buf += NR;
+      }
+    }
+  }
+}
+
+// MR x NR register tile: acc = a_panel * b_panel. The fixed trip counts let
+// the compiler keep the tile in vector registers.
+template <typename AccT, int64_t MR, int64_t NR>
+inline void MicroKernel(int64_t kc,
+                        const AccT* __restrict__ a,
+                        const AccT* __restrict__ b,
+                        AccT* __restrict__ acc) {
+  AccT c[MR * NR] = {};
+  for (int64_t k = 0; k < kc; ++k) {
+    for (int64_t i = 0; i < MR; ++i) {
+      const AccT av = a[i];
+      for (int64_t j = 0; j < NR; ++j) {
+        c[i * NR + j] += av * b[j];
+      }
+    }
+    a += MR;
+    b += NR;
+  }
+  for (int64_t i = 0; i < MR * NR; ++i) {
+    acc[i] = c[i];
+  }
+}
+
+template <typename T, typename AccT>
+inline void StoreTile(int64_t rows,
+                      int64_t cols,
+                      int64_t nr,
+                      const AccT* acc,
+                      AccT alpha,
+                      bool accumulate,
+                      AccT beta,
+                      T* C,
+                      int64_t c_rs,
+                      int64_t c_cs) {
+  for (int64_t i = 0; i < rows; ++i) {
+    for (int64_t j = 0; j < cols; ++j) {
+      T* c = C + i * c_rs + j * c_cs;
+      AccT v = alpha * acc[i * nr + j];
+      if (accumulate) {
+        *c = static_cast<T>(static_cast<AccT>(*c) + v);
+      } else if (beta == AccT(0)) {
+        *c = static_cast<T>(v);
+      } else {
+        *c = static_cast<T>(v + beta * static_cast<AccT>(*c));
+      }
+    }
+  }
+}
+
+template <typename AccT>
+AccT* ThreadLocalBuffer(int slot, size_t size) {
+  static thread_local std::vector<AccT> buffers[2];
+  auto& buf = buffers[slot];
+  if (buf.size() < size) buf.resize(size);
+  return buf.data();
+}
+
+}  // namespace detail
+
+// C[b] = alpha * A[b] * B[b] + beta * C[b] for b in [0, batch), where A[b] is
+// M x K, B[b] is K x N and C[b] is M x N, all given by strided views. A zero
+// batch stride broadcasts an operand; a zero batch stride on C sums all
+// batches into a single output. Work is split over batches and M/N tiles of
+// the output, so every thread owns a disjoint part of C.
+template <typename T, typename AccT = T>
+void BatchedGemm(int64_t batch,
+                 int64_t M,
+                 int64_t N,
+                 int64_t K,
+                 AccT alpha,
+                 GemmOperand<const T> A,
+                 GemmOperand<const T> B,
+                 AccT beta,
+                 GemmOperand<T> C) {
+  using Blocking = GemmBlocking<AccT>;
+  constexpr int64_t MR = Blocking::MR;
+  constexpr int64_t NR = Blocking::NR;
+  if (batch <= 0 || M <= 0 || N <= 0) return;
+
+  const bool reduce_batch = C.batch_stride == 0 && batch > 1;
+  const int64_t out_batch = reduce_batch ? 1 : batch;
+  const int64_t batches_per_item = reduce_batch ? batch : 1;
+  const int64_t threads = custom_cpu::GetThreadPool()->NumThreads();
+
+  if (K == 0 || M * N * K <= kNaiveGemmMaxFlops) {
+    auto grain = std::max<int64_t>(1, kNaiveGemmMaxFlops / (M * N * K + 1));
+    custom_cpu::ParallelFor(0, out_batch, grain, [&](int64_t lo, int64_t hi) {
+      for (int64_t ob = lo; ob < hi; ++ob) {
+        for (int64_t i = 0; i < batches_per_item; ++i) {
+          auto b = ob + i;
+          detail::NaiveGemm<T, AccT>(M,
+                                     N,
+                                     K,
+                                     alpha,
+                                     A.data + b * A.batch_stride,
+                                     A.row_stride,
+                                     A.col_stride,
+                                     B.data + b * B.batch_stride,
+                                     B.row_stride,
+                                     B.col_stride,
+                                     i > 0,
+                                     beta,
+                                     C.data + ob * C.batch_stride,
+                                     C.row_stride,
+                                     C.col_stride);
+        }
+      }
+    });
+    return;
+  }
+
+  if (M == 1 || N == 1) {
+    // A single output row or column is memory bound; packing would only add
+    // traffic, so stream the matrix operand once instead.
+    const bool row = M == 1;
+    const int64_t len = row ? N : M;
+    const T* mat = row ? B.data : A.data;
+    const int64_t mat_bs = row ? B.batch_stride : A.batch_stride;
+    const int64_t m_rs = row ? B.col_stride : A.row_stride;
+    const int64_t m_cs = row ? B.row_stride : A.col_stride;
+    const T* vec = row ? A.data : B.data;
+    const int64_t vec_bs = row ? A.batch_stride : B.batch_stride;
+    const int64_t vec_stride = row ? A.col_stride : B.row_stride;
+    const int64_t out_stride = row ? C.col_stride : C.row_stride;
+    const int64_t chunks = (len + kGemvRowGrain - 1) / kGemvRowGrain;
+    custom_cpu::ParallelFor(
+        0, out_batch * chunks, 1, [&](int64_t lo, int64_t hi) {
+          AccT* acc = detail::ThreadLocalBuffer<AccT>(0, kGemvRowGrain);
+          for (int64_t item = lo; item < hi; ++item) {
+            const int64_t ob = item / chunks;
+            const int64_t r_lo = item % chunks * kGemvRowGrain;
+            const int64_t r_hi = std::min(len, r_lo + kGemvRowGrain);
+            for (int64_t i = 0; i < batches_per_item; ++i) {
+              const int64_t b = ob + i;
+              detail::Gemv<T, AccT>(r_lo,
+                                    r_hi,
+                                    K,
+                                    alpha,
+                                    mat + b * mat_bs,
+                                    m_rs,
+                                    m_cs,
+                                    vec + b * vec_bs,
+                                    vec_stride,
+                                    i > 0,
+                                    beta,
+                                    C.data + ob * C.batch_stride,
+                                    out_stride,
+                                    acc);
+            }
+          }
+        });
+    return;
+  }
+
+  // Low precision types accumulate the whole K extent in AccT before
+  // rounding into C.
+  const int64_t kc_max = std::is_same<T, AccT>::value ? Blocking::KC : K;
+
+  // Shrink the output tiles until there is enough work for every thread.
+  int64_t mc = std::min<int64_t>(+Blocking::MC, (M + MR - 1) / MR * MR);
+  int64_t nc = std::min<int64_t>(+Blocking::NC, (N + NR - 1) / NR * NR);
+  auto num_tiles = [&]() {
+    return out_batch * ((M + mc - 1) / mc) * ((N + nc - 1) / nc);
+  };
+  while (num_tiles() < threads && (nc > 4 * NR || mc > 2 * MR)) {
+    if (nc > 4 * NR) {
+      nc = (nc / 2 + NR - 1) / NR * NR;
+    } else {
+      mc = (mc / 2 + MR - 1) / MR * MR;
+    }
+  }
+  const int64_t m_tiles = (M + mc - 1) / mc;
+  const int64_t n_tiles = (N + nc - 1) / nc;
+
+  custom_cpu::ParallelFor(0, num_tiles(), 1, [&](int64_t lo, int64_t hi) {
+    AccT* a_buf =
+        detail::ThreadLocalBuffer<AccT>(0, static_cast<size_t>(mc * kc_max));
+    AccT* b_buf =
+        detail::ThreadLocalBuffer<AccT>(1, static_cast<size_t>(kc_max * nc));
+    AccT acc[MR * NR];
+    for (int64_t tile = lo; tile < hi; ++tile) {
+      const int64_t ob = tile / (m_tiles * n_tiles);
+      const int64_t ic = (tile / n_tiles) % m_tiles * mc;
+      const int64_t jc = tile % n_tiles * nc;
+      const int64_t m_len = std::min(mc, M - ic);
+      const int64_t n_len = std::min(nc, N - jc);
+      T* c_tile =
+          C.data + ob * C.batch_stride + ic * C.row_stride + jc * C.col_stride;
+
+      bool accumulate = false;
+      for (int64_t i = 0; i < batches_per_item; ++i) {
+        const int64_t b = ob + i;
+        const T* a_mat = A.data + b * A.batch_stride + ic * A.row_stride;
+        const T* b_mat = B.data + b * B.batch_stride + jc * B.col_stride;
+        for (int64_t pc = 0; pc < K; pc += kc_max) {
+          const int64_t kc = std::min(kc_max, K - pc);
+          detail::PackB<T, AccT, NR>(kc,
+                                     n_len,
+                                     b_mat + pc * B.row_stride,
+                                     B.row_stride,
+                                     B.col_stride,
+                                     b_buf);
+          detail::PackA<T, AccT, MR>(m_len,
+                                     kc,
+                                     a_mat + pc * A.col_stride,
+                                     A.row_stride,
+                                     A.col_stride,
+                                     a_buf);
+          for (int64_t jr = 0; jr < n_len; jr += NR) {
+            const int64_t cols = std::min(NR, n_len - jr);
+            for (int64_t ir = 0; ir < m_len; ir += MR) {
+              const int64_t rows = std::min(MR, m_len - ir);
+              detail::MicroKernel<AccT, MR, NR>(
+                  kc, a_buf + ir * kc, b_buf + jr * kc, acc);
+              detail::StoreTile<T, AccT>(
+                  rows,
+                  cols,
+                  NR,
+                  acc,
+                  alpha,
+                  accumulate,
+                  beta,
+                  c_tile + ir * C.row_stride + jr * C.col_stride,
+                  C.row_stride,
+                  C.col_stride);
+            }
+          }
+          accumulate = true;
+        }
+      }
+    }
+  });
+}
+
+template <typename T, typename AccT = T>
+void Gemm(int64_t M,
+          int64_t N,
+          int64_t K,
+          AccT alpha,
+          GemmOperand<const T> A,
+          GemmOperand<const T> B,
+          AccT beta,
+          GemmOperand<T> C) {
+  BatchedGemm<T, AccT>(1, M, N, K, alpha, A, B, beta, C);
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,279 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+
+#include "kernels/funcs/quant.h"
+#include "kernels/funcs/reduce.h"
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Rows whose weight gradients one partial sum covers. Partials are merged
+// in row order, so the weight gradients do not depend on the thread count.
+constexpr int64_t kNormRowsPerPartial = 32;
+
+// Normalization of `rows` contiguous rows of `cols` elements. Each row is
+// first formed as z = x + bias + residual_alpha * residual (bias has `cols`
+// elements, residual one per element of x, and both may be null), then
+// normalized:
+//   layer norm: y = (z - mean(z)) / sqrt(var(z) + epsilon) * weight + nbias
+//   rms norm:   y = z / sqrt(mean(z^2) + epsilon) * weight + nbias
+// weight and nbias have `cols` elements and may be null. With add_only the
+// output is z itself.
+template <typename T>
+struct NormArgs {
+  int64_t rows;
+  int64_t cols;
+  const T* x;
+  const T* bias;
+  const T* residual;
+  T residual_alpha;
+  const T* weight;
+  const T* norm_bias;
+  float epsilon;
+  bool rms;
+  bool add_only;
+};
+
+// Int8 quantization of the normalized output.
+using NormQuant = Int8Quant;
+
+namespace detail {
+
+constexpr int kNormLanes = 16;
+
+// Forms z for row r, stores it to z and returns {sum(z), sum(z^2)}. The
+// row is read once; z stays in cache for the passes that follow.
+template <typename T>
+void ResidualRow(const NormArgs<T>& a,
+                 int64_t r,
+                 T* z,
+                 typename ReduceAccType<T>::type* sum,
+                 typename ReduceAccType<T>::type* sum_sq) {
+  const int64_t n = a.cols;
+  const T* x = a.x + r * n;
+  const T* bias = a.bias;
+  const T* res = a.residual ? a.residual + r * n : nullptr;
+  const T alpha = a.residual_alpha;
+  *sum = 0;
+  *sum_sq = 0;
+  for (int64_t start = 0; start < n; start += kReduceFlushSize) {
+    auto end = std::min(n, start + kReduceFlushSize);
+    T s[kNormLanes] = {}, q[kNormLanes] = {};
+    int64_t i = start;
+    auto body = [&](int64_t j, int l) {
+      T v = x[j];
+      if (bias) v += bias[j];
+      if (res) v += alpha * res[j];
+      z[j] = v;
+      s[l] += v;
+      q[l] += v * v;
+    };
+    for (; i + kNormLanes <= end; i += kNormLanes) {
+      for (int l = 0; l < kNormLanes; ++l) body(i + l, l);
+    }
+    for (; i < end; ++i) body(i, 0);
+    for (int l = 1; l < kNormLanes; ++l) {
+      s[0] += s[l];
+      q[0] += q[l];
+    }
+    *sum += s[0];
+    *sum_sq += q[0];
+  }
+}
+
+// sum((z - c)^2) over a cached row.
+template <typename T>
+typename ReduceAccType<T>::type CenteredSquares(const T* z, int64_t n, T c) {
+  typename ReduceAccType<T>::type acc = 0;
+  for (int64_t start = 0; start < n; start += kReduceFlushSize) {
+    auto end = std::min(n, start + kReduceFlushSize);
+    T lanes[kNormLanes] = {};
+    int64_t i = start;
+    for (; i + kNormLanes <= end; i += kNormLanes) {
+      for (int l = 0; l < kNormLanes; ++l) {
+        T d = z[i + l] - c;
+        lanes[l] += d * d;
+      }
+    }
+    for (; i < end; ++i) lanes[0] += (z[i] - c) * (z[i] - c);
+    for (int l = 1; l < kNormLanes; ++l) lanes[0] += lanes[l];
+    acc += lanes[0];
+  }
+  return acc;
+}
+
+template <typename T>
+inline void StoreNormalized(T* out, int64_t i, T v, const NormQuant*) {
+  out[i] = v;
+}
+
+template <typename T>
+inline void StoreNormalized(int8_t* out, int64_t i, T v, const NormQuant* q) {
+  out[i] = QuantizeInt8(static_cast<float>(v), *q);
+}
+
+// Rows per task: enough elements to be worth a task.
+inline int64_t NormGrain(int64_t cols) {
+  return std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (cols + 1));
+}
+
+}  // namespace detail
+
+// Normalizes every row of `a` into out, which is T, or int8_t quantized
+// by `quant`. residual_out, if not null, receives z. mean, variance and
+// rstd, if not null, receive per row the mean and variance of z (layer norm
+// only) and 1 / sqrt(variance + epsilon), where rms norm uses mean(z^2) for
+// the variance.
+template <typename T, typename OutT, typename StatT>
+void NormForward(const NormArgs<T>& a,
+                 OutT* out,
+                 T* residual_out,
+                 StatT* mean,
+                 StatT* variance,
+                 StatT* rstd,
+                 const NormQuant* quant = nullptr) {
+  const int64_t n = a.cols;
+  custom_cpu::ParallelFor(
+      0, a.rows, detail::NormGrain(n), [&](int64_t b, int64_t e) {
+        std::vector<T> scratch(residual_out ? 0 : n);
+        for (int64_t r = b; r < e; ++r) {
+          T* z = residual_out ? residual_out + r * n : scratch.data();
+          typename ReduceAccType<T>::type sum, sum_sq;
+          detail::ResidualRow(a, r, z, &sum, &sum_sq);
+          OutT* y = out + r * n;
+          if (a.add_only) {
+            for (int64_t i = 0; i < n; ++i) {
+              detail::StoreNormalized(y, i, z[i], quant);
+            }
+            continue;
+          }
+          T mu = 0;
+          double var;
+          if (a.rms) {
+            var = n ? static_cast<double>(sum_sq) / n : 0.;
+          } else {
+            mu = static_cast<T>(n ? static_cast<double>(sum) / n : 0.);
+            var = n ? static_cast<double>(detail::CenteredSquares(z, n, mu)) / n
+                    : 0.;
+          }
+          const T inv = static_cast<T>(1. / std::sqrt(var + a.epsilon));
+          if (mean) mean[r] = static_cast<StatT>(mu);
+          if (variance) variance[r] = static_cast<StatT>(var);
+          if (rstd) rstd[r] = static_cast<StatT>(inv);
+          const T* w = a.weight;
+          const T* nb = a.norm_bias;
+          for (int64_t i = 0; i < n; ++i) {
+            T v = (z[i] - mu) * inv;
+            if (w) v *= w[i];
+            if (nb) v += nb[i];
+            detail::StoreNormalized(y, i, v, quant);
+          }
+        }
+      });
+}
+
+// Gradients of NormForward without quantization, from the saved mean and
+// rstd (mean is ignored for rms norm). z is recomputed from x, bias and
+// residual, so dx is also the gradient of residual before residual_alpha.
+// dx, dweight and dnorm_bias may be null.
+template <typename T, typename StatT>
+void NormBackward(const NormArgs<T>& a,
+                  const StatT* mean,
+                  const StatT* rstd,
+                  const T* dy,
+                  T* dx,
+                  T* dweight,
+                  T* dnorm_bias) {
+  using AccT = typename ReduceAccType<T>::type;
+  const int64_t n = a.cols;
+  const bool param_grads = dweight || dnorm_bias;
+  const int64_t chunks =
+      param_grads ? (a.rows + kNormRowsPerPartial - 1) / kNormRowsPerPartial
+                  : 0;
+  // Per chunk partial dweight and dnorm_bias.
+  std::vector<AccT> partial(chunks * n * 2);
+  const int64_t grain =
+      std::max<int64_t>(1, detail::NormGrain(n) / kNormRowsPerPartial);
+  const int64_t tasks =
+      (a.rows + kNormRowsPerPartial - 1) / kNormRowsPerPartial;
+  custom_cpu::ParallelFor(0, tasks, grain, [&](int64_t b, int64_t e) {
+    std::vector<T> z(n), g(n);
+    for (int64_t t = b; t < e; ++t) {
+      AccT* pw = param_grads ? partial.data() + t * n * 2 : nullptr;
+      AccT* pb = pw ? pw + n : nullptr;
+      const int64_t r1 = std::min(a.rows, (t + 1) * kNormRowsPerPartial);
+      for (int64_t r = t * kNormRowsPerPartial; r < r1; ++r) {
+        AccT unused_sum, unused_sq;
+        detail::ResidualRow(a, r, z.data(), &unused_sum, &unused_sq);
+        const T mu = a.rms ? T(0) : static_cast<T>(mean[r]);
+        const T inv = static_cast<T>(rstd[r]);
+        const T* gy = dy + r * n;
+        // With x_hat = (z - mu) * inv and g = dy * weight:
+        //   dx = inv * (g - mean(g) - x_hat * mean(g * x_hat))
+        // and rms norm drops the mean(g) term.
+        T s[detail::kNormLanes] = {}, p[detail::kNormLanes] = {};
+        int64_t i = 0;
+        auto body = [&](int64_t j, int l) {
+          T xh = (z[j] - mu) * inv;
+          z[j] = xh;
+          if (pw) pw[j] += gy[j] * xh;
+          if (pb) pb[j] += gy[j];
+          T gj = a.weight ? gy[j] * a.weight[j] : gy[j];
+          g[j] = gj;
+          s[l] += gj;
+          p[l] += gj * xh;
+        };
+        for (; i + detail::kNormLanes <= n; i += detail::kNormLanes) {
+          for (int l = 0; l < detail::kNormLanes; ++l) body(i + l, l);
+        }
+        for (; i < n; ++i) body(i, 0);
+        for (int l = 1; l < detail::kNormLanes; ++l) {
+          s[0] += s[l];
+          p[0] += p[l];
+        }
+        if (!dx) continue;
+        const T mean_g = a.rms || n == 0 ? T(0) : s[0] / n;
+        const T mean_gx = n == 0 ? T(0) : p[0] / n;
+        T* out = dx + r * n;
+        for (int64_t j = 0; j < n; ++j) {
+          out[j] = inv * (g[j] - mean_g - z[j] * mean_gx);
+        }
+      }
+    }
+  });
+  if (!param_grads) return;
+  custom_cpu::ParallelFor(
+      0, n, detail::NormGrain(chunks), [&](int64_t b, int64_t e) {
+        for (int64_t j = b; j < e; ++j) {
+          AccT w = 0, nb = 0;
+          for (int64_t c = 0; c < chunks; ++c) {
+            w += partial[c * n * 2 + j];
+            nb += partial[c * n * 2 + n + j];
+          }
+          if (dweight) dweight[j] = static_cast<T>(w);
+          if (dnorm_bias) dnorm_bias[j] = static_cast<T>(nb);
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,253 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+// Elementwise optimizer updates over many tensors at once. A step over a
+// model is one parallel region that splits the elements of all its tensors
+// evenly across the intra-op pool, so a model of many small tensors costs
+// one launch and its threads stream through parameters, gradients and
+// optimizer state at memory bandwidth. Tensors updated in place may alias
+// their outputs.
+//
+// T is the parameter and gradient type, MT the type of the optimizer state
+// and the arithmetic. With multi-precision training T is bfloat16 or
+// float16, MT is float and the float master copy of the parameter is the
+// one updated; the parameter is its rounded copy.
+
+namespace custom_kernel {
+namespace funcs {
+
+// MT for parameters of type T: double for double and float otherwise.
+template <typename T>
+struct OptimizerStateType {
+  using type = float;
+};
+
+template <>
+struct OptimizerStateType<double> {
+  using type = double;
+};
+
+// Hyperparameters of one Adam or AdamW tensor with the bias correction of
+// the current step folded in. Built by MakeAdamStep.
+template <typename MT>
+struct AdamStep {
+  MT beta1;
+  MT beta2;
+  MT lr;       // lr * sqrt(1 - beta2_pow) / (1 - beta1_pow)
+  MT epsilon;  // epsilon * sqrt(1 - beta2_pow)
+  MT decay;    // 1 - lr * coeff, the AdamW weight decay; 1 for Adam
+};
+
+// `lr` is the learning rate of the tensor, already scaled by lr_ratio for
+// AdamW, and beta1_pow and beta2_pow are beta1 and beta2 to the power of
+// the current step. coeff is the AdamW weight decay coefficient, 0 for
+// Adam.
+template <typename MT>
+AdamStep<MT> MakeAdamStep(MT lr,
+                          MT beta1,
+                          MT beta2,
+                          MT epsilon,
+                          MT beta1_pow,
+                          MT beta2_pow,
+                          MT coeff) {
+  const MT correction = std::sqrt(1 - beta2_pow);
+  AdamStep<MT> step;
+  step.beta1 = beta1;
+  step.beta2 = beta2;
+  step.lr = lr * correction / (1 - beta1_pow);
+  step.epsilon = epsilon * correction;
+  step.decay = 1 - lr * coeff;
+  return step;
+}
+
+// One tensor of an Adam or AdamW step:
+//   p  = p * decay
+//   m1 = beta1 * m1 + (1 - beta1) * g
+//   m2 = beta2 * m2 + (1 - beta2) * g * g
+//   p  = p - lr * m1 / (sqrt(m2) + epsilon)
+// where p is master_param when it is set and param otherwise.
+template <typename T, typename MT>
+struct AdamTensor {
+  int64_t numel;
+  const T* param;
+  const T* grad;
+  const MT* moment1;
+  const MT* moment2;
+  const MT* master_param;  // may be null
+  T* param_out;
+  MT* moment1_out;
+  MT* moment2_out;
+  MT* master_param_out;  // set iff master_param is
+  AdamStep<MT> step;
+};
+
+// One tensor of a momentum step:
+//   g = g * rescale_grad + l2_coeff * p
+//   v = mu * v + g
+//   p = p - lr * (g + mu * v)    with Nesterov momentum
+//   p = p - lr * v               otherwise
+// where p is master_param when it is set and param otherwise.
+template <typename T, typename MT>
+struct MomentumTensor {
+  int64_t numel;
+  const T* param;
+  const T* grad;
+  const MT* velocity;
+  const MT* master_param;  // may be null
+  T* param_out;
+  MT* velocity_out;
+  MT* master_param_out;  // set iff master_param is
+  MT lr;
+  MT l2_coeff;  // 0 without L2 decay
+};
+
+// Settings shared by the tensors of a momentum step.
+template <typename MT>
+struct MomentumConfig {
+  MT mu;
+  MT rescale_grad;
+  bool use_nesterov;
+};
+
+namespace detail {
+
+// Calls fn(tensor, begin, end) over the elements of `tensors` in parallel,
+// as if they were one buffer, so that each thread gets the same number of
+// elements whatever the tensor sizes.
+template <typename Tensor, typename F>
+void MultiTensorApply(const std::vector<Tensor>& tensors, F&& fn) {
+  std::vector<int64_t> starts(tensors.size() + 1, 0);
+  for (size_t i = 0; i < tensors.size(); ++i) {
+    starts[i + 1] = starts[i] + tensors[i].numel;
+  }
+  custom_cpu::ParallelFor(
+      0,
+      starts.back(),
+      custom_cpu::kDefaultGrainSize,
+      [&](int64_t begin, int64_t end) {
+        size_t i = std::upper_bound(starts.begin(), starts.end(), begin) -
+                   starts.begin() - 1;
+        for (; i < tensors.size() && starts[i] < end; ++i) {
+          const int64_t first = std::max(begin, starts[i]) - starts[i];
+          const int64_t last = std::min(end, starts[i + 1]) - starts[i];
+          if (first < last) fn(tensors[i], first, last);
+        }
+      });
+}
+
+// The update loops read the parameter from the master copy or from param,
+// chosen at compile time so that the loop bodies have no branches and
+// vectorize. An output may alias its input, but element i is only read and
+// written at iteration i, so the loops carry no dependence; ivdep spares
+// them the runtime overlap checks, which fail for in-place updates.
+template <bool kMaster, typename T, typename MT>
+void AdamRange(const AdamTensor<T, MT>& t, int64_t begin, int64_t end) {
+  const AdamStep<MT> s = t.step;
+  const MT one_minus_beta1 = 1 - s.beta1;
+  const MT one_minus_beta2 = 1 - s.beta2;
+  const T* param = t.param;
+  const T* grad = t.grad;
+  const MT* moment1 = t.moment1;
+  const MT* moment2 = t.moment2;
+  const MT* master = t.master_param;
+  T* param_out = t.param_out;
+  MT* moment1_out = t.moment1_out;
+  MT* moment2_out = t.moment2_out;
+  MT* master_out = t.master_param_out;
+#pragma GCC ivdep
+  for (int64_t i = begin; i < end; ++i) {
+    MT p = kMaster ? master[i] : static_cast<MT>(param[i]);
+    const MT g = static_cast<MT>(grad[i]);
+    const MT m1 = s.beta1 * moment1[i] + one_minus_beta1 * g;
+    const MT m2 = s.beta2 * moment2[i] + one_minus_beta2 * g * g;
+    p = p * s.decay - s.lr * m1 / (std::sqrt(m2) + s.epsilon);
+    moment1_out[i] = m1;
+    moment2_out[i] = m2;
+    if (kMaster) master_out[i] = p;
+    param_out[i] = static_cast<T>(p);
+  }
+}
+
+template <bool kMaster, typename T, typename MT>
+void MomentumRange(const MomentumTensor<T, MT>& t,
+                   const MomentumConfig<MT>& c,
+                   int64_t begin,
+                   int64_t end) {
+  const MT mu = c.mu;
+  const MT rescale_grad = c.rescale_grad;
+  const MT lr = t.lr;
+  const MT l2_coeff = t.l2_coeff;
+  // p -= lr * (g_coeff * g + v_coeff * v) covers both variants without a
+  // branch in the loop.
+  const MT g_coeff = c.use_nesterov ? 1 : 0;
+  const MT v_coeff = c.use_nesterov ? mu : 1;
+  const T* param = t.param;
+  const T* grad = t.grad;
+  const MT* velocity = t.velocity;
+  const MT* master = t.master_param;
+  T* param_out = t.param_out;
+  MT* velocity_out = t.velocity_out;
+  MT* master_out = t.master_param_out;
+#pragma GCC ivdep
+  for (int64_t i = begin; i < end; ++i) {
+    MT p = kMaster ? master[i] : static_cast<MT>(param[i]);
+    const MT g = static_cast<MT>(grad[i]) * rescale_grad + l2_coeff * p;
+    const MT v = mu * velocity[i] + g;
+    p -= lr * (g_coeff * g + v_coeff * v);
+    velocity_out[i] = v;
+    if (kMaster) master_out[i] = p;
+    param_out[i] = static_cast<T>(p);
+  }
+}
+
+}  // namespace detail
+
+// Applies one Adam or AdamW step to every tensor in `tensors`.
+template <typename T, typename MT>
+void AdamUpdate(const std::vector<AdamTensor<T, MT>>& tensors) {
+  detail::MultiTensorApply(
+      tensors, [](const AdamTensor<T, MT>& t, int64_t begin, int64_t end) {
+        if (t.master_param) {
+          detail::AdamRange<true>(t, begin, end);
+        } else {
+          detail::AdamRange<false>(t, begin, end);
+        }
+      });
+}
+
+// Applies one momentum step to every tensor in `tensors`.
+template <typename T, typename MT>
+void MomentumUpdate(const std::vector<MomentumTensor<T, MT>>& tensors,
+                    const MomentumConfig<MT>& config) {
+  detail::MultiTensorApply(
+      tensors, [&](const MomentumTensor<T, MT>& t, int64_t begin, int64_t end) {
+        if (t.master_param) {
+          detail::MomentumRange<true>(t, config, begin, end);
+        } else {
+          detail::MomentumRange<false>(t, config, begin, end);
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
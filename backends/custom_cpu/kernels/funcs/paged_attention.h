@@ -0,0 +1,292 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <limits>
+#include <vector>
+
+#include "kernels/funcs/softmax.h"
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Queries of one sequence and head attended together in prefill; each key
+// block is loaded once per tile.
+constexpr int64_t kAttentionQueryTile = 16;
+
+// An additive attention mask: element (b, q, k) for query position q and
+// key position k is data[b * batch_stride + q * row_stride + k]. A
+// row_stride of 0 shares one row among all queries.
+template <typename T>
+struct AttentionMask {
+  const T* data;
+  int64_t batch_stride;
+  int64_t row_stride;
+};
+
+// Attention over a block-paged KV cache, for a batch whose sequences are
+// each either in prefill (seq_lens_encoder[b] > 0) or decoding.
+//
+// qkv holds the tokens of this step packed: rows cu_seqlens_q[b] ..
+// cu_seqlens_q[b + 1] belong to sequence b, each row num_heads query heads,
+// then kv_num_heads key heads and kv_num_heads value heads of head_dim.
+// Token i of sequence b sits at position seq_lens_decoder[b] + i, and
+// position p of it is slot p % block_size of cache block
+// block_tables[b * max_blocks_per_seq + p / block_size]. The caches are
+// [num_blocks, kv_num_heads, block_size, head_dim].
+template <typename T>
+struct PagedAttentionArgs {
+  int64_t batch;
+  int64_t num_heads;
+  int64_t kv_num_heads;
+  int64_t head_dim;
+  int64_t block_size;
+  int64_t max_blocks_per_seq;
+  const int32_t* seq_lens_encoder;
+  const int32_t* seq_lens_decoder;
+  const int32_t* seq_lens_this_time;
+  const int32_t* cu_seqlens_q;
+  const int32_t* block_tables;
+  // Optional: [(num_heads + 2 * kv_num_heads) * head_dim] added to qkv.
+  const T* qkv_bias;
+  // Optional rotary embedding of queries and keys: cos for position p of
+  // sequence b at rope[b * rope_batch_stride + p * rope_dim], sin
+  // rope_sin_offset further. rope_dim is head_dim / 2 (one angle per
+  // pair) or head_dim. neox_style rotates element i with i + head_dim / 2
+  // instead of 2i with 2i + 1.
+  const float* rope;
+  int64_t rope_batch_stride;
+  int64_t rope_sin_offset;
+  int64_t rope_dim;
+  bool neox_style;
+  AttentionMask<T> prefill_mask;
+  AttentionMask<T> decode_mask;
+};
+
+namespace detail {
+
+template <typename T>
+inline int64_t QkvWidth(const PagedAttentionArgs<T>& a) {
+  return (a.num_heads + 2 * a.kv_num_heads) * a.head_dim;
+}
+
+// Rotates one head in place by the angles at cos / sin.
+template <typename T>
+void RotateHead(T* h,
+                const float* cos,
+                const float* sin,
+                int64_t head_dim,
+                int64_t rope_dim,
+                bool neox_style) {
+  const int64_t half = head_dim / 2;
+  if (neox_style) {
+    for (int64_t i = 0; i < half; ++i) {
+      // A rope_dim of head_dim has separate angles for both halves.
+      const int64_t j = rope_dim == head_dim ? i + half : i;
+      const T a = h[i], b = h[i + half];
+      h[i] = a * static_cast<T>(cos[i]) - b * static_cast<T>(sin[i]);
+      h[i + half] = b * static_cast<T>(cos[j]) + a * static_cast<T>(sin[j]);
+    }
+    return;
+  }
+  for (int64_t i = 0; i < half; ++i) {
+    const int64_t j = rope_dim == head_dim ? 2 * i : i;
+    const T a = h[2 * i], b = h[2 * i + 1];
+    h[2 * i] = a * static_cast<T>(cos[j]) - b * static_cast<T>(sin[j]);
+    h[2 * i + 1] = b * static_cast<T>(cos[j]) + a * static_cast<T>(sin[j]);
+  }
+}
+
+// The cache row of position pos of sequence b for kv head h.
+template <typename T, typename CacheT>
+inline CacheT* CacheRow(const PagedAttentionArgs<T>& a,
+                        CacheT* cache,
+                        int64_t b,
+                        int64_t pos,
+                        int64_t h) {
+  const int64_t block =
+      a.block_tables[b * a.max_blocks_per_seq + pos / a.block_size];
+  return cache +
+         ((block * a.kv_num_heads + h) * a.block_size + pos % a.block_size) *
+             a.head_dim;
+}
+
+// x . y over a head, in independent lanes so the loop vectorizes.
+template <typename T>
+inline T HeadDot(const T* x, const T* y, int64_t n) {
+  constexpr int kLanes = kSoftmaxLanes;
+  T lanes[kLanes] = {};
+  int64_t i = 0;
+  for (; i + kLanes <= n; i += kLanes) {
+    for (int l = 0; l < kLanes; ++l) lanes[l] += x[i + l] * y[i + l];
+  }
+  for (; i < n; ++i) lanes[0] += x[i] * y[i];
+  for (int l = 1; l < kLanes; ++l) lanes[0] += lanes[l];
+  return lanes[0];
+}
+
+// One unit of attention work: query rows [q0, q1) of sequence b, head h.
+struct AttentionTask {
+  int64_t b;
+  int64_t h;
+  int64_t q0;
+  int64_t q1;
+};
+
+}  // namespace detail
+
+// Adds the bias and rotary embedding to qkv into qkv_out, and appends the
+// keys and values of this step to the caches.
+template <typename T>
+void PagedAttentionWriteCache(const PagedAttentionArgs<T>& a,
+                              const T* qkv,
+                              T* qkv_out,
+                              T* key_cache,
+                              T* value_cache) {
+  const int64_t width = detail::QkvWidth(a);
+  const int64_t d = a.head_dim;
+  const int64_t tokens = a.cu_seqlens_q[a.batch];
+  const int64_t grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (width + 1));
+  custom_cpu::ParallelFor(0, tokens, grain, [&](int64_t begin, int64_t end) {
+    // Tokens are packed by sequence; find the sequence of the first one.
+    int64_t b = std::upper_bound(a.cu_seqlens_q,
+                                 a.cu_seqlens_q + a.batch + 1,
+                                 static_cast<int32_t>(begin)) -
+                a.cu_seqlens_q - 1;
+    for (int64_t t = begin; t < end; ++t) {
+      while (t >= a.cu_seqlens_q[b + 1]) ++b;
+      const int64_t pos = a.seq_lens_decoder[b] + t - a.cu_seqlens_q[b];
+      const T* src = qkv + t * width;
+      T* dst = qkv_out + t * width;
+      for (int64_t i = 0; i < width; ++i) {
+        dst[i] = a.qkv_bias ? src[i] + a.qkv_bias[i] : src[i];
+      }
+      if (a.rope) {
+        const float* cos = a.rope + b * a.rope_batch_stride + pos * a.rope_dim;
+        const float* sin = cos + a.rope_sin_offset;
+        for (int64_t h = 0; h < a.num_heads + a.kv_num_heads; ++h) {
+          detail::RotateHead(
+              dst + h * d, cos, sin, d, a.rope_dim, a.neox_style);
+        }
+      }
+      const T* k = dst + a.num_heads * d;
+      const T* v = k + a.kv_num_heads * d;
+      for (int64_t h = 0; h < a.kv_num_heads; ++h) {
+        std::copy(k + h * d,
+                  k + (h + 1) * d,
+                  detail::CacheRow(a, key_cache, b, pos, h));
+        std::copy(v + h * d,
+                  v + (h + 1) * d,
+                  detail::CacheRow(a, value_cache, b, pos, h));
+      }
+    }
+  });
+}
+
+// Causal attention of the queries in qkv_out (as PagedAttentionWriteCache
+// left it) over every cached position up to their own, into out
+// [tokens, num_heads * head_dim]. A task takes one head of up to
+// kAttentionQueryTile queries of a sequence, so decode is parallel over
+// sequences and heads, and walks the sequence's cache block by block with
+// an online softmax: a running max, sum and weighted value row per query,
+// rescaled whenever the max grows, so no score matrix is materialized.
+template <typename T>
+void PagedAttention(const PagedAttentionArgs<T>& a,
+                    const T* qkv_out,
+                    const T* key_cache,
+                    const T* value_cache,
+                    T* out) {
+  const int64_t width = detail::QkvWidth(a);
+  const int64_t d = a.head_dim;
+  const int64_t group = a.num_heads / a.kv_num_heads;
+  const T scale = static_cast<T>(1. / std::sqrt(static_cast<double>(d)));
+  std::vector<detail::AttentionTask> tasks;
+  for (int64_t b = 0; b < a.batch; ++b) {
+    const int64_t len = a.seq_lens_this_time[b];
+    for (int64_t h = 0; h < a.num_heads; ++h) {
+      for (int64_t q0 = 0; q0 < len; q0 += kAttentionQueryTile) {
+        tasks.push_back({b, h, q0, std::min(len, q0 + kAttentionQueryTile)});
+      }
+    }
+  }
+  custom_cpu::ParallelFor(
+      0, static_cast<int64_t>(tasks.size()), 1, [&](int64_t tb, int64_t te) {
+        constexpr int64_t kTile = kAttentionQueryTile;
+        std::vector<T> acc(kTile * d), scores(a.block_size);
+        T row_max[kTile], row_sum[kTile];
+        for (int64_t ti = tb; ti < te; ++ti) {
+          const auto& task = tasks[ti];
+          const int64_t b = task.b;
+          const int64_t kvh = task.h / group;
+          const int64_t rows = task.q1 - task.q0;
+          const int64_t past = a.seq_lens_decoder[b];
+          const bool prefill = a.seq_lens_encoder[b] > 0;
+          const auto& mask = prefill ? a.prefill_mask : a.decode_mask;
+          const T* mask_b =
+              mask.data ? mask.data + b * mask.batch_stride : nullptr;
+          const int64_t first_token = a.cu_seqlens_q[b] + task.q0;
+          std::fill(acc.begin(), acc.begin() + rows * d, T(0));
+          std::fill(row_max, row_max + rows, -std::numeric_limits<T>::max());
+          std::fill(row_sum, row_sum + rows, T(0));
+          // Keys up to the last query's position.
+          const int64_t keys = past + task.q1;
+          for (int64_t k0 = 0; k0 < keys; k0 += a.block_size) {
+            const int64_t k1 = std::min(keys, k0 + a.block_size);
+            const T* kb = detail::CacheRow(a, key_cache, b, k0, kvh);
+            const T* vb = detail::CacheRow(a, value_cache, b, k0, kvh);
+            for (int64_t r = 0; r < rows; ++r) {
+              const int64_t qpos = past + task.q0 + r;
+              const int64_t end = std::min(k1, qpos + 1);
+              if (end <= k0) continue;
+              const T* q = qkv_out + (first_token + r) * width + task.h * d;
+              const T* m = mask_b ? mask_b + qpos * mask.row_stride : nullptr;
+              T block_max = row_max[r];
+              for (int64_t k = k0; k < end; ++k) {
+                T s = detail::HeadDot(q, kb + (k - k0) * d, d) * scale;
+                if (m) s += m[k];
+                scores[k - k0] = s;
+                block_max = std::max(block_max, s);
+              }
+              T* o = acc.data() + r * d;
+              if (block_max > row_max[r]) {
+                const T rescale = detail::ExpNeg(block_max - row_max[r]);
+                row_sum[r] *= rescale;
+                for (int64_t i = 0; i < d; ++i) o[i] *= rescale;
+                row_max[r] = block_max;
+              }
+              for (int64_t k = k0; k < end; ++k) {
+                const T p = detail::ExpNeg(row_max[r] - scores[k - k0]);
+                row_sum[r] += p;
+                const T* v = vb + (k - k0) * d;
+                for (int64_t i = 0; i < d; ++i) o[i] += p * v[i];
+              }
+            }
+          }
+          for (int64_t r = 0; r < rows; ++r) {
+            const T inv = row_sum[r] > 0 ? T(1) / row_sum[r] : T(0);
+            T* dst = out + (first_token + r) * a.num_heads * d + task.h * d;
+            for (int64_t i = 0; i < d; ++i) dst[i] = acc[r * d + i] * inv;
+          }
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
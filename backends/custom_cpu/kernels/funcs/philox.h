@@ -0,0 +1,250 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <atomic>
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Counters generated together; each round runs across them as SIMD lanes.
+constexpr int kPhiloxLanes = 8;
+
+// Where a kernel call draws from: the Philox key and the first counter.
+// Draw i of the call always comes from counter offset + i, whichever
+// thread computes it, so the output does not depend on the thread count.
+struct PhiloxSeed {
+  uint64_t key;
+  uint64_t offset;
+};
+
+namespace detail {
+
+// Generates Philox4x32-10 for counters counter .. counter + kPhiloxLanes - 1.
+// The counter is 64 bits in words 0 and 1; words 2 and 3 are zero.
+// out[w][l] is word w of lane l.
+inline void PhiloxBlock(uint64_t key,
+                        uint64_t counter,
+                        uint32_t out[4][kPhiloxLanes]) {
+  constexpr uint64_t kMul0 = 0xD2511F53;
+  constexpr uint64_t kMul1 = 0xCD9E8D57;
+  constexpr uint32_t kWeyl0 = 0x9E3779B9;
+  constexpr uint32_t kWeyl1 = 0xBB67AE85;
+  uint32_t c0[kPhiloxLanes], c1[kPhiloxLanes], c2[kPhiloxLanes],
+      c3[kPhiloxLanes];
+  for (int l = 0; l < kPhiloxLanes; ++l) {
+    uint64_t c = counter + l;
+    c0[l] = static_cast<uint32_t>(c);
+    c1[l] = static_cast<uint32_t>(c >> 32);
+    c2[l] = 0;
+    c3[l] = 0;
+  }
+  uint32_t k0 = static_cast<uint32_t>(key);
+  uint32_t k1 = static_cast<uint32_t>(key >> 32);
+  for (int round = 0; round < 10; ++round) {
+    for (int l = 0; l < kPhiloxLanes; ++l) {
+      uint64_t p0 = kMul0 * c0[l];
+      uint64_t p1 = kMul1 * c2[l];
+      uint32_t n0 = static_cast<uint32_t>(p1 >> 32) ^ c1[l] ^ k0;
+      uint32_t n2 = static_cast<uint32_t>(p0 >> 32) ^ c3[l] ^ k1;
+      c1[l] = static_cast<uint32_t>(p1);
+      c3[l] = static_cast<uint32_t>(p0);
+      c0[l] = n0;
+      c2[l] = n2;
+    }
+    k0 += kWeyl0;
+    k1 += kWeyl1;
+  }
+  for (int l = 0; l < kPhiloxLanes; ++l) {
+    out[0][l] = c0[l];
+    out[1][l] = c1[l];
+    out[2][l] = c2[l];
+    out[3][l] = c3[l];
+  }
+}
+
+// Uniform in [0, 1) from the top 24 bits of r.
+inline float UniformFloat(uint32_t r) {
+  return static_cast<float>(r >> 8) * (1.f / (1 << 24));
+}
+
+// Uniform in [0, 1) from the top 53 bits of hi:lo.
+inline double UniformDouble(uint32_t hi, uint32_t lo) {
+  uint64_t bits = (static_cast<uint64_t>(hi) << 32 | lo) >> 11;
+  return static_cast<double>(bits) * (1. / (static_cast<uint64_t>(1) << 53));
+}
+
+}  // namespace detail
+
+// Seed for a kernel call taking `counters` counters. A non-zero seed gives
+// the same draws on every call. Seed 0 reserves the next range of one
+// process-wide stream keyed by FLAGS_custom_cpu_random_seed (default 0):
+// the plugin C API cannot reach Paddle's generator, so this is what makes
+// successive unseeded calls differ while a run stays reproducible.
+inline PhiloxSeed PhiloxSeedFor(int64_t seed, uint64_t counters) {
+  if (seed != 0) return {static_cast<uint64_t>(seed), 0};
+  static const uint64_t default_key = [] {
+    const char* env = std::getenv("FLAGS_custom_cpu_random_seed");
+    return env ? std::strtoull(env, nullptr, 10) : static_cast<uint64_t>(0);
+  }();
+  static std::atomic<uint64_t> default_offset{0};
+  // Whole blocks keep every call's range aligned to kPhiloxLanes.
+  auto blocks = (counters + kPhiloxLanes - 1) / kPhiloxLanes;
+  return {default_key, default_offset.fetch_add(blocks * kPhiloxLanes)};
+}
+
+// Calls fn(i, r) with the four words r of Philox(seed.key, seed.offset + i)
+// for every i in [0, counters), split across the intra-op pool.
+template <typename Fn>
+void PhiloxForEach(PhiloxSeed seed, int64_t counters, Fn fn) {
+  auto blocks = (counters + kPhiloxLanes - 1) / kPhiloxLanes;
+  auto grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (4 * kPhiloxLanes));
+  custom_cpu::ParallelFor(0, blocks, grain, [&](int64_t b, int64_t e) {
+    uint32_t out[4][kPhiloxLanes];
+    for (auto block = b; block < e; ++block) {
+      auto first = block * kPhiloxLanes;
+      detail::PhiloxBlock(seed.key, seed.offset + first, out);
+      auto lanes = std::min<int64_t>(kPhiloxLanes, counters - first);
+      for (int64_t l = 0; l < lanes; ++l) {
+        const uint32_t r[4] = {out[0][l], out[1][l], out[2][l], out[3][l]};
+        fn(first + l, r);
+      }
+    }
+  });
+}
+
+// Values drawn per counter: four floats or two doubles.
+template <typename T>
+constexpr int64_t PhiloxValuesPerCounter() {
+  return sizeof(T) > 4 ? 2 : 4;
+}
+
+namespace detail {
+
+// The uniforms in [0, 1) of one counter.
+inline void CounterUniforms(const uint32_t* r, float u[4]) {
+  for (int j = 0; j < 4; ++j) u[j] = UniformFloat(r[j]);
+}
+
+inline void CounterUniforms(const uint32_t* r, double u[2]) {
+  u[0] = UniformDouble(r[0], r[1]);
+  u[1] = UniformDouble(r[2], r[3]);
+}
+
+// Standard normals from the uniforms of one counter, by the Box-Muller
+// transform of each pair. 1 - u lies in (0, 1], so the log is finite.
+template <typename T>
+void CounterNormals(const uint32_t* r, T z[]) {
+  constexpr auto kPer = PhiloxValuesPerCounter<T>();
+  constexpr T kTwoPi = static_cast<T>(6.283185307179586);
+  T u[kPer];
+  CounterUniforms(r, u);
+  for (int p = 0; p < kPer; p += 2) {
+    T radius = std::sqrt(T(-2) * std::log(T(1) - u[p]));
+    z[p] = radius * std::cos(kTwoPi * u[p + 1]);
+    z[p + 1] = radius * std::sin(kTwoPi * u[p + 1]);
+  }
+}
+
+// Fills data[0, n) with transform(r, values) of the kPer values drawn
+// from each counter.
+template <typename T, int64_t kPer, typename Transform>
+void PhiloxFill(int64_t seed, T* data, int64_t n, Transform transform) {
+  auto counters = (n + kPer - 1) / kPer;
+  PhiloxForEach(PhiloxSeedFor(seed, counters),
+                counters,
+                [&](int64_t i, const uint32_t* r) {
+                  T* out = data + i * kPer;
+                  if (n - i * kPer >= kPer) {
+                    transform(r, out);
+                    return;
+                  }
+                  T values[kPer];
+                  transform(r, values);
+                  std::copy(values, values + n - i * kPer, out);
+                });
+}
+
+}  // namespace detail
+
+// Fills data[0, n) with draws uniform in [min, max).
+template <typename T>
+void UniformFill(int64_t seed, T* data, int64_t n, T min, T max) {
+  constexpr auto kPer = PhiloxValuesPerCounter<T>();
+  const T range = max - min;
+  detail::PhiloxFill<T, kPer>(seed, data, n, [&](const uint32_t* r, T* out) {
+    detail::CounterUniforms(r, out);
+    for (int64_t j = 0; j < kPer; ++j) out[j] = min + out[j] * range;
+  });
+}
+
+// Fills data[0, n) with normal draws of the given mean and std.
+template <typename T>
+void GaussianFill(int64_t seed, T* data, int64_t n, T mean, T std) {
+  constexpr auto kPer = PhiloxValuesPerCounter<T>();
+  detail::PhiloxFill<T, kPer>(seed, data, n, [&](const uint32_t* r, T* out) {
+    detail::CounterNormals(r, out);
+    for (int64_t j = 0; j < kPer; ++j) out[j] = mean + out[j] * std;
+  });
+}
+
+// Fills data[0, n) with integers uniform in [low, high), by scaling 32
+// random bits, or 64 when the range needs them.
+template <typename T>
+void RandintFill(int64_t seed, T* data, int64_t n, int64_t low, int64_t high) {
+  const auto range = static_cast<uint64_t>(high - low);
+  if (range <= (static_cast<uint64_t>(1) << 32)) {
+    detail::PhiloxFill<T, 4>(seed, data, n, [&](const uint32_t* r, T* out) {
+      for (int j = 0; j < 4; ++j) {
+        auto v = (static_cast<uint64_t>(r[j]) * range) >> 32;
+        out[j] = static_cast<T>(low + static_cast<int64_t>(v));
+      }
+    });
+    return;
+  }
+  detail::PhiloxFill<T, 2>(seed, data, n, [&](const uint32_t* r, T* out) {
+    for (int j = 0; j < 2; ++j) {
+      uint64_t bits = static_cast<uint64_t>(r[2 * j]) << 32 | r[2 * j + 1];
+      auto v = static_cast<uint64_t>(
+          (static_cast<unsigned __int128>(bits) * range) >> 64);
+      out[j] = static_cast<T>(low + static_cast<int64_t>(v));
+    }
+  });
+}
+
+// Fills mask[0, n) with 1 where a uniform draw is at least drop_prob and 0
+// elsewhere, so each element is kept with probability 1 - drop_prob.
+inline void KeepMaskFill(int64_t seed,
+                         uint8_t* mask,
+                         int64_t n,
+                         float drop_prob) {
+  detail::PhiloxFill<uint8_t, 4>(
+      seed, mask, n, [&](const uint32_t* r, uint8_t* out) {
+        for (int j = 0; j < 4; ++j) {
+          out[j] =
+              static_cast<uint8_t>(detail::UniformFloat(r[j]) >= drop_prob);
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,279 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <limits>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Channels of an NHWC image one pool2d_grad task owns.
+constexpr int64_t kPoolChannelBlock = 16;
+
+// A 2-D max or average pooling of [N, C, H, W] (or [N, H, W, C] when
+// channel_last) into [N, C, OH, OW]. Adaptive pooling splits the input
+// evenly instead of using the kernel, strides and padding; exclusive
+// average pooling divides by the number of elements inside the image
+// rather than the kernel size.
+struct Pool2dShape {
+  int64_t batch;
+  int64_t channels;
+  int64_t in_h;
+  int64_t in_w;
+  int64_t out_h;
+  int64_t out_w;
+  int64_t kernel_h;
+  int64_t kernel_w;
+  int64_t stride_h;
+  int64_t stride_w;
+  int64_t pad_top;
+  int64_t pad_left;
+  bool adaptive;
+  bool exclusive;
+  bool channel_last;
+  bool max;
+};
+
+namespace detail {
+
+// The input range [begin, end) pooled into output index o of a dim.
+inline void PoolWindow(int64_t o,
+                       int64_t in,
+                       int64_t out,
+                       int64_t kernel,
+                       int64_t stride,
+                       int64_t pad,
+                       bool adaptive,
+                       int64_t* begin,
+                       int64_t* end) {
+  if (adaptive) {
+    *begin = o * in / out;
+    *end = ((o + 1) * in + out - 1) / out;
+    return;
+  }
+  const int64_t start = o * stride - pad;
+  *end = std::min(start + kernel, in);
+  *begin = std::max<int64_t>(start, 0);
+}
+
+struct Window {
+  int64_t h0;
+  int64_t h1;
+  int64_t w0;
+  int64_t w1;
+  int64_t size;
+};
+
+inline Window PoolWindow2d(const Pool2dShape& s, int64_t oh, int64_t ow) {
+  Window w;
+  PoolWindow(oh,
+             s.in_h,
+             s.out_h,
+             s.kernel_h,
+             s.stride_h,
+             s.pad_top,
+             s.adaptive,
+             &w.h0,
+             &w.h1);
+  PoolWindow(ow,
+             s.in_w,
+             s.out_w,
+             s.kernel_w,
+             s.stride_w,
+             s.pad_left,
+             s.adaptive,
+             &w.w0,
+             &w.w1);
+  w.size = (s.exclusive || s.adaptive) ? std::max<int64_t>(0, w.h1 - w.h0) *
+                                             std::max<int64_t>(0, w.w1 - w.w0)
+                                       : s.kernel_h * s.kernel_w;
+  return w;
+}
+
+template <typename T>
+inline T PoolDivide(T sum, int64_t size) {
+  return size > 0 ? sum / static_cast<T>(size) : T(0);
+}
+
+}  // namespace detail
+
+template <typename T>
+void Pool2dForward(const Pool2dShape& s, const T* x, T* out) {
+  const T lowest = std::numeric_limits<T>::lowest();
+  const int64_t in_plane = s.in_h * s.in_w;
+  const int64_t out_plane = s.out_h * s.out_w;
+  if (!s.channel_last) {
+    const int64_t planes = s.batch * s.channels;
+    const int64_t grain =
+        std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (in_plane + 1));
+    custom_cpu::ParallelFor(0, planes, grain, [&](int64_t b, int64_t e) {
+      for (int64_t p = b; p < e; ++p) {
+        const T* src = x + p * in_plane;
+        T* dst = out + p * out_plane;
+        for (int64_t oh = 0; oh < s.out_h; ++oh) {
+          for (int64_t ow = 0; ow < s.out_w; ++ow) {
+            auto w = detail::PoolWindow2d(s, oh, ow);
+            T acc = s.max ? lowest : T(0);
+            for (int64_t h = w.h0; h < w.h1; ++h) {
+              const T* row = src + h * s.in_w;
+              if (s.max) {
+                for (int64_t i = w.w0; i < w.w1; ++i) {
+                  acc = std::max(acc, row[i]);
+                }
+              } else {
+                for (int64_t i = w.w0; i < w.w1; ++i) acc += row[i];
+              }
+            }
+            dst[oh * s.out_w + ow] =
+                s.max ? acc : detail::PoolDivide(acc, w.size);
+          }
+        }
+      }
+    });
+    return;
+  }
+  // NHWC: every window reduces whole channel vectors.
+  const int64_t rows = s.batch * s.out_h;
+  const int64_t grain = std::max<int64_t>(
+      1, custom_cpu::kDefaultGrainSize / (s.out_w * s.channels + 1));
+  custom_cpu::ParallelFor(0, rows, grain, [&](int64_t b, int64_t e) {
+    for (int64_t r = b; r < e; ++r) {
+      const int64_t n = r / s.out_h;
+      const int64_t oh = r % s.out_h;
+      const T* image = x + n * in_plane * s.channels;
+      for (int64_t ow = 0; ow < s.out_w; ++ow) {
+        auto w = detail::PoolWindow2d(s, oh, ow);
+        T* dst = out + (r * s.out_w + ow) * s.channels;
+        std::fill(dst, dst + s.channels, s.max ? lowest : T(0));
+        for (int64_t h = w.h0; h < w.h1; ++h) {
+          for (int64_t i = w.w0; i < w.w1; ++i) {
+            const T* src = image + (h * s.in_w + i) * s.channels;
+            if (s.max) {
+              for (int64_t c = 0; c < s.channels; ++c) {
+                dst[c] = std::max(dst[c], src[c]);
+              }
+            } else {
+              for (int64_t c = 0; c < s.channels; ++c) dst[c] += src[c];
+            }
+          }
+        }
+        if (!s.max) {
+          for (int64_t c = 0; c < s.channels; ++c) {
+            dst[c] = detail::PoolDivide(dst[c], w.size);
+          }
+        }
+      }
+    }
+  });
+}
+
+// dx of Pool2dForward. Max pooling routes each output gradient to the first
+// element of its window equal to the output, as the reference CPU kernel
+// does; average pooling spreads it over the window.
+template <typename T>
+void Pool2dBackward(
+    const Pool2dShape& s, const T* x, const T* out, const T* dout, T* dx) {
+  const int64_t in_plane = s.in_h * s.in_w;
+  const int64_t out_plane = s.out_h * s.out_w;
+  // Routes the gradient dy of output (oh, ow), whose value is y, into the
+  // window of one channel of x and dx, whose pixels are `pixel` apart.
+  auto backward = [&](const T* src,
+                      T* dst,
+                      int64_t pixel,
+                      int64_t oh,
+                      int64_t ow,
+                      T y,
+                      T dy) {
+    auto w = detail::PoolWindow2d(s, oh, ow);
+    if (s.max) {
+      for (int64_t h = w.h0; h < w.h1; ++h) {
+        for (int64_t i = w.w0; i < w.w1; ++i) {
+          const int64_t idx = (h * s.in_w + i) * pixel;
+          if (src[idx] == y) {
+            dst[idx] += dy;
+            return;
+          }
+        }
+      }
+      return;
+    }
+    const T g = detail::PoolDivide(dy, w.size);
+    for (int64_t h = w.h0; h < w.h1; ++h) {
+      for (int64_t i = w.w0; i < w.w1; ++i) {
+        dst[(h * s.in_w + i) * pixel] += g;
+      }
+    }
+  };
+  if (!s.channel_last) {
+    const int64_t planes = s.batch * s.channels;
+    const int64_t grain =
+        std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (in_plane + 1));
+    custom_cpu::ParallelFor(0, planes, grain, [&](int64_t b, int64_t e) {
+      for (int64_t p = b; p < e; ++p) {
+        T* dst = dx + p * in_plane;
+        std::fill(dst, dst + in_plane, T(0));
+        for (int64_t oh = 0; oh < s.out_h; ++oh) {
+          for (int64_t ow = 0; ow < s.out_w; ++ow) {
+            const int64_t o = p * out_plane + oh * s.out_w + ow;
+            backward(x + p * in_plane, dst, 1, oh, ow, out[o], dout[o]);
+          }
+        }
+      }
+    });
+    return;
+  }
+  // Windows overlap across output pixels, so NHWC tasks own channel blocks
+  // of an image.
+  const int64_t blocks =
+      (s.channels + kPoolChannelBlock - 1) / kPoolChannelBlock;
+  const int64_t grain = std::max<int64_t>(
+      1, custom_cpu::kDefaultGrainSize / (in_plane * kPoolChannelBlock + 1));
+  custom_cpu::ParallelFor(
+      0, s.batch * blocks, grain, [&](int64_t b, int64_t e) {
+        for (int64_t task = b; task < e; ++task) {
+          const int64_t n = task / blocks;
+          const int64_t c0 = task % blocks * kPoolChannelBlock;
+          const int64_t c1 = std::min(s.channels, c0 + kPoolChannelBlock);
+          const T* image = x + n * in_plane * s.channels;
+          T* grad = dx + n * in_plane * s.channels;
+          for (int64_t i = 0; i < in_plane; ++i) {
+            std::fill(
+                grad + i * s.channels + c0, grad + i * s.channels + c1, T(0));
+          }
+          for (int64_t oh = 0; oh < s.out_h; ++oh) {
+            for (int64_t ow = 0; ow < s.out_w; ++ow) {
+              const int64_t o =
+                  ((n * s.out_h + oh) * s.out_w + ow) * s.channels;
+              for (int64_t c = c0; c < c1; ++c) {
+                backward(image + c,
+                         grad + c,
+                         s.channels,
+                         oh,
+                         ow,
+                         out[o + c],
+                         dout[o + c]);
+              }
+            }
+          }
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,326 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <type_traits>
+
+#if defined(__x86_64__)
+#include <immintrin.h>
+#endif
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Int8 quantization as Paddle's quant kernels do it:
+// clip(round(max_bound * scale * v), min_bound, max_bound) with round half
+// to even (round_type 0) or away from zero.
+struct Int8Quant {
+  float scale;
+  int round_type;
+  float max_bound;
+  float min_bound;
+};
+
+inline int8_t QuantizeInt8(float v, const Int8Quant& q) {
+  float r = q.max_bound * q.scale * v;
+  r = q.round_type == 0 ? std::rint(r) : std::round(r);
+  r = std::min(std::max(r, q.min_bound), q.max_bound);
+  return static_cast<int8_t>(r);
+}
+
+// Register tile of the int8 GEMM: rows of A by rows of B (columns of C).
+constexpr int kInt8GemmMR = 4;
+constexpr int kInt8GemmNR = 4;
+// Rows of A one task walks while its rows of B stay in cache.
+constexpr int64_t kInt8GemmRowBlock = 64;
+// Multiply-adds below which a task is not split further.
+constexpr int64_t kInt8GemmTaskMacs = 1 << 20;
+
+namespace detail {
+
+// Rows per task for elementwise passes over rows of `cols` elements.
+inline int64_t QuantGrain(int64_t cols) {
+  return std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (cols + 1));
+}
+
+// The dot products of rows a[0 .. MR) and b[0 .. NR), each of K int8
+// values, into acc[MR][NR].
+template <int MR, int NR>
+void Int8TileScalar(int64_t K,
+                    const int8_t* a,
+                    int64_t lda,
+                    const int8_t* b,
+                    int64_t ldb,
+                    int32_t* acc) {
+  for (int i = 0; i < MR; ++i) {
+    for (int j = 0; j < NR; ++j) {
+      const int8_t* x = a + i * lda;
+      const int8_t* y = b + j * ldb;
+      int32_t sum = 0;
+      for (int64_t k = 0; k < K; ++k) sum += int32_t{x[k]} * int32_t{y[k]};
+      acc[i * NR + j] = sum;
+    }
+  }
+}
+
+#if defined(__x86_64__)
+#define CUSTOM_CPU_VNNI __attribute__((target("avx512f,avx512bw,avx512vnni")))
+
+inline bool HasAvx512Vnni() {
+  static const bool has = __builtin_cpu_supports("avx512vnni") &&
+                          __builtin_cpu_supports("avx512bw");
+  return has;
+}
+
+CUSTOM_CPU_VNNI inline int32_t ReduceAddVnni(__m512i v) {
+  alignas(64) int32_t lanes[16];
+  _mm512_store_si512(lanes, v);
+  int32_t sum = 0;
+  for (int32_t lane : lanes) sum += lane;
+  return sum;
+}
+
+// The VNNI dot product multiplies unsigned by signed bytes, so a is biased
+// to a + 128 and 128 * sum(b) taken back off.
+template <int MR, int NR>
+CUSTOM_CPU_VNNI void Int8TileVnni(int64_t K,
+                                  const int8_t* a,
+                                  int64_t lda,
+                                  const int8_t* b,
+                                  int64_t ldb,
+                                  int32_t* acc) {
+  const __m512i bias = _mm512_set1_epi8(static_cast<char>(0x80));
+  __m512i c[MR][NR], comp[NR];
+  for (int j = 0; j < NR; ++j) {
+    comp[j] = _mm512_setzero_si512();
+    for (int i = 0; i < MR; ++i) c[i][j] = _mm512_setzero_si512();
+  }
+  for (int64_t k = 0; k < K; k += 64) {
+    const __mmask64 mask =
+        K - k >= 64 ? ~__mmask64{0} : (__mmask64{1} << (K - k)) - 1;
+    __m512i x[MR], y[NR];
+    for (int i = 0; i < MR; ++i) {
+      x[i] = _mm512_xor_si512(_mm512_maskz_loadu_epi8(mask, a + i * lda + k),
+                              bias);
+    }
+    // Masked-off bytes of b are zero, which cancels whatever x holds there.
+    for (int j = 0; j < NR; ++j) {
+      y[j] = _mm512_maskz_loadu_epi8(mask, b + j * ldb + k);
+      comp[j] = _mm512_dpbusd_epi32(comp[j], bias, y[j]);
+    }
+    for (int i = 0; i < MR; ++i) {
+      for (int j = 0; j < NR; ++j) {
+        c[i][j] = _mm512_dpbusd_epi32(c[i][j], x[i], y[j]);
+      }
+    }
+  }
+  for (int j = 0; j < NR; ++j) {
+    const int32_t bias_sum = ReduceAddVnni(comp[j]);
+    for (int i = 0; i < MR; ++i) {
+      acc[i * NR + j] = ReduceAddVnni(c[i][j]) - bias_sum;
+    }
+  }
+}
+#endif
+
+using Int8TileFn =
+    void (*)(int64_t, const int8_t*, int64_t, const int8_t*, int64_t, int32_t*);
+
+template <int MR, int NR>
+Int8TileFn SelectInt8Tile(bool vnni) {
+#if defined(__x86_64__)
+  if (vnni) return &Int8TileVnni<MR, NR>;
+#endif
+  return &Int8TileScalar<MR, NR>;
+}
+
+// The tile function for an mr x nr tile, 1 <= mr, nr <= 4.
+inline Int8TileFn Int8Tile(int mr, int nr, bool vnni) {
+  static_assert(kInt8GemmMR == 4 && kInt8GemmNR == 4, "tile table");
+  using Row = Int8TileFn (*)(bool);
+  static const Row table[4][4] = {
+      {SelectInt8Tile<1, 1>,
+       SelectInt8Tile<1, 2>,
+       SelectInt8Tile<1, 3>,
+       SelectInt8Tile<1, 4>},
+      {SelectInt8Tile<2, 1>,
+       SelectInt8Tile<2, 2>,
+       SelectInt8Tile<2, 3>,
+       SelectInt8Tile<2, 4>},
+      {SelectInt8Tile<3, 1>,
+       SelectInt8Tile<3, 2>,
+       SelectInt8Tile<3, 3>,
+       SelectInt8Tile<3, 4>},
+      {SelectInt8Tile<4, 1>,
+       SelectInt8Tile<4, 2>,
+       SelectInt8Tile<4, 3>,
+       SelectInt8Tile<4, 4>},
+  };
+  return table[mr - 1][nr - 1](vnni);
+}
+
+template <typename OutT>
+inline OutT DequantizeAcc(int32_t acc, const float* scale, int64_t n) {
+  return static_cast<OutT>(static_cast<float>(acc) * (scale ? scale[n] : 1.f));
+}
+
+template <>
+inline int32_t DequantizeAcc<int32_t>(int32_t acc, const float*, int64_t) {
+  return acc;
+}
+
+template <typename OutT>
+void GemmInt8(int64_t M,
+              int64_t N,
+              int64_t K,
+              const int8_t* A,
+              const int8_t* B,
+              const float* scale,
+              OutT* C,
+              bool vnni) {
+  const int64_t n_tiles = (N + kInt8GemmNR - 1) / kInt8GemmNR;
+  const int64_t m_blocks = (M + kInt8GemmRowBlock - 1) / kInt8GemmRowBlock;
+  const int64_t task_macs =
+      std::min(M, kInt8GemmRowBlock) * kInt8GemmNR * std::max<int64_t>(K, 1);
+  const int64_t grain =
+      std::max<int64_t>(1, kInt8GemmTaskMacs / std::max<int64_t>(task_macs, 1));
+  custom_cpu::ParallelFor(
+      0, n_tiles * m_blocks, grain, [&](int64_t begin, int64_t end) {
+        int32_t acc[kInt8GemmMR * kInt8GemmNR];
+        for (int64_t t = begin; t < end; ++t) {
+          const int64_t n0 = t / m_blocks * kInt8GemmNR;
+          const int64_t m_end =
+              std::min(M, (t % m_blocks + 1) * kInt8GemmRowBlock);
+          const int nr =
+              static_cast<int>(std::min<int64_t>(kInt8GemmNR, N - n0));
+          for (int64_t m0 = t % m_blocks * kInt8GemmRowBlock; m0 < m_end;
+               m0 += kInt8GemmMR) {
+            const int mr =
+                static_cast<int>(std::min<int64_t>(kInt8GemmMR, m_end - m0));
+            Int8Tile(mr, nr, vnni)(K, A + m0 * K, K, B + n0 * K, K, acc);
+            for (int i = 0; i < mr; ++i) {
+              OutT* c = C + (m0 + i) * N + n0;
+              for (int j = 0; j < nr; ++j) {
+                c[j] = DequantizeAcc<OutT>(acc[i * nr + j], scale, n0 + j);
+              }
+            }
+          }
+        }
+      });
+}
+
+}  // namespace detail
+
+// C [M, N] = A [M, K] * B [N, K]^T over int8 with int32 accumulation. B
+// holds one row per output channel, as int8 weights are stored. An OutT of
+// int32_t receives the accumulators; any other OutT receives them scaled by
+// the per-channel scale [N] (1 where scale is null). Uses the AVX-512 VNNI
+// dot product when the CPU has it.
+template <typename OutT>
+void GemmInt8(int64_t M,
+              int64_t N,
+              int64_t K,
+              const int8_t* A,
+              const int8_t* B,
+              const float* scale,
+              OutT* C) {
+#if defined(__x86_64__)
+  const bool vnni = detail::HasAvx512Vnni();
+#else
+  const bool vnni = false;
+#endif
+  detail::GemmInt8(M, N, K, A, B, scale, C, vnni);
+}
+
+// out = quantize((x + shift) * smooth) for `rows` rows of `cols` elements;
+// shift and smooth have `cols` elements and may be null.
+template <typename T>
+void QuantizeInt8Rows(int64_t rows,
+                      int64_t cols,
+                      const T* x,
+                      const T* shift,
+                      const T* smooth,
+                      const Int8Quant& quant,
+                      int8_t* out) {
+  custom_cpu::ParallelFor(
+      0, rows, detail::QuantGrain(cols), [&](int64_t begin, int64_t end) {
+        for (int64_t r = begin; r < end; ++r) {
+          const T* in = x + r * cols;
+          int8_t* dst = out + r * cols;
+          for (int64_t i = 0; i < cols; ++i) {
+            float v = static_cast<float>(in[i]);
+            if (shift) v += static_cast<float>(shift[i]);
+            if (smooth) v *= static_cast<float>(smooth[i]);
+            dst[i] = QuantizeInt8(v, quant);
+          }
+        }
+      });
+}
+
+// out = in * scale per column, turning int32 GEMM accumulators of `rows`
+// rows of `cols` elements back into real values.
+template <typename T>
+void DequantizeInt32Rows(
+    int64_t rows, int64_t cols, const int32_t* in, const float* scale, T* out) {
+  custom_cpu::ParallelFor(
+      0, rows, detail::QuantGrain(cols), [&](int64_t begin, int64_t end) {
+        for (int64_t r = begin; r < end; ++r) {
+          for (int64_t i = 0; i < cols; ++i) {
+            out[r * cols + i] =
+                static_cast<T>(static_cast<float>(in[r * cols + i]) * scale[i]);
+          }
+        }
+      });
+}
+
+// Quantizes k and v [bsz, num_head, seq_len, dim_head] into the first
+// seq_len positions of cache [2, bsz, num_head, max_seq_len, dim_head] with
+// the per-head scales of each, rounding half to even into [-127, 127].
+template <typename T>
+void WriteInt8CacheKV(int64_t bsz,
+                      int64_t num_head,
+                      int64_t seq_len,
+                      int64_t max_seq_len,
+                      int64_t dim_head,
+                      const T* k,
+                      const T* v,
+                      const float* k_scales,
+                      const float* v_scales,
+                      int8_t* cache) {
+  const int64_t heads = bsz * num_head;
+  const int64_t len = seq_len * dim_head;
+  custom_cpu::ParallelFor(
+      0, 2 * heads, detail::QuantGrain(len), [&](int64_t begin, int64_t end) {
+        for (int64_t t = begin; t < end; ++t) {
+          const bool is_v = t >= heads;
+          const int64_t bh = t % heads;
+          const float* scales = is_v ? v_scales : k_scales;
+          const Int8Quant quant = {scales[bh % num_head], 0, 127.f, -127.f};
+          const T* src = (is_v ? v : k) + bh * len;
+          int8_t* dst = cache + t * max_seq_len * dim_head;
+          for (int64_t i = 0; i < len; ++i) {
+            dst[i] = QuantizeInt8(static_cast<float>(src[i]), quant);
+          }
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
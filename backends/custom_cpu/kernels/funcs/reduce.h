@@ -0,0 +1,405 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <type_traits>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+// Declared here so the 16-bit float accumulators below stay next to the
+// others without making this header depend on Paddle.
+namespace phi {
+namespace dtype {
+struct float16;
+struct bfloat16;
+}  // namespace dtype
+}  // namespace phi
+
+namespace custom_kernel {
+namespace funcs {
+
+// Type the reductions accumulate in.
+template <typename T>
+struct ReduceAccType {
+  using type = T;
+};
+
+template <>
+struct ReduceAccType<float> {
+  using type = double;
+};
+
+template <>
+struct ReduceAccType<int32_t> {
+  using type = int64_t;
+};
+
+// The 16-bit floats are summed in float.
+template <>
+struct ReduceAccType<phi::dtype::float16> {
+  using type = float;
+};
+
+template <>
+struct ReduceAccType<phi::dtype::bfloat16> {
+  using type = float;
+};
+
+struct SumReducer {
+  template <typename AccT>
+  AccT operator()(AccT a, AccT b) const {
+    return a + b;
+  }
+};
+
+struct MinReducer {
+  template <typename AccT>
+  AccT operator()(AccT a, AccT b) const {
+    return b < a ? b : a;
+  }
+};
+
+struct MaxReducer {
+  template <typename AccT>
+  AccT operator()(AccT a, AccT b) const {
+    return a < b ? b : a;
+  }
+};
+
+// Floating point inputs are first summed in their own type over short
+// stretches and then flushed into the wider accumulator, which keeps the hot
+// loops vectorized while the long-range sum keeps the wider precision.
+template <typename T, typename AccT>
+struct ReduceLaneType {
+  using type = typename std::
+      conditional<std::is_floating_point<T>::value, T, AccT>::type;
+};
+
+// Paddle marks the 16-bit floats as floating point, but their sums would
+// round away most of the float accumulator's precision.
+template <typename AccT>
+struct ReduceLaneType<phi::dtype::float16, AccT> {
+  using type = AccT;
+};
+
+template <typename AccT>
+struct ReduceLaneType<phi::dtype::bfloat16, AccT> {
+  using type = AccT;
+};
+
+// Elements of a contiguous run folded in the lane type before a flush.
+constexpr int64_t kReduceFlushSize = 1024;
+
+// Rows of an outer reduction folded in the lane type before a flush.
+constexpr int64_t kReduceFlushRows = 64;
+
+// Columns of an outer reduction handled by one task.
+constexpr int64_t kReduceColumnBlock = 1024;
+
+namespace detail {
+
+// Walks dims in row-major order and keeps the matching offset into a tensor
+// with the given strides.
+struct ReduceOdometer {
+  std::vector<int64_t> dims;
+  std::vector<int64_t> strides;
+  std::vector<int64_t> index;
+  int64_t offset = 0;
+
+  void Seek(int64_t linear) {
+    index.assign(dims.size(), 0);
+    offset = 0;
+    for (auto i = static_cast<int64_t>(dims.size()) - 1; i >= 0; --i) {
+      index[i] = linear % dims[i];
+      linear /= dims[i];
+      offset += index[i] * strides[i];
+    }
+  }
+
+  // Moves n steps along the innermost dim, which must not run past its end,
+  // and carries into the outer dims.
+  void Advance(int64_t n) {
+    if (dims.empty()) return;
+    auto i = static_cast<int64_t>(dims.size()) - 1;
+    index[i] += n;
+    offset += n * strides[i];
+    for (; i > 0 && index[i] == dims[i]; --i) {
+      offset -= dims[i] * strides[i];
+      index[i] = 0;
+      ++index[i - 1];
+      offset += strides[i - 1];
+    }
+  }
+};
+
+// Folds a contiguous run into acc. Sixteen independent lanes keep the
+// reducer off a single dependency chain; init must be the reducer's identity.
+template <typename T, typename AccT, typename Reducer>
+inline AccT ReduceContiguous(
+    const T* x, int64_t n, AccT acc, AccT init, Reducer reducer) {
+  using LaneT = typename ReduceLaneType<T, AccT>::type;
+  constexpr int kLanes = 16;
+  for (int64_t start = 0; start < n; start += kReduceFlushSize) {
+    auto p = x + start;
+    auto len = std::min(kReduceFlushSize, n - start);
+    LaneT lanes[kLanes];
+    for (int l = 0; l < kLanes; ++l) lanes[l] = static_cast<LaneT>(init);
+    int64_t i = 0;
+    for (; i + kLanes <= len; i += kLanes) {
+      for (int l = 0; l < kLanes; ++l) {
+        lanes[l] = reducer(lanes[l], static_cast<LaneT>(p[i + l]));
+      }
+    }
+    for (; i < len; ++i) {
+      lanes[0] = reducer(lanes[0], static_cast<LaneT>(p[i]));
+    }
+    for (int l = 1; l < kLanes; ++l) lanes[0] = reducer(lanes[0], lanes[l]);
+    acc = reducer(acc, static_cast<AccT>(lanes[0]));
+  }
+  return acc;
+}
+
+}  // namespace detail
+
+// Reduces a contiguous tensor of shape x_dims over the dims flagged in
+// `reduced` and writes finalize(acc) for every output element in row-major
+// order of the kept dims. init must be the identity of reducer.
+//
+// Adjacent reduced dims and adjacent kept dims are merged first, so any
+// reduction becomes either an inner reduction (the innermost dim is reduced,
+// every output folds contiguous runs) or an outer reduction (the innermost
+// dim is kept, rows of outputs are accumulated column-wise). Outputs are
+// split across the intra-op pool; when there are fewer outputs than threads
+// the reduced range is split as well and the partial results are combined.
+template <typename T,
+          typename OutT,
+          typename AccT,
+          typename Reducer,
+          typename Finalize>
+void Reduce(const T* x,
+            const std::vector<int64_t>& x_dims,
+            const std::vector<bool>& reduced,
+            OutT* out,
+            AccT init,
+            Reducer reducer,
+            Finalize finalize) {
+  std::vector<int64_t> dims;
+  std::vector<bool> is_reduced;
+  for (size_t i = 0; i < x_dims.size(); ++i) {
+    if (x_dims[i] == 1) continue;
+    if (!dims.empty() && is_reduced.back() == reduced[i]) {
+      dims.back() *= x_dims[i];
+    } else {
+      dims.push_back(x_dims[i]);
+      is_reduced.push_back(reduced[i]);
+    }
+  }
+  if (dims.empty()) {
+    dims.push_back(1);
+    is_reduced.push_back(false);
+  }
+
+  detail::ReduceOdometer kept, red;
+  int64_t stride = 1;
+  for (auto i = static_cast<int64_t>(dims.size()) - 1; i >= 0; --i) {
+    auto& od = is_reduced[i] ? red : kept;
+    od.dims.insert(od.dims.begin(), dims[i]);
+    od.strides.insert(od.strides.begin(), stride);
+    stride *= dims[i];
+  }
+  int64_t out_numel = 1, reduce_numel = 1;
+  for (auto d : kept.dims) out_numel *= d;
+  for (auto d : red.dims) reduce_numel *= d;
+  if (out_numel == 0) return;
+  if (reduce_numel == 0) {
+    std::fill(out, out + out_numel, finalize(init));
+    return;
+  }
+
+  auto num_threads = custom_cpu::GetThreadPool()->NumThreads();
+  // Splits of the reduced range per independent output group.
+  auto num_parts = [&](int64_t groups, int64_t work_per_group) {
+    auto wanted = (num_threads + groups - 1) / groups;
+    auto affordable = work_per_group / custom_cpu::kDefaultGrainSize;
+    return std::max<int64_t>(
+        1, std::min(std::min<int64_t>(wanted, affordable), reduce_numel));
+  };
+
+  if (is_reduced.back()) {
+    // Inner reduction: every output folds reduce_numel elements laid out as
+    // runs of `run` contiguous values.
+    auto run = red.dims.back();
+    auto fold = [&](detail::ReduceOdometer* od,
+                    int64_t base,
+                    int64_t begin,
+                    int64_t end) {
+      od->Seek(begin);
+      AccT acc = init;
+      for (auto pos = begin; pos < end;) {
+        auto n = std::min(run - od->index.back(), end - pos);
+        acc = detail::ReduceContiguous(
+            x + base + od->offset, n, acc, init, reducer);
+        od->Advance(n);
+        pos += n;
+      }
+      return acc;
+    };
+
+    auto parts = num_parts(out_numel, reduce_numel);
+    if (parts == 1) {
+      auto grain =
+          std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / reduce_numel);
+      custom_cpu::ParallelFor(
+          0, out_numel, grain, [&](int64_t begin, int64_t end) {
+            auto out_od = kept;
+            auto red_od = red;
+            out_od.Seek(begin);
+            for (auto o = begin; o < end; ++o) {
+              if (red.dims.size() == 1) {
+                out[o] = finalize(detail::ReduceContiguous(
+                    x + out_od.offset, run, init, init, reducer));
+              } else {
+                out[o] =
+                    finalize(fold(&red_od, out_od.offset, 0, reduce_numel));
+              }
+              out_od.Advance(1);
+            }
+          });
+      return;
+    }
+
+    auto part_size = (reduce_numel + parts - 1) / parts;
+    std::vector<AccT> partial(out_numel * parts, init);
+    custom_cpu::ParallelFor(0, out_numel * parts, 1, [&](int64_t b, int64_t e) {
+      auto out_od = kept;
+      auto red_od = red;
+      for (auto t = b; t < e; ++t) {
+        out_od.Seek(t / parts);
+        auto begin = (t % parts) * part_size;
+        auto end = std::min(reduce_numel, begin + part_size);
+        if (begin < end) {
+          partial[t] = fold(&red_od, out_od.offset, begin, end);
+        }
+      }
+    });
+    for (int64_t o = 0; o < out_numel; ++o) {
+      AccT acc = init;
+      for (int64_t p = 0; p < parts; ++p) {
+        acc = reducer(acc, partial[o * parts + p]);
+      }
+      out[o] = finalize(acc);
+    }
+    return;
+  }
+
+  // Outer reduction: the innermost dim is kept, so each task accumulates a
+  // block of contiguous columns over every reduced offset.
+  auto cols = kept.dims.back();
+  auto block = std::min(cols, kReduceColumnBlock);
+  auto blocks_per_row = (cols + block - 1) / block;
+  auto rows = out_numel / cols;
+  auto groups = rows * blocks_per_row;
+  auto parts = num_parts(groups, reduce_numel * block);
+  auto part_size = (reduce_numel + parts - 1) / parts;
+
+  using LaneT = typename ReduceLaneType<T, AccT>::type;
+  auto accumulate = [&](detail::ReduceOdometer* red_od,
+                        int64_t group,
+                        int64_t part,
+                        AccT* acc,
+                        LaneT* lanes,
+                        int64_t* col_begin,
+                        int64_t* len) {
+    auto row = group / blocks_per_row;
+    *col_begin = (group % blocks_per_row) * block;
+    *len = std::min(block, cols - *col_begin);
+    auto out_od = kept;
+    out_od.Seek(row * cols + *col_begin);
+    auto base = x + out_od.offset;
+    auto n = *len;
+    std::fill(acc, acc + n, init);
+    auto begin = part * part_size;
+    auto end = std::min(reduce_numel, begin + part_size);
+    if (begin >= end) return;
+    red_od->Seek(begin);
+    for (auto r = begin; r < end;) {
+      auto flush_end = std::min(end, r + kReduceFlushRows);
+      std::fill(lanes, lanes + n, static_cast<LaneT>(init));
+      for (; r < flush_end; ++r) {
+        auto src = base + red_od->offset;
+        for (int64_t c = 0; c < n; ++c) {
+          lanes[c] = reducer(lanes[c], static_cast<LaneT>(src[c]));
+        }
+        red_od->Advance(1);
+      }
+      for (int64_t c = 0; c < n; ++c) {
+        acc[c] = reducer(acc[c], static_cast<AccT>(lanes[c]));
+      }
+    }
+  };
+
+  if (parts == 1) {
+    auto grain = std::max<int64_t>(
+        1, custom_cpu::kDefaultGrainSize / (reduce_numel * block));
+    custom_cpu::ParallelFor(0, groups, grain, [&](int64_t b, int64_t e) {
+      std::vector<AccT> acc(block);
+      std::vector<LaneT> lanes(block);
+      auto red_od = red;
+      for (auto g = b; g < e; ++g) {
+        int64_t col_begin, len;
+        accumulate(&red_od, g, 0, acc.data(), lanes.data(), &col_begin, &len);
+        auto dst = out + (g / blocks_per_row) * cols + col_begin;
+        for (int64_t c = 0; c < len; ++c) {
+          dst[c] = finalize(acc[c]);
+        }
+      }
+    });
+    return;
+  }
+
+  std::vector<AccT> partial(groups * parts * block, init);
+  custom_cpu::ParallelFor(0, groups * parts, 1, [&](int64_t b, int64_t e) {
+    std::vector<LaneT> lanes(block);
+    auto red_od = red;
+    for (auto t = b; t < e; ++t) {
+      int64_t col_begin, len;
+      accumulate(&red_od,
+                 t / parts,
+                 t % parts,
+                 partial.data() + t * block,
+                 lanes.data(),
+                 &col_begin,
+                 &len);
+    }
+  });
+  for (int64_t g = 0; g < groups; ++g) {
+    auto col_begin = (g % blocks_per_row) * block;
+    auto len = std::min(block, cols - col_begin);
+    auto dst = out + (g / blocks_per_row) * cols + col_begin;
+    for (int64_t c = 0; c < len; ++c) {
+      AccT acc = init;
+      for (int64_t p = 0; p < parts; ++p) {
+        acc = reducer(acc, partial[(g * parts + p) * block + c]);
+      }
+      dst[c] = finalize(acc);
+    }
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
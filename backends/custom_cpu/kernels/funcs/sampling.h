@@ -0,0 +1,311 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "kernels/funcs/philox.h"
+#include "runtime/thread_pool.h"
+
+// Top-p and top-k sampling of the next token from a row of probabilities
+// without sorting the vocabulary. The nucleus of a language model row lies
+// within a few orders of magnitude of its most likely token, so one pass
+// takes the row total and maximum, a second gathers the candidates above a
+// floor relative to the maximum, lowered only when they hold too little
+// mass, and the rest works on the candidates alone. Among them, the bit
+// pattern of a non-negative float orders like its value: radix histograms
+// of the probability mass over 8 bits at a time narrow the cutoff of the
+// nucleus down to the few tokens sharing its top 24 bits, and only those
+// are sorted.
+
+namespace custom_kernel {
+namespace funcs {
+
+constexpr int kSamplingRadixBits = 8;
+constexpr int kSamplingRadixLevels = 3;
+constexpr int kSamplingBuckets = 1 << kSamplingRadixBits;
+
+// Candidate floors tried, as a fraction of the row maximum, before taking
+// every token: 2^-6, 2^-12, 2^-18 and 2^-24.
+constexpr int kSamplingFloorShift = 6;
+constexpr int kSamplingFloorTries = 4;
+
+// Inputs of one sampling call. probs is [bsz, vocab] and need not sum to
+// one: top_p is a fraction of each row's total. Per row, the nucleus is the
+// smallest set of the most likely tokens holding top_p of the mass, at
+// most top_k tokens (0 for no limit) and only of tokens whose probability
+// is at least threshold (null for none). Ties are broken towards the lower
+// index. Row b draws from Philox counter seed.offset + b.
+template <typename T>
+struct TopPSamplingArgs {
+  int64_t bsz;
+  int64_t vocab;
+  const T* probs;
+  const T* top_p;
+  const T* threshold;
+  int64_t top_k;
+  PhiloxSeed seed;
+};
+
+namespace detail {
+
+constexpr int kSamplingLanes = 16;
+
+struct SamplingBucket {
+  double mass;
+  int64_t count;
+};
+
+// Digit `level` of p > 0, counting from the bits below the sign.
+inline uint32_t SamplingDigit(float p, int level) {
+  uint32_t bits;
+  std::memcpy(&bits, &p, sizeof(bits));
+  return (bits >> (31 - kSamplingRadixBits * (level + 1))) &
+         (kSamplingBuckets - 1);
+}
+
+// Per-thread scratch of the row being sampled: the candidates in index
+// order and the ones left in the boundary bucket.
+struct SamplingScratch {
+  std::vector<int64_t> candidates;
+  std::vector<int64_t> boundary;
+};
+
+inline SamplingScratch* GetSamplingScratch() {
+  thread_local SamplingScratch scratch;
+  return &scratch;
+}
+
+// Walks the histogram from the most likely bucket down and returns the
+// first bucket whose tokens reach *mass or *count, after taking the mass
+// and count of the buckets above it off both; -1 if the whole histogram
+// falls short.
+inline int FindBoundaryBucket(const SamplingBucket* histogram,
+                              double* mass,
+                              int64_t* count) {
+  for (int d = kSamplingBuckets - 1; d >= 0; --d) {
+    const SamplingBucket& bucket = histogram[d];
+    if (bucket.count == 0) continue;
+    if (bucket.mass >= *mass || bucket.count >= *count) return d;
+    *mass -= bucket.mass;
+    *count -= bucket.count;
+  }
+  return -1;
+}
+
+// The last token of the nucleus in (probability descending, index
+// ascending) order: the nucleus is every candidate ranked no lower.
+struct SamplingCutoff {
+  float p;
+  int64_t index;
+
+  bool Admits(float q, int64_t i) const {
+    return q > p || (q == p && i <= index);
+  }
+};
+
+inline int32_t SamplingBits(float p) {
+  int32_t bits;
+  std::memcpy(&bits, &p, sizeof(bits));
+  return bits;
+}
+
+// Sum of the positive entries of a row and its maximum, or 0 if none is
+// positive. The maximum is taken over the bit patterns, which order like
+// the values for positive floats and below them for negative ones, so that
+// the loop vectorizes.
+template <typename T>
+void RowTotalAndMax(const T* row, int64_t n, double* total, float* max_p) {
+  float sum[kSamplingLanes] = {};
+  int32_t top[kSamplingLanes] = {};
+  int64_t i = 0;
+  for (; i + kSamplingLanes <= n; i += kSamplingLanes) {
+    for (int l = 0; l < kSamplingLanes; ++l) {
+      const float p = static_cast<float>(row[i + l]);
+      sum[l] += std::max(p, 0.f);
+      top[l] = std::max(top[l], SamplingBits(p));
+    }
+  }
+  for (; i < n; ++i) {
+    const float p = static_cast<float>(row[i]);
+    sum[0] += std::max(p, 0.f);
+    top[0] = std::max(top[0], SamplingBits(p));
+  }
+  *total = 0;
+  for (int l = 0; l < kSamplingLanes; ++l) {
+    *total += sum[l];
+    top[0] = std::max(top[0], top[l]);
+  }
+  std::memcpy(max_p, &top[0], sizeof(float));
+}
+
+// Sets candidates to the tokens of the row at or above floor (> 0), in
+// index order, and returns their mass. A block of tokens is first tested
+// as a whole, which vectorizes, and only blocks with a candidate are
+// compacted, without branches.
+template <typename T>
+double GatherCandidates(const T* row,
+                        int64_t n,
+                        float floor,
+                        std::vector<int64_t>* candidates) {
+  const int32_t floor_bits = SamplingBits(floor);
+  candidates->resize(n);
+  int64_t* out = candidates->data();
+  int64_t count = 0;
+  double mass = 0;
+  for (int64_t start = 0; start < n; start += kSamplingLanes) {
+    const int64_t end = std::min(n, start + kSamplingLanes);
+    int hits = 0;
+    for (int64_t i = start; i < end; ++i) {
+      hits += SamplingBits(static_cast<float>(row[i])) >= floor_bits;
+    }
+    if (hits == 0) continue;
+    for (int64_t i = start; i < end; ++i) {
+      const float p = static_cast<float>(row[i]);
+      const bool hit = SamplingBits(p) >= floor_bits;
+      out[count] = i;
+      count += hit;
+      mass += hit ? p : 0;
+    }
+  }
+  candidates->resize(count);
+  return mass;
+}
+
+template <typename T>
+int64_t SampleRow(const TopPSamplingArgs<T>& a, int64_t b) {
+  const T* row = a.probs + b * a.vocab;
+  auto prob = [&](int64_t i) { return static_cast<float>(row[i]); };
+  SamplingScratch& scratch = *GetSamplingScratch();
+  std::vector<int64_t>& candidates = scratch.candidates;
+
+  double total;
+  float max_p;
+  RowTotalAndMax(row, a.vocab, &total, &max_p);
+  const float threshold = a.threshold ? static_cast<float>(a.threshold[b]) : 0;
+  if (!(max_p > 0) || max_p < threshold) {
+    // Nothing to sample from: the first most likely token.
+    int64_t argmax = 0;
+    for (int64_t i = 1; i < a.vocab; ++i) {
+      if (prob(i) > prob(argmax)) argmax = i;
+    }
+    return argmax;
+  }
+
+  const double target = static_cast<double>(a.top_p[b]) * total;
+  const int64_t limit = a.top_k > 0 ? a.top_k : a.vocab;
+  // The smallest positive float, so that zeros are never candidates.
+  const float min_floor = std::max(threshold, 1e-45f);
+  double candidate_mass = 0;
+  for (int tries = 0;; ++tries) {
+    float floor = std::ldexp(max_p, -kSamplingFloorShift * (tries + 1));
+    if (tries == kSamplingFloorTries || floor < min_floor) floor = min_floor;
+    candidate_mass = GatherCandidates(row, a.vocab, floor, &candidates);
+    const bool enough = candidate_mass >= target ||
+                        static_cast<int64_t>(candidates.size()) >= limit;
+    if (enough || floor == min_floor) break;
+  }
+
+  // Narrow the cutoff down one radix digit at a time. Every candidate in a
+  // bucket above the boundary one is in the nucleus.
+  double mass = target;
+  int64_t count = limit;
+  double above = 0;
+  SamplingCutoff cutoff = {0, a.vocab};
+  double nucleus_mass = candidate_mass;
+  std::vector<int64_t>& boundary = scratch.boundary;
+  boundary = candidates;
+  bool bounded = true;
+  for (int level = 0; level < kSamplingRadixLevels; ++level) {
+    SamplingBucket histogram[kSamplingBuckets] = {};
+    for (int64_t i : boundary) {
+      SamplingBucket& bucket = histogram[SamplingDigit(prob(i), level)];
+      bucket.mass += prob(i);
+      ++bucket.count;
+    }
+    const double bucket_mass = mass;
+    const int64_t bucket_count = count;
+    const int d = FindBoundaryBucket(histogram, &mass, &count);
+    if (d < 0) {
+      // At the first level every candidate is in. Deeper, rounding left
+      // the sub-buckets short of the bucket's share and the whole bucket
+      // is in.
+      bounded = level > 0;
+      mass = bucket_mass;
+      count = bucket_count;
+      break;
+    }
+    above += bucket_mass - mass;
+    boundary.erase(std::remove_if(boundary.begin(),
+                                  boundary.end(),
+                                  [&](int64_t i) {
+                                    return SamplingDigit(prob(i), level) !=
+                                           static_cast<uint32_t>(d);
+                                  }),
+                   boundary.end());
+  }
+  if (bounded) {
+    // The tokens are in index order, so the stable sort breaks ties
+    // towards the lower index.
+    std::stable_sort(boundary.begin(),
+                     boundary.end(),
+                     [&](int64_t i, int64_t j) { return prob(i) > prob(j); });
+    double taken = 0;
+    int64_t n = 0;
+    for (int64_t i : boundary) {
+      cutoff = {prob(i), i};
+      taken += cutoff.p;
+      if (taken >= mass || ++n >= count) break;
+    }
+    nucleus_mass = above + taken;
+  }
+
+  // The candidate where the running mass of the nucleus passes the draw.
+  uint32_t r[4][kPhiloxLanes];
+  PhiloxBlock(a.seed.key, a.seed.offset + b, r);
+  const double u = UniformDouble(r[0][0], r[1][0]) * nucleus_mass;
+  double running = 0;
+  int64_t last = candidates.front();
+  for (int64_t i : candidates) {
+    const float p = prob(i);
+    if (!cutoff.Admits(p, i)) continue;
+    running += p;
+    last = i;
+    if (running > u) break;
+  }
+  return last;
+}
+
+}  // namespace detail
+
+// Samples a token for every row of a.probs into ids [bsz] and writes its
+// probability to out [bsz]. A row without a positive probability at or
+// above its threshold yields its argmax.
+template <typename T>
+void TopPSampling(const TopPSamplingArgs<T>& a, T* out, int64_t* ids) {
+  custom_cpu::ParallelFor(0, a.bsz, 1, [&](int64_t begin, int64_t end) {
+    for (int64_t b = begin; b < end; ++b) {
+      const int64_t id = detail::SampleRow(a, b);
+      ids[b] = id;
+      out[b] = a.probs[b * a.vocab + id];
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,521 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <limits>
+#include <vector>
+
+#include "kernels/funcs/reduce.h"
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Columns handled by one task when the softmax axis is not the innermost.
+constexpr int64_t kSoftmaxColumnBlock = 256;
+
+namespace detail {
+
+constexpr int kSoftmaxLanes = 16;
+
+union FloatBits {
+  float f;
+  int32_t i;
+};
+
+// exp(-min(d, 64)) for d >= 0; the softmax kernels clip x - max at -64.
+//
+// The float version is the Cephes expf polynomial. The clip and the power
+// of two are done on the bit patterns (non-negative floats order like their
+// bits), because with the default -ftrapping-math GCC refuses to if-convert
+// a float select that feeds further float math, and a loop calling this
+// would not vectorize. Within 1e-7 relative of std::exp.
+inline float ExpNeg(float d) {
+  constexpr int32_t kClipBits = 0x42800000;  // 64.f
+  constexpr float kRound = 12582912.f;       // 1.5 * 2^23
+  constexpr int32_t kRoundBits = 0x4B400000;
+  FloatBits clipped;
+  clipped.f = d;
+  clipped.i = std::min(clipped.i, kClipBits);
+  float x = -clipped.f;
+  // Rounds x * log2(e) to the integer n, which lands in the low mantissa
+  // bits of t.
+  FloatBits t;
+  t.f = x * 1.44269504088896341f + kRound;
+  float n = t.f - kRound;
+  float r = x - n * 0.693359375f + n * 2.12194440e-4f;
+  float p = 1.9875691500e-4f;
+  p = p * r + 1.3981999507e-3f;
+  p = p * r + 8.3334519073e-3f;
+  p = p * r + 4.1665795894e-2f;
+  p = p * r + 1.6666665459e-1f;
+  p = p * r + 5.0000001201e-1f;
+  p = p * r * r + r + 1.f;
+  FloatBits scale;
+  scale.i = (t.i - kRoundBits + 127) << 23;
+  return p * scale.f;
+}
+
+inline double ExpNeg(double d) { return std::exp(-std::min(d, 64.)); }
+
+template <typename T>
+inline T RowMax(const T* x, int64_t n) {
+  T max = -std::numeric_limits<T>::infinity();
+  for (int64_t i = 0; i < n; ++i) max = max < x[i] ? x[i] : max;
+  return max;
+}
+
+// GCC will not vectorize a float max reduction without -ffinite-math-only,
+// so the float one runs on integer keys that order like the floats.
+inline int32_t FloatKey(float v) {
+  FloatBits b;
+  b.f = v;
+  return b.i ^ ((b.i >> 31) & 0x7FFFFFFF);
+}
+
+inline float KeyFloat(int32_t k) {
+  FloatBits b;
+  b.i = k ^ ((k >> 31) & 0x7FFFFFFF);
+  return b.f;
+}
+
+template <>
+inline float RowMax<float>(const float* x, int64_t n) {
+  constexpr int kLanes = kSoftmaxLanes;
+  int32_t lanes[kLanes];
+  for (int l = 0; l < kLanes; ++l) {
+    lanes[l] = FloatKey(-std::numeric_limits<float>::infinity());
+  }
+  int64_t i = 0;
+  for (; i + kLanes <= n; i += kLanes) {
+    for (int l = 0; l < kLanes; ++l) {
+      lanes[l] = std::max(lanes[l], FloatKey(x[i + l]));
+    }
+  }
+  for (; i < n; ++i) lanes[0] = std::max(lanes[0], FloatKey(x[i]));
+  for (int l = 1; l < kLanes; ++l) lanes[0] = std::max(lanes[0], lanes[l]);
+  return KeyFloat(lanes[0]);
+}
+
+// Stores exp(x - max) to y and returns its sum.
+template <typename T>
+inline typename ReduceAccType<T>::type ExpStoreSum(const T* x,
+                                                   int64_t n,
+                                                   T max,
+                                                   T* y) {
+  constexpr int kLanes = kSoftmaxLanes;
+  typename ReduceAccType<T>::type acc = 0;
+  for (int64_t start = 0; start < n; start += kReduceFlushSize) {
+    auto end = std::min(n, start + kReduceFlushSize);
+    T lanes[kLanes] = {};
+    int64_t i = start;
+    for (; i + kLanes <= end; i += kLanes) {
+      for (int l = 0; l < kLanes; ++l) {
+        y[i + l] = ExpNeg(max - x[i + l]);
+        lanes[l] += y[i + l];
+      }
+    }
+    for (; i < end; ++i) {
+      y[i] = ExpNeg(max - x[i]);
+      lanes[0] += y[i];
+    }
+    for (int l = 1; l < kLanes; ++l) lanes[0] += lanes[l];
+    acc += lanes[0];
+  }
+  return acc;
+}
+
+template <typename T>
+inline T Dot(const T* x, const T* y, int64_t n) {
+  using AccT = typename ReduceAccType<T>::type;
+  constexpr int kLanes = kSoftmaxLanes;
+  AccT acc = 0;
+  for (int64_t start = 0; start < n; start += kReduceFlushSize) {
+    auto end = std::min(n, start + kReduceFlushSize);
+    T lanes[kLanes] = {};
+    int64_t i = start;
+    for (; i + kLanes <= end; i += kLanes) {
+      for (int l = 0; l < kLanes; ++l) lanes[l] += x[i + l] * y[i + l];
+    }
+    for (; i < end; ++i) lanes[0] += x[i] * y[i];
+    for (int l = 1; l < kLanes; ++l) lanes[0] += lanes[l];
+    acc += lanes[0];
+  }
+  return static_cast<T>(acc);
+}
+
+}  // namespace detail
+
+// Max and sum of exp(x - max) over part of a softmax row. Statistics of
+// disjoint parts combine with the online softmax rescaling rule.
+template <typename T>
+struct SoftmaxStats {
+  T max = -std::numeric_limits<T>::infinity();
+  typename ReduceAccType<T>::type sum = 0;
+
+  void Merge(const SoftmaxStats& other) {
+    if (other.max <= max) {
+      sum += other.sum * detail::ExpNeg(max - other.max);
+    } else {
+      sum = sum * detail::ExpNeg(other.max - max) + other.sum;
+      max = other.max;
+    }
+  }
+};
+
+namespace detail {
+
+// Softmax of each of `rows` contiguous rows of length n, leaving the
+// statistics of row r in stats[r].
+//
+// A part of a row costs three passes: its max, exp(x - max) stored to y
+// with its sum, and a scale of y. The part stays in cache between them and
+// each element takes one exp, which measured faster than a single-pass
+// online max and sum that has to recompute the exp when writing y. When
+// there are fewer rows than threads, rows are split into parts whose
+// statistics are merged before the scale pass, which also corrects each
+// part for the row max it did not see.
+template <typename T>
+void RowSoftmax(const T* x,
+                int64_t rows,
+                int64_t n,
+                T* y,
+                std::vector<SoftmaxStats<T>>* stats) {
+  stats->assign(rows, SoftmaxStats<T>());
+  auto num_threads = custom_cpu::GetThreadPool()->NumThreads();
+  auto parts =
+      std::max<int64_t>(1,
+                        std::min<int64_t>((num_threads + rows - 1) / rows,
+                                          n / custom_cpu::kDefaultGrainSize));
+  auto part_size = (n + parts - 1) / parts;
+  auto grain = std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / n);
+
+  if (parts == 1) {
+    custom_cpu::ParallelFor(0, rows, grain, [&](int64_t begin, int64_t end) {
+      for (auto r = begin; r < end; ++r) {
+        auto& s = (*stats)[r];
+        auto src = x + r * n;
+        auto dst = y + r * n;
+        s.max = RowMax(src, n);
+        s.sum = ExpStoreSum(src, n, s.max, dst);
+        auto inv = static_cast<T>(1. / s.sum);
+        for (int64_t i = 0; i < n; ++i) dst[i] *= inv;
+      }
+    });
+    return;
+  }
+
+  std::vector<SoftmaxStats<T>> partial(rows * parts);
+  custom_cpu::ParallelFor(0, rows * parts, 1, [&](int64_t b, int64_t e) {
+    for (auto t = b; t < e; ++t) {
+      auto begin = (t / parts) * n + (t % parts) * part_size;
+      auto len = std::min(part_size, n - (t % parts) * part_size);
+      if (len <= 0) continue;
+      partial[t].max = RowMax(x + begin, len);
+      partial[t].sum = ExpStoreSum(x + begin, len, partial[t].max, y + begin);
+    }
+  });
+  for (int64_t r = 0; r < rows; ++r) {
+    for (int64_t p = 0; p < parts; ++p) {
+      (*stats)[r].Merge(partial[r * parts + p]);
+    }
+  }
+  custom_cpu::ParallelFor(0, rows * parts, 1, [&](int64_t b, int64_t e) {
+    for (auto t = b; t < e; ++t) {
+      auto& s = (*stats)[t / parts];
+      auto begin = (t / parts) * n + (t % parts) * part_size;
+      auto len = std::min(part_size, n - (t % parts) * part_size);
+      if (len <= 0) continue;
+      auto scale = static_cast<T>(ExpNeg(s.max - partial[t].max) / s.sum);
+      for (int64_t i = 0; i < len; ++i) y[begin + i] *= scale;
+    }
+  });
+}
+
+// Softmax over the middle dim of [outer, axis_dim, inner] with inner > 1.
+// Each task takes a block of columns so every pass walks contiguous
+// memory, and calls epilogue(o, c0, len, max, sum) with the statistics of
+// columns [c0, c0 + len) of outer index o once their softmax is written.
+template <typename T, typename Epilogue>
+void ColumnSoftmax(const T* x,
+                   int64_t outer,
+                   int64_t axis_dim,
+                   int64_t inner,
+                   T* y,
+                   Epilogue epilogue) {
+  using AccT = typename ReduceAccType<T>::type;
+  auto block = std::min(inner, kSoftmaxColumnBlock);
+  auto blocks = (inner + block - 1) / block;
+  auto grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (axis_dim * block));
+  custom_cpu::ParallelFor(0, outer * blocks, grain, [&](int64_t b, int64_t e) {
+    std::vector<T> max(block);
+    std::vector<AccT> sum(block);
+    std::vector<T> lanes(block);
+    for (auto t = b; t < e; ++t) {
+      auto o = t / blocks;
+      auto c0 = (t % blocks) * block;
+      auto len = std::min(block, inner - c0);
+      auto src = x + o * axis_dim * inner + c0;
+      auto dst = y + o * axis_dim * inner + c0;
+      std::copy(src, src + len, max.begin());
+      for (int64_t j = 1; j < axis_dim; ++j) {
+        auto row = src + j * inner;
+        for (int64_t c = 0; c < len; ++c) {
+          max[c] = max[c] < row[c] ? row[c] : max[c];
+        }
+      }
+      std::fill(sum.begin(), sum.begin() + len, AccT(0));
+      for (int64_t j = 0; j < axis_dim; j += kReduceFlushRows) {
+        auto j_end = std::min(axis_dim, j + kReduceFlushRows);
+        std::fill(lanes.begin(), lanes.begin() + len, T(0));
+        for (auto jj = j; jj < j_end; ++jj) {
+          auto row = src + jj * inner;
+          auto out = dst + jj * inner;
+          for (int64_t c = 0; c < len; ++c) {
+            out[c] = ExpNeg(max[c] - row[c]);
+            lanes[c] += out[c];
+          }
+        }
+        for (int64_t c = 0; c < len; ++c) sum[c] += lanes[c];
+      }
+      for (int64_t c = 0; c < len; ++c) {
+        lanes[c] = static_cast<T>(1. / sum[c]);
+      }
+      for (int64_t j = 0; j < axis_dim; ++j) {
+        auto out = dst + j * inner;
+        for (int64_t c = 0; c < len; ++c) out[c] *= lanes[c];
+      }
+      epilogue(o, c0, len, max.data(), sum.data());
+    }
+  });
+}
+
+}  // namespace detail
+
+// Softmax over the middle dim of a contiguous [outer, axis_dim, inner]
+// tensor, with x - max clipped at -64 before exp.
+template <typename T>
+void SoftmaxForward(
+    const T* x, int64_t outer, int64_t axis_dim, int64_t inner, T* y) {
+  using AccT = typename ReduceAccType<T>::type;
+  if (inner == 1) {
+    std::vector<SoftmaxStats<T>> stats;
+    detail::RowSoftmax(x, outer, axis_dim, y, &stats);
+    return;
+  }
+  detail::ColumnSoftmax(
+      x,
+      outer,
+      axis_dim,
+      inner,
+      y,
+      [](int64_t, int64_t, int64_t, const T*, const AccT*) {});
+}
+
+// dx = (dy - sum(dy * y)) * y over the middle dim. dx may alias dy.
+template <typename T>
+void SoftmaxBackward(const T* y,
+                     const T* dy,
+                     int64_t outer,
+                     int64_t axis_dim,
+                     int64_t inner,
+                     T* dx) {
+  using AccT = typename ReduceAccType<T>::type;
+  if (inner == 1) {
+    auto grain = std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / axis_dim);
+    custom_cpu::ParallelFor(0, outer, grain, [&](int64_t b, int64_t e) {
+      for (auto r = b; r < e; ++r) {
+        auto off = r * axis_dim;
+        auto dot = detail::Dot(y + off, dy + off, axis_dim);
+        for (int64_t j = 0; j < axis_dim; ++j) {
+          dx[off + j] = (dy[off + j] - dot) * y[off + j];
+        }
+      }
+    });
+    return;
+  }
+
+  auto block = std::min(inner, kSoftmaxColumnBlock);
+  auto blocks = (inner + block - 1) / block;
+  auto grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (axis_dim * block));
+  custom_cpu::ParallelFor(0, outer * blocks, grain, [&](int64_t b, int64_t e) {
+    std::vector<AccT> dot(block);
+    std::vector<T> lanes(block);
+    for (auto t = b; t < e; ++t) {
+      auto o = t / blocks;
+      auto c0 = (t % blocks) * block;
+      auto len = std::min(block, inner - c0);
+      auto off = o * axis_dim * inner + c0;
+      std::fill(dot.begin(), dot.begin() + len, AccT(0));
+      for (int64_t j = 0; j < axis_dim; j += kReduceFlushRows) {
+        auto j_end = std::min(axis_dim, j + kReduceFlushRows);
+        std::fill(lanes.begin(), lanes.begin() + len, T(0));
+        for (auto jj = j; jj < j_end; ++jj) {
+          auto yr = y + off + jj * inner;
+          auto dyr = dy + off + jj * inner;
+          for (int64_t c = 0; c < len; ++c) lanes[c] += yr[c] * dyr[c];
+        }
+        for (int64_t c = 0; c < len; ++c) dot[c] += lanes[c];
+      }
+      for (int64_t c = 0; c < len; ++c) lanes[c] = static_cast<T>(dot[c]);
+      for (int64_t j = 0; j < axis_dim; ++j) {
+        auto yr = y + off + j * inner;
+        auto dyr = dy + off + j * inner;
+        auto dxr = dx + off + j * inner;
+        for (int64_t c = 0; c < len; ++c) {
+          dxr[c] = (dyr[c] - lanes[c]) * yr[c];
+        }
+      }
+    }
+  });
+}
+
+// Softmax of x over the middle dim together with its cross entropy loss of
+// shape [outer, inner]. Hard labels hold one class index per loss element
+// and ignore_index yields a zero loss; soft labels have the shape of x. The
+// loss is taken from the softmax statistics as log(sum) + min(max - x, 64),
+// the same value as -log(softmax) without a second exp or log per element.
+template <typename T, typename LabelT>
+void SoftmaxCrossEntropyForward(const T* x,
+                                const LabelT* label,
+                                bool soft_label,
+                                int64_t ignore_index,
+                                int64_t outer,
+                                int64_t axis_dim,
+                                int64_t inner,
+                                T* softmax,
+                                T* loss) {
+  using AccT = typename ReduceAccType<T>::type;
+  auto clip = [](T d) { return std::min(d, static_cast<T>(64)); };
+  if (inner == 1) {
+    std::vector<SoftmaxStats<T>> stats;
+    detail::RowSoftmax(x, outer, axis_dim, softmax, &stats);
+    auto grain = std::max<int64_t>(
+        1, custom_cpu::kDefaultGrainSize / (soft_label ? axis_dim : 1));
+    custom_cpu::ParallelFor(0, outer, grain, [&](int64_t b, int64_t e) {
+      for (auto r = b; r < e; ++r) {
+        auto& s = stats[r];
+        auto row = x + r * axis_dim;
+        auto log_sum = static_cast<T>(std::log(s.sum));
+        if (soft_label) {
+          auto lbl = label + r * axis_dim;
+          AccT acc = 0;
+          for (int64_t j = 0; j < axis_dim; ++j) {
+            acc += static_cast<T>(lbl[j]) * (log_sum + clip(s.max - row[j]));
+          }
+          loss[r] = static_cast<T>(acc);
+        } else {
+          auto lbl = static_cast<int64_t>(label[r]);
+          loss[r] =
+              lbl == ignore_index ? T(0) : log_sum + clip(s.max - row[lbl]);
+        }
+      }
+    });
+    return;
+  }
+
+  detail::ColumnSoftmax(
+      x,
+      outer,
+      axis_dim,
+      inner,
+      softmax,
+      [&](int64_t o, int64_t c0, int64_t len, const T* max, const AccT* sum) {
+        auto src = x + o * axis_dim * inner + c0;
+        auto dst = loss + o * inner + c0;
+        if (soft_label) {
+          auto lbl = label + o * axis_dim * inner + c0;
+          std::vector<T> log_sum(len);
+          for (int64_t c = 0; c < len; ++c) {
+            log_sum[c] = static_cast<T>(std::log(sum[c]));
+            dst[c] = T(0);
+          }
+          for (int64_t j = 0; j < axis_dim; ++j) {
+            for (int64_t c = 0; c < len; ++c) {
+              dst[c] += static_cast<T>(lbl[j * inner + c]) *
+                        (log_sum[c] + clip(max[c] - src[j * inner + c]));
+            }
+          }
+          return;
+        }
+        auto lbl = label + o * inner + c0;
+        for (int64_t c = 0; c < len; ++c) {
+          auto k = static_cast<int64_t>(lbl[c]);
+          dst[c] = k == ignore_index ? T(0)
+                                     : static_cast<T>(std::log(sum[c])) +
+                                           clip(max[c] - src[k * inner + c]);
+        }
+      });
+}
+
+// Gradient of SoftmaxCrossEntropyForward's loss with respect to the logits,
+// loss_grad * (softmax - label), in one pass. dx may alias softmax.
+template <typename T, typename LabelT>
+void SoftmaxCrossEntropyBackward(const T* softmax,
+                                 const LabelT* label,
+                                 const T* loss_grad,
+                                 bool soft_label,
+                                 int64_t ignore_index,
+                                 int64_t outer,
+                                 int64_t axis_dim,
+                                 int64_t inner,
+                                 T* dx) {
+  auto lines = outer * (inner == 1 ? 1 : axis_dim);
+  auto len = inner == 1 ? axis_dim : inner;
+  auto grain = std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / len);
+  custom_cpu::ParallelFor(0, lines, grain, [&](int64_t b, int64_t e) {
+    for (auto t = b; t < e; ++t) {
+      // A line is a whole row when inner == 1 and row j of outer index o
+      // otherwise.
+      auto o = inner == 1 ? t : t / axis_dim;
+      auto j = inner == 1 ? 0 : t % axis_dim;
+      auto off = (o * axis_dim + j) * inner;
+      auto y = softmax + off;
+      auto out = dx + off;
+      auto lg = loss_grad + o * inner;
+      if (soft_label) {
+        auto lbl = label + off;
+        for (int64_t c = 0; c < len; ++c) {
+          auto g = inner == 1 ? lg[0] : lg[c];
+          out[c] = g * (y[c] - static_cast<T>(lbl[c]));
+        }
+      } else if (inner == 1) {
+        auto k = static_cast<int64_t>(label[o]);
+        if (k == ignore_index) {
+          std::fill(out, out + len, T(0));
+          continue;
+        }
+        auto g = lg[0];
+        for (int64_t c = 0; c < len; ++c) out[c] = g * y[c];
+        out[k] -= g;
+      } else {
+        auto lbl = label + o * inner;
+        for (int64_t c = 0; c < len; ++c) {
+          auto k = static_cast<int64_t>(lbl[c]);
+          auto hit = static_cast<T>(k == j);
+          out[c] = k == ignore_index ? T(0) : lg[c] * (y[c] - hit);
+        }
+      }
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
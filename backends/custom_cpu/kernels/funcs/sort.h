@@ -0,0 +1,365 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <limits>
+#include <type_traits>
+#include <utility>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Columns gathered by one task when the sorted axis is not the innermost.
+constexpr int64_t kSortColumnBlock = 16;
+
+// Largest k selected with a bounded heap; beyond it the row is partitioned.
+constexpr int64_t kHeapTopK = 64;
+
+namespace detail {
+
+// Maps values to signed integer keys that order like the values, with NaN
+// above everything and -0 equal to +0, so rows sort as plain integers.
+//
+// The float keys are built from the bit pattern with masks rather than
+// selects: GCC will not vectorize the selects, nor an unsigned min, on
+// the baseline x86-64 ISA, and the top-k scan needs both to.
+template <typename T>
+struct SortKey;
+
+template <>
+struct SortKey<float> {
+  using type = int32_t;
+  static type Of(float v) {
+    union {
+      float f;
+      int32_t i;
+    } bits;
+    bits.f = v;
+    int32_t i = bits.i;
+    // Flips the magnitude of negatives; -0 lands on -1, which no other
+    // value maps to.
+    int32_t key = i ^ ((i >> 31) & INT32_MAX);
+    key += static_cast<int32_t>(key == -1);
+    int32_t nan = -static_cast<int32_t>((i & INT32_MAX) > 0x7F800000);
+    return (key & ~nan) | (INT32_MAX & nan);
+  }
+};
+
+template <>
+struct SortKey<double> {
+  using type = int64_t;
+  static type Of(double v) {
+    union {
+      double f;
+      int64_t i;
+    } bits;
+    bits.f = v;
+    int64_t i = bits.i;
+    int64_t key = i ^ ((i >> 63) & INT64_MAX);
+    key += static_cast<int64_t>(key == -1);
+    int64_t nan = -static_cast<int64_t>((i & INT64_MAX) > 0x7FF0000000000000ll);
+    return (key & ~nan) | (INT64_MAX & nan);
+  }
+};
+
+template <>
+struct SortKey<int32_t> {
+  using type = int32_t;
+  static type Of(int32_t v) { return v; }
+};
+
+template <>
+struct SortKey<int64_t> {
+  using type = int64_t;
+  static type Of(int64_t v) { return v; }
+};
+
+// Key whose ascending order is the requested order, given flip = -1 for
+// descending and 0 otherwise (~key reverses signed order). Descending puts
+// NaN first, ascending puts it last, as the previous comparator did.
+template <typename T>
+inline typename SortKey<T>::type RankOf(T v, typename SortKey<T>::type flip) {
+  return SortKey<T>::Of(v) ^ flip;
+}
+
+template <typename T>
+inline typename SortKey<T>::type RankFlip(bool descending) {
+  return descending ? -1 : 0;
+}
+
+// Rows shorter than this are sorted by comparison instead of radix.
+constexpr int64_t kRadixMinRow = 64;
+
+// Elements ranked at once while scanning a row for its top k.
+constexpr int64_t kTopKBlock = 256;
+
+// Per-task buffers, sized on first use and reused across rows.
+template <typename T>
+struct SortScratch {
+  using Key = typename SortKey<T>::type;
+  using Digits = typename std::make_unsigned<Key>::type;
+  std::vector<Digits> keys, keys_tmp;
+  std::vector<int64_t> idx, idx_tmp;
+  std::vector<std::pair<Key, int64_t>> ranked;
+  std::vector<T> column;
+
+  void Reserve(int64_t n) {
+    keys.resize(n);
+    keys_tmp.resize(n);
+    idx.resize(n);
+    idx_tmp.resize(n);
+  }
+};
+
+// Sorts unsigned `keys` ascending with `idx` carried along; equal keys
+// keep their order. Least significant digit first, skipping digits that
+// are the same for the whole row. Returns the buffers that hold the
+// result, which are either the inputs or the temporaries.
+template <typename Key>
+std::pair<Key*, int64_t*> RadixSortPairs(
+    Key* keys, int64_t* idx, Key* keys_tmp, int64_t* idx_tmp, int64_t n) {
+  constexpr int kPasses = sizeof(Key);
+  int64_t counts[kPasses][256];
+  std::memset(counts, 0, sizeof(counts));
+  for (int64_t i = 0; i < n; ++i) {
+    auto key = keys[i];
+    for (int p = 0; p < kPasses; ++p) {
+      ++counts[p][(key >> (8 * p)) & 0xFF];
+    }
+  }
+  for (int p = 0; p < kPasses; ++p) {
+    auto* count = counts[p];
+    if (count[(keys[0] >> (8 * p)) & 0xFF] == n) continue;
+    int64_t offset = 0;
+    for (int d = 0; d < 256; ++d) {
+      auto c = count[d];
+      count[d] = offset;
+      offset += c;
+    }
+    for (int64_t i = 0; i < n; ++i) {
+      auto pos = count[(keys[i] >> (8 * p)) & 0xFF]++;
+      keys_tmp[pos] = keys[i];
+      idx_tmp[pos] = idx[i];
+    }
+    std::swap(keys, keys_tmp);
+    std::swap(idx, idx_tmp);
+  }
+  return {keys, idx};
+}
+
+// Writes the order of the contiguous row x[0, n) to `order`, ties broken
+// by position, so the sort is stable.
+template <typename T>
+void SortRow(const T* x,
+             int64_t n,
+             bool descending,
+             SortScratch<T>* scratch,
+             int64_t* order) {
+  using Digits = typename SortScratch<T>::Digits;
+  if (static_cast<int64_t>(scratch->keys.size()) < n) scratch->Reserve(n);
+  auto* keys = scratch->keys.data();
+  auto flip = RankFlip<T>(descending);
+  // Biasing the sign bit makes the signed order the unsigned one.
+  constexpr Digits kBias = Digits(1) << (sizeof(Digits) * 8 - 1);
+  for (int64_t i = 0; i < n; ++i) {
+    keys[i] = static_cast<Digits>(RankOf(x[i], flip)) ^ kBias;
+    order[i] = i;
+  }
+  if (n < kRadixMinRow) {
+    std::sort(order, order + n, [keys](int64_t a, int64_t b) {
+      return keys[a] < keys[b] || (keys[a] == keys[b] && a < b);
+    });
+    return;
+  }
+  auto sorted = RadixSortPairs<Digits>(
+      keys, order, scratch->keys_tmp.data(), scratch->idx_tmp.data(), n);
+  if (sorted.second != order) {
+    std::copy(sorted.second, sorted.second + n, order);
+  }
+}
+
+// Writes the positions of the k first entries of the contiguous row x[0, n)
+// in the requested order to `order`, ties broken by position.
+template <typename T>
+void TopKRow(const T* x,
+             int64_t n,
+             int64_t k,
+             bool largest,
+             SortScratch<T>* scratch,
+             int64_t* order) {
+  using Key = typename SortKey<T>::type;
+  auto& ranked = scratch->ranked;
+  auto flip = RankFlip<T>(largest);
+  if (k <= kHeapTopK && k < n) {
+    // Keeps the k best seen so far in a max-heap of (rank, position). The
+    // row is ranked a block at a time and only blocks whose best rank
+    // beats the worst kept one are looked at element by element.
+    ranked.resize(k);
+    for (int64_t i = 0; i < k; ++i) {
+      ranked[i] = {RankOf(x[i], flip), i};
+    }
+    std::make_heap(ranked.begin(), ranked.end());
+    Key worst = ranked.front().first;
+    Key ranks[kTopKBlock];
+    for (int64_t b = k; b < n; b += kTopKBlock) {
+      auto len = std::min(kTopKBlock, n - b);
+      Key best = std::numeric_limits<Key>::max();
+      for (int64_t i = 0; i < len; ++i) {
+        ranks[i] = RankOf(x[b + i], flip);
+        best = std::min(best, ranks[i]);
+      }
+      if (best >= worst) continue;
+      for (int64_t i = 0; i < len; ++i) {
+        if (ranks[i] < worst) {
+          std::pop_heap(ranked.begin(), ranked.end());
+          ranked.back() = {ranks[i], b + i};
+          std::push_heap(ranked.begin(), ranked.end());
+          worst = ranked.front().first;
+        }
+      }
+    }
+    std::sort_heap(ranked.begin(), ranked.end());
+  } else if (k * 4 < n) {
+    ranked.resize(n);
+    for (int64_t i = 0; i < n; ++i) {
+      ranked[i] = {RankOf(x[i], flip), i};
+    }
+    std::nth_element(ranked.begin(), ranked.begin() + k - 1, ranked.end());
+    std::sort(ranked.begin(), ranked.begin() + k);
+  } else {
+    scratch->Reserve(n);
+    SortRow(x, n, largest, scratch, scratch->idx.data());
+    std::copy(scratch->idx.data(), scratch->idx.data() + k, order);
+    return;
+  }
+  for (int64_t i = 0; i < k; ++i) order[i] = ranked[i].second;
+}
+
+// Runs row_fn(row, order, scratch) for every row of x viewed as
+// [outer, n, inner] along the middle dim, where `row` is contiguous, then
+// calls write(o, c, row, order) to scatter the result of column c of
+// outer index o. Non-innermost axes are gathered a block of columns at a
+// time, so no transpose of the whole tensor is made.
+template <typename T, typename RowFn, typename Write>
+void ForEachRow(const T* x,
+                int64_t outer,
+                int64_t n,
+                int64_t inner,
+                int64_t order_len,
+                RowFn row_fn,
+                Write write) {
+  auto block = std::min(inner, kSortColumnBlock);
+  auto blocks = (inner + block - 1) / block;
+  auto grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (n * block));
+  custom_cpu::ParallelFor(0, outer * blocks, grain, [&](int64_t b, int64_t e) {
+    SortScratch<T> scratch;
+    std::vector<int64_t> order(order_len);
+    if (inner > 1) scratch.column.resize(n * block);
+    for (auto t = b; t < e; ++t) {
+      auto o = t / blocks;
+      auto c0 = (t % blocks) * block;
+      auto len = std::min(block, inner - c0);
+      auto src = x + o * n * inner + c0;
+      if (inner == 1) {
+        row_fn(src, order.data(), &scratch);
+        write(o, 0, src, order.data());
+        continue;
+      }
+      auto* column = scratch.column.data();
+      for (int64_t j = 0; j < n; ++j) {
+        for (int64_t c = 0; c < len; ++c) {
+          column[c * n + j] = src[j * inner + c];
+        }
+      }
+      for (int64_t c = 0; c < len; ++c) {
+        row_fn(column + c * n, order.data(), &scratch);
+        write(o, c0 + c, column + c * n, order.data());
+      }
+    }
+  });
+}
+
+}  // namespace detail
+
+// Sorts x viewed as [outer, n, inner] along the middle dim, writing the
+// sorted values to `out` and their positions to `indices`, both shaped
+// like x. The sort is stable; NaN sorts as the largest value.
+template <typename T>
+void SortAlongAxis(const T* x,
+                   int64_t outer,
+                   int64_t n,
+                   int64_t inner,
+                   bool descending,
+                   T* out,
+                   int64_t* indices) {
+  if (outer * n * inner == 0) return;
+  detail::ForEachRow(
+      x,
+      outer,
+      n,
+      inner,
+      n,
+      [&](const T* row, int64_t* order, detail::SortScratch<T>* scratch) {
+        detail::SortRow(row, n, descending, scratch, order);
+      },
+      [&](int64_t o, int64_t c, const T* row, const int64_t* order) {
+        auto base = o * n * inner + c;
+        for (int64_t j = 0; j < n; ++j) {
+          out[base + j * inner] = row[order[j]];
+          indices[base + j * inner] = order[j];
+        }
+      });
+}
+
+// The k largest (or smallest) entries of x viewed as [outer, n, inner]
+// along the middle dim, in order, into `out` and `indices` shaped
+// [outer, k, inner]. Equal values keep their order of appearance.
+template <typename T>
+void TopKAlongAxis(const T* x,
+                   int64_t outer,
+                   int64_t n,
+                   int64_t inner,
+                   int64_t k,
+                   bool largest,
+                   T* out,
+                   int64_t* indices) {
+  if (outer * k * inner == 0) return;
+  detail::ForEachRow(
+      x,
+      outer,
+      n,
+      inner,
+      k,
+      [&](const T* row, int64_t* order, detail::SortScratch<T>* scratch) {
+        detail::TopKRow(row, n, k, largest, scratch, order);
+      },
+      [&](int64_t o, int64_t c, const T* row, const int64_t* order) {
+        auto base = o * k * inner + c;
+        for (int64_t j = 0; j < k; ++j) {
+          out[base + j * inner] = row[order[j]];
+          indices[base + j * inner] = order[j];
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,220 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "runtime/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Edge of the square tiles used when the innermost dims of source and
+// destination differ.
+constexpr int64_t kCopyTileSize = 32;
+
+namespace detail {
+
+// Walks dims in row-major order and keeps the matching source and
+// destination offsets.
+struct CopyOdometer {
+  std::vector<int64_t> dims;
+  std::vector<int64_t> src_strides;
+  std::vector<int64_t> dst_strides;
+  std::vector<int64_t> index;
+  int64_t src = 0;
+  int64_t dst = 0;
+
+  void Seek(int64_t linear) {
+    index.assign(dims.size(), 0);
+    src = dst = 0;
+    for (auto i = static_cast<int64_t>(dims.size()) - 1; i >= 0; --i) {
+      index[i] = linear % dims[i];
+      linear /= dims[i];
+      src += index[i] * src_strides[i];
+      dst += index[i] * dst_strides[i];
+    }
+  }
+
+  void Next() {
+    for (auto i = static_cast<int64_t>(dims.size()) - 1; i >= 0; --i) {
+      src += src_strides[i];
+      dst += dst_strides[i];
+      if (++index[i] < dims[i]) return;
+      src -= dims[i] * src_strides[i];
+      dst -= dims[i] * dst_strides[i];
+      index[i] = 0;
+    }
+  }
+};
+
+}  // namespace detail
+
+// Copies a tensor of shape dims from src to dst, where both are addressed
+// through their own element strides.
+//
+// Dims are reordered by destination stride so the writes are as sequential
+// as possible, size-1 dims are dropped and neighbours that both sides walk
+// linearly are merged. What is left takes one of three paths:
+//   * the innermost dim is contiguous on both sides: memcpy of whole runs;
+//   * it is contiguous only in dst and another dim is contiguous in src:
+//     the pair is copied as a tiled 2-D transpose so both sides stay in
+//     cache;
+//   * otherwise a plain strided loop.
+// Work is split across the intra-op pool.
+template <typename T>
+void StridedCopy(const T* src,
+                 const std::vector<int64_t>& src_strides,
+                 T* dst,
+                 const std::vector<int64_t>& dst_strides,
+                 const std::vector<int64_t>& dims) {
+  int64_t numel = 1;
+  for (auto d : dims) numel *= d;
+  if (numel <= 0) return;
+
+  std::vector<size_t> order;
+  for (size_t i = 0; i < dims.size(); ++i) {
+    if (dims[i] != 1) order.push_back(i);
+  }
+  std::stable_sort(order.begin(), order.end(), [&](size_t a, size_t b) {
+    return dst_strides[a] > dst_strides[b];
+  });
+
+  detail::CopyOdometer plan;
+  for (auto i : order) {
+    auto d = dims[i];
+    if (!plan.dims.empty() && plan.src_strides.back() == src_strides[i] * d &&
+        plan.dst_strides.back() == dst_strides[i] * d) {
+      plan.dims.back() *= d;
+      plan.src_strides.back() = src_strides[i];
+      plan.dst_strides.back() = dst_strides[i];
+    } else {
+      plan.dims.push_back(d);
+      plan.src_strides.push_back(src_strides[i]);
+      plan.dst_strides.push_back(dst_strides[i]);
+    }
+  }
+  if (plan.dims.empty()) {
+    *dst = *src;
+    return;
+  }
+
+  auto rank = static_cast<int64_t>(plan.dims.size());
+  auto inner = plan.dims.back();
+  auto inner_src = plan.src_strides.back();
+  auto inner_dst = plan.dst_strides.back();
+
+  if (inner_src == 1 && inner_dst == 1) {
+    // Contiguous runs of `inner` elements.
+    detail::CopyOdometer outer = plan;
+    outer.dims.pop_back();
+    outer.src_strides.pop_back();
+    outer.dst_strides.pop_back();
+    int64_t runs = numel / inner;
+    if (runs == 1) {
+      custom_cpu::ParallelFor(
+          0, inner, custom_cpu::kDefaultGrainSize, [&](int64_t b, int64_t e) {
+            std::memcpy(dst + b, src + b, (e - b) * sizeof(T));
+          });
+      return;
+    }
+    auto grain = std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / inner);
+    custom_cpu::ParallelFor(0, runs, grain, [&](int64_t b, int64_t e) {
+      auto od = outer;
+      od.Seek(b);
+      for (auto r = b; r < e; ++r) {
+        std::memcpy(dst + od.dst, src + od.src, inner * sizeof(T));
+        od.Next();
+      }
+    });
+    return;
+  }
+
+  int64_t pair = -1;
+  if (inner_dst == 1) {
+    for (int64_t i = rank - 2; i >= 0; --i) {
+      if (plan.src_strides[i] == 1) {
+        pair = i;
+        break;
+      }
+    }
+  }
+
+  if (pair >= 0) {
+    // Tiled transpose of the (pair, inner) plane: src is contiguous along
+    // `pair`, dst along `inner`.
+    auto rows = plan.dims[pair];
+    auto row_dst = plan.dst_strides[pair];
+    detail::CopyOdometer outer;
+    for (int64_t i = 0; i < rank - 1; ++i) {
+      if (i == pair) continue;
+      outer.dims.push_back(plan.dims[i]);
+      outer.src_strides.push_back(plan.src_strides[i]);
+      outer.dst_strides.push_back(plan.dst_strides[i]);
+    }
+    auto row_tiles = (rows + kCopyTileSize - 1) / kCopyTileSize;
+    auto col_tiles = (inner + kCopyTileSize - 1) / kCopyTileSize;
+    auto tiles = row_tiles * col_tiles;
+    auto planes = numel / (rows * inner);
+    auto grain = std::max<int64_t>(
+        1, custom_cpu::kDefaultGrainSize / (kCopyTileSize * kCopyTileSize));
+    custom_cpu::ParallelFor(
+        0, planes * tiles, grain, [&](int64_t b, int64_t e) {
+          auto od = outer;
+          od.Seek(b / tiles);
+          for (auto t = b; t < e; ++t) {
+            if (t != b && t % tiles == 0) od.Next();
+            auto r0 = (t % tiles) / col_tiles * kCopyTileSize;
+            auto c0 = (t % tiles) % col_tiles * kCopyTileSize;
+            auto r1 = std::min(rows, r0 + kCopyTileSize);
+            auto c1 = std::min(inner, c0 + kCopyTileSize);
+            auto s = src + od.src;
+            auto d = dst + od.dst;
+            for (auto r = r0; r < r1; ++r) {
+              for (auto c = c0; c < c1; ++c) {
+                d[r * row_dst + c] = s[r + c * inner_src];
+              }
+            }
+          }
+        });
+    return;
+  }
+
+  custom_cpu::ParallelFor(
+      0, numel, custom_cpu::kDefaultGrainSize, [&](int64_t b, int64_t e) {
+        auto od = plan;
+        od.Seek(b);
+        for (auto i = b; i < e; ++i) {
+          dst[od.dst] = src[od.src];
+          od.Next();
+        }
+      });
+}
+
+// Strides of a contiguous row-major tensor.
+inline std::vector<int64_t> ContiguousStrides(
+    const std::vector<int64_t>& dims) {
+  std::vector<int64_t> strides(dims.size(), 1);
+  for (auto i = static_cast<int64_t>(dims.size()) - 2; i >= 0; --i) {
+    strides[i] = strides[i + 1] * dims[i + 1];
+  }
+  return strides;
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
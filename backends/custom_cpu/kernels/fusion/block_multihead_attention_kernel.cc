@@ -0,0 +1,163 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+#include "kernels/funcs/paged_attention.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+funcs::AttentionMask<T> MakeAttentionMask(
+    const paddle::optional<phi::DenseTensor>& mask, bool shared_row) {
+  funcs::AttentionMask<T> m = {nullptr, 0, 0};
+  if (!mask.get_ptr()) return m;
+  auto dims = mask->dims();
+  m.data = mask->data<T>();
+  m.batch_stride = dims[0] > 1 ? mask->numel() / dims[0] : 0;
+  m.row_stride = shared_row ? 0 : dims.back();
+  return m;
+}
+
+// Paged attention over block_tables for a batch mixing prefill and decode
+// sequences. The caches are updated in place; quantized caches and
+// outputs, and prefix caches, are not supported on custom_cpu.
+template <typename T>
+void BlockMultiheadAttentionKernel(
+    const phi::Context& dev_ctx,
+    const phi::DenseTensor& qkv,
+    const phi::DenseTensor& key_cache,
+    const phi::DenseTensor& value_cache,
+    const phi::DenseTensor& seq_lens_encoder,
+    const phi::DenseTensor& seq_lens_decoder,
+    const phi::DenseTensor& seq_lens_this_time,
+    const phi::DenseTensor& padding_offsets,
+    const phi::DenseTensor& cum_offsets,
+    const phi::DenseTensor& cu_seqlens_q,
+    const phi::DenseTensor& cu_seqlens_k,
+    const phi::DenseTensor& block_tables,
+    const paddle::optional<phi::DenseTensor>& pre_key_cache,
+    const paddle::optional<phi::DenseTensor>& pre_value_cache,
+    const paddle::optional<phi::DenseTensor>& rope_emb,
+    const paddle::optional<phi::DenseTensor>& mask,
+    const paddle::optional<phi::DenseTensor>& tgt_mask,
+    const paddle::optional<phi::DenseTensor>& cache_k_quant_scales,
+    const paddle::optional<phi::DenseTensor>& cache_v_quant_scales,
+    const paddle::optional<phi::DenseTensor>& cache_k_dequant_scales,
+    const paddle::optional<phi::DenseTensor>& cache_v_dequant_scales,
+    const paddle::optional<phi::DenseTensor>& qkv_out_scale,
+    const paddle::optional<phi::DenseTensor>& qkv_bias,
+    const paddle::optional<phi::DenseTensor>& out_shift,
+    const paddle::optional<phi::DenseTensor>& out_smooth,
+    int max_seq_len,
+    int block_size,
+    bool use_neox_style,
+    const bool dynamic_cachekv_quant,
+    const int quant_round_type,
+    const float quant_max_bound,
+    const float quant_min_bound,
+    const float out_scale,
+    const std::string& compute_dtype,
+    phi::DenseTensor* fmha_out,
+    phi::DenseTensor* qkv_out,
+    phi::DenseTensor* key_cache_out,
+    phi::DenseTensor* value_cache_out) {
+  PD_CHECK(!pre_key_cache.get_ptr() && !pre_value_cache.get_ptr(),
+           "block_multihead_attention on custom_cpu does not support "
+           "pre_key_cache/pre_value_cache.");
+  PD_CHECK(!cache_k_quant_scales.get_ptr() && !cache_v_quant_scales.get_ptr() &&
+               !cache_k_dequant_scales.get_ptr() &&
+               !cache_v_dequant_scales.get_ptr() && !dynamic_cachekv_quant,
+           "block_multihead_attention on custom_cpu does not support "
+           "quantized caches.");
+  PD_CHECK(!qkv_out_scale.get_ptr() && !out_shift.get_ptr() &&
+               !out_smooth.get_ptr() && out_scale <= 0,
+           "block_multihead_attention on custom_cpu does not support "
+           "quantized inputs or outputs.");
+
+  auto cache_dims = key_cache.dims();
+  PD_CHECK(cache_dims.size() == 4,
+           "key_cache must be [num_blocks, kv_num_heads, block_size, "
+           "head_dim], but it is %d-D.",
+           static_cast<int>(cache_dims.size()));
+  PD_CHECK(cache_dims[2] == block_size,
+           "key_cache holds blocks of %ld tokens, but block_size is %d.",
+           cache_dims[2],
+           block_size);
+  funcs::PagedAttentionArgs<T> args = {};
+  args.batch = seq_lens_this_time.numel();
+  args.kv_num_heads = cache_dims[1];
+  args.block_size = block_size;
+  args.head_dim = cache_dims[3];
+  args.num_heads = qkv.dims()[1] / args.head_dim - 2 * args.kv_num_heads;
+  PD_CHECK(args.num_heads > 0 && args.num_heads % args.kv_num_heads == 0,
+           "qkv has %ld columns, which do not split into query heads and "
+           "%ld key/value heads of %ld.",
+           qkv.dims()[1],
+           args.kv_num_heads,
+           args.head_dim);
+  args.max_blocks_per_seq = block_tables.dims()[1];
+  args.seq_lens_encoder = seq_lens_encoder.data<int32_t>();
+  args.seq_lens_decoder = seq_lens_decoder.data<int32_t>();
+  args.seq_lens_this_time = seq_lens_this_time.data<int32_t>();
+  args.cu_seqlens_q = cu_seqlens_q.data<int32_t>();
+  args.block_tables = block_tables.data<int32_t>();
+  args.qkv_bias = phi::OptionalData<T>(qkv_bias);
+  if (rope_emb.get_ptr()) {
+    // [2, batch or 1, max_seq_len, 1, rope_dim]: cos, then sin.
+    auto rope_dims = rope_emb->dims();
+    args.rope = rope_emb->data<float>();
+    args.rope_dim = rope_dims.back();
+    args.rope_batch_stride =
+        rope_dims[1] > 1 ? rope_emb->numel() / 2 / rope_dims[1] : 0;
+    args.rope_sin_offset = rope_emb->numel() / 2;
+    args.neox_style = use_neox_style;
+    PD_CHECK(
+        args.rope_dim == args.head_dim || args.rope_dim * 2 == args.head_dim,
+        "rope_emb has %ld angles per position for heads of %ld.",
+        args.rope_dim,
+        args.head_dim);
+  }
+  args.prefill_mask = MakeAttentionMask<T>(mask, false);
+  args.decode_mask = MakeAttentionMask<T>(tgt_mask, true);
+
+  // The caches are in-place outputs; copy them only if Paddle did not
+  // share the buffers.
+  T* key_cache_data = dev_ctx.template Alloc<T>(key_cache_out);
+  T* value_cache_data = dev_ctx.template Alloc<T>(value_cache_out);
+  if (key_cache_data != key_cache.data<T>()) {
+    std::copy(key_cache.data<T>(),
+              key_cache.data<T>() + key_cache.numel(),
+              key_cache_data);
+  }
+  if (value_cache_data != value_cache.data<T>()) {
+    std::copy(value_cache.data<T>(),
+              value_cache.data<T>() + value_cache.numel(),
+              value_cache_data);
+  }
+  T* qkv_out_data = dev_ctx.template Alloc<T>(qkv_out);
+  T* out_data = dev_ctx.template Alloc<T>(fmha_out);
+  funcs::PagedAttentionWriteCache(
+      args, qkv.data<T>(), qkv_out_data, key_cache_data, value_cache_data);
+  funcs::PagedAttention<T>(
+      args, qkv_out_data, key_cache_data, value_cache_data, out_data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(block_multihead_attention,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BlockMultiheadAttentionKernel,
+                    float,
+                    double) {}
@@ -0,0 +1,99 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+#include "kernels/funcs/norm.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// residual_out = x + bias + residual_alpha * residual, and out its layer
+// norm, quantized to int8 when quant_scale > 0. Without norm_weight and
+// norm_bias the op only adds the residual and out is residual_out.
+template <typename T>
+void FusedLayerNormKernel(const phi::Context& dev_ctx,
+                          const phi::DenseTensor& x,
+                          const paddle::optional<phi::DenseTensor>& bias,
+                          const paddle::optional<phi::DenseTensor>& residual,
+                          const paddle::optional<phi::DenseTensor>& norm_weight,
+                          const paddle::optional<phi::DenseTensor>& norm_bias,
+                          const float epsilon,
+                          const float residual_alpha,
+                          const int begin_norm_axis,
+                          const float quant_scale,
+                          const int quant_round_type,
+                          const float quant_max_bound,
+                          const float quant_min_bound,
+                          phi::DenseTensor* out,
+                          phi::DenseTensor* residual_out,
+                          phi::DenseTensor* mean,
+                          phi::DenseTensor* variance) {
+  auto dims = x.dims();
+  const int rank = static_cast<int>(dims.size());
+  const int axis =
+      begin_norm_axis < 0 ? begin_norm_axis + rank : begin_norm_axis;
+  PD_CHECK(axis >= 0 && axis < rank,
+           "begin_norm_axis must be in [-%d, %d), but received %d.",
+           rank,
+           rank,
+           begin_norm_axis);
+  funcs::NormArgs<T> args = {};
+  args.rows = phi::product(phi::slice_ddim(dims, 0, axis));
+  args.cols = phi::product(phi::slice_ddim(dims, axis, rank));
+  args.x = x.data<T>();
+  args.bias = phi::OptionalData<T>(bias);
+  args.residual = phi::OptionalData<T>(residual);
+  args.residual_alpha = static_cast<T>(residual_alpha);
+  args.weight = phi::OptionalData<T>(norm_weight);
+  args.norm_bias = phi::OptionalData<T>(norm_bias);
+  args.epsilon = epsilon;
+  args.add_only = !args.weight && !args.norm_bias;
+
+  T* residual_out_data = (args.bias || args.residual) && residual_out
+                             ? dev_ctx.template Alloc<T>(residual_out)
+                             : nullptr;
+  float* mean_data = mean ? dev_ctx.template Alloc<float>(mean) : nullptr;
+  float* variance_data =
+      variance ? dev_ctx.template Alloc<float>(variance) : nullptr;
+  if (quant_scale > 0) {
+    funcs::NormQuant quant = {
+        quant_scale, quant_round_type, quant_max_bound, quant_min_bound};
+    funcs::NormForward<T, int8_t, float>(args,
+                                         dev_ctx.template Alloc<int8_t>(out),
+                                         residual_out_data,
+                                         mean_data,
+                                         variance_data,
+                                         nullptr,
+                                         &quant);
+    return;
+  }
+  funcs::NormForward<T, T, float>(args,
+                                  dev_ctx.template Alloc<T>(out),
+                                  residual_out_data,
+                                  mean_data,
+                                  variance_data,
+                                  nullptr);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(fused_bias_residual_layernorm,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::FusedLayerNormKernel,
+                    float,
+                    double) {
+  kernel->OutputAt(0).SetDataType(phi::DataType::UNDEFINED);
+  kernel->OutputAt(2).SetDataType(phi::DataType::FLOAT32);
+  kernel->OutputAt(3).SetDataType(phi::DataType::FLOAT32);
+}
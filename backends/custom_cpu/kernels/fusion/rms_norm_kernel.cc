@@ -0,0 +1,146 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+#include "kernels/funcs/norm.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+funcs::NormArgs<T> MakeRmsNormArgs(
+    const phi::DenseTensor& x,
+    const paddle::optional<phi::DenseTensor>& bias,
+    const paddle::optional<phi::DenseTensor>& residual,
+    const phi::DenseTensor& norm_weight,
+    const paddle::optional<phi::DenseTensor>& norm_bias,
+    float epsilon,
+    int begin_norm_axis) {
+  auto dims = x.dims();
+  const int rank = static_cast<int>(dims.size());
+  if (begin_norm_axis < 0) begin_norm_axis += rank;
+  PD_CHECK(begin_norm_axis >= 0 && begin_norm_axis < rank,
+           "begin_norm_axis must be in [-%d, %d), but received %d.",
+           rank,
+           rank,
+           begin_norm_axis);
+  funcs::NormArgs<T> args = {};
+  args.rows = phi::product(phi::slice_ddim(dims, 0, begin_norm_axis));
+  args.cols = phi::product(phi::slice_ddim(dims, begin_norm_axis, rank));
+  PD_CHECK(norm_weight.numel() == args.cols,
+           "norm_weight has %ld elements, but the normalized dims have %ld.",
+           norm_weight.numel(),
+           args.cols);
+  args.x = x.data<T>();
+  args.bias = phi::OptionalData<T>(bias);
+  args.residual = phi::OptionalData<T>(residual);
+  args.residual_alpha = T(1);
+  args.weight = norm_weight.data<T>();
+  args.norm_bias = phi::OptionalData<T>(norm_bias);
+  args.epsilon = epsilon;
+  args.rms = true;
+  return args;
+}
+
+// out = (x + bias + residual) / rms * norm_weight + norm_bias, quantized to
+// int8 when quant_scale > 0. residual_out receives x + bias + residual.
+template <typename T>
+void RmsNormKernel(const phi::Context& dev_ctx,
+                   const phi::DenseTensor& x,
+                   const paddle::optional<phi::DenseTensor>& bias,
+                   const paddle::optional<phi::DenseTensor>& residual,
+                   const phi::DenseTensor& norm_weight,
+                   const paddle::optional<phi::DenseTensor>& norm_bias,
+                   const float epsilon,
+                   const int begin_norm_axis,
+                   const float quant_scale,
+                   const int quant_round_type,
+                   const float quant_max_bound,
+                   const float quant_min_bound,
+                   phi::DenseTensor* out,
+                   phi::DenseTensor* residual_out,
+                   phi::DenseTensor* inv_var) {
+  auto args = MakeRmsNormArgs<T>(
+      x, bias, residual, norm_weight, norm_bias, epsilon, begin_norm_axis);
+  T* residual_out_data = residual && residual_out
+                             ? dev_ctx.template Alloc<T>(residual_out)
+                             : nullptr;
+  float* inv_var_data =
+      inv_var ? dev_ctx.template Alloc<float>(inv_var) : nullptr;
+  if (quant_scale > 0) {
+    funcs::NormQuant quant = {
+        quant_scale, quant_round_type, quant_max_bound, quant_min_bound};
+    funcs::NormForward<T, int8_t, float>(args,
+                                         dev_ctx.template Alloc<int8_t>(out),
+                                         residual_out_data,
+                                         nullptr,
+                                         nullptr,
+                                         inv_var_data,
+                                         &quant);
+    return;
+  }
+  funcs::NormForward<T, T, float>(args,
+                                  dev_ctx.template Alloc<T>(out),
+                                  residual_out_data,
+                                  nullptr,
+                                  nullptr,
+                                  inv_var_data);
+}
+
+template <typename T>
+void RmsNormGradKernel(const phi::Context& dev_ctx,
+                       const phi::DenseTensor& x,
+                       const paddle::optional<phi::DenseTensor>& bias,
+                       const paddle::optional<phi::DenseTensor>& residual,
+                       const phi::DenseTensor& norm_weight,
+                       const paddle::optional<phi::DenseTensor>& norm_bias,
+                       const phi::DenseTensor& inv_var,
+                       const phi::DenseTensor& out_grad,
+                       const float epsilon,
+                       const int begin_norm_axis,
+                       const float quant_scale,
+                       phi::DenseTensor* x_grad,
+                       phi::DenseTensor* norm_weight_grad) {
+  PD_CHECK(quant_scale <= 0, "rms_norm_grad does not support quantization.");
+  auto args = MakeRmsNormArgs<T>(
+      x, bias, residual, norm_weight, norm_bias, epsilon, begin_norm_axis);
+  T* dx = x_grad ? dev_ctx.template Alloc<T>(x_grad) : nullptr;
+  T* dweight =
+      norm_weight_grad ? dev_ctx.template Alloc<T>(norm_weight_grad) : nullptr;
+  funcs::NormBackward<T, float>(args,
+                                nullptr,
+                                inv_var.data<float>(),
+                                out_grad.data<T>(),
+                                dx,
+                                dweight,
+                                nullptr);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(rms_norm,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::RmsNormKernel,
+                    float,
+                    double) {
+  kernel->OutputAt(0).SetDataType(phi::DataType::UNDEFINED);
+  kernel->OutputAt(2).SetDataType(phi::DataType::FLOAT32);
+}
+
+PD_BUILD_PHI_KERNEL(rms_norm_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::RmsNormGradKernel,
+                    float,
+                    double) {}
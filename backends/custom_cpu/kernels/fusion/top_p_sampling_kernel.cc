@@ -0,0 +1,67 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/sampling.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Samples one token per row of the probabilities x [bsz, vocab] from its
+// top_p nucleus, ps [bsz, 1], leaving out tokens below threshold [bsz, 1].
+// A non-negative random_seed makes the draws reproducible; -1 takes them
+// from the plugin's default stream.
+template <typename T>
+void TopPSamplingKernel(const phi::Context& dev_ctx,
+                        const phi::DenseTensor& x,
+                        const phi::DenseTensor& ps,
+                        const paddle::optional<phi::DenseTensor>& threshold,
+                        int random_seed,
+                        phi::DenseTensor* out,
+                        phi::DenseTensor* ids) {
+  auto dims = x.dims();
+  PD_CHECK(dims.size() == 2,
+           "top_p_sampling expects x of [bsz, vocab], but received rank %d.",
+           static_cast<int>(dims.size()));
+  const int64_t bsz = dims[0];
+  PD_CHECK(ps.numel() == bsz,
+           "top_p_sampling needs one top_p per row (%ld), but received %ld.",
+           bsz,
+           ps.numel());
+  out->Resize({bsz, 1});
+  ids->Resize({bsz, 1});
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  int64_t* ids_data = dev_ctx.template Alloc<int64_t>(ids);
+
+  funcs::TopPSamplingArgs<T> args = {};
+  args.bsz = bsz;
+  args.vocab = dims[1];
+  args.probs = x.data<T>();
+  args.top_p = ps.data<T>();
+  args.threshold = phi::OptionalData<T>(threshold);
+  args.seed = random_seed >= 0
+                  ? funcs::PhiloxSeed{static_cast<uint64_t>(random_seed), 0}
+                  : funcs::PhiloxSeedFor(0, bsz);
+  funcs::TopPSampling<T>(args, out_data, ids_data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(top_p_sampling,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::TopPSamplingKernel,
+                    float,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
@@ -0,0 +1,107 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+#include "kernels/funcs/norm.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+funcs::NormArgs<T> MakeLayerNormArgs(const phi::DenseTensor& x,
+                                     const T* scale,
+                                     const T* bias,
+                                     float epsilon,
+                                     int begin_norm_axis) {
+  auto dims = x.dims();
+  const int rank = static_cast<int>(dims.size());
+  PD_CHECK(begin_norm_axis > 0 && begin_norm_axis < rank,
+           "begin_norm_axis must be in [1, %d), but received %d.",
+           rank,
+           begin_norm_axis);
+  funcs::NormArgs<T> args = {};
+  args.rows = phi::product(phi::slice_ddim(dims, 0, begin_norm_axis));
+  args.cols = phi::product(phi::slice_ddim(dims, begin_norm_axis, rank));
+  args.x = x.data<T>();
+  args.weight = scale;
+  args.norm_bias = bias;
+  args.epsilon = epsilon;
+  return args;
+}
+
+template <typename T>
+void LayerNormKernel(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& x,
+                     const paddle::optional<phi::DenseTensor>& scale,
+                     const paddle::optional<phi::DenseTensor>& bias,
+                     float epsilon,
+                     int begin_norm_axis,
+                     phi::DenseTensor* out,
+                     phi::DenseTensor* mean,
+                     phi::DenseTensor* variance) {
+  auto args = MakeLayerNormArgs(x,
+                                phi::OptionalData<T>(scale),
+                                phi::OptionalData<T>(bias),
+                                epsilon,
+                                begin_norm_axis);
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  T* mean_data = mean ? dev_ctx.template Alloc<T>(mean) : nullptr;
+  T* variance_data = variance ? dev_ctx.template Alloc<T>(variance) : nullptr;
+  funcs::NormForward<T, T, T>(
+      args, out_data, nullptr, mean_data, variance_data, nullptr);
+}
+
+template <typename T>
+void LayerNormGradKernel(const phi::Context& dev_ctx,
+                         const phi::DenseTensor& x,
+                         const paddle::optional<phi::DenseTensor>& scale,
+                         const paddle::optional<phi::DenseTensor>& bias,
+                         const phi::DenseTensor& mean,
+                         const phi::DenseTensor& variance,
+                         const phi::DenseTensor& out_grad,
+                         float epsilon,
+                         int begin_norm_axis,
+                         phi::DenseTensor* x_grad,
+                         phi::DenseTensor* scale_grad,
+                         phi::DenseTensor* bias_grad) {
+  // bias is a no_need_buffer input of layer_norm_grad; only its shape is
+  // kept, and the backward pass does not read it.
+  auto args = MakeLayerNormArgs<T>(
+      x, phi::OptionalData<T>(scale), nullptr, epsilon, begin_norm_axis);
+  T* dx = x_grad ? dev_ctx.template Alloc<T>(x_grad) : nullptr;
+  T* dscale = scale_grad ? dev_ctx.template Alloc<T>(scale_grad) : nullptr;
+  T* dbias = bias_grad ? dev_ctx.template Alloc<T>(bias_grad) : nullptr;
+  const T* var = variance.data<T>();
+  std::vector<T> rstd(args.rows);
+  for (int64_t r = 0; r < args.rows; ++r) {
+    rstd[r] = static_cast<T>(1. / std::sqrt(var[r] + epsilon));
+  }
+  funcs::NormBackward(
+      args, mean.data<T>(), rstd.data(), out_grad.data<T>(), dx, dscale, dbias);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(layer_norm,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::LayerNormKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(layer_norm_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::LayerNormGradKernel,
+                    float,
+                    double) {}
@@ -12,11 +12,27 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/gemm.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
 namespace custom_kernel {
 
+template <typename T>
+struct GEMMAccType {
+  using Type = T;
+};
+
+template <>
+struct GEMMAccType<phi::dtype::float16> {
+  using Type = float;
+};
+
+template <>
+struct GEMMAccType<phi::dtype::bfloat16> {
+  using Type = float;
+};
+
 template <typename T>
 void GEMM(bool trans_x,
           bool trans_y,
@@ -27,17 +43,12 @@ void GEMM(bool trans_x,
           const T* y,
           T* out,
           bool trans_out = false) {
-  memset(out, 0, M * N * sizeof(T));
-  for (size_t m = 0; m < M; ++m) {
-    for (size_t n = 0; n < N; ++n) {
-      auto* out_data = trans_out ? &out[n * M + m] : &out[m * N + n];
-      for (size_t k = 0; k < K; ++k) {
-        auto x_dat = trans_x ? x[k * M + m] : x[m * K + k];
-        auto y_dat = trans_y ? y[n * K + k] : y[k * N + n];
-        *out_data += x_dat * y_dat;
-      }
-    }
-  }
+  using AccT = typename GEMMAccType<T>::Type;
+  int64_t m = M, k = K, n = N;
+  funcs::GemmOperand<const T> a{x, 0, trans_x ? 1 : k, trans_x ? m : 1};
+  funcs::GemmOperand<const T> b{y, 0, trans_y ? 1 : n, trans_y ? k : 1};
+  funcs::GemmOperand<T> c{out, 0, trans_out ? 1 : n, trans_out ? m : 1};
+  funcs::Gemm<T, AccT>(m, n, k, AccT(1), a, b, AccT(0), c);
 }
 
 template <typename T>
@@ -55,42 +66,18 @@ void BatchedGEMM(bool trans_x,
                  bool bs_flag = false,
                  bool reduce_bs = false,
                  float alpha = 1.0) {
-  memset(out, 0, sizeof(T) * (reduce_bs ? M * N : batch_size * M * N));
-  if (x_is_larger) {
-    for (size_t bs = 0; bs < batch_size; ++bs) {
-      for (size_t m = 0; m < M; ++m) {
-        for (size_t n = 0; n < N; ++n) {
-          auto out_bs = reduce_bs ? 0 : bs * M * N;
-          auto* out_data =
-              trans_out ? &out[out_bs + n * M + m] : &out[out_bs + m * N + n];
-          for (size_t k = 0; k < K; ++k) {
-            auto x_dat =
-                trans_x ? x[bs * M * K + k * M + m] : x[bs * M * K + m * K + k];
-            auto y_bs = bs_flag ? bs * N * K : 0;
-            auto y_dat = trans_y ? y[y_bs + n * K + k] : y[y_bs + k * N + n];
-            *out_data += static_cast<T>(alpha) * (x_dat * y_dat);
-          }
-        }
-      }
-    }
-  } else {
-    for (size_t bs = 0; bs < batch_size; ++bs) {
-      for (size_t m = 0; m < M; ++m) {
-        for (size_t n = 0; n < N; ++n) {
-          auto out_bs = reduce_bs ? 0 : bs * M * N;
-          auto* out_data =
-              trans_out ? &out[out_bs + n * M + m] : &out[out_bs + m * N + n];
-          for (size_t k = 0; k < K; ++k) {
-            auto y_dat =
-                trans_y ? y[bs * K * N + n * K + k] : y[bs * K * N + k * N + n];
-            auto x_bs = bs_flag ? bs * M * K : 0;
-            auto x_dat = trans_x ? x[x_bs + k * M + m] : x[x_bs + m * K + k];
-            *out_data += static_cast<T>(alpha) * (x_dat * y_dat);
-          }
-        }
-      }
-    }
-  }
+  using AccT = typename GEMMAccType<T>::Type;
+  int64_t m = M, k = K, n = N;
+  // The larger operand carries the batch, the other one is broadcast unless
+  // bs_flag says it is batched too. reduce_bs sums all batches into out.
+  int64_t x_bs = (x_is_larger || bs_flag) ? m * k : 0;
+  int64_t y_bs = (!x_is_larger || bs_flag) ? k * n : 0;
+  int64_t out_bs = reduce_bs ? 0 : m * n;
+  funcs::GemmOperand<const T> a{x, x_bs, trans_x ? 1 : k, trans_x ? m : 1};
+  funcs::GemmOperand<const T> b{y, y_bs, trans_y ? 1 : n, trans_y ? k : 1};
+  funcs::GemmOperand<T> c{out, out_bs, trans_out ? 1 : n, trans_out ? m : 1};
+  funcs::BatchedGemm<T, AccT>(
+      batch_size, m, n, k, static_cast<AccT>(alpha), a, b, AccT(0), c);
 }
 
 template <typename T>
@@ -544,6 +531,7 @@ PD_BUILD_PHI_KERNEL(matmul,
                     ALL_LAYOUT,
                     custom_kernel::MatmulKernel,
                     phi::dtype::float16,
+                    phi::dtype::bfloat16,
                     float,
                     double) {}
 
@@ -552,5 +540,6 @@ PD_BUILD_PHI_KERNEL(matmul_grad,
                     ALL_LAYOUT,
                     custom_kernel::MatmulGradKernel,
                     phi::dtype::float16,
+                    phi::dtype::bfloat16,
                     float,
                     double) {}
@@ -12,19 +12,40 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <cstdlib>
+
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
 namespace custom_kernel {
 
+// Whether memcpy_h2d/memcpy_d2h share the source allocation instead of
+// copying it, as read from FLAGS_custom_cpu_zero_copy_memcpy. Host and
+// device memory are the same heap on custom_cpu, so the shared buffer is
+// valid on both sides, but an in-place write to either tensor afterwards
+// shows through the other. Off by default for that reason.
+static bool ZeroCopyMemcpyEnabled() {
+  static const bool enabled = [] {
+    const char* env = std::getenv("FLAGS_custom_cpu_zero_copy_memcpy");
+    return env && std::atoi(env) != 0;
+  }();
+  return enabled;
+}
+
 template <typename T>
 void MemcpyD2HKernel(const phi::Context& dev_ctx,
                      const phi::DenseTensor& x,
                      int dst_place_type,
                      phi::DenseTensor* out) {
+  if (ZeroCopyMemcpyEnabled()) {
+    out->ShareDataWith(x);
+    return;
+  }
   auto out_data = dev_ctx.HostAlloc<T>(out);
   auto x_data = x.data<T>();
-  memcpy(out_data, x_data, x.memory_size());
+  if (out_data != x_data) {
+    memcpy(out_data, x_data, x.memory_size());
+  }
 }
 
 template <typename T>
@@ -32,9 +53,15 @@ void MemcpyH2DKernel(const phi::Context& dev_ctx,
                      const phi::DenseTensor& x,
                      int dst_place_type,
                      phi::DenseTensor* out) {
+  if (ZeroCopyMemcpyEnabled()) {
+    out->ShareDataWith(x);
+    return;
+  }
   auto out_data = dev_ctx.Alloc<T>(out);
   auto x_data = x.data<T>();
-  memcpy(out_data, x_data, x.memory_size());
+  if (out_data != x_data) {
+    memcpy(out_data, x_data, x.memory_size());
+  }
 }
 
 }  // namespace custom_kernel
@@ -0,0 +1,175 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include <string>
+#include <vector>
+
+#include "kernels/funcs/optimizer.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+using MomentumMT = typename funcs::OptimizerStateType<T>::type;
+
+// Points one tensor of a momentum step at its inputs and allocated
+// outputs. master_param is null unless the step runs in multi precision.
+template <typename T>
+funcs::MomentumTensor<T, MomentumMT<T>> MakeMomentumTensor(
+    const phi::Context& dev_ctx,
+    const phi::DenseTensor& param,
+    const phi::DenseTensor& grad,
+    const phi::DenseTensor& velocity,
+    const phi::DenseTensor& learning_rate,
+    const phi::DenseTensor* master_param,
+    const std::string& regularization_method,
+    float regularization_coeff,
+    phi::DenseTensor* param_out,
+    phi::DenseTensor* velocity_out,
+    phi::DenseTensor* master_param_out) {
+  using MT = MomentumMT<T>;
+  funcs::MomentumTensor<T, MT> t = {};
+  t.numel = param.numel();
+  t.param = param.data<T>();
+  t.grad = grad.data<T>();
+  t.velocity = velocity.data<MT>();
+  t.param_out = dev_ctx.template Alloc<T>(param_out);
+  t.velocity_out = dev_ctx.template Alloc<MT>(velocity_out);
+  if (master_param) {
+    t.master_param = master_param->data<MT>();
+    t.master_param_out = dev_ctx.template Alloc<MT>(master_param_out);
+  }
+  t.lr = learning_rate.data<MT>()[0];
+  t.l2_coeff = regularization_method == "l2_decay"
+                   ? static_cast<MT>(regularization_coeff)
+                   : MT(0);
+  return t;
+}
+
+template <typename T>
+void MomentumKernel(const phi::Context& dev_ctx,
+                    const phi::DenseTensor& param,
+                    const phi::DenseTensor& grad,
+                    const phi::DenseTensor& velocity,
+                    const phi::DenseTensor& learning_rate,
+                    const paddle::optional<phi::DenseTensor>& master_param,
+                    float mu,
+                    bool use_nesterov,
+                    const std::string& regularization_method,
+                    float regularization_coeff,
+                    bool multi_precision,
+                    float rescale_grad,
+                    phi::DenseTensor* param_out,
+                    phi::DenseTensor* velocity_out,
+                    phi::DenseTensor* master_param_out) {
+  using MT = MomentumMT<T>;
+  const phi::DenseTensor* master =
+      multi_precision ? master_param.get_ptr() : nullptr;
+  PD_CHECK(!multi_precision || master,
+           "momentum with multi_precision needs the master_param input.");
+  funcs::MomentumConfig<MT> config = {
+      static_cast<MT>(mu), static_cast<MT>(rescale_grad), use_nesterov};
+  funcs::MomentumUpdate<T, MT>({MakeMomentumTensor<T>(dev_ctx,
+                                                      param,
+                                                      grad,
+                                                      velocity,
+                                                      learning_rate,
+                                                      master,
+                                                      regularization_method,
+                                                      regularization_coeff,
+                                                      param_out,
+                                                      velocity_out,
+                                                      master_param_out)},
+                               config);
+}
+
+// Updates every parameter of the list in one parallel region. Each has its
+// own learning rate, and regularization_method and regularization_coeff
+// are either per parameter or empty for none.
+template <typename T>
+void MergedMomentumKernel(
+    const phi::Context& dev_ctx,
+    const std::vector<const phi::DenseTensor*>& param,
+    const std::vector<const phi::DenseTensor*>& grad,
+    const std::vector<const phi::DenseTensor*>& velocity,
+    const std::vector<const phi::DenseTensor*>& learning_rate,
+    const std::vector<const phi::DenseTensor*>& master_param,
+    float mu,
+    bool use_nesterov,
+    const std::vector<std::string>& regularization_method,
+    const std::vector<float>& regularization_coeff,
+    bool multi_precision,
+    float rescale_grad,
+    std::vector<phi::DenseTensor*> param_out,
+    std::vector<phi::DenseTensor*> velocity_out,
+    std::vector<phi::DenseTensor*> master_param_out) {
+  using MT = MomentumMT<T>;
+  const size_t n = param.size();
+  PD_CHECK(grad.size() == n && velocity.size() == n,
+           "merged_momentum needs as many grad and velocity tensors as "
+           "params (%d).",
+           static_cast<int>(n));
+  PD_CHECK(learning_rate.size() == n || learning_rate.size() == 1,
+           "merged_momentum needs one learning_rate or one per param.");
+  PD_CHECK(
+      regularization_method.empty() || (regularization_method.size() == n &&
+                                        regularization_coeff.size() == n),
+      "merged_momentum needs no regularization or one per param.");
+  // phi::capi passes an absent master_param as an empty list.
+  const bool masters = multi_precision && !master_param.empty();
+  PD_CHECK(!multi_precision || master_param.size() == n,
+           "merged_momentum with multi_precision needs one master_param per "
+           "param.");
+
+  const std::string none;
+  std::vector<funcs::MomentumTensor<T, MT>> tensors;
+  for (size_t i = 0; i < n; ++i) {
+    const bool regularized = !regularization_method.empty();
+    tensors.push_back(
+        MakeMomentumTensor<T>(dev_ctx,
+                              *param[i],
+                              *grad[i],
+                              *velocity[i],
+                              *learning_rate[learning_rate.size() == 1 ? 0 : i],
+                              masters ? master_param[i] : nullptr,
+                              regularized ? regularization_method[i] : none,
+                              regularized ? regularization_coeff[i] : 0.0f,
+                              param_out[i],
+                              velocity_out[i],
+                              masters ? master_param_out[i] : nullptr));
+  }
+  funcs::MomentumConfig<MT> config = {
+      static_cast<MT>(mu), static_cast<MT>(rescale_grad), use_nesterov};
+  funcs::MomentumUpdate<T, MT>(tensors, config);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(momentum,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MomentumKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
+
+PD_BUILD_PHI_KERNEL(merged_momentum,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MergedMomentumKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
@@ -18,7 +18,9 @@
 #include <cmath>
 #include <numeric>
 #include <sstream>
+#include <type_traits>
 
+#include "kernels/funcs/convert.h"
 #include "paddle/phi/capi/all.h"
 
 namespace phi {
@@ -74,6 +76,59 @@ static inline std::string to_string(const std::vector<T>& vec) {
   return ss.str();
 }
 
+// Data of an optional input, or null when the input is absent.
+template <typename T>
+static inline const T* OptionalData(
+    const paddle::optional<phi::DenseTensor>& t) {
+  return t.get_ptr() ? t.get_ptr()->data<T>() : nullptr;
+}
+
+// Whether T is one of the 16-bit floats, which kernels store but compute
+// on in float.
+template <typename T>
+struct IsLowPrecision : std::false_type {};
+
+template <>
+struct IsLowPrecision<phi::dtype::float16> : std::true_type {};
+
+template <>
+struct IsLowPrecision<phi::dtype::bfloat16> : std::true_type {};
+
+// Converts n values of T to float. The 16-bit floats take the vectorized
+// bit conversions of kernels/funcs/convert.h.
+template <typename T>
+inline void ToFloat(const T* in, float* out, int64_t n) {
+  for (int64_t i = 0; i < n; ++i) out[i] = static_cast<float>(in[i]);
+}
+
+template <>
+inline void ToFloat(const phi::dtype::float16* in, float* out, int64_t n) {
+  custom_kernel::funcs::Fp16ToFloat(
+      reinterpret_cast<const uint16_t*>(in), out, n);
+}
+
+template <>
+inline void ToFloat(const phi::dtype::bfloat16* in, float* out, int64_t n) {
+  custom_kernel::funcs::Bf16ToFloat(
+      reinterpret_cast<const uint16_t*>(in), out, n);
+}
+
+// Converts n floats to T.
+template <typename T>
+inline void FromFloat(const float* in, T* out, int64_t n) {
+  for (int64_t i = 0; i < n; ++i) out[i] = static_cast<T>(in[i]);
+}
+
+template <>
+inline void FromFloat(const float* in, phi::dtype::float16* out, int64_t n) {
+  custom_kernel::funcs::FloatToFp16(in, reinterpret_cast<uint16_t*>(out), n);
+}
+
+template <>
+inline void FromFloat(const float* in, phi::dtype::bfloat16* out, int64_t n) {
+  custom_kernel::funcs::FloatToBf16(in, reinterpret_cast<uint16_t*>(out), n);
+}
+
 static inline std::vector<int64_t> slice_ddim(const std::vector<int64_t>& dim,
                                               int begin,
                                               int end) {
@@ -82,7 +137,8 @@ static inline std::vector<int64_t> slice_ddim(const std::vector<int64_t>& dim,
 
 template <typename T>
 static inline int64_t product(const std::vector<T>& ddim) {
-  return std::accumulate(ddim.cbegin(), ddim.cend(), 1, std::multiplies<T>());
+  return std::accumulate(
+      ddim.cbegin(), ddim.cend(), static_cast<T>(1), std::multiplies<T>());
 }
 
 template <typename T>
@@ -94,6 +150,36 @@ T vec_product(const std::vector<T>& a, const std::vector<T>& b) {
   return ret;
 }
 
+// Expands `paddings` to [top, bottom, left, right] (two entries per spatial
+// dim) and applies the SAME/VALID padding algorithms.
+static inline void UpdatePaddingAndDilation(
+    std::vector<int>* paddings,
+    std::vector<int>* dilation,
+    const std::string& padding_algorithm,
+    const std::vector<int64_t>& data_dims,
+    const std::vector<int>& strides,
+    const std::vector<int>& ksize) {
+  if (paddings->size() == data_dims.size()) {
+    for (size_t i = 0; i < data_dims.size(); ++i) {
+      int copy_pad = *(paddings->begin() + 2 * i);
+      paddings->insert(paddings->begin() + 2 * i + 1, copy_pad);
+    }
+  }
+  if (padding_algorithm == "SAME") {
+    for (size_t i = 0; i < data_dims.size(); ++i) {
+      int out_size = (data_dims[i] + strides[i] - 1) / strides[i];
+      int pad_sum = std::max((out_size - 1) * strides[i] + ksize[i] -
+                                 static_cast<int>(data_dims[i]),
+                             0);
+      (*paddings)[i * 2] = pad_sum / 2;
+      (*paddings)[i * 2 + 1] = pad_sum - pad_sum / 2;
+      (*dilation)[i] = 1;
+    }
+  } else if (padding_algorithm == "VALID") {
+    std::fill(paddings->begin(), paddings->end(), 0);
+  }
+}
+
 namespace funcs {
 
 static inline int CanonicalAxis(const int axis, const int rank) {
@@ -256,6 +342,31 @@ inline std::vector<int64_t> GetDecreasedDims(
   return decreased_dims;
 }
 
+// Pooling counterpart of phi::UpdatePaddingAndDilation: global and adaptive
+// pooling use no padding.
+static inline void UpdatePadding(std::vector<int>* paddings,
+                                 const bool global_pooling,
+                                 const bool adaptive,
+                                 const std::string& padding_algorithm,
+                                 const std::vector<int64_t>& data_dims,
+                                 const std::vector<int>& strides,
+                                 const std::vector<int>& kernel_size) {
+  std::vector<int> dilation(data_dims.size(), 1);
+  UpdatePaddingAndDilation(
+      paddings, &dilation, padding_algorithm, data_dims, strides, kernel_size);
+  if (global_pooling || adaptive) {
+    std::fill(paddings->begin(), paddings->end(), 0);
+  }
+}
+
+static inline void UpdateKernelSize(std::vector<int>* kernel_size,
+                                    const std::vector<int64_t>& data_dims) {
+  kernel_size->resize(data_dims.size());
+  for (size_t i = 0; i < data_dims.size(); ++i) {
+    (*kernel_size)[i] = static_cast<int>(data_dims[i]);
+  }
+}
+
 }  // namespace funcs
 
 template <typename T>
@@ -0,0 +1,155 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/pool.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Resolves the pool2d attributes of an input of `in_dims` pooled into
+// `out_dims` into the engine's shape.
+inline funcs::Pool2dShape MakePool2dShape(
+    const std::vector<int64_t>& in_dims,
+    const std::vector<int64_t>& out_dims,
+    const phi::IntArray& kernel_size,
+    const std::vector<int>& strides_t,
+    const std::vector<int>& paddings_t,
+    bool exclusive,
+    const std::string& data_format,
+    const std::string& pooling_type,
+    bool global_pooling,
+    bool adaptive,
+    const std::string& padding_algorithm) {
+  PD_CHECK(in_dims.size() == 4,
+           "pool2d expects a 4-D input, but received %d-D.",
+           static_cast<int>(in_dims.size()));
+  PD_CHECK(pooling_type == "max" || pooling_type == "avg",
+           "pooling_type must be max or avg, but received %s.",
+           pooling_type.c_str());
+  const bool channel_last = data_format == "NHWC";
+  std::vector<int> ksize(kernel_size.GetData().begin(),
+                         kernel_size.GetData().end());
+  auto strides = strides_t;
+  auto paddings = paddings_t;
+  std::vector<int64_t> data_dims =
+      channel_last ? std::vector<int64_t>{in_dims[1], in_dims[2]}
+                   : std::vector<int64_t>{in_dims[2], in_dims[3]};
+  if (global_pooling) {
+    phi::funcs::UpdateKernelSize(&ksize, data_dims);
+  }
+  phi::funcs::UpdatePadding(&paddings,
+                            global_pooling,
+                            adaptive,
+                            padding_algorithm,
+                            data_dims,
+                            strides,
+                            ksize);
+
+  funcs::Pool2dShape shape;
+  shape.batch = in_dims[0];
+  shape.channels = channel_last ? in_dims[3] : in_dims[1];
+  shape.in_h = data_dims[0];
+  shape.in_w = data_dims[1];
+  shape.out_h = channel_last ? out_dims[1] : out_dims[2];
+  shape.out_w = channel_last ? out_dims[2] : out_dims[3];
+  shape.kernel_h = ksize[0];
+  shape.kernel_w = ksize[1];
+  shape.stride_h = strides[0];
+  shape.stride_w = strides[1];
+  shape.pad_top = paddings[0];
+  shape.pad_left = paddings[2];
+  shape.adaptive = adaptive;
+  shape.exclusive = exclusive;
+  shape.channel_last = channel_last;
+  shape.max = pooling_type == "max";
+  return shape;
+}
+
+template <typename T>
+void Pool2dKernel(const phi::Context& dev_ctx,
+                  const phi::DenseTensor& x,
+                  const phi::IntArray& kernel_size,
+                  const std::vector<int>& strides,
+                  const std::vector<int>& paddings,
+                  bool ceil_mode,
+                  bool exclusive,
+                  const std::string& data_format,
+                  const std::string& pooling_type,
+                  bool global_pooling,
+                  bool adaptive,
+                  const std::string& padding_algorithm,
+                  phi::DenseTensor* out) {
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  auto shape = MakePool2dShape(x.dims(),
+                               out->dims(),
+                               kernel_size,
+                               strides,
+                               paddings,
+                               exclusive,
+                               data_format,
+                               pooling_type,
+                               global_pooling,
+                               adaptive,
+                               padding_algorithm);
+  funcs::Pool2dForward(shape, x.data<T>(), out_data);
+}
+
+template <typename T>
+void Pool2dGradKernel(const phi::Context& dev_ctx,
+                      const phi::DenseTensor& x,
+                      const phi::DenseTensor& out,
+                      const phi::DenseTensor& out_grad,
+                      const phi::IntArray& kernel_size,
+                      const std::vector<int>& strides,
+                      const std::vector<int>& paddings,
+                      bool ceil_mode,
+                      bool exclusive,
+                      const std::string& data_format,
+                      const std::string& pooling_type,
+                      bool global_pooling,
+                      bool adaptive,
+                      const std::string& padding_algorithm,
+                      phi::DenseTensor* x_grad) {
+  T* dx = dev_ctx.template Alloc<T>(x_grad);
+  auto shape = MakePool2dShape(x.dims(),
+                               out.dims(),
+                               kernel_size,
+                               strides,
+                               paddings,
+                               exclusive,
+                               data_format,
+                               pooling_type,
+                               global_pooling,
+                               adaptive,
+                               padding_algorithm);
+  funcs::Pool2dBackward(
+      shape, x.data<T>(), out.data<T>(), out_grad.data<T>(), dx);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(pool2d,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Pool2dKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(pool2d_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Pool2dGradKernel,
+                    float,
+                    double) {}
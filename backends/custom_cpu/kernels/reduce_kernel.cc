@@ -13,12 +13,26 @@
 // limitations under the License.
 
 #include <cmath>
+#include <limits>
+#include <vector>
 
+#include "kernels/funcs/reduce.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
 namespace custom_kernel {
 
+// Flags the dims of x that are reduced. Negative dims count from the back.
+inline std::vector<bool> GetReduceMask(int64_t rank,
+                                       const std::vector<int64_t>& dims,
+                                       bool reduce_all) {
+  std::vector<bool> reduced(rank, reduce_all);
+  for (auto d : dims) {
+    reduced[d < 0 ? d + rank : d] = true;
+  }
+  return reduced;
+}
+
 template <typename T>
 void MeanRawKernel(const phi::Context& dev_ctx,
                    const phi::DenseTensor& x,
@@ -26,56 +40,22 @@ void MeanRawKernel(const phi::Context& dev_ctx,
                    bool keep_dim,
                    bool reduce_all,
                    phi::DenseTensor* out) {
+  using AccT = typename funcs::ReduceAccType<T>::type;
   auto x_dims = x.dims();
-  auto reduce_dims = dims.GetData();
-  if (reduce_all) {
-    reduce_dims.clear();
-    for (auto i = 0; i < x_dims.size(); ++i) {
-      reduce_dims.push_back(i);
-    }
+  auto reduced = GetReduceMask(x_dims.size(), dims.GetData(), reduce_all);
+  AccT reduce_numel = 1;
+  for (size_t i = 0; i < x_dims.size(); ++i) {
+    if (reduced[i]) reduce_numel *= x_dims[i];
   }
-  for (auto& d : reduce_dims) {
-    // handle negative dims, f.e. "-1" means rightmost dimension
-    if (d < 0) {
-      d = d + x_dims.size();
-    }
-  }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-  memset(out_data, 0, sizeof(T) * out->numel());
-  size_t reduce_numel = 1;
-  for (auto d : reduce_dims) {
-    reduce_numel *= x_dims[d];
-  }
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] +=
-        x_data[phi::vec_product(step, index)] / reduce_numel;
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  funcs::Reduce(
+      x.data<T>(),
+      x_dims,
+      reduced,
+      out_data,
+      static_cast<AccT>(0),
+      funcs::SumReducer(),
+      [reduce_numel](AccT acc) { return static_cast<T>(acc / reduce_numel); });
 }
 
 template <typename T>
@@ -99,57 +79,18 @@ void SumRawKernel(const phi::Context& dev_ctx,
                   bool reduce_all,
                   phi::DataType out_dtype,
                   phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto reduce_dims = dims.GetData();
-  if (reduce_dims.size() == 0) {
+  if (dims.size() == 0) {
     reduce_all = true;
   }
-  if (reduce_all) {
-    reduce_dims.clear();
-    for (auto i = 0; i < x_dims.size(); ++i) {
-      reduce_dims.push_back(i);
-    }
-  }
-
-  for (auto& d : reduce_dims) {
-    // handle negative dims, f.e. "-1" means rightmost dimension
-    if (d < 0) {
-      d = d + x_dims.size();
-    }
-  }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-
-  memset(out_data, 0, sizeof(T) * out->numel());
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] +=
-        x_data[phi::vec_product(step, index)];
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  using AccT = typename funcs::ReduceAccType<T>::type;
+  funcs::Reduce(x.data<T>(),
+                x.dims(),
+                GetReduceMask(x.dims().size(), dims.GetData(), reduce_all),
+                out_data,
+                static_cast<AccT>(0),
+                funcs::SumReducer(),
+                [](AccT acc) { return static_cast<T>(acc); });
 }
 
 template <typename T>
@@ -173,57 +114,17 @@ void MinRawKernel(const phi::Context& dev_ctx,
                   bool keep_dim,
                   bool reduce_all,
                   phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto reduce_dims = dims.GetData();
-  if (reduce_dims.size() == 0) {
+  if (dims.size() == 0) {
     reduce_all = true;
   }
-  if (reduce_all) {
-    reduce_dims.clear();
-    for (auto i = 0; i < x_dims.size(); ++i) {
-      reduce_dims.push_back(i);
-    }
-  }
-
-  for (auto& d : reduce_dims) {
-    // handle negative dims, f.e. "-1" means rightmost dimension
-    if (d < 0) {
-      d = d + x_dims.size();
-    }
-  }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-  std::fill(out_data, out_data + out->numel(), std::numeric_limits<T>::max());
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] =
-        std::min(out_data[phi::vec_product(dst_step, index)],
-                 x_data[phi::vec_product(step, index)]);
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  funcs::Reduce(x.data<T>(),
+                x.dims(),
+                GetReduceMask(x.dims().size(), dims.GetData(), reduce_all),
+                out_data,
+                std::numeric_limits<T>::max(),
+                funcs::MinReducer(),
+                [](T acc) { return acc; });
 }
 
 template <typename T>
@@ -246,54 +147,14 @@ void MaxRawKernel(const phi::Context& dev_ctx,
                   bool keep_dim,
                   bool reduce_all,
                   phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto reduce_dims = dims.GetData();
-  if (reduce_all) {
-    reduce_dims.clear();
-    for (auto i = 0; i < x_dims.size(); ++i) {
-      reduce_dims.push_back(i);
-    }
-  }
-  for (auto& d : reduce_dims) {
-    // handle negative dims, f.e. "-1" means rightmost dimension
-    if (d < 0) {
-      d = d + x_dims.size();
-    }
-  }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
-
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-  std::fill(
-      out_data, out_data + out->numel(), std::numeric_limits<T>::lowest());
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] =
-        std::max(out_data[phi::vec_product(dst_step, index)],
-                 x_data[phi::vec_product(step, index)]);
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  funcs::Reduce(x.data<T>(),
+                x.dims(),
+                GetReduceMask(x.dims().size(), dims.GetData(), reduce_all),
+                out_data,
+                std::numeric_limits<T>::lowest(),
+                funcs::MaxReducer(),
+                [](T acc) { return acc; });
 }
 
 template <typename T>
@@ -316,20 +177,36 @@ PD_BUILD_PHI_KERNEL(mean_raw,
                     ALL_LAYOUT,
                     custom_kernel::MeanRawKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
-PD_BUILD_PHI_KERNEL(
-    mean, custom_cpu, ALL_LAYOUT, custom_kernel::MeanKernel, float, double) {}
+PD_BUILD_PHI_KERNEL(mean,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MeanKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(sum_raw,
                     custom_cpu,
                     ALL_LAYOUT,
                     custom_kernel::SumRawKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
-PD_BUILD_PHI_KERNEL(
-    sum, custom_cpu, ALL_LAYOUT, custom_kernel::SumKernel, float, double) {}
+PD_BUILD_PHI_KERNEL(sum,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::SumKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(min_raw,
                     custom_cpu,
@@ -338,7 +215,9 @@ PD_BUILD_PHI_KERNEL(min_raw,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(min,
                     custom_cpu,
@@ -347,7 +226,9 @@ PD_BUILD_PHI_KERNEL(min,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(max_raw,
                     custom_cpu,
@@ -356,7 +237,9 @@ PD_BUILD_PHI_KERNEL(max_raw,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(max,
                     custom_cpu,
@@ -365,4 +248,6 @@ PD_BUILD_PHI_KERNEL(max,
                     int32_t,
                     int64_t,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
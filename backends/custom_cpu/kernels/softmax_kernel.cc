@@ -12,44 +12,108 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <algorithm>
+#include <type_traits>
+#include <vector>
+
+#include "kernels/funcs/softmax.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
+#include "runtime/thread_pool.h"
 
 namespace custom_kernel {
 
+// Elements of a float16 or bfloat16 softmax widened to float at a time.
+constexpr int64_t kSoftmaxStageSize = 1 << 20;
+
+// Runs fn(fa, fb, rows, fout) on float copies of a and b, whole slices of
+// `slice` elements at a time, and narrows fout back to out. The float
+// engine computes the exps and sums of a 16-bit softmax this way while the
+// tensors stay 16-bit. b may be null.
+template <typename T, typename Fn>
+void RunInFloat(
+    const T* a, const T* b, int64_t outer, int64_t slice, T* out, Fn fn) {
+  auto rows = std::min(outer, std::max<int64_t>(1, kSoftmaxStageSize / slice));
+  std::vector<float> fa(rows * slice), fb(b ? rows * slice : 0);
+  std::vector<float> fout(rows * slice);
+  for (int64_t o = 0; o < outer; o += rows) {
+    auto n = std::min(rows, outer - o);
+    auto first = o * slice;
+    custom_cpu::ParallelFor(
+        0,
+        n * slice,
+        custom_cpu::kDefaultGrainSize,
+        [&](int64_t begin, int64_t end) {
+          phi::ToFloat(a + first + begin, fa.data() + begin, end - begin);
+          if (b) {
+            phi::ToFloat(b + first + begin, fb.data() + begin, end - begin);
+          }
+        });
+    fn(fa.data(), fb.data(), n, fout.data());
+    custom_cpu::ParallelFor(
+        0,
+        n * slice,
+        custom_cpu::kDefaultGrainSize,
+        [&](int64_t begin, int64_t end) {
+          phi::FromFloat(fout.data() + begin, out + first + begin, end - begin);
+        });
+  }
+}
+
 template <typename T>
-T ValueClip(const T& x) {
-  const T kThreshold = static_cast<T>(-64.);
-  return x < kThreshold ? kThreshold : x;
+void SoftmaxForward(const T* x,
+                    int64_t outer,
+                    int64_t axis_dim,
+                    int64_t inner,
+                    T* y,
+                    std::false_type) {
+  funcs::SoftmaxForward(x, outer, axis_dim, inner, y);
 }
 
 template <typename T>
-void Softmax(int axis_dim, const T* in, T* out, size_t M, size_t N) {
-  auto remain = N / axis_dim;
-
-  for (size_t i = 0; i < M; ++i) {
-    for (size_t k = 0; k < remain; ++k) {
-      T max_val = in[i * N + k];
-      for (size_t j = 0; j < axis_dim; ++j) {
-        max_val = std::max(max_val, in[i * N + j * remain + k]);
-      }
-
-      auto exps = new T[axis_dim];
-      for (size_t j = 0; j < axis_dim; ++j) {
-        exps[j] = std::exp(ValueClip(in[i * N + j * remain + k] - max_val));
-      }
-
-      T sum = 0;
-      for (size_t j = 0; j < axis_dim; ++j) {
-        sum += exps[j];
-      }
-
-      for (size_t j = 0; j < axis_dim; ++j) {
-        out[i * N + j * remain + k] = exps[j] / sum;
-      }
-      delete[] exps;
-    }
-  }
+void SoftmaxForward(const T* x,
+                    int64_t outer,
+                    int64_t axis_dim,
+                    int64_t inner,
+                    T* y,
+                    std::true_type) {
+  RunInFloat(x,
+             static_cast<const T*>(nullptr),
+             outer,
+             axis_dim * inner,
+             y,
+             [&](const float* fx, const float*, int64_t rows, float* fy) {
+               funcs::SoftmaxForward(fx, rows, axis_dim, inner, fy);
+             });
+}
+
+template <typename T>
+void SoftmaxBackward(const T* y,
+                     const T* dy,
+                     int64_t outer,
+                     int64_t axis_dim,
+                     int64_t inner,
+                     T* dx,
+                     std::false_type) {
+  funcs::SoftmaxBackward(y, dy, outer, axis_dim, inner, dx);
+}
+
+template <typename T>
+void SoftmaxBackward(const T* y,
+                     const T* dy,
+                     int64_t outer,
+                     int64_t axis_dim,
+                     int64_t inner,
+                     T* dx,
+                     std::true_type) {
+  RunInFloat(y,
+             dy,
+             outer,
+             axis_dim * inner,
+             dx,
+             [&](const float* fy, const float* fdy, int64_t rows, float* fdx) {
+               funcs::SoftmaxBackward(fy, fdy, rows, axis_dim, inner, fdx);
+             });
 }
 
 template <typename T>
@@ -73,33 +137,12 @@ void SoftmaxKernel(const phi::Context& dev_ctx,
 
   const int n = phi::funcs::SizeToAxis(calc_axis, x.dims());
   const int d = phi::funcs::SizeFromAxis(calc_axis, x.dims());
-  Softmax(axis_dim, x.data<T>(), out->data<T>(), n, d);
-}
-
-template <typename T>
-void SoftmaxGrad(
-    const T* out, const T* out_grad, int axis_dim, int M, int N, T* x_grad) {
-  int num_remain = N / axis_dim;
-  T* dot = new T[M * num_remain];
-  for (auto i = 0; i < M; ++i) {
-    for (auto k = 0; k < num_remain; ++k) {
-      dot[i * num_remain + k] = 0;
-      for (auto j = 0; j < axis_dim; ++j) {
-        dot[i * num_remain + k] += out[i * N + j * num_remain + k] *
-                                   out_grad[i * N + j * num_remain + k];
-      }
-    }
-  }
-  for (auto i = 0; i < M; ++i) {
-    for (auto j = 0; j < axis_dim; ++j) {
-      for (auto k = 0; k < num_remain; ++k) {
-        x_grad[i * N + j * num_remain + k] =
-            (out_grad[i * N + j * num_remain + k] - dot[i * num_remain + k]) *
-            out[i * N + j * num_remain + k];
-      }
-    }
-  }
-  delete[] dot;
+  SoftmaxForward(x.data<T>(),
+                 n,
+                 axis_dim,
+                 d / axis_dim,
+                 out_data,
+                 phi::IsLowPrecision<T>());
 }
 
 template <typename T>
@@ -125,8 +168,13 @@ void SoftmaxGradKernel(const phi::Context& dev_ctx,
 
   const int n = phi::funcs::SizeToAxis(calc_axis, x_grad->dims());
   const int d = phi::funcs::SizeFromAxis(calc_axis, x_grad->dims());
-  SoftmaxGrad(
-      out.data<T>(), out_grad.data<T>(), axis_dim, n, d, x_grad->data<T>());
+  SoftmaxBackward(out.data<T>(),
+                  out_grad.data<T>(),
+                  n,
+                  axis_dim,
+                  d / axis_dim,
+                  x_grad_data,
+                  phi::IsLowPrecision<T>());
 }
 
 }  // namespace custom_kernel
@@ -136,11 +184,15 @@ PD_BUILD_PHI_KERNEL(softmax,
                     ALL_LAYOUT,
                     custom_kernel::SoftmaxKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(softmax_grad,
                     custom_cpu,
                     ALL_LAYOUT,
                     custom_kernel::SoftmaxGradKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
@@ -0,0 +1,125 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/concat.h"
+#include "paddle/phi/capi/all.h"
+#include "phi_funcs.h"  //NOLINT
+
+namespace custom_kernel {
+
+template <typename T>
+void SplitBySections(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& x,
+                     std::vector<int64_t> sections,
+                     int64_t axis,
+                     std::vector<phi::DenseTensor*> outs) {
+  auto in_dims = x.dims();
+  if (axis < 0) {
+    axis = axis + in_dims.size();
+  }
+
+  // At most one section is -1 and takes what the others leave.
+  int64_t known = 0;
+  int unknown = -1;
+  for (size_t i = 0; i < sections.size(); ++i) {
+    if (sections[i] == -1) {
+      unknown = i;
+    } else {
+      known += sections[i];
+    }
+  }
+  if (unknown != -1) {
+    sections[unknown] = in_dims[axis] - known;
+  }
+  PD_CHECK(sections.size() == outs.size(),
+           "The number of sections (%d) must match the number of outputs "
+           "(%d).",
+           static_cast<int>(sections.size()),
+           static_cast<int>(outs.size()));
+
+  const int64_t outer = phi::product(phi::slice_ddim(in_dims, 0, axis));
+  const int64_t inner = phi::product(
+      phi::slice_ddim(in_dims, axis + 1, static_cast<int>(in_dims.size())));
+  std::vector<funcs::ConcatSlice> slices;
+  slices.reserve(outs.size());
+  for (size_t j = 0; j < outs.size(); ++j) {
+    auto out_dims = in_dims;
+    out_dims[axis] = sections[j];
+    outs[j]->Resize(out_dims);
+    void* data = dev_ctx.template Alloc<T>(outs[j]);
+    auto bytes = sections[j] * inner * static_cast<int64_t>(sizeof(T));
+    slices.push_back({bytes ? data : nullptr, bytes});
+  }
+  funcs::SplitBytes(x.data<T>(), outer, slices);
+}
+
+template <typename T>
+void SplitKernel(const phi::Context& dev_ctx,
+                 const phi::DenseTensor& x,
+                 const phi::IntArray& num_or_sections,
+                 const phi::Scalar& axis_scalar,
+                 std::vector<phi::DenseTensor*> outs) {
+  SplitBySections<T>(
+      dev_ctx, x, num_or_sections.GetData(), axis_scalar.to<int64_t>(), outs);
+}
+
+template <typename T>
+void SplitWithNumKernel(const phi::Context& dev_ctx,
+                        const phi::DenseTensor& x,
+                        int num,
+                        const phi::Scalar& axis_scalar,
+                        std::vector<phi::DenseTensor*> outs) {
+  int64_t axis = axis_scalar.to<int64_t>();
+  if (axis < 0) {
+    axis = axis + x.dims().size();
+  }
+  auto input_axis_dim = x.dims()[axis];
+  PD_CHECK(num > 0 && input_axis_dim % num == 0,
+           "The input's size along the split dimension must be evenly "
+           "divisible by num (%d), but received %ld.",
+           num,
+           input_axis_dim);
+  std::vector<int64_t> sections(num, input_axis_dim / num);
+  SplitBySections<T>(dev_ctx, x, sections, axis, outs);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(split,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::SplitKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t,
+                    bool,
+                    int8_t,
+                    uint8_t,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
+
+PD_BUILD_PHI_KERNEL(split_with_num,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::SplitWithNumKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t,
+                    bool,
+                    int8_t,
+                    uint8_t,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
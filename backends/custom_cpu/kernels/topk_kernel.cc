@@ -0,0 +1,128 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/sort.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+void TopkKernel(const phi::Context& dev_ctx,
+                const phi::DenseTensor& x,
+                const phi::Scalar& k_scalar,
+                int axis,
+                bool largest,
+                bool sorted,
+                phi::DenseTensor* out,
+                phi::DenseTensor* indices) {
+  auto in_dims = x.dims();
+  int64_t k = k_scalar.to<int64_t>();
+  if (in_dims.size() == 0) {
+    PD_CHECK(k == 1 || k == -1,
+             "k must be 1 or -1 for a 0-D input, but received %ld.",
+             k);
+    out->Resize(in_dims);
+    indices->Resize(in_dims);
+    *dev_ctx.template Alloc<T>(out) = *x.data<T>();
+    *dev_ctx.template Alloc<int64_t>(indices) = 0;
+    return;
+  }
+
+  axis = (axis < 0) ? (in_dims.size() + axis) : axis;
+  const int64_t n = in_dims[axis];
+  PD_CHECK(k >= 1 && k <= n,
+           "k must be in [1, %ld] along axis %d, but received %ld.",
+           n,
+           axis,
+           k);
+  // Sorted output costs at most k log k on top of the selection, so the
+  // entries are always returned in order.
+  std::vector<int64_t> out_dims(in_dims.cbegin(), in_dims.cend());
+  out_dims[axis] = k;
+  out->Resize(out_dims);
+  indices->Resize(out_dims);
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  int64_t* ids_data = dev_ctx.template Alloc<int64_t>(indices);
+
+  const int64_t outer = phi::product(phi::slice_ddim(in_dims, 0, axis));
+  const int64_t inner =
+      phi::product(phi::slice_ddim(in_dims, axis + 1, in_dims.size()));
+  funcs::TopKAlongAxis(
+      x.data<T>(), outer, n, inner, k, largest, out_data, ids_data);
+}
+
+template <typename T>
+void TopkGradKernel(const phi::Context& dev_ctx,
+                    const phi::DenseTensor& x,
+                    const phi::DenseTensor& indices,
+                    const phi::DenseTensor& out_grad,
+                    const phi::Scalar& k_scalar,
+                    int axis,
+                    bool largest,
+                    bool sorted,
+                    phi::DenseTensor* x_grad) {
+  auto in_dims = x.dims();
+  T* x_grad_data = dev_ctx.template Alloc<T>(x_grad);
+  if (x.numel() == 0) {
+    return;
+  }
+  if (in_dims.size() == 0) {
+    *x_grad_data = *out_grad.data<T>();
+    return;
+  }
+
+  axis = (axis < 0) ? (in_dims.size() + axis) : axis;
+  const int64_t n = in_dims[axis];
+  const int64_t k = out_grad.dims()[axis];
+  const int64_t outer = phi::product(phi::slice_ddim(in_dims, 0, axis));
+  const int64_t inner =
+      phi::product(phi::slice_ddim(in_dims, axis + 1, in_dims.size()));
+  auto dout = out_grad.data<T>();
+  auto ids = indices.data<int64_t>();
+  auto grain =
+      std::max<int64_t>(1, custom_cpu::kDefaultGrainSize / (n * inner));
+  custom_cpu::ParallelFor(0, outer, grain, [&](int64_t b, int64_t e) {
+    for (auto o = b; o < e; ++o) {
+      auto dx = x_grad_data + o * n * inner;
+      std::fill(dx, dx + n * inner, T(0));
+      for (int64_t j = 0; j < k; ++j) {
+        auto off = o * k * inner + j * inner;
+        for (int64_t c = 0; c < inner; ++c) {
+          dx[ids[off + c] * inner + c] = dout[off + c];
+        }
+      }
+    }
+  });
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(topk,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::TopkKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t) {}
+
+PD_BUILD_PHI_KERNEL(topk_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::TopkGradKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t) {}
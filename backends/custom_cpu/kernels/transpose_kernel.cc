@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/strided_copy.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -33,35 +34,25 @@ void TransposeKernel(const phi::Context& ctx,
   auto rank = x_dims.size();
   if (rank == 1) {
     memcpy(out_data, x_data, x.numel() * sizeof(T));
+    return;
   }
   PD_CHECK(axis.size() == rank,
            "axis.size (%d) must be equal the rank of input (%d).",
            axis.size(),
            rank);
 
-  std::vector<size_t> step(out_dims.size(), 1);
-  for (auto i = out_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * out_dims[i];
-  }
-
-  std::vector<size_t> index(rank, 0);
-  for (auto i = 0; i < x.numel(); ++i) {
-    std::vector<size_t> dst_index(rank, 0);
-    for (auto j = 0; j < rank; ++j) {
-      dst_index[j] = index[axis[j]];
-    }
-    out_data[phi::vec_product(dst_index, step)] = x_data[i];
-
-    index.back()++;
-    for (auto j = rank - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j - 1]++;
-        index[j] = 0;
-      } else {
-        break;
-      }
-    }
+  // Gather in output order: out is contiguous and reads x through the
+  // permuted strides.
+  auto x_strides = funcs::ContiguousStrides(x_dims);
+  std::vector<int64_t> src_strides(rank);
+  for (size_t j = 0; j < rank; ++j) {
+    src_strides[j] = x_strides[axis[j]];
   }
+  funcs::StridedCopy(x_data,
+                     src_strides,
+                     out_data,
+                     funcs::ContiguousStrides(out_dims),
+                     out_dims);
 }
 
 }  // namespace custom_kernel
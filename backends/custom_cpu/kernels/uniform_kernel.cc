@@ -12,25 +12,11 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
-#include <random>
-
+#include "kernels/funcs/philox.h"
 #include "paddle/phi/capi/all.h"
 
 namespace custom_kernel {
 
-template <typename T>
-inline void UniformRealDistribution(T *data,
-                                    const int64_t &size,
-                                    const float &min,
-                                    const float &max,
-                                    std::shared_ptr<std::mt19937_64> engine) {
-  std::uniform_real_distribution<T> dist(static_cast<T>(min),
-                                         static_cast<T>(max));
-  for (int64_t i = 0; i < size; ++i) {
-    data[i] = dist(*engine);
-  }
-}
-
 template <typename T>
 void UniformRawKernel(const phi::Context &dev_ctx,
                       const phi::IntArray &shape,
@@ -47,13 +33,12 @@ void UniformRawKernel(const phi::Context &dev_ctx,
   out->Resize(std::vector<int64_t>(shape_data.begin(), shape_data.end()));
   T *data = dev_ctx.template Alloc<T>(out);
   auto size = out->numel();
-  std::shared_ptr<std::mt19937_64> engine;
-
-  engine = std::make_shared<std::mt19937_64>();
-  engine->seed(seed);
 
-  UniformRealDistribution<T>(
-      data, size, min.to<float>(), max.to<float>(), engine);
+  funcs::UniformFill<T>(seed,
+                        data,
+                        size,
+                        static_cast<T>(min.to<float>()),
+                        static_cast<T>(max.to<float>()));
   if (diag_num > 0) {
     PD_CHECK(size > (diag_num - 1) * (diag_step + 1),
              "ShapeInvalid: the diagonal's elements is equal (num-1) "
@@ -0,0 +1,270 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/allocator.h"
+
+#include <unistd.h>
+
+#include <atomic>
+#include <cstdint>
+#include <cstdlib>
+#include <mutex>
+#include <vector>
+
+#include "runtime/topology.h"
+
+namespace custom_cpu {
+
+namespace {
+
+// Size classes are 2^kMinClassShift .. 2^kMaxClassShift bytes. Larger
+// requests bypass the cache.
+constexpr int kMinClassShift = 6;
+constexpr int kMaxClassShift = 30;
+constexpr int kNumClasses = kMaxClassShift + 1;
+
+// Per-thread free lists only keep classes up to 1 MiB and at most this many
+// bytes in total, so that short-lived temporaries never take the lock.
+constexpr int kMaxThreadClassShift = 20;
+constexpr size_t kThreadCacheBytes = size_t(4) << 20;
+
+constexpr size_t kDefaultMaxCachedMB = 1024;
+
+int SizeClass(size_t size) {
+  if (size <= (size_t(1) << kMinClassShift)) return kMinClassShift;
+  return 64 - __builtin_clzll(static_cast<uint64_t>(size - 1));
+}
+
+size_t MaxCachedBytes() {
+  const char* env = std::getenv("FLAGS_custom_cpu_allocator_max_cached_mb");
+  size_t mb = kDefaultMaxCachedMB;
+  if (env) {
+    auto value = std::atoll(env);
+    if (value >= 0) mb = static_cast<size_t>(value);
+  }
+  return mb << 20;
+}
+
+// Pools: one per NUMA node below kMaxNumaNodes, then the unbound one.
+constexpr int kNumPools = kMaxNumaNodes + 1;
+
+int PoolIndex(int node) {
+  return node >= 0 && node < kMaxNumaNodes ? node : kMaxNumaNodes;
+}
+
+// Blocks of a page or more for a NUMA node are page aligned and bound to
+// the node before anything touches them. Smaller ones share pages with
+// other blocks and rely on first touch by the node's pinned threads.
+void* SystemAllocate(size_t size, int node) {
+  static const size_t page = static_cast<size_t>(sysconf(_SC_PAGESIZE));
+  const bool bind = node >= 0 && node < kMaxNumaNodes && size >= page;
+  void* ptr = nullptr;
+  if (posix_memalign(&ptr, bind ? page : kAllocatorAlignment, size) != 0) {
+    return nullptr;
+  }
+  if (bind) BindMemoryToNode(ptr, size / page * page, node);
+  return ptr;
+}
+
+class CachingAllocator {
+ public:
+  explicit CachingAllocator(int node)
+      : node_(node), max_cached_(MaxCachedBytes()) {}
+
+  int node() const { return node_; }
+
+  bool caching() const { return max_cached_ > 0; }
+
+  // Takes a block of class `shift` from the shared pool or the system.
+  void* Take(int shift) {
+    size_t bytes = size_t(1) << shift;
+    {
+      std::lock_guard<std::mutex> lock(mu_);
+      auto& list = pool_[shift];
+      if (!list.empty()) {
+        void* ptr = list.back();
+        list.pop_back();
+        cached_ -= bytes;
+        return ptr;
+      }
+    }
+    void* ptr = SystemAllocate(bytes, node_);
+    if (!ptr) {
+      Release();
+      ptr = SystemAllocate(bytes, node_);
+    }
+    return ptr;
+  }
+
+  // Puts a block of class `shift` into the shared pool and trims the pool
+  // when it grows past the high watermark.
+  void Give(void* ptr, int shift) {
+    std::lock_guard<std::mutex> lock(mu_);
+    pool_[shift].push_back(ptr);
+    cached_ += size_t(1) << shift;
+    if (cached_ > max_cached_) TrimLocked(max_cached_ / 2);
+  }
+
+  void Release() {
+    std::lock_guard<std::mutex> lock(mu_);
+    TrimLocked(0);
+  }
+
+  void AddInUse(size_t bytes) {
+    auto now = in_use_.fetch_add(bytes) + bytes;
+    auto peak = peak_in_use_.load();
+    while (now > peak && !peak_in_use_.compare_exchange_weak(peak, now)) {
+    }
+  }
+
+  void SubInUse(size_t bytes) { in_use_ -= bytes; }
+
+  void AddThreadCached(int64_t bytes) { thread_cached_ += bytes; }
+
+  AllocatorStats Stats() {
+    std::lock_guard<std::mutex> lock(mu_);
+    return {in_use_.load(),
+            cached_ + static_cast<size_t>(thread_cached_.load()),
+            peak_in_use_.load()};
+  }
+
+ private:
+  // Frees the largest blocks first until at most `target` bytes are cached.
+  void TrimLocked(size_t target) {
+    for (int shift = kMaxClassShift; shift >= kMinClassShift; --shift) {
+      auto& list = pool_[shift];
+      while (cached_ > target && !list.empty()) {
+        std::free(list.back());
+        list.pop_back();
+        cached_ -= size_t(1) << shift;
+      }
+    }
+  }
+
+  const int node_;
+  const size_t max_cached_;
+  std::mutex mu_;
+  std::vector<void*> pool_[kNumClasses];
+  size_t cached_ = 0;
+  std::atomic<size_t> in_use_{0};
+  std::atomic<size_t> peak_in_use_{0};
+  std::atomic<int64_t> thread_cached_{0};
+};
+
+// Never destroyed, so thread caches flushed during process teardown still
+// have somewhere to go.
+CachingAllocator* GetAllocator(int node) {
+  static auto* allocators = [] {
+    auto* pools = new CachingAllocator*[kNumPools];
+    for (int i = 0; i < kNumPools; ++i) {
+      pools[i] = new CachingAllocator(i < kMaxNumaNodes ? i : -1);
+    }
+    return pools;
+  }();
+  return allocators[PoolIndex(node)];
+}
+
+struct ThreadCache {
+  std::vector<void*> lists[kNumPools][kMaxThreadClassShift + 1];
+  size_t bytes = 0;
+
+  ~ThreadCache() {
+    for (int pool = 0; pool < kNumPools; ++pool) {
+      auto* allocator = GetAllocator(pool < kMaxNumaNodes ? pool : -1);
+      int64_t pool_bytes = 0;
+      for (int shift = kMinClassShift; shift <= kMaxThreadClassShift; ++shift) {
+        for (auto* ptr : lists[pool][shift]) allocator->Give(ptr, shift);
+        pool_bytes += static_cast<int64_t>(lists[pool][shift].size()) << shift;
+      }
+      allocator->AddThreadCached(-pool_bytes);
+    }
+  }
+};
+
+thread_local ThreadCache thread_cache;
+
+}  // namespace
+
+void* CachedAllocate(size_t size, int node) {
+  auto* allocator = GetAllocator(node);
+  int shift = SizeClass(size);
+  if (shift > kMaxClassShift || !allocator->caching()) {
+    size_t bytes = (size + kAllocatorAlignment - 1) / kAllocatorAlignment *
+                   kAllocatorAlignment;
+    void* ptr = SystemAllocate(bytes == 0 ? kAllocatorAlignment : bytes,
+                               allocator->node());
+    if (ptr) allocator->AddInUse(bytes);
+    return ptr;
+  }
+
+  size_t bytes = size_t(1) << shift;
+  void* ptr = nullptr;
+  auto& lists = thread_cache.lists[PoolIndex(node)];
+  if (shift <= kMaxThreadClassShift && !lists[shift].empty()) {
+    ptr = lists[shift].back();
+    lists[shift].pop_back();
+    thread_cache.bytes -= bytes;
+    allocator->AddThreadCached(-static_cast<int64_t>(bytes));
+  } else {
+    ptr = allocator->Take(shift);
+  }
+  if (ptr) allocator->AddInUse(bytes);
+  return ptr;
+}
+
+void CachedFree(void* ptr, size_t size, int node) {
+  if (!ptr) return;
+  auto* allocator = GetAllocator(node);
+  int shift = SizeClass(size);
+  if (shift > kMaxClassShift || !allocator->caching()) {
+    std::free(ptr);
+    allocator->SubInUse((size + kAllocatorAlignment - 1) / kAllocatorAlignment *
+                        kAllocatorAlignment);
+    return;
+  }
+
+  size_t bytes = size_t(1) << shift;
+  allocator->SubInUse(bytes);
+  if (shift <= kMaxThreadClassShift &&
+      thread_cache.bytes + bytes <= kThreadCacheBytes) {
+    thread_cache.lists[PoolIndex(node)][shift].push_back(ptr);
+    thread_cache.bytes += bytes;
+    allocator->AddThreadCached(static_cast<int64_t>(bytes));
+  } else {
+    allocator->Give(ptr, shift);
+  }
+}
+
+void ReleaseCachedMemory() {
+  for (int pool = 0; pool < kNumPools; ++pool) {
+    GetAllocator(pool < kMaxNumaNodes ? pool : -1)->Release();
+  }
+}
+
+AllocatorStats GetAllocatorStats() {
+  AllocatorStats total{0, 0, 0};
+  for (int pool = 0; pool < kNumPools; ++pool) {
+    auto stats = GetAllocator(pool < kMaxNumaNodes ? pool : -1)->Stats();
+    total.in_use_bytes += stats.in_use_bytes;
+    total.cached_bytes += stats.cached_bytes;
+    total.peak_in_use_bytes += stats.peak_in_use_bytes;
+  }
+  return total;
+}
+
+AllocatorStats GetAllocatorStats(int node) {
+  return GetAllocator(node)->Stats();
+}
+
+}  // namespace custom_cpu
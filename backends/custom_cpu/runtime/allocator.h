@@ -0,0 +1,59 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstddef>
+
+namespace custom_cpu {
+
+// Every block handed out by the allocator is aligned to this many bytes.
+constexpr size_t kAllocatorAlignment = 64;
+
+struct AllocatorStats {
+  // Bytes of size-class blocks currently owned by callers.
+  size_t in_use_bytes;
+  // Bytes of freed blocks kept in the free lists for reuse.
+  size_t cached_bytes;
+  // Highest in_use_bytes seen since the process started.
+  size_t peak_in_use_bytes;
+};
+
+// Returns a block of at least `size` bytes from the process-wide caching
+// allocator, or nullptr when the system is out of memory. Every NUMA node
+// below kMaxNumaNodes has its own pool, whose new blocks prefer the node's
+// memory; node -1 is the unbound pool.
+//
+// Requests are rounded up to a power-of-two size class. Freed blocks go to a
+// small per-thread free list first and to a shared per-class pool after
+// that, so steady-state training steps stop calling into malloc. The shared
+// pool is trimmed back to half of FLAGS_custom_cpu_allocator_max_cached_mb
+// whenever it grows past it; a limit of 0 disables caching.
+void* CachedAllocate(size_t size, int node = -1);
+
+// Returns a block obtained from CachedAllocate(size, node) with the same
+// size and node.
+void CachedFree(void* ptr, size_t size, int node = -1);
+
+// Hands the shared pool back to the system. Blocks held by per-thread free
+// lists are released when their thread exits.
+void ReleaseCachedMemory();
+
+// Stats summed over every pool. The peak is the sum of the pools' peaks.
+AllocatorStats GetAllocatorStats();
+
+// Stats of the pool of NUMA node `node`, or of the unbound pool for -1.
+AllocatorStats GetAllocatorStats(int node);
+
+}  // namespace custom_cpu
@@ -0,0 +1,619 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/collective.h"
+
+#include <fcntl.h>
+#include <signal.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <atomic>
+#include <cerrno>
+#include <chrono>
+#include <complex>
+#include <cstring>
+#include <thread>
+#include <vector>
+
+#include "kernels/funcs/convert.h"
+
+namespace custom_cpu {
+
+static_assert(ATOMIC_INT_LOCK_FREE == 2 && ATOMIC_LLONG_LOCK_FREE == 2,
+              "shared memory synchronization needs lock-free atomics");
+
+namespace {
+
+// Waits spin for this many polls before yielding the core to other ranks.
+constexpr int kSpinCount = 1024;
+
+inline void CpuRelax() {
+#if defined(__x86_64__) || defined(__i386__)
+  __builtin_ia32_pause();
+#endif
+}
+
+template <typename Pred>
+void SpinUntil(Pred pred) {
+  for (int i = 0; !pred(); ++i) {
+    if (i < kSpinCount) {
+      CpuRelax();
+    } else {
+      std::this_thread::yield();
+    }
+  }
+}
+
+struct Float16 {
+  uint16_t bits;
+};
+
+struct BFloat16 {
+  uint16_t bits;
+};
+
+template <typename T, typename AccT>
+struct Convert {
+  static AccT Load(T v) { return static_cast<AccT>(v); }
+  static T Store(AccT v) { return static_cast<T>(v); }
+};
+
+// The 16-bit floats round as the kernels cast them.
+template <>
+struct Convert<Float16, float> {
+  static float Load(Float16 v) {
+    return custom_kernel::funcs::Fp16ToFloat(v.bits);
+  }
+  static Float16 Store(float v) {
+    return {custom_kernel::funcs::FloatToFp16(v)};
+  }
+};
+
+template <>
+struct Convert<BFloat16, float> {
+  static float Load(BFloat16 v) {
+    return custom_kernel::funcs::Bf16ToFloat(v.bits);
+  }
+  static BFloat16 Store(float v) {
+    return {custom_kernel::funcs::FloatToBf16(v)};
+  }
+};
+
+template <typename T>
+struct SumOp {
+  T operator()(T a, T b) const { return a + b; }
+};
+
+template <typename T>
+struct ProductOp {
+  T operator()(T a, T b) const { return a * b; }
+};
+
+template <typename T>
+struct MaxOp {
+  T operator()(T a, T b) const { return a < b ? b : a; }
+};
+
+template <typename T>
+struct MinOp {
+  T operator()(T a, T b) const { return b < a ? b : a; }
+};
+
+// Bools reduce as logical or (sum, max) and logical and (product, min).
+template <>
+struct SumOp<bool> {
+  bool operator()(bool a, bool b) const { return a || b; }
+};
+
+template <>
+struct ProductOp<bool> {
+  bool operator()(bool a, bool b) const { return a && b; }
+};
+
+// out[i] = op(ins[0][i], ..., ins[nins - 1][i]) in input order, divided by
+// nins for an average. out may alias any input.
+using ReduceFn = void (*)(void* out,
+                          const void* const* ins,
+                          int nins,
+                          size_t count);
+
+template <typename T, typename AccT, typename Op, bool kAverage>
+void ReduceInputs(void* out, const void* const* ins, int nins, size_t count) {
+  constexpr size_t kBlock = 256;
+  AccT acc[kBlock];
+  Op op;
+  auto* dst = static_cast<T*>(out);
+  for (size_t begin = 0; begin < count; begin += kBlock) {
+    auto n = std::min(kBlock, count - begin);
+    auto* first = static_cast<const T*>(ins[0]) + begin;
+    for (size_t i = 0; i < n; ++i) {
+      acc[i] = Convert<T, AccT>::Load(first[i]);
+    }
+    for (int k = 1; k < nins; ++k) {
+      auto* in = static_cast<const T*>(ins[k]) + begin;
+      for (size_t i = 0; i < n; ++i) {
+        acc[i] = op(acc[i], Convert<T, AccT>::Load(in[i]));
+      }
+    }
+    if (kAverage) {
+      auto divisor = static_cast<AccT>(nins);
+      for (size_t i = 0; i < n; ++i) acc[i] = acc[i] / divisor;
+    }
+    for (size_t i = 0; i < n; ++i) {
+      dst[begin + i] = Convert<T, AccT>::Store(acc[i]);
+    }
+  }
+}
+
+template <typename T, typename AccT = T>
+ReduceFn SelectOrdered(CclReduceOp op) {
+  switch (op) {
+    case CclReduceOp::kSum:
+      return &ReduceInputs<T, AccT, SumOp<AccT>, false>;
+    case CclReduceOp::kAvg:
+      return &ReduceInputs<T, AccT, SumOp<AccT>, true>;
+    case CclReduceOp::kMax:
+      return &ReduceInputs<T, AccT, MaxOp<AccT>, false>;
+    case CclReduceOp::kMin:
+      return &ReduceInputs<T, AccT, MinOp<AccT>, false>;
+    case CclReduceOp::kProduct:
+      return &ReduceInputs<T, AccT, ProductOp<AccT>, false>;
+  }
+  return nullptr;
+}
+
+template <typename T>
+ReduceFn SelectComplex(CclReduceOp op) {
+  switch (op) {
+    case CclReduceOp::kSum:
+      return &ReduceInputs<T, T, SumOp<T>, false>;
+    case CclReduceOp::kAvg:
+      return &ReduceInputs<T, T, SumOp<T>, true>;
+    case CclReduceOp::kProduct:
+      return &ReduceInputs<T, T, ProductOp<T>, false>;
+    default:
+      return nullptr;
+  }
+}
+
+ReduceFn SelectBool(CclReduceOp op) {
+  switch (op) {
+    case CclReduceOp::kSum:
+    case CclReduceOp::kMax:
+      return &ReduceInputs<bool, bool, SumOp<bool>, false>;
+    case CclReduceOp::kProduct:
+    case CclReduceOp::kMin:
+      return &ReduceInputs<bool, bool, ProductOp<bool>, false>;
+    default:
+      return nullptr;
+  }
+}
+
+ReduceFn SelectReduceFn(CclDataType dtype, CclReduceOp op) {
+  switch (dtype) {
+    case CclDataType::kBool:
+      return SelectBool(op);
+    case CclDataType::kInt8:
+      return SelectOrdered<int8_t>(op);
+    case CclDataType::kUint8:
+      return SelectOrdered<uint8_t>(op);
+    case CclDataType::kInt16:
+      return SelectOrdered<int16_t>(op);
+    case CclDataType::kUint16:
+      return SelectOrdered<uint16_t>(op);
+    case CclDataType::kInt32:
+      return SelectOrdered<int32_t>(op);
+    case CclDataType::kUint32:
+      return SelectOrdered<uint32_t>(op);
+    case CclDataType::kInt64:
+      return SelectOrdered<int64_t>(op);
+    case CclDataType::kUint64:
+      return SelectOrdered<uint64_t>(op);
+    case CclDataType::kFloat16:
+      return SelectOrdered<Float16, float>(op);
+    case CclDataType::kBFloat16:
+      return SelectOrdered<BFloat16, float>(op);
+    case CclDataType::kFloat32:
+      return SelectOrdered<float>(op);
+    case CclDataType::kFloat64:
+      return SelectOrdered<double>(op);
+    case CclDataType::kComplex64:
+      return SelectComplex<std::complex<float>>(op);
+    case CclDataType::kComplex128:
+      return SelectComplex<std::complex<double>>(op);
+  }
+  return nullptr;
+}
+
+constexpr size_t kCacheLine = 64;
+constexpr size_t kPageSize = 4096;
+
+size_t AlignUp(size_t n, size_t align) {
+  return (n + align - 1) / align * align;
+}
+
+// Ranks other than 0 give up joining a segment after this long.
+constexpr auto kJoinTimeout = std::chrono::seconds(300);
+
+// Stored in the header by rank 0 once the segment is initialized.
+constexpr uint64_t kSegmentMagic = 0x6363785f75706363;  // "ccpu_xcc"
+
+// Segment layout: header, one mailbox flag per ordered rank pair, the
+// per-rank slots and then the mailboxes.
+constexpr size_t FlagsOffset() { return 3 * kCacheLine; }
+
+size_t SlotsOffset(int nranks) {
+  return AlignUp(FlagsOffset() + nranks * nranks * kCacheLine, kPageSize);
+}
+
+size_t ChannelsOffset(int nranks) {
+  return SlotsOffset(nranks) + nranks * kCclSlotBytes;
+}
+
+size_t SegmentSize(int nranks) {
+  return ChannelsOffset(nranks) + nranks * nranks * kCclChannelBytes;
+}
+
+bool ProcessAlive(pid_t pid) { return kill(pid, 0) == 0 || errno == EPERM; }
+
+}  // namespace
+
+size_t CclDataTypeSize(CclDataType dtype) {
+  switch (dtype) {
+    case CclDataType::kBool:
+    case CclDataType::kInt8:
+    case CclDataType::kUint8:
+      return 1;
+    case CclDataType::kInt16:
+    case CclDataType::kUint16:
+    case CclDataType::kFloat16:
+    case CclDataType::kBFloat16:
+      return 2;
+    case CclDataType::kInt32:
+    case CclDataType::kUint32:
+    case CclDataType::kFloat32:
+      return 4;
+    case CclDataType::kInt64:
+    case CclDataType::kUint64:
+    case CclDataType::kFloat64:
+    case CclDataType::kComplex64:
+      return 8;
+    case CclDataType::kComplex128:
+      return 16;
+  }
+  return 0;
+}
+
+struct ShmCommunicator::Header {
+  alignas(kCacheLine) std::atomic<uint32_t> arrived;
+  alignas(kCacheLine) std::atomic<uint32_t> generation;
+  // kSegmentMagic once rank 0, running in process `creator`, has set the
+  // segment up.
+  alignas(kCacheLine) std::atomic<uint64_t> magic;
+  pid_t creator;
+};
+
+// Rank 0 always starts from a fresh segment. A segment left behind under
+// the same name by a crashed run is unlinked first: its barrier counters
+// would otherwise never match the new ranks.
+void* ShmCommunicator::CreateSegment(const std::string& name, size_t size) {
+  static_assert(sizeof(Header) <= FlagsOffset(),
+                "the header overlaps the mailbox flags");
+  shm_unlink(name.c_str());
+  int fd = shm_open(name.c_str(), O_CREAT | O_EXCL | O_RDWR, 0600);
+  if (fd < 0) return nullptr;
+  if (ftruncate(fd, size) != 0) {
+    close(fd);
+    shm_unlink(name.c_str());
+    return nullptr;
+  }
+  void* base = mmap(nullptr, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+  close(fd);
+  if (base == MAP_FAILED) {
+    shm_unlink(name.c_str());
+    return nullptr;
+  }
+  auto* header = static_cast<Header*>(base);
+  header->creator = getpid();
+  header->magic.store(kSegmentMagic, std::memory_order_release);
+  return base;
+}
+
+// The other ranks wait for rank 0's segment. Segments that are not fully
+// set up yet, and stale ones whose creator has exited, are skipped until
+// rank 0 replaces them.
+void* ShmCommunicator::OpenSegment(const std::string& name, size_t size) {
+  auto deadline = std::chrono::steady_clock::now() + kJoinTimeout;
+  while (std::chrono::steady_clock::now() < deadline) {
+    int fd = shm_open(name.c_str(), O_RDWR, 0600);
+    if (fd >= 0) {
+      struct stat st;
+      void* base = MAP_FAILED;
+      if (fstat(fd, &st) == 0 && static_cast<size_t>(st.st_size) == size) {
+        base = mmap(nullptr, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+      }
+      close(fd);
+      if (base != MAP_FAILED) {
+        auto* header = static_cast<Header*>(base);
+        if (header->magic.load(std::memory_order_acquire) == kSegmentMagic &&
+            ProcessAlive(header->creator)) {
+          return base;
+        }
+        munmap(base, size);
+      }
+    }
+    std::this_thread::sleep_for(std::chrono::milliseconds(1));
+  }
+  return nullptr;
+}
+
+// A queued Send or Recv. `done` counts the bytes handed over so far.
+struct ShmCommunicator::P2POp {
+  ShmCommunicator* comm;
+  bool send;
+  int peer;
+  char* buf;
+  size_t bytes;
+  size_t done;
+};
+
+thread_local int ShmCommunicator::group_depth_ = 0;
+thread_local std::vector<ShmCommunicator::P2POp> ShmCommunicator::group_ops_;
+
+std::unique_ptr<ShmCommunicator> ShmCommunicator::Create(
+    const std::string& unique_id, int rank, int nranks) {
+  if (nranks <= 0 || rank < 0 || rank >= nranks) return nullptr;
+  auto name = "/custom_cpu_xccl_" + unique_id;
+  auto size = SegmentSize(nranks);
+  void* base = rank == 0 ? CreateSegment(name, size) : OpenSegment(name, size);
+  if (!base) return nullptr;
+  std::unique_ptr<ShmCommunicator> comm(
+      new ShmCommunicator(rank, nranks, base, size));
+  // Once every rank has mapped the segment its name is no longer needed, so
+  // nothing is left behind in /dev/shm even if a rank dies later.
+  comm->Barrier();
+  if (rank == 0) shm_unlink(name.c_str());
+  return comm;
+}
+
+ShmCommunicator::ShmCommunicator(int rank, int nranks, void* base, size_t size)
+    : rank_(rank),
+      nranks_(nranks),
+      base_(base),
+      size_(size),
+      header_(static_cast<Header*>(base)) {}
+
+ShmCommunicator::~ShmCommunicator() { munmap(base_, size_); }
+
+char* ShmCommunicator::Slot(int rank) const {
+  return static_cast<char*>(base_) + SlotsOffset(nranks_) +
+         rank * kCclSlotBytes;
+}
+
+char* ShmCommunicator::Channel(int src, int dst) const {
+  return static_cast<char*>(base_) + ChannelsOffset(nranks_) +
+         (src * nranks_ + dst) * kCclChannelBytes;
+}
+
+std::atomic<uint64_t>* ShmCommunicator::ChannelBytes(int src, int dst) const {
+  return reinterpret_cast<std::atomic<uint64_t>*>(
+      static_cast<char*>(base_) + FlagsOffset() +
+      (src * nranks_ + dst) * kCacheLine);
+}
+
+void ShmCommunicator::Barrier() {
+  auto generation = header_->generation.load(std::memory_order_acquire);
+  if (header_->arrived.fetch_add(1, std::memory_order_acq_rel) ==
+      static_cast<uint32_t>(nranks_ - 1)) {
+    header_->arrived.store(0, std::memory_order_relaxed);
+    header_->generation.fetch_add(1, std::memory_order_release);
+    return;
+  }
+  SpinUntil([&] {
+    return header_->generation.load(std::memory_order_acquire) != generation;
+  });
+}
+
+bool ShmCommunicator::ReduceImpl(const void* send,
+                                 void* recv,
+                                 size_t count,
+                                 CclDataType dtype,
+                                 CclReduceOp op,
+                                 int root) {
+  auto reduce = SelectReduceFn(dtype, op);
+  if (!reduce) return false;
+  auto elem = CclDataTypeSize(dtype);
+  auto chunk = kCclSlotBytes / elem;
+  auto src = static_cast<const char*>(send);
+  auto dst = static_cast<char*>(recv);
+  std::vector<const void*> ins(nranks_);
+  for (size_t off = 0; off < count; off += chunk) {
+    auto n = std::min(chunk, count - off);
+    std::memcpy(Slot(rank_), src + off * elem, n * elem);
+    Barrier();
+    // Reduce-scatter: this rank owns segment `rank_` of the chunk.
+    auto begin = n * rank_ / nranks_;
+    auto end = n * (rank_ + 1) / nranks_;
+    for (int k = 0; k < nranks_; ++k) ins[k] = Slot(k) + begin * elem;
+    reduce(Slot(rank_) + begin * elem, ins.data(), nranks_, end - begin);
+    Barrier();
+    // All-gather the reduced segments.
+    if (root < 0 || root == rank_) {
+      for (int k = 0; k < nranks_; ++k) {
+        auto b = n * k / nranks_;
+        auto e = n * (k + 1) / nranks_;
+        std::memcpy(dst + (off + b) * elem, Slot(k) + b * elem, (e - b) * elem);
+      }
+    }
+    Barrier();
+  }
+  return true;
+}
+
+bool ShmCommunicator::AllReduce(const void* send,
+                                void* recv,
+                                size_t count,
+                                CclDataType dtype,
+                                CclReduceOp op) {
+  return ReduceImpl(send, recv, count, dtype, op, -1);
+}
+
+bool ShmCommunicator::Reduce(const void* send,
+                             void* recv,
+                             size_t count,
+                             CclDataType dtype,
+                             CclReduceOp op,
+                             int root) {
+  return ReduceImpl(send, recv, count, dtype, op, root);
+}
+
+bool ShmCommunicator::ReduceScatter(const void* send,
+                                    void* recv,
+                                    size_t count,
+                                    CclDataType dtype,
+                                    CclReduceOp op) {
+  auto reduce = SelectReduceFn(dtype, op);
+  if (!reduce) return false;
+  auto elem = CclDataTypeSize(dtype);
+  auto chunk = std::max<size_t>(1, kCclSlotBytes / (elem * nranks_));
+  auto src = static_cast<const char*>(send);
+  auto dst = static_cast<char*>(recv);
+  std::vector<const void*> ins(nranks_);
+  for (size_t off = 0; off < count; off += chunk) {
+    auto n = std::min(chunk, count - off);
+    // Slot layout is [destination rank][n].
+    for (int k = 0; k < nranks_; ++k) {
+      std::memcpy(
+          Slot(rank_) + k * n * elem, src + (k * count + off) * elem, n * elem);
+    }
+    Barrier();
+    for (int k = 0; k < nranks_; ++k) ins[k] = Slot(k) + rank_ * n * elem;
+    reduce(dst + off * elem, ins.data(), nranks_, n);
+    Barrier();
+  }
+  return true;
+}
+
+void ShmCommunicator::Broadcast(void* buf, size_t bytes, int root) {
+  // All slots are contiguous, so the root stages through all of them.
+  auto chunk = nranks_ * kCclSlotBytes;
+  auto data = static_cast<char*>(buf);
+  for (size_t off = 0; off < bytes; off += chunk) {
+    auto n = std::min(chunk, bytes - off);
+    if (rank_ == root) std::memcpy(Slot(0), data + off, n);
+    Barrier();
+    if (rank_ != root) std::memcpy(data + off, Slot(0), n);
+    Barrier();
+  }
+}
+
+void ShmCommunicator::AllGather(const void* send, void* recv, size_t bytes) {
+  auto src = static_cast<const char*>(send);
+  auto dst = static_cast<char*>(recv);
+  for (size_t off = 0; off < bytes; off += kCclSlotBytes) {
+    auto n = std::min(kCclSlotBytes, bytes - off);
+    std::memcpy(Slot(rank_), src + off, n);
+    Barrier();
+    for (int k = 0; k < nranks_; ++k) {
+      std::memcpy(dst + k * bytes + off, Slot(k), n);
+    }
+    Barrier();
+  }
+}
+
+// Moves at most one mailbox worth of `op` without blocking. Returns whether
+// anything moved.
+bool ShmCommunicator::Progress(P2POp* op) {
+  if (op->send) {
+    auto flag = ChannelBytes(rank_, op->peer);
+    if (flag->load(std::memory_order_acquire) != 0) return false;
+    auto n = std::min(kCclChannelBytes, op->bytes - op->done);
+    std::memcpy(Channel(rank_, op->peer), op->buf + op->done, n);
+    flag->store(n, std::memory_order_release);
+    op->done += n;
+  } else {
+    auto flag = ChannelBytes(op->peer, rank_);
+    auto n = flag->load(std::memory_order_acquire);
+    if (n == 0) return false;
+    std::memcpy(op->buf + op->done, Channel(op->peer, rank_), n);
+    flag->store(0, std::memory_order_release);
+    op->done += n;
+  }
+  return true;
+}
+
+void ShmCommunicator::RunP2P(std::vector<P2POp>* ops) {
+  auto same_mailbox = [](const P2POp& a, const P2POp& b) {
+    return a.comm == b.comm && a.send == b.send && a.peer == b.peer;
+  };
+  for (int idle = 0;;) {
+    bool pending = false;
+    bool progressed = false;
+    for (size_t i = 0; i < ops->size(); ++i) {
+      auto& op = (*ops)[i];
+      if (op.done == op.bytes) continue;
+      pending = true;
+      // Messages through one mailbox must not interleave.
+      bool blocked = false;
+      for (size_t j = 0; j < i && !blocked; ++j) {
+        const auto& prev = (*ops)[j];
+        blocked = prev.done < prev.bytes && same_mailbox(prev, op);
+      }
+      if (!blocked && op.comm->Progress(&op)) progressed = true;
+    }
+    if (!pending) break;
+    if (progressed) {
+      idle = 0;
+    } else if (++idle < kSpinCount) {
+      CpuRelax();
+    } else {
+      std::this_thread::yield();
+    }
+  }
+}
+
+void ShmCommunicator::Send(const void* buf, size_t bytes, int peer) {
+  P2POp op{
+      this, true, peer, static_cast<char*>(const_cast<void*>(buf)), bytes, 0};
+  if (group_depth_ > 0) {
+    group_ops_.push_back(op);
+    return;
+  }
+  std::vector<P2POp> ops{op};
+  RunP2P(&ops);
+}
+
+void ShmCommunicator::Recv(void* buf, size_t bytes, int peer) {
+  P2POp op{this, false, peer, static_cast<char*>(buf), bytes, 0};
+  if (group_depth_ > 0) {
+    group_ops_.push_back(op);
+    return;
+  }
+  std::vector<P2POp> ops{op};
+  RunP2P(&ops);
+}
+
+void ShmCommunicator::GroupStart() { ++group_depth_; }
+
+void ShmCommunicator::GroupEnd() {
+  if (group_depth_ == 0 || --group_depth_ > 0) return;
+  std::vector<P2POp> ops;
+  ops.swap(group_ops_);
+  RunP2P(&ops);
+}
+
+}  // namespace custom_cpu
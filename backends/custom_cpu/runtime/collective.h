@@ -0,0 +1,150 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <memory>
+#include <string>
+#include <vector>
+
+namespace custom_cpu {
+
+enum class CclDataType {
+  kBool,
+  kInt8,
+  kUint8,
+  kInt16,
+  kUint16,
+  kInt32,
+  kUint32,
+  kInt64,
+  kUint64,
+  kFloat16,
+  kBFloat16,
+  kFloat32,
+  kFloat64,
+  kComplex64,
+  kComplex128,
+};
+
+enum class CclReduceOp { kSum, kAvg, kMax, kMin, kProduct };
+
+size_t CclDataTypeSize(CclDataType dtype);
+
+// Bytes of shared staging memory per rank. Collectives on larger messages
+// are pipelined through it in chunks.
+constexpr size_t kCclSlotBytes = size_t(2) << 20;
+// Bytes of the mailbox between every ordered pair of ranks used by Send and
+// Recv.
+constexpr size_t kCclChannelBytes = size_t(512) << 10;
+
+// An intra-node communicator whose ranks, processes or threads, exchange
+// data through one POSIX shared memory segment.
+//
+// Reductions are split so that every rank reduces one segment of each chunk
+// (reduce-scatter) and then copies all segments back (all-gather); each
+// segment is reduced in rank order, so every rank gets bit-identical
+// results. All calls block until this rank's part of the operation is done
+// and must be issued in the same order on every rank.
+class ShmCommunicator {
+ public:
+  // Maps the segment named after `unique_id`, creating it if needed, and
+  // waits for all `nranks` ranks to join. Returns nullptr on failure.
+  static std::unique_ptr<ShmCommunicator> Create(const std::string& unique_id,
+                                                 int rank,
+                                                 int nranks);
+  ~ShmCommunicator();
+
+  ShmCommunicator(const ShmCommunicator&) = delete;
+  ShmCommunicator& operator=(const ShmCommunicator&) = delete;
+
+  int rank() const { return rank_; }
+  int nranks() const { return nranks_; }
+
+  // The reductions return false for unsupported combinations, e.g. max of
+  // complex numbers or the average of bools.
+  bool AllReduce(const void* send,
+                 void* recv,
+                 size_t count,
+                 CclDataType dtype,
+                 CclReduceOp op);
+  bool Reduce(const void* send,
+              void* recv,
+              size_t count,
+              CclDataType dtype,
+              CclReduceOp op,
+              int root);
+  // recv holds `count` elements; send holds nranks * count.
+  bool ReduceScatter(const void* send,
+                     void* recv,
+                     size_t count,
+                     CclDataType dtype,
+                     CclReduceOp op);
+  void Broadcast(void* buf, size_t bytes, int root);
+  // recv holds nranks * bytes, ordered by rank.
+  void AllGather(const void* send, void* recv, size_t bytes);
+  void Barrier();
+
+  // Point-to-point transfers. Outside a group they block until the message
+  // has been handed over; inside a group they are queued and run together,
+  // interleaved, at the outermost GroupEnd() so that exchanges in both
+  // directions cannot deadlock.
+  void Send(const void* buf, size_t bytes, int peer);
+  void Recv(void* buf, size_t bytes, int peer);
+
+  // Groups nest and are tracked per calling thread.
+  static void GroupStart();
+  static void GroupEnd();
+
+ private:
+  struct Header;
+  struct P2POp;
+
+  ShmCommunicator(int rank, int nranks, void* base, size_t size);
+
+  // Rank 0 creates and maps the segment; the other ranks map it once rank 0
+  // has set it up. Both return nullptr on failure.
+  static void* CreateSegment(const std::string& name, size_t size);
+  static void* OpenSegment(const std::string& name, size_t size);
+
+  char* Slot(int rank) const;
+  char* Channel(int src, int dst) const;
+  // Bytes waiting in the src -> dst mailbox; 0 when it is free.
+  std::atomic<uint64_t>* ChannelBytes(int src, int dst) const;
+
+  // AllReduce when root < 0, Reduce to root otherwise.
+  bool ReduceImpl(const void* send,
+                  void* recv,
+                  size_t count,
+                  CclDataType dtype,
+                  CclReduceOp op,
+                  int root);
+
+  bool Progress(P2POp* op);
+  static void RunP2P(std::vector<P2POp>* ops);
+
+  static thread_local int group_depth_;
+  static thread_local std::vector<P2POp> group_ops_;
+
+  int rank_;
+  int nranks_;
+  void* base_;
+  size_t size_;
+  Header* header_;
+};
+
+}  // namespace custom_cpu
@@ -0,0 +1,78 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/process_trace_data.h"
+
+#include <unistd.h>
+
+#include <cstdio>
+#include <cstring>
+#include <iostream>
+
+#include "runtime/trace.h"
+
+namespace {
+
+void AddRuntimeRecord(const custom_cpu::TraceEvent &record,
+                      C_Profiler collector) {
+  phi::RuntimeTraceEvent event;
+  event.name = record.name;
+  event.start_ns = record.start_ns;
+  event.end_ns = record.end_ns;
+  event.process_id = getpid();
+  event.thread_id = record.thread_id;
+  event.correlation_id = record.correlation_id;
+  event.callback_id = 0;
+  event.type = phi::TracerEventType::CudaRuntime;
+  profiler_add_runtime_trace_event(collector, &event);
+}
+
+void AddDeviceRecord(const custom_cpu::TraceEvent &record,
+                     C_Profiler collector) {
+  phi::DeviceTraceEvent event;
+  event.name = record.name;
+  event.start_ns = record.start_ns;
+  event.end_ns = record.end_ns;
+  event.device_id = record.device_id;
+  event.context_id = 0;
+  event.stream_id = record.stream_id;
+  event.correlation_id = record.correlation_id;
+  if (record.kind == custom_cpu::TraceEventKind::kMemcpy) {
+    event.type = phi::TracerEventType::Memcpy;
+    event.memcpy_info.num_bytes = record.bytes;
+    snprintf(
+        event.memcpy_info.copy_kind, phi::kMemKindMaxLen, "%s", record.name);
+  } else {
+    event.type = phi::TracerEventType::Kernel;
+    std::memset(&event.kernel_info, 0, sizeof(event.kernel_info));
+  }
+  profiler_add_device_trace_event(collector, &event);
+}
+
+}  // namespace
+
+void ProcessTraceEvents(C_Profiler collector, uint64_t tracing_start_ns) {
+  for (auto &record : custom_cpu::ConsumeTraceEvents()) {
+    if (record.start_ns < tracing_start_ns) continue;
+    if (record.kind == custom_cpu::TraceEventKind::kRuntimeApi) {
+      AddRuntimeRecord(record, collector);
+    } else {
+      AddDeviceRecord(record, collector);
+    }
+  }
+  if (auto dropped = custom_cpu::DroppedTraceEvents()) {
+    std::cerr << "custom_cpu profiler dropped " << dropped
+              << " events because a trace buffer was full\n";
+  }
+}
@@ -0,0 +1,26 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstdint>
+
+#include "paddle/phi/api/profiler/trace_event.h"
+#include "paddle/phi/backends/device_ext.h"
+
+// Hands the events recorded since tracing started to Paddle's collector:
+// runtime calls as host-side runtime events on their calling thread, and
+// the copies, stream tasks and collectives they issued as device events
+// sharing their correlation id.
+void ProcessTraceEvents(C_Profiler collector, uint64_t tracing_start_ns);
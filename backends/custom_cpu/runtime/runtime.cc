@@ -14,7 +14,6 @@
 
 #include <errno.h>
 #include <fcntl.h>
-#include <semaphore.h>
 #include <sys/types.h>
 #include <sys/wait.h>
 #include <unistd.h>
@@ -23,13 +22,100 @@
 #include <cstdio>
 #include <cstring>
 #include <iostream>
+#include <random>
+#include <string>
+#include <unordered_set>
 
 #include "paddle/phi/backends/device_ext.h"
+#include "runtime/allocator.h"
+#include "runtime/collective.h"
+#include "runtime/process_trace_data.h"
+#include "runtime/stream.h"
+#include "runtime/thread_pool.h"
+#include "runtime/topology.h"
+#include "runtime/trace.h"
 
 #define MEMORY_FRACTION 0.5f
 
 static int global_current_device = 0;
 
+namespace {
+
+using custom_cpu::TraceEventKind;
+using custom_cpu::TraceScope;
+
+std::mutex streams_mu;
+std::unordered_set<custom_cpu::Stream *> streams;
+
+custom_cpu::Stream *ToStream(C_Stream stream) {
+  return reinterpret_cast<custom_cpu::Stream *>(stream);
+}
+
+custom_cpu::Event *ToEvent(C_Event event) {
+  return reinterpret_cast<custom_cpu::Event *>(event);
+}
+
+// Waits for the work already queued on `stream`, so that host-side work
+// issued next is ordered after it.
+void WaitStream(C_Stream stream) {
+  if (stream) ToStream(stream)->Synchronize();
+}
+
+uint64_t StreamId(C_Stream stream) {
+  return reinterpret_cast<uint64_t>(stream);
+}
+
+int DeviceId(const C_Device device) {
+  return device ? device->id : global_current_device;
+}
+
+// Makes the calling thread run its kernels on the intra-op pool of
+// `device_id` and pins it to the CPUs FLAGS_custom_cpu_devices gives the
+// device.
+void BindDevice(int device_id) {
+  const auto &devices = custom_cpu::GetDeviceTopology();
+  if (device_id < 0 || device_id >= static_cast<int>(devices.size())) return;
+  thread_local int thread_device = -1;
+  if (thread_device != device_id) {
+    custom_cpu::SetThreadPoolDevice(device_id);
+    custom_cpu::PinCurrentThread(devices[device_id].cpus);
+    thread_device = device_id;
+  }
+}
+
+// Copies on `stream`, or inline when it is null. `kind` names the copy in
+// profiler traces.
+void StreamMemCpy(const char *kind,
+                  int device_id,
+                  C_Stream stream,
+                  void *dst,
+                  const void *src,
+                  size_t size) {
+  TraceScope api(stream ? "AsyncMemCpy" : "MemCpy",
+                 TraceEventKind::kRuntimeApi,
+                 size,
+                 device_id);
+  auto correlation_id = api.correlation_id();
+  auto copy = [=] {
+    TraceScope trace(kind,
+                     TraceEventKind::kMemcpy,
+                     size,
+                     device_id,
+                     StreamId(stream),
+                     correlation_id);
+    // Tensors sharing an allocation copy onto themselves.
+    if (dst != src) memcpy(dst, src, size);
+  };
+  if (!stream) {
+    copy();
+    return;
+  }
+  ToStream(stream)->Enqueue(copy);
+  if (!custom_cpu::AsyncMemcpyEnabled()) ToStream(stream)->Synchronize();
+}
+
+}  // namespace
+
 C_Status Init() {
   std::cout << "custom_cpu plugin compiled with ";
 #ifdef __clang__
@@ -37,6 +123,7 @@ C_Status Init() {
 #else
   std::cout << "gcc\n";
 #endif
+  custom_cpu::InitThreadPool();
   return C_SUCCESS;
 }
 
@@ -47,6 +134,7 @@ C_Status InitDevice(const C_Device device) {
 
 C_Status SetDevice(const C_Device device) {
   global_current_device = device->id;
+  BindDevice(device->id);
   return C_SUCCESS;
 }
 
@@ -57,33 +145,70 @@ C_Status GetDevice(const C_Device device) {
 
 C_Status DestroyDevice(const C_Device device) { return C_SUCCESS; }
 
-C_Status Finalize() { return C_SUCCESS; }
+C_Status Finalize() {
+  custom_cpu::FinalizeThreadPool();
+  custom_cpu::ReleaseCachedMemory();
+  return C_SUCCESS;
+}
 
 C_Status GetDevicesCount(size_t *count) {
-  *count = 2;
+  *count = custom_cpu::NumDevices();
   return C_SUCCESS;
 }
 
 C_Status GetDevicesList(size_t *devices) {
-  devices[0] = 0;
-  devices[1] = 1;
+  for (int i = 0; i < custom_cpu::NumDevices(); ++i) devices[i] = i;
   return C_SUCCESS;
 }
 
-C_Status MemCpy(const C_Device device,
-                void *dst,
-                const void *src,
-                size_t size) {
-  memcpy(dst, src, size);
+C_Status MemCpyH2D(const C_Device device,
+                   void *dst,
+                   const void *src,
+                   size_t size) {
+  StreamMemCpy("MEMCPY_HtoD", DeviceId(device), nullptr, dst, src, size);
   return C_SUCCESS;
 }
 
-C_Status AsyncMemCpy(const C_Device device,
-                     C_Stream stream,
-                     void *dst,
-                     const void *src,
-                     size_t size) {
-  memcpy(dst, src, size);
+C_Status MemCpyD2D(const C_Device device,
+                   void *dst,
+                   const void *src,
+                   size_t size) {
+  StreamMemCpy("MEMCPY_DtoD", DeviceId(device), nullptr, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status MemCpyD2H(const C_Device device,
+                   void *dst,
+                   const void *src,
+                   size_t size) {
+  StreamMemCpy("MEMCPY_DtoH", DeviceId(device), nullptr, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status AsyncMemCpyH2D(const C_Device device,
+                        C_Stream stream,
+                        void *dst,
+                        const void *src,
+                        size_t size) {
+  StreamMemCpy("MEMCPY_HtoD", DeviceId(device), stream, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status AsyncMemCpyD2D(const C_Device device,
+                        C_Stream stream,
+                        void *dst,
+                        const void *src,
+                        size_t size) {
+  StreamMemCpy("MEMCPY_DtoD", DeviceId(device), stream, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status AsyncMemCpyD2H(const C_Device device,
+                        C_Stream stream,
+                        void *dst,
+                        const void *src,
+                        size_t size) {
+  StreamMemCpy("MEMCPY_DtoH", DeviceId(device), stream, dst, src, size);
   return C_SUCCESS;
 }
 
@@ -92,7 +217,7 @@ C_Status MemCpyP2P(const C_Device dst_device,
                    void *dst,
                    const void *src,
                    size_t size) {
-  memcpy(dst, src, size);
+  StreamMemCpy("MEMCPY_PtoP", DeviceId(src_device), nullptr, dst, src, size);
   return C_SUCCESS;
 }
 
@@ -102,12 +227,15 @@ C_Status AsyncMemCpyP2P(const C_Device dst_device,
                         void *dst,
                         const void *src,
                         size_t size) {
-  memcpy(dst, src, size);
+  StreamMemCpy("MEMCPY_PtoP", DeviceId(src_device), stream, dst, src, size);
   return C_SUCCESS;
 }
 
 C_Status Allocate(const C_Device device, void **ptr, size_t size) {
-  auto data = malloc(size);
+  TraceScope trace(
+      "Allocate", TraceEventKind::kRuntimeApi, size, DeviceId(device));
+  auto data = custom_cpu::CachedAllocate(
+      size, custom_cpu::DeviceNumaNode(DeviceId(device)));
   if (data) {
     *ptr = data;
     return C_SUCCESS;
@@ -118,42 +246,106 @@ C_Status Allocate(const C_Device device, void **ptr, size_t size) {
 }
 
 C_Status Deallocate(const C_Device device, void *ptr, size_t size) {
-  free(ptr);
+  TraceScope trace(
+      "Deallocate", TraceEventKind::kRuntimeApi, size, DeviceId(device));
+  custom_cpu::CachedFree(
+      ptr, size, custom_cpu::DeviceNumaNode(DeviceId(device)));
   return C_SUCCESS;
 }
 
 C_Status CreateStream(const C_Device device, C_Stream *stream) {
-  stream = nullptr;
+  auto impl = new custom_cpu::Stream();
+  {
+    std::lock_guard<std::mutex> lock(streams_mu);
+    streams.insert(impl);
+  }
+  *stream = reinterpret_cast<C_Stream>(impl);
   return C_SUCCESS;
 }
 
 C_Status DestroyStream(const C_Device device, C_Stream stream) {
+  {
+    std::lock_guard<std::mutex> lock(streams_mu);
+    streams.erase(ToStream(stream));
+  }
+  delete ToStream(stream);
+  return C_SUCCESS;
+}
+
+C_Status QueryStream(const C_Device device, C_Stream stream) {
+  if (!stream || ToStream(stream)->Query()) return C_SUCCESS;
+  return C_FAILED;
+}
+
+C_Status AddCallback(const C_Device device,
+                     C_Stream stream,
+                     C_Callback callback,
+                     void *user_data) {
+  TraceScope api(
+      "AddCallback", TraceEventKind::kRuntimeApi, 0, DeviceId(device));
+  auto correlation_id = api.correlation_id();
+  C_Device_st device_copy = *device;
+  auto task = [=]() mutable {
+    TraceScope trace("StreamCallback",
+                     TraceEventKind::kStreamTask,
+                     0,
+                     device_copy.id,
+                     StreamId(stream),
+                     correlation_id);
+    C_Status status = C_SUCCESS;
+    callback(&device_copy, stream, user_data, &status);
+  };
+  if (stream) {
+    ToStream(stream)->Enqueue(task);
+  } else {
+    task();
+  }
   return C_SUCCESS;
 }
 
 C_Status CreateEvent(const C_Device device, C_Event *event) {
+  *event = reinterpret_cast<C_Event>(new custom_cpu::Event());
   return C_SUCCESS;
 }
 
 C_Status RecordEvent(const C_Device device, C_Stream stream, C_Event event) {
+  ToEvent(event)->Record(ToStream(stream));
   return C_SUCCESS;
 }
 
+C_Status QueryEvent(const C_Device device, C_Event event) {
+  return ToEvent(event)->Query() ? C_SUCCESS : C_FAILED;
+}
+
 C_Status DestroyEvent(const C_Device device, C_Event event) {
+  delete ToEvent(event);
   return C_SUCCESS;
 }
 
-C_Status SyncDevice(const C_Device device) { return C_SUCCESS; }
+C_Status SyncDevice(const C_Device device) {
+  std::lock_guard<std::mutex> lock(streams_mu);
+  for (auto stream : streams) stream->Synchronize();
+  return C_SUCCESS;
+}
 
 C_Status SyncStream(const C_Device device, C_Stream stream) {
+  WaitStream(stream);
   return C_SUCCESS;
 }
 
-C_Status SyncEvent(const C_Device device, C_Event event) { return C_SUCCESS; }
+C_Status SyncEvent(const C_Device device, C_Event event) {
+  ToEvent(event)->Synchronize();
+  return C_SUCCESS;
+}
 
 C_Status StreamWaitEvent(const C_Device device,
                          C_Stream stream,
                          C_Event event) {
+  if (stream) {
+    ToStream(stream)->WaitEvent(*ToEvent(event));
+  } else {
+    ToEvent(event)->Synchronize();
+  }
   return C_SUCCESS;
 }
 
@@ -162,24 +354,18 @@ C_Status VisibleDevices(size_t *devices) { return C_SUCCESS; }
 C_Status DeviceMemStats(const C_Device device,
                         size_t *total_memory,
                         size_t *free_memory) {
-  float memusage;
-  FILE *fp;
-  char buffer[1024];
-  size_t byte_read;
-  char *pos;
-
-  fp = fopen("/proc/meminfo", "r");
-  byte_read = fread(buffer, 1, sizeof(buffer), fp);
-  fclose(fp);
-  buffer[byte_read] = '\0';
-  pos = strstr(buffer, "MemTotal:");
-  sscanf(pos, "MemTotal: %lu kB", total_memory);
-  pos = strstr(pos, "MemFree:");
-  sscanf(pos, "MemFree: %lu kB", free_memory);
-  *total_memory = *total_memory * 1024;
-  *free_memory = *free_memory * 1024;
-  *free_memory = *free_memory * MEMORY_FRACTION;
-
+  // The device owns MEMORY_FRACTION of the physical memory of its NUMA node,
+  // or of the host when it has none. Bytes handed out and bytes parked in
+  // the allocator's free lists both count against it: a cached block only
+  // serves requests of its own size class.
+  const int node = custom_cpu::DeviceNumaNode(DeviceId(device));
+  *total_memory = custom_cpu::NodeTotalMemory(node);
+  auto budget = static_cast<size_t>(*total_memory * MEMORY_FRACTION);
+  auto stats = custom_cpu::GetDeviceTopology().empty()
+                   ? custom_cpu::GetAllocatorStats()
+                   : custom_cpu::GetAllocatorStats(node);
+  size_t held = stats.in_use_bytes + stats.cached_bytes;
+  *free_memory = budget > held ? budget - held : 0;
   return C_SUCCESS;
 }
 
@@ -188,53 +374,152 @@ C_Status DeviceMinChunkSize(const C_Device device, size_t *size) {
   return C_SUCCESS;
 }
 
-struct C_CCLComm_st {
-  size_t rank;
-  size_t nranks;
-  sem_t *sig;
-  sem_t *sig_2;
-  std::string sig_name;
-  std::string sig_2_name;
+namespace {
+
+custom_cpu::ShmCommunicator *ToComm(C_CCLComm comm) {
+  return reinterpret_cast<custom_cpu::ShmCommunicator *>(comm);
+}
+
+bool ToCclDataType(C_DataType data_type, custom_cpu::CclDataType *dtype) {
+  using custom_cpu::CclDataType;
+  switch (data_type) {
+    case BOOL:
+      *dtype = CclDataType::kBool;
+      return true;
+    case INT8:
+      *dtype = CclDataType::kInt8;
+      return true;
+    case UINT8:
+      *dtype = CclDataType::kUint8;
+      return true;
+    case INT16:
+      *dtype = CclDataType::kInt16;
+      return true;
+    case UINT16:
+      *dtype = CclDataType::kUint16;
+      return true;
+    case INT32:
+      *dtype = CclDataType::kInt32;
+      return true;
+    case UINT32:
+      *dtype = CclDataType::kUint32;
+      return true;
+    case INT64:
+      *dtype = CclDataType::kInt64;
+      return true;
+    case UINT64:
+      *dtype = CclDataType::kUint64;
+      return true;
+    case FLOAT16:
+      *dtype = CclDataType::kFloat16;
+      return true;
+    case BFLOAT16:
+      *dtype = CclDataType::kBFloat16;
+      return true;
+    case FLOAT32:
+      *dtype = CclDataType::kFloat32;
+      return true;
+    case FLOAT64:
+      *dtype = CclDataType::kFloat64;
+      return true;
+    case COMPLEX64:
+      *dtype = CclDataType::kComplex64;
+      return true;
+    case COMPLEX128:
+      *dtype = CclDataType::kComplex128;
+      return true;
+    default:
+      return false;
+  }
+}
+
+bool ToCclReduceOp(C_CCLReduceOp reduce_op, custom_cpu::CclReduceOp *op) {
+  using custom_cpu::CclReduceOp;
+  switch (reduce_op) {
+    case SUM:
+      *op = CclReduceOp::kSum;
+      return true;
+    case AVG:
+      *op = CclReduceOp::kAvg;
+      return true;
+    case MAX:
+      *op = CclReduceOp::kMax;
+      return true;
+    case MIN:
+      *op = CclReduceOp::kMin;
+      return true;
+    case PRODUCT:
+      *op = CclReduceOp::kProduct;
+      return true;
+    default:
+      return false;
+  }
+}
+
+size_t ByteSize(size_t count, C_DataType data_type) {
+  custom_cpu::CclDataType dtype;
+  if (!ToCclDataType(data_type, &dtype)) return 0;
+  return count * custom_cpu::CclDataTypeSize(dtype);
+}
+
+// Traces a collective as the runtime call `api` and the communication `op`
+// it runs inline, ordered after the work already queued on `stream`.
+class CollectiveTrace {
+ public:
+  CollectiveTrace(const char *api,
+                  const char *op,
+                  size_t bytes,
+                  C_Stream stream)
+      : api_(api, TraceEventKind::kRuntimeApi, bytes, global_current_device),
+        op_(op,
+            TraceEventKind::kCollective,
+            bytes,
+            global_current_device,
+            StreamId(stream),
+            api_.correlation_id()) {}
+
+ private:
+  TraceScope api_;
+  TraceScope op_;
 };
 
-// for unittest
+}  // namespace
+
 C_Status XcclGetUniqueIdSize(size_t *sz) {
-  *sz = sizeof(size_t);
+  *sz = 32;
   return C_SUCCESS;
 }
 
 C_Status XcclGetUniqueId(C_CCLRootId *unique_id) {
-  auto ptr = reinterpret_cast<int8_t *>(unique_id->data);
-  for (auto i = 0; i < unique_id->sz - 1; ++i) {
-    ptr[i] = static_cast<int8_t>(std::rand() % ('z' - 'a') + 'a');
+  auto ptr = reinterpret_cast<char *>(unique_id->data);
+  std::random_device device;
+  std::mt19937 gen(device());
+  std::uniform_int_distribution<int> dist('a', 'z');
+  for (size_t i = 0; i + 1 < unique_id->sz; ++i) {
+    ptr[i] = static_cast<char>(dist(gen));
   }
   ptr[unique_id->sz - 1] = '\0';
   return C_SUCCESS;
 }
 
-C_Status XcclCommInitRank(size_t ranks,
+C_Status XcclCommInitRank(size_t nranks,
                           C_CCLRootId *unique_id,
                           size_t rank,
                           C_CCLComm *comm) {
-  auto sig = sem_open(static_cast<char *>(unique_id->data), O_CREAT, 0644, 0);
-  auto sig_2 =
-      sem_open(static_cast<char *>(unique_id->data) + 1, O_CREAT, 0644, 0);
-  *comm =
-      new C_CCLComm_st({rank,
-                        ranks,
-                        sig,
-                        sig_2,
-                        std::string(static_cast<char *>(unique_id->data)),
-                        std::string(static_cast<char *>(unique_id->data) + 1)});
+  auto impl = custom_cpu::ShmCommunicator::Create(
+      std::string(static_cast<char *>(unique_id->data)),
+      static_cast<int>(rank),
+      static_cast<int>(nranks));
+  if (!impl) {
+    *comm = nullptr;
+    return C_FAILED;
+  }
+  *comm = reinterpret_cast<C_CCLComm>(impl.release());
   return C_SUCCESS;
 }
 
 C_Status XcclDestroyComm(C_CCLComm comm) {
-  if (comm) {
-    sem_unlink(comm->sig_name.c_str());
-    sem_unlink(comm->sig_2_name.c_str());
-    delete comm;
-  }
+  delete ToComm(comm);
   return C_SUCCESS;
 }
 
@@ -245,19 +530,15 @@ C_Status XcclAllReduce(void *send_buf,
                        C_CCLReduceOp op,
                        C_CCLComm comm,
                        C_Stream stream) {
-  sem_post(comm->sig);
-
-  if (comm->rank == 0) {
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_wait(comm->sig);
-    }
-
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_post(comm->sig_2);
-    }
+  WaitStream(stream);
+  CollectiveTrace trace(
+      "XcclAllReduce", "AllReduce", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  custom_cpu::CclReduceOp reduce_op;
+  if (!ToCclDataType(data_type, &dtype) || !ToCclReduceOp(op, &reduce_op) ||
+      !ToComm(comm)->AllReduce(send_buf, recv_buf, count, dtype, reduce_op)) {
+    return C_FAILED;
   }
-
-  sem_wait(comm->sig_2);
   return C_SUCCESS;
 }
 
@@ -267,19 +548,124 @@ C_Status XcclBroadcast(void *buf,
                        size_t root,
                        C_CCLComm comm,
                        C_Stream stream) {
-  sem_post(comm->sig);
+  WaitStream(stream);
+  CollectiveTrace trace(
+      "XcclBroadcast", "Broadcast", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  if (!ToCclDataType(data_type, &dtype)) {
+    return C_FAILED;
+  }
+  ToComm(comm)->Broadcast(
+      buf, count * custom_cpu::CclDataTypeSize(dtype), static_cast<int>(root));
+  return C_SUCCESS;
+}
+
+C_Status XcclReduce(void *send_buf,
+                    void *recv_buf,
+                    size_t count,
+                    C_DataType data_type,
+                    C_CCLReduceOp op,
+                    size_t root,
+                    C_CCLComm comm,
+                    C_Stream stream) {
+  WaitStream(stream);
+  CollectiveTrace trace(
+      "XcclReduce", "Reduce", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  custom_cpu::CclReduceOp reduce_op;
+  if (!ToCclDataType(data_type, &dtype) || !ToCclReduceOp(op, &reduce_op) ||
+      !ToComm(comm)->Reduce(send_buf,
+                            recv_buf,
+                            count,
+                            dtype,
+                            reduce_op,
+                            static_cast<int>(root))) {
+    return C_FAILED;
+  }
+  return C_SUCCESS;
+}
 
-  if (comm->rank == 0) {
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_wait(comm->sig);
-    }
+C_Status XcclAllGather(void *send_buf,
+                       void *recv_buf,
+                       size_t count,
+                       C_DataType data_type,
+                       C_CCLComm comm,
+                       C_Stream stream) {
+  WaitStream(stream);
+  CollectiveTrace trace(
+      "XcclAllGather", "AllGather", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  if (!ToCclDataType(data_type, &dtype)) {
+    return C_FAILED;
+  }
+  ToComm(comm)->AllGather(
+      send_buf, recv_buf, count * custom_cpu::CclDataTypeSize(dtype));
+  return C_SUCCESS;
+}
 
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_post(comm->sig_2);
-    }
+C_Status XcclReduceScatter(void *send_buf,
+                           void *recv_buf,
+                           size_t count,
+                           C_DataType data_type,
+                           C_CCLReduceOp op,
+                           C_CCLComm comm,
+                           C_Stream stream) {
+  WaitStream(stream);
+  CollectiveTrace trace(
+      "XcclReduceScatter", "ReduceScatter", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  custom_cpu::CclReduceOp reduce_op;
+  if (!ToCclDataType(data_type, &dtype) || !ToCclReduceOp(op, &reduce_op) ||
+      !ToComm(comm)->ReduceScatter(
+          send_buf, recv_buf, count, dtype, reduce_op)) {
+    return C_FAILED;
   }
+  return C_SUCCESS;
+}
 
-  sem_wait(comm->sig_2);
+C_Status XcclGroupStart() {
+  custom_cpu::ShmCommunicator::GroupStart();
+  return C_SUCCESS;
+}
+
+C_Status XcclGroupEnd() {
+  custom_cpu::ShmCommunicator::GroupEnd();
+  return C_SUCCESS;
+}
+
+C_Status XcclSend(void *send_buf,
+                  size_t count,
+                  C_DataType data_type,
+                  size_t dest_rank,
+                  C_CCLComm comm,
+                  C_Stream stream) {
+  WaitStream(stream);
+  CollectiveTrace trace("XcclSend", "Send", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  if (!ToCclDataType(data_type, &dtype)) {
+    return C_FAILED;
+  }
+  ToComm(comm)->Send(send_buf,
+                     count * custom_cpu::CclDataTypeSize(dtype),
+                     static_cast<int>(dest_rank));
+  return C_SUCCESS;
+}
+
+C_Status XcclRecv(void *recv_buf,
+                  size_t count,
+                  C_DataType data_type,
+                  size_t src_rank,
+                  C_CCLComm comm,
+                  C_Stream stream) {
+  WaitStream(stream);
+  CollectiveTrace trace("XcclRecv", "Recv", ByteSize(count, data_type), stream);
+  custom_cpu::CclDataType dtype;
+  if (!ToCclDataType(data_type, &dtype)) {
+    return C_FAILED;
+  }
+  ToComm(comm)->Recv(recv_buf,
+                     count * custom_cpu::CclDataTypeSize(dtype),
+                     static_cast<int>(src_rank));
   return C_SUCCESS;
 }
 
@@ -288,18 +674,26 @@ C_Status ProfilerInitialize(C_Profiler prof, void **user_data) {
 }
 
 C_Status ProfilerFinalize(C_Profiler prof, void *user_data) {
+  custom_cpu::StopTracing();
   return C_SUCCESS;
 }
 
 C_Status ProfilerPrepare(C_Profiler prof, void *user_data) { return C_SUCCESS; }
 
-C_Status ProfilerStart(C_Profiler prof, void *user_data) { return C_SUCCESS; }
+C_Status ProfilerStart(C_Profiler prof, void *user_data) {
+  custom_cpu::StartTracing();
+  return C_SUCCESS;
+}
 
-C_Status ProfilerStop(C_Profiler prof, void *user_data) { return C_SUCCESS; }
+C_Status ProfilerStop(C_Profiler prof, void *user_data) {
+  custom_cpu::StopTracing();
+  return C_SUCCESS;
+}
 
 C_Status ProfilerCollectData(C_Profiler prof,
                              uint64_t start_ns,
                              void *user_data) {
+  ProcessTraceEvents(prof, start_ns);
   return C_SUCCESS;
 }
 
@@ -322,23 +716,26 @@ void InitPlugin(CustomRuntimeParams *params) {
 
   params->interface->create_stream = CreateStream;
   params->interface->destroy_stream = DestroyStream;
+  params->interface->query_stream = QueryStream;
+  params->interface->stream_add_callback = AddCallback;
 
   params->interface->create_event = CreateEvent;
   params->interface->destroy_event = DestroyEvent;
   params->interface->record_event = RecordEvent;
+  params->interface->query_event = QueryEvent;
 
   params->interface->synchronize_device = SyncDevice;
   params->interface->synchronize_stream = SyncStream;
   params->interface->synchronize_event = SyncEvent;
   params->interface->stream_wait_event = StreamWaitEvent;
 
-  params->interface->memory_copy_h2d = MemCpy;
-  params->interface->memory_copy_d2d = MemCpy;
-  params->interface->memory_copy_d2h = MemCpy;
+  params->interface->memory_copy_h2d = MemCpyH2D;
+  params->interface->memory_copy_d2d = MemCpyD2D;
+  params->interface->memory_copy_d2h = MemCpyD2H;
   params->interface->memory_copy_p2p = MemCpyP2P;
-  params->interface->async_memory_copy_h2d = AsyncMemCpy;
-  params->interface->async_memory_copy_d2d = AsyncMemCpy;
-  params->interface->async_memory_copy_d2h = AsyncMemCpy;
+  params->interface->async_memory_copy_h2d = AsyncMemCpyH2D;
+  params->interface->async_memory_copy_d2d = AsyncMemCpyD2D;
+  params->interface->async_memory_copy_d2h = AsyncMemCpyD2H;
   params->interface->async_memory_copy_p2p = AsyncMemCpyP2P;
   params->interface->device_memory_allocate = Allocate;
   params->interface->host_memory_allocate = Allocate;
@@ -358,6 +755,13 @@ void InitPlugin(CustomRuntimeParams *params) {
   params->interface->xccl_destroy_comm = XcclDestroyComm;
   params->interface->xccl_all_reduce = XcclAllReduce;
   params->interface->xccl_broadcast = XcclBroadcast;
+  params->interface->xccl_reduce = XcclReduce;
+  params->interface->xccl_all_gather = XcclAllGather;
+  params->interface->xccl_reduce_scatter = XcclReduceScatter;
+  params->interface->xccl_group_start = XcclGroupStart;
+  params->interface->xccl_group_end = XcclGroupEnd;
+  params->interface->xccl_send = XcclSend;
+  params->interface->xccl_recv = XcclRecv;
 
   params->interface->profiler_collect_trace_data = ProfilerCollectData;
   params->interface->profiler_initialize = ProfilerInitialize;
@@ -0,0 +1,120 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/stream.h"
+
+#include <cstdlib>
+#include <utility>
+
+namespace custom_cpu {
+
+Event::Event() : state_(std::make_shared<State>()) {}
+
+void Event::Record(Stream* stream) {
+  uint64_t ticket;
+  {
+    std::lock_guard<std::mutex> lock(state_->mu);
+    ticket = ++state_->recorded;
+    if (!stream) {
+      state_->completed = ticket;
+      state_->cv.notify_all();
+      return;
+    }
+  }
+  auto state = state_;
+  stream->Enqueue([state, ticket] {
+    std::lock_guard<std::mutex> lock(state->mu);
+    if (state->completed < ticket) state->completed = ticket;
+    state->cv.notify_all();
+  });
+}
+
+bool Event::Query() const {
+  std::lock_guard<std::mutex> lock(state_->mu);
+  return state_->completed >= state_->recorded;
+}
+
+void Event::Synchronize() const {
+  std::unique_lock<std::mutex> lock(state_->mu);
+  auto ticket = state_->recorded;
+  state_->cv.wait(lock, [&] { return state_->completed >= ticket; });
+}
+
+Stream::Stream() : worker_([this] { WorkerLoop(); }) {}
+
+Stream::~Stream() {
+  {
+    std::lock_guard<std::mutex> lock(mu_);
+    stop_ = true;
+  }
+  cv_.notify_all();
+  worker_.join();
+}
+
+void Stream::Enqueue(std::function<void()> task) {
+  {
+    std::lock_guard<std::mutex> lock(mu_);
+    tasks_.push_back(std::move(task));
+  }
+  cv_.notify_one();
+}
+
+void Stream::WaitEvent(const Event& event) {
+  auto state = event.state_;
+  uint64_t ticket;
+  {
+    std::lock_guard<std::mutex> lock(state->mu);
+    ticket = state->recorded;
+  }
+  Enqueue([state, ticket] {
+    std::unique_lock<std::mutex> lock(state->mu);
+    state->cv.wait(lock, [&] { return state->completed >= ticket; });
+  });
+}
+
+void Stream::Synchronize() {
+  std::unique_lock<std::mutex> lock(mu_);
+  idle_cv_.wait(lock, [this] { return tasks_.empty() && !running_; });
+}
+
+bool Stream::Query() {
+  std::lock_guard<std::mutex> lock(mu_);
+  return tasks_.empty() && !running_;
+}
+
+void Stream::WorkerLoop() {
+  std::unique_lock<std::mutex> lock(mu_);
+  while (true) {
+    cv_.wait(lock, [this] { return stop_ || !tasks_.empty(); });
+    if (tasks_.empty()) return;
+    auto task = std::move(tasks_.front());
+    tasks_.pop_front();
+    running_ = true;
+    lock.unlock();
+    task();
+    lock.lock();
+    running_ = false;
+    if (tasks_.empty()) idle_cv_.notify_all();
+  }
+}
+
+bool AsyncMemcpyEnabled() {
+  static const bool enabled = [] {
+    const char* env = std::getenv("FLAGS_custom_cpu_async_memcpy");
+    return env && std::atoi(env) != 0;
+  }();
+  return enabled;
+}
+
+}  // namespace custom_cpu
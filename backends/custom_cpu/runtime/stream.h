@@ -0,0 +1,94 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <condition_variable>
+#include <cstdint>
+#include <deque>
+#include <functional>
+#include <memory>
+#include <mutex>
+#include <thread>
+
+namespace custom_cpu {
+
+class Stream;
+
+// A marker in a stream's task queue. Record() captures all work submitted
+// to the stream so far; the event completes once the stream has run it.
+// Re-recording moves the marker, and an event that was never recorded or
+// was recorded on a null stream is complete.
+class Event {
+ public:
+  Event();
+
+  void Record(Stream* stream);
+  bool Query() const;
+  void Synchronize() const;
+
+ private:
+  friend class Stream;
+
+  struct State {
+    std::mutex mu;
+    std::condition_variable cv;
+    uint64_t recorded = 0;
+    uint64_t completed = 0;
+  };
+
+  // Shared with the tasks that complete or wait on it, so the event may be
+  // destroyed while still pending.
+  std::shared_ptr<State> state_;
+};
+
+// An in-order work queue served by a dedicated thread, standing in for a
+// device stream.
+class Stream {
+ public:
+  Stream();
+  // Runs the remaining tasks and joins the worker.
+  ~Stream();
+
+  Stream(const Stream&) = delete;
+  Stream& operator=(const Stream&) = delete;
+
+  void Enqueue(std::function<void()> task);
+  // Makes later tasks wait until `event` reaches its current record.
+  void WaitEvent(const Event& event);
+  // Blocks until every task submitted so far has run.
+  void Synchronize();
+  // Whether every task submitted so far has run.
+  bool Query();
+
+ private:
+  void WorkerLoop();
+
+  std::mutex mu_;
+  std::condition_variable cv_;
+  std::condition_variable idle_cv_;
+  std::deque<std::function<void()>> tasks_;
+  bool running_ = false;
+  bool stop_ = false;
+  std::thread worker_;
+};
+
+// Whether AsyncMemCpy returns before the copy has run, as read from
+// FLAGS_custom_cpu_async_memcpy. Off by default: kernels execute on the
+// launching thread as soon as they are launched, not in stream order, so a
+// kernel could otherwise read a buffer that an earlier copy on its stream
+// has not written yet.
+bool AsyncMemcpyEnabled();
+
+}  // namespace custom_cpu
@@ -0,0 +1,223 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/thread_pool.h"
+
+#include <algorithm>
+#include <atomic>
+#include <cstdlib>
+#include <exception>
+#include <memory>
+
+#include "runtime/topology.h"
+
+namespace custom_cpu {
+
+namespace {
+
+thread_local bool in_parallel_region = false;
+
+thread_local int thread_pool_device = 0;
+
+using ThreadPools = std::vector<std::unique_ptr<ThreadPool>>;
+
+std::mutex pool_mu;
+std::unique_ptr<ThreadPools> pools_holder;
+std::atomic<ThreadPools*> global_pools{nullptr};
+
+int DefaultNumThreads(const std::vector<int>& cpus = {}) {
+  const char* env = std::getenv("FLAGS_custom_cpu_num_threads");
+  if (env) {
+    int num_threads = std::atoi(env);
+    if (num_threads > 0) return num_threads;
+  }
+  if (!cpus.empty()) return static_cast<int>(cpus.size());
+  return std::max(1, static_cast<int>(std::thread::hardware_concurrency()));
+}
+
+// One pool per device of the topology, or a single unpinned one.
+std::unique_ptr<ThreadPools> CreateThreadPools(int num_threads) {
+  std::unique_ptr<ThreadPools> pools(new ThreadPools);
+  for (const auto& device : GetDeviceTopology()) {
+    pools->emplace_back(new ThreadPool(
+        num_threads > 0 ? num_threads : DefaultNumThreads(device.cpus),
+        device.cpus));
+  }
+  if (pools->empty()) {
+    pools->emplace_back(
+        new ThreadPool(num_threads > 0 ? num_threads : DefaultNumThreads()));
+  }
+  return pools;
+}
+
+struct RunState {
+  const std::function<void(int64_t)>* fn;
+  int64_t num_tasks;
+  std::atomic<int64_t> next{0};
+  std::atomic<int64_t> pending{0};
+  std::mutex mu;
+  std::condition_variable done_cv;
+  std::exception_ptr error;
+};
+
+// Claims task indices until none are left. Only touches state->fn for
+// indices it claimed, so a late helper never calls into a finished Run().
+void Drain(const std::shared_ptr<RunState>& state) {
+  bool saved = in_parallel_region;
+  in_parallel_region = true;
+  while (true) {
+    int64_t i = state->next.fetch_add(1);
+    if (i >= state->num_tasks) break;
+    try {
+      (*state->fn)(i);
+    } catch (...) {
+      std::lock_guard<std::mutex> lock(state->mu);
+      if (!state->error) state->error = std::current_exception();
+    }
+    if (state->pending.fetch_sub(1) == 1) {
+      std::lock_guard<std::mutex> lock(state->mu);
+      state->done_cv.notify_all();
+    }
+  }
+  in_parallel_region = saved;
+}
+
+}  // namespace
+
+ThreadPool::ThreadPool(int num_threads, const std::vector<int>& cpus) {
+  for (int i = 1; i < num_threads; ++i) {
+    std::vector<int> cpu;
+    if (!cpus.empty()) cpu.push_back(cpus[i % cpus.size()]);
+    workers_.emplace_back([this, cpu] {
+      PinCurrentThread(cpu);
+      WorkerLoop();
+    });
+  }
+}
+
+ThreadPool::~ThreadPool() {
+  {
+    std::lock_guard<std::mutex> lock(mu_);
+    stop_ = true;
+  }
+  cv_.notify_all();
+  for (auto& worker : workers_) {
+    worker.join();
+  }
+}
+
+void ThreadPool::WorkerLoop() {
+  while (true) {
+    std::function<void()> job;
+    {
+      std::unique_lock<std::mutex> lock(mu_);
+      cv_.wait(lock, [this] { return stop_ || !jobs_.empty(); });
+      if (stop_ && jobs_.empty()) return;
+      job = std::move(jobs_.front());
+      jobs_.pop_front();
+    }
+    job();
+  }
+}
+
+void ThreadPool::Run(int64_t num_tasks,
+                     const std::function<void(int64_t)>& fn) {
+  if (num_tasks <= 0) return;
+  if (num_tasks == 1 || workers_.empty() || in_parallel_region) {
+    for (int64_t i = 0; i < num_tasks; ++i) {
+      fn(i);
+    }
+    return;
+  }
+
+  auto state = std::make_shared<RunState>();
+  state->fn = &fn;
+  state->num_tasks = num_tasks;
+  state->pending = num_tasks;
+
+  auto helpers = std::min<int64_t>(num_tasks - 1, workers_.size());
+  {
+    std::lock_guard<std::mutex> lock(mu_);
+    for (int64_t i = 0; i < helpers; ++i) {
+      jobs_.emplace_back([state] { Drain(state); });
+    }
+  }
+  if (helpers == 1) {
+    cv_.notify_one();
+  } else {
+    cv_.notify_all();
+  }
+
+  Drain(state);
+  {
+    std::unique_lock<std::mutex> lock(state->mu);
+    state->done_cv.wait(lock, [&state] { return state->pending == 0; });
+  }
+  if (state->error) std::rethrow_exception(state->error);
+}
+
+void InitThreadPool(int num_threads) {
+  auto pools = CreateThreadPools(num_threads);
+  std::lock_guard<std::mutex> lock(pool_mu);
+  global_pools = nullptr;
+  pools_holder = std::move(pools);
+  global_pools = pools_holder.get();
+}
+
+void FinalizeThreadPool() {
+  std::lock_guard<std::mutex> lock(pool_mu);
+  global_pools = nullptr;
+  pools_holder.reset();
+}
+
+void SetThreadPoolDevice(int device) { thread_pool_device = device; }
+
+ThreadPool* GetThreadPool() {
+  ThreadPools* pools = global_pools;
+  if (!pools) {
+    std::lock_guard<std::mutex> lock(pool_mu);
+    if (!pools_holder) {
+      pools_holder = CreateThreadPools(0);
+      global_pools = pools_holder.get();
+    }
+    pools = pools_holder.get();
+  }
+  auto device = thread_pool_device;
+  if (device < 0 || device >= static_cast<int>(pools->size())) device = 0;
+  return (*pools)[device].get();
+}
+
+void ParallelFor(int64_t begin,
+                 int64_t end,
+                 int64_t grain,
+                 const std::function<void(int64_t, int64_t)>& fn) {
+  if (begin >= end) return;
+  auto range = end - begin;
+  grain = std::max<int64_t>(grain, 1);
+  auto pool = GetThreadPool();
+  auto num_chunks =
+      std::min<int64_t>(pool->NumThreads(), (range + grain - 1) / grain);
+  if (num_chunks <= 1 || in_parallel_region) {
+    fn(begin, end);
+    return;
+  }
+  auto chunk = (range + num_chunks - 1) / num_chunks;
+  pool->Run(num_chunks, [&](int64_t i) {
+    auto chunk_begin = begin + i * chunk;
+    auto chunk_end = std::min(end, chunk_begin + chunk);
+    if (chunk_begin < chunk_end) fn(chunk_begin, chunk_end);
+  });
+}
+
+}  // namespace custom_cpu
@@ -0,0 +1,84 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <condition_variable>
+#include <cstdint>
+#include <deque>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace custom_cpu {
+
+// A fixed-size pool of worker threads. The thread calling Run() takes part in
+// the work, so a pool of N threads owns N - 1 workers. With a non-empty
+// `cpus`, worker i is pinned to cpus[i % cpus.size()].
+class ThreadPool {
+ public:
+  explicit ThreadPool(int num_threads, const std::vector<int>& cpus = {});
+  ~ThreadPool();
+
+  ThreadPool(const ThreadPool&) = delete;
+  ThreadPool& operator=(const ThreadPool&) = delete;
+
+  int NumThreads() const { return static_cast<int>(workers_.size()) + 1; }
+
+  // Calls fn(i) for every i in [0, num_tasks) and blocks until all calls
+  // return. The first exception thrown by fn is rethrown in the caller.
+  void Run(int64_t num_tasks, const std::function<void(int64_t)>& fn);
+
+ private:
+  void WorkerLoop();
+
+  std::vector<std::thread> workers_;
+  std::deque<std::function<void()>> jobs_;
+  std::mutex mu_;
+  std::condition_variable cv_;
+  bool stop_ = false;
+};
+
+// Elementwise loops are not split below this many iterations per thread.
+constexpr int64_t kDefaultGrainSize = 1 << 15;
+
+// Creates the intra-op pools, replacing any existing ones: one per device of
+// FLAGS_custom_cpu_devices with its workers pinned to the device's CPUs, or a
+// single unpinned pool when no topology is configured. A non-positive
+// num_threads reads FLAGS_custom_cpu_num_threads and falls back to the
+// number of CPUs of the device, or to the number of hardware threads. Must
+// not race with running kernels.
+void InitThreadPool(int num_threads = 0);
+
+// Joins and destroys the pools.
+void FinalizeThreadPool();
+
+// Makes later kernels on the calling thread use the pool of `device`.
+// Threads that never call it use the pool of device 0.
+void SetThreadPoolDevice(int device);
+
+// Returns the intra-op pool of the calling thread's device, creating the
+// pools on first use.
+ThreadPool* GetThreadPool();
+
+// Splits [begin, end) into at most GetThreadPool()->NumThreads() chunks of at
+// least `grain` iterations and calls fn(chunk_begin, chunk_end) on each.
+// Nested calls from inside a parallel region run serially on the caller.
+void ParallelFor(int64_t begin,
+                 int64_t end,
+                 int64_t grain,
+                 const std::function<void(int64_t, int64_t)>& fn);
+
+}  // namespace custom_cpu
@@ -0,0 +1,208 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/topology.h"
+
+#include <dirent.h>
+#include <pthread.h>
+#include <sched.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+
+namespace custom_cpu {
+
+namespace {
+
+// From linux/mempolicy.h, which numaif.h wraps.
+constexpr int kMpolPreferred = 1;
+
+bool ReadFile(const std::string& path, std::string* content) {
+  std::ifstream in(path);
+  if (!in) return false;
+  std::stringstream buffer;
+  buffer << in.rdbuf();
+  *content = buffer.str();
+  return true;
+}
+
+bool ParseInt(const std::string& text, int* value) {
+  if (text.empty()) return false;
+  char* end = nullptr;
+  long parsed = std::strtol(text.c_str(), &end, 10);  // NOLINT
+  if (*end != '\0' || parsed < 0 || parsed > (1 << 20)) return false;
+  *value = static_cast<int>(parsed);
+  return true;
+}
+
+std::string Trim(const std::string& text) {
+  auto begin = text.find_first_not_of(" \t\n");
+  if (begin == std::string::npos) return "";
+  auto end = text.find_last_not_of(" \t\n");
+  return text.substr(begin, end - begin + 1);
+}
+
+// Parses "0-3,8,10-11" as the kernel prints CPU lists.
+bool ParseCpuList(const std::string& list, std::vector<int>* cpus) {
+  std::stringstream items(Trim(list));
+  std::string item;
+  while (std::getline(items, item, ',')) {
+    item = Trim(item);
+    auto dash = item.find('-');
+    int first, last;
+    if (dash == std::string::npos) {
+      if (!ParseInt(item, &first)) return false;
+      last = first;
+    } else if (!ParseInt(item.substr(0, dash), &first) ||
+               !ParseInt(item.substr(dash + 1), &last) || last < first) {
+      return false;
+    }
+    for (int cpu = first; cpu <= last; ++cpu) cpus->push_back(cpu);
+  }
+  return !cpus->empty();
+}
+
+// The NUMA node of `cpu`, from the nodeN link sysfs keeps next to it.
+int CpuNode(int cpu) {
+  auto path = "/sys/devices/system/cpu/cpu" + std::to_string(cpu);
+  DIR* dir = opendir(path.c_str());
+  if (!dir) return -1;
+  int node = -1;
+  while (auto* entry = readdir(dir)) {
+    if (std::strncmp(entry->d_name, "node", 4) == 0 &&
+        ParseInt(entry->d_name + 4, &node)) {
+      break;
+    }
+    node = -1;
+  }
+  closedir(dir);
+  return node;
+}
+
+std::vector<DeviceTopology> LoadDeviceTopology() {
+  std::vector<DeviceTopology> devices;
+  const char* env = std::getenv("FLAGS_custom_cpu_devices");
+  if (!env || !*env) return devices;
+  std::string error;
+  if (!ParseDeviceTopology(env, &devices, &error)) {
+    std::cerr << "custom_cpu: ignoring FLAGS_custom_cpu_devices=\"" << env
+              << "\": " << error << "\n";
+    devices.clear();
+  }
+  return devices;
+}
+
+}  // namespace
+
+bool ParseDeviceTopology(const std::string& spec,
+                         std::vector<DeviceTopology>* devices,
+                         std::string* error) {
+  std::stringstream entries(spec);
+  std::string entry;
+  while (std::getline(entries, entry, ';')) {
+    entry = Trim(entry);
+    if (entry.empty()) continue;
+    DeviceTopology device{{}, -1};
+    if (entry.compare(0, 5, "node:") == 0) {
+      std::string cpulist;
+      if (!ParseInt(entry.substr(5), &device.numa_node) ||
+          !ReadFile("/sys/devices/system/node/node" +
+                        std::to_string(device.numa_node) + "/cpulist",
+                    &cpulist) ||
+          !ParseCpuList(cpulist, &device.cpus)) {
+        *error = "no NUMA node for \"" + entry + "\"";
+        return false;
+      }
+    } else {
+      if (!ParseCpuList(entry, &device.cpus)) {
+        *error = "\"" + entry + "\" is neither node:N nor a CPU list";
+        return false;
+      }
+      device.numa_node = CpuNode(device.cpus[0]);
+      for (int cpu : device.cpus) {
+        if (CpuNode(cpu) != device.numa_node) device.numa_node = -1;
+      }
+    }
+    devices->push_back(device);
+  }
+  if (devices->empty()) {
+    *error = "no devices";
+    return false;
+  }
+  return true;
+}
+
+const std::vector<DeviceTopology>& GetDeviceTopology() {
+  static const std::vector<DeviceTopology> devices = LoadDeviceTopology();
+  return devices;
+}
+
+int NumDevices() {
+  const auto& devices = GetDeviceTopology();
+  return devices.empty() ? kDefaultNumDevices
+                         : static_cast<int>(devices.size());
+}
+
+int DeviceNumaNode(int device) {
+  const auto& devices = GetDeviceTopology();
+  if (device < 0 || device >= static_cast<int>(devices.size())) return -1;
+  return devices[device].numa_node;
+}
+
+bool PinCurrentThread(const std::vector<int>& cpus) {
+  if (cpus.empty()) return true;
+  cpu_set_t set;
+  CPU_ZERO(&set);
+  for (int cpu : cpus) {
+    if (cpu < CPU_SETSIZE) CPU_SET(cpu, &set);
+  }
+  return pthread_setaffinity_np(pthread_self(), sizeof(set), &set) == 0;
+}
+
+bool BindMemoryToNode(void* ptr, size_t size, int node) {
+  if (node < 0 || node >= kMaxNumaNodes) return false;
+  unsigned long mask = 1UL << node;  // NOLINT
+  return syscall(SYS_mbind,
+                 ptr,
+                 size,
+                 kMpolPreferred,
+                 &mask,
+                 sizeof(mask) * 8,
+                 0) == 0;
+}
+
+size_t NodeTotalMemory(int node) {
+  const size_t host = static_cast<size_t>(sysconf(_SC_PHYS_PAGES)) *
+                      static_cast<size_t>(sysconf(_SC_PAGESIZE));
+  std::string meminfo;
+  if (node < 0 || !ReadFile("/sys/devices/system/node/node" +
+                                std::to_string(node) + "/meminfo",
+                            &meminfo)) {
+    return host;
+  }
+  // "Node 0 MemTotal:       32658132 kB"
+  auto at = meminfo.find("MemTotal:");
+  if (at == std::string::npos) return host;
+  return static_cast<size_t>(
+             std::strtoull(meminfo.c_str() + at + 9, nullptr, 10))
+         << 10;
+}
+
+}  // namespace custom_cpu
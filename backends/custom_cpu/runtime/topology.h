@@ -0,0 +1,66 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstddef>
+#include <string>
+#include <vector>
+
+namespace custom_cpu {
+
+// Devices the plugin reports when FLAGS_custom_cpu_devices is unset. They
+// share every CPU and all memory.
+constexpr int kDefaultNumDevices = 2;
+
+// Allocations are bound to NUMA nodes below this id; higher nodes fall back
+// to the unbound pool.
+constexpr int kMaxNumaNodes = 16;
+
+// A virtual custom_cpu device: the CPUs its kernels run on and the NUMA
+// node its memory comes from, or -1 for no binding.
+struct DeviceTopology {
+  std::vector<int> cpus;
+  int numa_node;
+};
+
+// Parses a device list: devices separated by ';', each either "node:N",
+// the CPUs and memory of NUMA node N, or a CPU list such as "0-7,16-23",
+// whose memory comes from the node of its CPUs when they share one.
+// Returns false and sets *error on malformed input.
+bool ParseDeviceTopology(const std::string& spec,
+                         std::vector<DeviceTopology>* devices,
+                         std::string* error);
+
+// The devices FLAGS_custom_cpu_devices configures, read once; empty when it
+// is unset or invalid.
+const std::vector<DeviceTopology>& GetDeviceTopology();
+
+// Number of custom_cpu devices.
+int NumDevices();
+
+// The NUMA node device memory is bound to, or -1.
+int DeviceNumaNode(int device);
+
+// Pins the calling thread to `cpus`. An empty set is a no-op.
+bool PinCurrentThread(const std::vector<int>& cpus);
+
+// Sets the policy of [ptr, ptr + size), which must be page aligned and not
+// yet touched, to prefer memory of `node`.
+bool BindMemoryToNode(void* ptr, size_t size, int node);
+
+// Physical memory of NUMA node `node`, or of the whole host for -1.
+size_t NodeTotalMemory(int node);
+
+}  // namespace custom_cpu
@@ -0,0 +1,167 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/trace.h"
+
+#include <sys/syscall.h>
+#include <time.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <memory>
+#include <mutex>
+
+namespace custom_cpu {
+
+std::atomic<bool> tracing_enabled{false};
+
+namespace {
+
+// Events per thread; a power of two.
+constexpr uint64_t kRingCapacity = static_cast<uint64_t>(1) << 16;
+
+// Single-producer single-consumer ring. The owning thread pushes; the
+// collector drains under registry_mu.
+class TraceRing {
+ public:
+  TraceRing() : events_(new TraceEvent[kRingCapacity]) {}
+
+  void Push(const TraceEvent& event) {
+    auto head = head_.load(std::memory_order_relaxed);
+    if (head - tail_.load(std::memory_order_acquire) == kRingCapacity) {
+      dropped_.fetch_add(1, std::memory_order_relaxed);
+      return;
+    }
+    events_[head & (kRingCapacity - 1)] = event;
+    head_.store(head + 1, std::memory_order_release);
+  }
+
+  void Drain(std::vector<TraceEvent>* out) {
+    auto tail = tail_.load(std::memory_order_relaxed);
+    auto head = head_.load(std::memory_order_acquire);
+    for (; tail < head; ++tail) {
+      out->push_back(events_[tail & (kRingCapacity - 1)]);
+    }
+    tail_.store(head, std::memory_order_release);
+  }
+
+  bool Empty() const {
+    return head_.load(std::memory_order_acquire) ==
+           tail_.load(std::memory_order_acquire);
+  }
+
+  uint64_t TakeDropped() { return dropped_.exchange(0); }
+
+  std::atomic<bool> alive{true};
+
+ private:
+  std::unique_ptr<TraceEvent[]> events_;
+  std::atomic<uint64_t> head_{0};
+  std::atomic<uint64_t> tail_{0};
+  std::atomic<uint64_t> dropped_{0};
+};
+
+std::mutex registry_mu;
+std::vector<std::shared_ptr<TraceRing>> registry;
+std::atomic<uint64_t> dropped_events{0};
+std::atomic<uint64_t> correlation_ids{0};
+
+// Registers the calling thread's ring on first use and retires it when the
+// thread exits; the collector frees it once drained.
+struct ThreadRing {
+  std::shared_ptr<TraceRing> ring;
+  uint32_t thread_id = static_cast<uint32_t>(syscall(SYS_gettid));
+
+  TraceRing* Get() {
+    if (!ring) {
+      ring = std::make_shared<TraceRing>();
+      std::lock_guard<std::mutex> lock(registry_mu);
+      registry.push_back(ring);
+    }
+    return ring.get();
+  }
+
+  ~ThreadRing() {
+    if (ring) ring->alive = false;
+  }
+};
+
+thread_local ThreadRing thread_ring;
+
+void DrainLocked(std::vector<TraceEvent>* out) {
+  for (auto& ring : registry) {
+    if (out) {
+      ring->Drain(out);
+    } else {
+      std::vector<TraceEvent> discard;
+      ring->Drain(&discard);
+    }
+    dropped_events += ring->TakeDropped();
+  }
+  registry.erase(std::remove_if(registry.begin(),
+                                registry.end(),
+                                [](const std::shared_ptr<TraceRing>& ring) {
+                                  return !ring->alive && ring->Empty();
+                                }),
+                 registry.end());
+}
+
+}  // namespace
+
+void StartTracing() {
+  {
+    std::lock_guard<std::mutex> lock(registry_mu);
+    DrainLocked(nullptr);
+    dropped_events = 0;
+  }
+  tracing_enabled.store(true);
+}
+
+void StopTracing() { tracing_enabled.store(false); }
+
+uint64_t TraceNowNs() {
+  struct timespec tp;
+  clock_gettime(CLOCK_REALTIME, &tp);
+  return static_cast<uint64_t>(tp.tv_sec) * 1000000000 + tp.tv_nsec;
+}
+
+uint64_t NextCorrelationId() { return ++correlation_ids; }
+
+void RecordTraceEvent(const TraceEvent& event) {
+  auto copy = event;
+  copy.thread_id = thread_ring.thread_id;
+  thread_ring.Get()->Push(copy);
+}
+
+std::vector<TraceEvent> ConsumeTraceEvents() {
+  std::vector<TraceEvent> events;
+  std::lock_guard<std::mutex> lock(registry_mu);
+  DrainLocked(&events);
+  std::sort(events.begin(),
+            events.end(),
+            [](const TraceEvent& a, const TraceEvent& b) {
+              return a.start_ns < b.start_ns;
+            });
+  return events;
+}
+
+uint64_t DroppedTraceEvents() {
+  std::lock_guard<std::mutex> lock(registry_mu);
+  uint64_t dropped = dropped_events;
+  for (auto& ring : registry) dropped += ring->TakeDropped();
+  dropped_events = dropped;
+  return dropped;
+}
+
+}  // namespace custom_cpu
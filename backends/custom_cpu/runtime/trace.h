@@ -0,0 +1,117 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <cstdint>
+#include <vector>
+
+namespace custom_cpu {
+
+// kRuntimeApi events are the host-side span of a runtime call. The other
+// kinds are the work the call issued, which shares its correlation id and
+// runs either inline or later on a stream's worker thread.
+enum class TraceEventKind : uint8_t {
+  kRuntimeApi,
+  kMemcpy,
+  kStreamTask,
+  kCollective,
+};
+
+struct TraceEvent {
+  // A string literal, never freed.
+  const char* name;
+  uint64_t start_ns;
+  uint64_t end_ns;
+  uint64_t bytes;
+  // The stream the work ran on, or 0 for work done on the calling thread.
+  uint64_t stream_id;
+  uint64_t correlation_id;
+  uint32_t thread_id;
+  int32_t device_id;
+  TraceEventKind kind;
+};
+
+// Events are only recorded between StartTracing() and StopTracing().
+extern std::atomic<bool> tracing_enabled;
+
+inline bool TracingEnabled() {
+  return tracing_enabled.load(std::memory_order_relaxed);
+}
+
+// Drops everything recorded so far and starts recording.
+void StartTracing();
+void StopTracing();
+
+// Wall clock in nanoseconds, the clock Paddle's host tracer uses.
+uint64_t TraceNowNs();
+
+// A process-wide id linking a runtime call to the work it issued.
+uint64_t NextCorrelationId();
+
+// Appends `event` to the calling thread's ring buffer. Never blocks or
+// takes a lock; when the ring is full the event is dropped and counted.
+void RecordTraceEvent(const TraceEvent& event);
+
+// Moves the events of every thread out of their ring buffers.
+std::vector<TraceEvent> ConsumeTraceEvents();
+
+// Events dropped because a ring buffer was full, since StartTracing().
+uint64_t DroppedTraceEvents();
+
+// Records the lifetime of a scope as one event when tracing is on. A zero
+// `correlation_id` draws a fresh one.
+class TraceScope {
+ public:
+  TraceScope(const char* name,
+             TraceEventKind kind,
+             uint64_t bytes = 0,
+             int32_t device_id = 0,
+             uint64_t stream_id = 0,
+             uint64_t correlation_id = 0)
+      : enabled_(TracingEnabled()) {
+    if (enabled_) {
+      event_.name = name;
+      event_.kind = kind;
+      event_.bytes = bytes;
+      event_.device_id = device_id;
+      event_.stream_id = stream_id;
+      event_.correlation_id =
+          correlation_id ? correlation_id : NextCorrelationId();
+      event_.start_ns = TraceNowNs();
+    }
+  }
+
+  // Zero when tracing was off as the scope opened.
+  uint64_t correlation_id() const {
+    return enabled_ ? event_.correlation_id : 0;
+  }
+
+  ~TraceScope() {
+    if (enabled_) {
+      event_.end_ns = TraceNowNs();
+      RecordTraceEvent(event_);
+    }
+  }
+
+  TraceScope(const TraceScope&) = delete;
+  TraceScope& operator=(const TraceScope&) = delete;
+
+ private:
+  bool enabled_;
+  TraceEvent event_;
+};
+
+}  // namespace custom_cpu
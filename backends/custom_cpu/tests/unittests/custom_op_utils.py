@@ -0,0 +1,30 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import glob
+import os
+
+from paddle.utils.cpp_extension.extension_utils import (
+    _custom_api_content,
+    load_op_meta_info_and_register_op,
+)
+
+
+def load_ops():
+    """Returns the Python APIs of the plugin's custom ops by name."""
+    lib = glob.glob(os.path.join(os.environ["CUSTOM_DEVICE_ROOT"], "*.so"))[0]
+    ops = {}
+    for name in load_op_meta_info_and_register_op(lib):
+        exec(_custom_api_content(name), ops)
+    return ops
@@ -0,0 +1,146 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+np.random.seed(10)
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def adam_step(inputs, attrs):
+    param = inputs["Param"]
+    grad = inputs["Grad"]
+    moment1 = inputs["Moment1"]
+    moment2 = inputs["Moment2"]
+    lr = inputs["LearningRate"] * attrs.get("lr_ratio", 1.0)
+    beta1_pow = inputs["Beta1Pow"]
+    beta2_pow = inputs["Beta2Pow"]
+    beta1 = attrs["beta1"]
+    beta2 = attrs["beta2"]
+    epsilon = attrs["epsilon"]
+
+    if attrs.get("with_decay", False):
+        param = param * (1 - lr * attrs["coeff"])
+    moment1_out = beta1 * moment1 + (1 - beta1) * grad
+    moment2_out = beta2 * moment2 + (1 - beta2) * np.square(grad)
+    lr_t = lr * np.sqrt(1 - beta2_pow) / (1 - beta1_pow)
+    param_out = param - lr_t * (
+        moment1_out / (np.sqrt(moment2_out) + epsilon * np.sqrt(1 - beta2_pow))
+    )
+    return param_out, moment1_out, moment2_out
+
+
+class TestAdamOp(OpTest):
+    def setUp(self):
+        self.op_type = "adam"
+        self.init_attrs()
+        shape = (102, 105)
+        beta1, beta2 = self.attrs["beta1"], self.attrs["beta2"]
+        self.inputs = {
+            "Param": np.random.uniform(-1, 1, shape).astype("float32"),
+            "Grad": np.random.uniform(-1, 1, shape).astype("float32"),
+            "Moment1": np.random.uniform(-1, 1, shape).astype("float32"),
+            "Moment2": np.random.random(shape).astype("float32"),
+            "LearningRate": np.array([0.004]).astype("float32"),
+            "Beta1Pow": np.array([beta1**10]).astype("float32"),
+            "Beta2Pow": np.array([beta2**10]).astype("float32"),
+        }
+        param_out, moment1_out, moment2_out = adam_step(self.inputs, self.attrs)
+        self.outputs = {
+            "ParamOut": param_out,
+            "Moment1Out": moment1_out,
+            "Moment2Out": moment2_out,
+            "Beta1PowOut": np.array([beta1**11]).astype("float32"),
+            "Beta2PowOut": np.array([beta2**11]).astype("float32"),
+        }
+
+    def init_attrs(self):
+        self.attrs = {"epsilon": 1e-4, "beta1": 0.78, "beta2": 0.836}
+
+    def test_check_output(self):
+        self.check_output(atol=1e-5)
+
+
+class TestAdamWOp(TestAdamOp):
+    def setUp(self):
+        super().setUp()
+        self.op_type = "adamw"
+
+    def init_attrs(self):
+        self.attrs = {
+            "epsilon": 1e-4,
+            "beta1": 0.9,
+            "beta2": 0.999,
+            "lr_ratio": 0.5,
+            "coeff": 0.01,
+            "with_decay": True,
+        }
+
+
+class TestMultiTensorAdamW(unittest.TestCase):
+    def run_steps(self, use_multi_tensor, multi_precision=False):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        paddle.seed(10)
+        shapes = [(64, 33), (33,), (7, 5, 3), (1,)]
+        params = [paddle.create_parameter(shape, "float32") for shape in shapes]
+        if multi_precision:
+            params = [
+                paddle.create_parameter(
+                    p.shape,
+                    "bfloat16",
+                    default_initializer=paddle.nn.initializer.Assign(
+                        p.astype("bfloat16")
+                    ),
+                )
+                for p in params
+            ]
+        opt = paddle.optimizer.AdamW(
+            learning_rate=0.01,
+            parameters=params,
+            weight_decay=0.02,
+            use_multi_tensor=use_multi_tensor,
+            multi_precision=multi_precision,
+        )
+        for step in range(3):
+            loss = paddle.add_n([(p.astype("float32") ** 2).sum() for p in params])
+            loss.backward()
+            opt.step()
+            opt.clear_grad()
+        return [p.astype("float32").numpy() for p in params]
+
+    def test_multi_tensor_matches_single(self):
+        for single, merged in zip(self.run_steps(False), self.run_steps(True)):
+            np.testing.assert_allclose(single, merged, rtol=1e-6, atol=1e-6)
+
+    def test_bfloat16_master_weights(self):
+        fp32 = self.run_steps(False)
+        bf16 = self.run_steps(False, multi_precision=True)
+        for expect, actual in zip(fp32, bf16):
+            np.testing.assert_allclose(expect, actual, rtol=2e-2, atol=2e-2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+
+
+def batch_norm_naive(x, scale, bias, mean, var, epsilon, data_format):
+    axes = (0, 2, 3) if data_format == "NCHW" else (0, 1, 2)
+    shape = [1, -1, 1, 1] if data_format == "NCHW" else [1, 1, 1, -1]
+    inv = 1.0 / np.sqrt(var + epsilon)
+    x_hat = (x - mean.reshape(shape)) * inv.reshape(shape)
+    return x_hat * scale.reshape(shape) + bias.reshape(shape), axes, shape
+
+
+class TestBatchNorm(unittest.TestCase):
+    data_format = "NCHW"
+    shape = [4, 5, 6, 7]
+
+    def setUp(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        np.random.seed(2024)
+        self.channels = self.shape[1 if self.data_format == "NCHW" else 3]
+        self.x = (np.random.random(self.shape) * 4 + 3).astype("float64")
+        self.dy = np.random.random(self.shape).astype("float64")
+        self.scale = np.random.random(self.channels).astype("float64")
+        self.bias = np.random.random(self.channels).astype("float64")
+        self.mean = np.random.random(self.channels).astype("float64")
+        self.var = np.random.random(self.channels).astype("float64") + 0.5
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def run_batch_norm(self, training):
+        x = paddle.to_tensor(self.x, stop_gradient=False)
+        scale = paddle.to_tensor(self.scale, stop_gradient=False)
+        bias = paddle.to_tensor(self.bias, stop_gradient=False)
+        mean = paddle.to_tensor(self.mean)
+        var = paddle.to_tensor(self.var)
+        y = paddle.nn.functional.batch_norm(
+            x,
+            mean,
+            var,
+            weight=scale,
+            bias=bias,
+            training=training,
+            momentum=0.9,
+            epsilon=1e-5,
+            data_format=self.data_format,
+        )
+        dx, dscale, dbias = paddle.grad(
+            [y], [x, scale, bias], [paddle.to_tensor(self.dy)]
+        )
+        return y, dx, dscale, dbias, mean, var
+
+    def test_training(self):
+        y, dx, dscale, dbias, mean, var = self.run_batch_norm(True)
+        axes = (0, 2, 3) if self.data_format == "NCHW" else (0, 1, 2)
+        batch_mean = self.x.mean(axis=axes)
+        batch_var = self.x.var(axis=axes)
+        expected, axes, shape = batch_norm_naive(
+            self.x,
+            self.scale,
+            self.bias,
+            batch_mean,
+            batch_var,
+            1e-5,
+            self.data_format,
+        )
+        np.testing.assert_allclose(y.numpy(), expected, rtol=1e-6, atol=1e-8)
+        np.testing.assert_allclose(
+            mean.numpy(), 0.9 * self.mean + 0.1 * batch_mean, rtol=1e-6
+        )
+        np.testing.assert_allclose(
+            var.numpy(), 0.9 * self.var + 0.1 * batch_var, rtol=1e-6
+        )
+
+        m = self.x.size // self.channels
+        inv = (1.0 / np.sqrt(batch_var + 1e-5)).reshape(shape)
+        x_hat = (self.x - batch_mean.reshape(shape)) * inv
+        ref_dbias = self.dy.sum(axis=axes)
+        ref_dscale = (self.dy * x_hat).sum(axis=axes)
+        ref_dx = (
+            self.scale.reshape(shape)
+            * inv
+            * (
+                self.dy
+                - ref_dbias.reshape(shape) / m
+                - x_hat * ref_dscale.reshape(shape) / m
+            )
+        )
+        np.testing.assert_allclose(dbias.numpy(), ref_dbias, rtol=1e-6)
+        np.testing.assert_allclose(dscale.numpy(), ref_dscale, rtol=1e-6)
+        np.testing.assert_allclose(dx.numpy(), ref_dx, rtol=1e-5, atol=1e-8)
+
+    def test_inference(self):
+        y, dx, dscale, dbias, mean, var = self.run_batch_norm(False)
+        expected, axes, shape = batch_norm_naive(
+            self.x,
+            self.scale,
+            self.bias,
+            self.mean,
+            self.var,
+            1e-5,
+            self.data_format,
+        )
+        np.testing.assert_allclose(y.numpy(), expected, rtol=1e-6, atol=1e-8)
+        np.testing.assert_allclose(mean.numpy(), self.mean)
+        np.testing.assert_allclose(var.numpy(), self.var)
+        inv = (1.0 / np.sqrt(self.var + 1e-5)).reshape(shape)
+        np.testing.assert_allclose(
+            dx.numpy(), self.scale.reshape(shape) * inv * self.dy, rtol=1e-6
+        )
+
+
+class TestBatchNormNHWC(TestBatchNorm):
+    data_format = "NHWC"
+    shape = [3, 6, 5, 40]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+from paddle.incubate.nn.functional import block_multihead_attention
+
+
+def attention_naive(q, k, v):
+    """Causal attention of q [len, heads, d] at the last len positions of
+    k, v [keys, kv_heads, d]."""
+    length, heads, d = q.shape
+    keys, kv_heads = k.shape[:2]
+    group = heads // kv_heads
+    out = np.zeros_like(q)
+    for i in range(length):
+        pos = keys - length + i
+        for h in range(heads):
+            s = k[: pos + 1, h // group] @ q[i, h] / np.sqrt(d)
+            p = np.exp(s - s.max())
+            out[i, h] = p @ v[: pos + 1, h // group] / p.sum()
+    return out
+
+
+class TestBlockMultiheadAttention(unittest.TestCase):
+    batch = 3
+    heads = 4
+    kv_heads = 2
+    head_dim = 16
+    block_size = 8
+    max_seq_len = 64
+
+    def setUp(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        np.random.seed(2024)
+        blocks_per_seq = self.max_seq_len // self.block_size
+        num_blocks = self.batch * blocks_per_seq
+        self.cache_shape = [
+            num_blocks,
+            self.kv_heads,
+            self.block_size,
+            self.head_dim,
+        ]
+        # Blocks are handed out shuffled, as an allocator would.
+        tables = np.random.permutation(num_blocks).astype("int32")
+        self.block_tables = tables.reshape([self.batch, blocks_per_seq])
+        self.width = (self.heads + 2 * self.kv_heads) * self.head_dim
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def run_step(self, qkv, key_cache, value_cache, enc, dec, this_time):
+        cu = np.concatenate([[0], np.cumsum(this_time)]).astype("int32")
+        offsets = np.zeros([self.batch], dtype="int32")
+        return block_multihead_attention(
+            paddle.to_tensor(qkv),
+            key_cache,
+            value_cache,
+            paddle.to_tensor(np.array(enc, dtype="int32").reshape([-1, 1])),
+            paddle.to_tensor(np.array(dec, dtype="int32").reshape([-1, 1])),
+            paddle.to_tensor(np.array(this_time, dtype="int32")),
+            paddle.to_tensor(np.zeros([int(cu[-1])], dtype="int32")),
+            paddle.to_tensor(offsets),
+            paddle.to_tensor(cu),
+            paddle.to_tensor(cu),
+            paddle.to_tensor(self.block_tables),
+            max_seq_len=self.max_seq_len,
+            block_size=self.block_size,
+        )
+
+    def split(self, qkv):
+        q_end = self.heads * self.head_dim
+        k_end = q_end + self.kv_heads * self.head_dim
+        q = qkv[:, :q_end].reshape([-1, self.heads, self.head_dim])
+        k = qkv[:, q_end:k_end].reshape([-1, self.kv_heads, self.head_dim])
+        v = qkv[:, k_end:].reshape([-1, self.kv_heads, self.head_dim])
+        return q, k, v
+
+    def test_prefill_then_decode(self):
+        key_cache = paddle.zeros(self.cache_shape, dtype="float32")
+        value_cache = paddle.zeros(self.cache_shape, dtype="float32")
+        lens = [13, 0, 9]
+        history = [None] * self.batch
+
+        qkv = np.random.random([sum(lens), self.width]).astype("float32")
+        out = self.run_step(qkv, key_cache, value_cache, lens, [0] * 3, lens)
+        start = 0
+        for b, n in enumerate(lens):
+            if n == 0:
+                continue
+            q, k, v = self.split(qkv[start : start + n])
+            history[b] = (k, v)
+            np.testing.assert_allclose(
+                out[0].numpy()[start : start + n].reshape(q.shape),
+                attention_naive(q, k, v),
+                rtol=1e-5,
+                atol=1e-6,
+            )
+            start += n
+
+        # One decode step for the sequences that ran prefill, on the caches
+        # the prefill wrote.
+        key_cache, value_cache = out[2], out[3]
+        this_time = [1 if n else 0 for n in lens]
+        qkv = np.random.random([sum(this_time), self.width]).astype("float32")
+        out = self.run_step(qkv, key_cache, value_cache, [0] * 3, lens, this_time)
+        row = 0
+        for b, n in enumerate(lens):
+            if n == 0:
+                continue
+            q, k, v = self.split(qkv[row : row + 1])
+            k = np.concatenate([history[b][0], k])
+            v = np.concatenate([history[b][1], v])
+            np.testing.assert_allclose(
+                out[0].numpy()[row : row + 1].reshape(q.shape),
+                attention_naive(q, k, v),
+                rtol=1e-5,
+                atol=1e-6,
+            )
+            row += 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -115,6 +115,38 @@ class TestCastOpFp32ToBf16(OpTest):
         self.check_output()
 
 
+class TestCastLowPrecisionRounding(unittest.TestCase):
+    def cast(self, x, dtype):
+        with base.dygraph.guard(paddle.CustomPlace("custom_cpu", 0)):
+            out = paddle.cast(paddle.to_tensor(x), dtype)
+            return out.numpy(), paddle.cast(out, "float32").numpy()
+
+    def test_fp16_matches_numpy(self):
+        special = [65504, 65519, 65520, 1e9, 6e-8, 3e-8, 2.0**-25, 1e-5, 0.0]
+        x = np.concatenate(
+            [np.random.normal(0, 100, 100000), special, np.negative(special)]
+        )
+        x = np.append(x, [np.inf, -np.inf]).astype("float32")
+        out, back = self.cast(x, "float16")
+        expected = x.astype("float16")
+        np.testing.assert_array_equal(out.view("uint16"), expected.view("uint16"))
+        np.testing.assert_array_equal(back, expected.astype("float32"))
+
+    def test_bf16_truncates(self):
+        x = np.random.normal(0, 100, 100003).astype("float32")
+        out, back = self.cast(x, "bfloat16")
+        expected = x.view("uint32") >> 16
+        np.testing.assert_array_equal(out.view("uint16"), expected)
+        np.testing.assert_array_equal(back, (expected << 16).view("float32"))
+
+    def test_nan_stays_nan(self):
+        x = np.array([np.nan, 1.0], "float32")
+        for dtype in ["float16", "bfloat16"]:
+            _, back = self.cast(x, dtype)
+            self.assertTrue(np.isnan(back[0]))
+            self.assertEqual(back[1], 1.0)
+
+
 class TestCastOpError(unittest.TestCase):
     def test_errors(self):
         with program_guard(Program(), Program()):
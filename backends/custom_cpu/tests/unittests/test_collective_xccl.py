@@ -0,0 +1,102 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+
+def run_worker():
+    import paddle
+    import paddle.distributed as dist
+
+    paddle.set_device("custom_cpu")
+    dist.init_parallel_env()
+    rank = dist.get_rank()
+    nranks = dist.get_world_size()
+    shape = (3, 1000)
+
+    def data(r, dtype="float32"):
+        return (np.arange(np.prod(shape)).reshape(shape) % 7 + r + 1).astype(dtype)
+
+    for dtype in ["float32", "float64", "int32", "int64"]:
+        x = paddle.to_tensor(data(rank, dtype))
+        dist.all_reduce(x)
+        expected = sum(data(r, dtype) for r in range(nranks))
+        np.testing.assert_array_equal(x.numpy(), expected)
+
+    x = paddle.to_tensor(data(rank))
+    dist.all_reduce(x, op=dist.ReduceOp.MAX)
+    np.testing.assert_array_equal(x.numpy(), data(nranks - 1))
+
+    x = paddle.to_tensor(data(rank))
+    dist.broadcast(x, src=1)
+    np.testing.assert_array_equal(x.numpy(), data(1))
+
+    gathered = []
+    dist.all_gather(gathered, paddle.to_tensor(data(rank)))
+    for r in range(nranks):
+        np.testing.assert_array_equal(gathered[r].numpy(), data(r))
+
+    out = paddle.zeros(shape, dtype="float32")
+    dist.reduce_scatter(
+        out, [paddle.to_tensor(data(rank) * (r + 1)) for r in range(nranks)]
+    )
+    expected = sum(data(r) for r in range(nranks)) * (rank + 1)
+    np.testing.assert_array_equal(out.numpy(), expected)
+
+    if rank == 0:
+        dist.send(paddle.to_tensor(data(7)), dst=1)
+    elif rank == 1:
+        y = paddle.zeros(shape, dtype="float32")
+        dist.recv(y, src=0)
+        np.testing.assert_array_equal(y.numpy(), data(7))
+
+
+class TestCollectiveXCCL(unittest.TestCase):
+    def test_collectives(self):
+        env = dict(os.environ)
+        env["PADDLE_XCCL_BACKEND"] = "custom_cpu"
+        with tempfile.TemporaryDirectory() as log_dir:
+            cmd = [
+                sys.executable,
+                "-u",
+                "-m",
+                "paddle.distributed.launch",
+                "--devices",
+                "0,1",
+                "--log_dir",
+                log_dir,
+                os.path.abspath(__file__),
+                "--worker",
+            ]
+            proc = subprocess.run(cmd, env=env)
+            if proc.returncode != 0:
+                for name in sorted(os.listdir(log_dir)):
+                    with open(os.path.join(log_dir, name)) as f:
+                        print(f.read())
+            self.assertEqual(proc.returncode, 0)
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        run_worker()
+    else:
+        unittest.main()
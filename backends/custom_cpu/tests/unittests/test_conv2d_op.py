@@ -0,0 +1,180 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def conv2d_forward_naive(x, w, stride, pad, dilation, groups, data_format):
+    """x is NCHW or NHWC, w is [OC, C / groups, KH, KW], pad is
+    [top, bottom, left, right]."""
+    if data_format == "NHWC":
+        x = x.transpose([0, 3, 1, 2])
+    n, c, h, w_in = x.shape
+    oc, cg, kh, kw = w.shape
+    xp = np.pad(x, [(0, 0), (0, 0), (pad[0], pad[1]), (pad[2], pad[3])])
+    ekh = dilation[0] * (kh - 1) + 1
+    ekw = dilation[1] * (kw - 1) + 1
+    oh = (h + pad[0] + pad[1] - ekh) // stride[0] + 1
+    ow = (w_in + pad[2] + pad[3] - ekw) // stride[1] + 1
+    out = np.zeros((n, oc, oh, ow), dtype=x.dtype)
+    ocg = oc // groups
+    for g in range(groups):
+        xg = xp[:, g * cg : (g + 1) * cg]
+        wg = w[g * ocg : (g + 1) * ocg]
+        for i in range(oh):
+            for j in range(ow):
+                hs, ws = i * stride[0], j * stride[1]
+                patch = xg[
+                    :,
+                    :,
+                    hs : hs + ekh : dilation[0],
+                    ws : ws + ekw : dilation[1],
+                ]
+                out[:, g * ocg : (g + 1) * ocg, i, j] = np.tensordot(
+                    patch, wg, axes=([1, 2, 3], [1, 2, 3])
+                )
+    if data_format == "NHWC":
+        out = out.transpose([0, 2, 3, 1])
+    return out
+
+
+class TestConv2DOp(OpTest):
+    def setUp(self):
+        self.op_type = "conv2d"
+        self.dtype = np.float64
+        self.data_format = "NCHW"
+        self.stride = [1, 1]
+        self.pad = [0, 0]
+        self.dilation = [1, 1]
+        self.groups = 1
+        self.init_test_case()
+        x = np.random.random(self.input_size).astype(self.dtype)
+        w = np.random.random(self.filter_size).astype(self.dtype) - 0.5
+        pad = [self.pad[0], self.pad[0], self.pad[1], self.pad[1]]
+        out = conv2d_forward_naive(
+            x, w, self.stride, pad, self.dilation, self.groups, self.data_format
+        )
+        self.inputs = {"Input": x, "Filter": w}
+        self.attrs = {
+            "strides": self.stride,
+            "paddings": self.pad,
+            "groups": self.groups,
+            "dilations": self.dilation,
+            "data_format": self.data_format,
+        }
+        self.outputs = {"Output": out}
+
+    def init_test_case(self):
+        self.input_size = [2, 3, 5, 5]
+        self.filter_size = [6, 3, 3, 3]
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad(["Input", "Filter"], "Output")
+
+    def test_check_grad_no_filter(self):
+        self.check_grad(["Input"], "Output", no_grad_set=set(["Filter"]))
+
+    def test_check_grad_no_input(self):
+        self.check_grad(["Filter"], "Output", no_grad_set=set(["Input"]))
+
+
+class TestConv2DOpPadStride(TestConv2DOp):
+    def init_test_case(self):
+        self.input_size = [2, 3, 7, 6]
+        self.filter_size = [4, 3, 3, 3]
+        self.stride = [2, 1]
+        self.pad = [1, 2]
+
+
+class TestConv2DOpDilation(TestConv2DOp):
+    def init_test_case(self):
+        self.input_size = [2, 3, 10, 10]
+        self.filter_size = [6, 3, 3, 3]
+        self.dilation = [2, 2]
+        self.pad = [1, 1]
+
+
+class TestConv2DOpGroups(TestConv2DOp):
+    def init_test_case(self):
+        self.input_size = [2, 4, 5, 5]
+        self.filter_size = [6, 2, 3, 3]
+        self.groups = 2
+        self.pad = [1, 1]
+
+
+class TestConv2DOp1x1(TestConv2DOp):
+    def init_test_case(self):
+        self.input_size = [2, 8, 4, 4]
+        self.filter_size = [5, 8, 1, 1]
+
+
+class TestConv2DOpNHWC(TestConv2DOp):
+    def init_test_case(self):
+        self.input_size = [2, 5, 6, 3]
+        self.filter_size = [4, 3, 3, 3]
+        self.stride = [2, 2]
+        self.pad = [1, 1]
+        self.data_format = "NHWC"
+
+
+class TestConv2DOpNHWCGroups(TestConv2DOp):
+    def init_test_case(self):
+        self.input_size = [2, 5, 5, 4]
+        self.filter_size = [4, 2, 3, 3]
+        self.groups = 2
+        self.data_format = "NHWC"
+
+
+class TestDepthwiseConv2DOp(TestConv2DOp):
+    def init_test_case(self):
+        self.op_type = "depthwise_conv2d"
+        self.input_size = [2, 4, 6, 6]
+        self.filter_size = [8, 1, 3, 3]
+        self.groups = 4
+        self.pad = [1, 1]
+
+
+class TestConv2DAPI(unittest.TestCase):
+    def test_padding_same(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        x = np.random.random([2, 3, 9, 7]).astype("float32")
+        w = np.random.random([4, 3, 3, 3]).astype("float32")
+        out = paddle.nn.functional.conv2d(
+            paddle.to_tensor(x), paddle.to_tensor(w), stride=2, padding="SAME"
+        )
+        expected = conv2d_forward_naive(x, w, [2, 2], [1, 1, 1, 1], [1, 1], 1, "NCHW")
+        np.testing.assert_allclose(out.numpy(), expected, rtol=1e-5)
+        paddle.enable_static()
+
+
+if __name__ == "__main__":
+    unittest.main()
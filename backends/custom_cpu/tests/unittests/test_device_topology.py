@@ -0,0 +1,67 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+
+def run_worker():
+    import paddle
+
+    devices = paddle.device.get_available_custom_device()
+    # Switching back and forth reuses each device's pool.
+    for device in devices * 2:
+        paddle.set_device(device)
+        x = paddle.to_tensor(np.arange(12, dtype="float32").reshape(3, 4))
+        y = paddle.matmul(x, x, transpose_y=True)
+        np.testing.assert_allclose(
+            y.numpy(), np.matmul(x.numpy(), x.numpy().T), rtol=1e-6
+        )
+    print(json.dumps({"devices": devices, "affinity": sorted(os.sched_getaffinity(0))}))
+
+
+class TestDeviceTopology(unittest.TestCase):
+    def run_worker(self, spec):
+        env = dict(os.environ, FLAGS_custom_cpu_devices=spec)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker"],
+            env=env,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        self.assertEqual(proc.returncode, 0)
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def test_devices_from_cpu_lists(self):
+        out = self.run_worker("0;0;0")
+        self.assertEqual(len(out["devices"]), 3)
+        self.assertEqual(out["affinity"], [0])
+
+    def test_invalid_spec_keeps_default_devices(self):
+        out = self.run_worker("not-a-cpu-list")
+        self.assertEqual(len(out["devices"]), 2)
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        run_worker()
+    else:
+        unittest.main()
@@ -0,0 +1,107 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestDropoutOp(OpTest):
+    def setUp(self):
+        self.op_type = "dropout"
+        x = np.random.random((32, 64)).astype("float32")
+        self.inputs = {"X": x}
+        self.attrs = {"dropout_prob": 0.0, "fix_seed": True, "is_test": False}
+        self.outputs = {"Out": x, "Mask": np.ones((32, 64)).astype("uint8")}
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad_normal(self):
+        self.check_grad(["X"], "Out")
+
+
+class TestDropoutOpAllDropped(OpTest):
+    def setUp(self):
+        self.op_type = "dropout"
+        self.inputs = {"X": np.random.random((32, 64)).astype("float32")}
+        self.attrs = {"dropout_prob": 1.0, "fix_seed": True, "is_test": False}
+        self.outputs = {
+            "Out": np.zeros((32, 64)).astype("float32"),
+            "Mask": np.zeros((32, 64)).astype("uint8"),
+        }
+
+    def test_check_output(self):
+        self.check_output()
+
+
+class TestDropoutOpInferDowngrade(OpTest):
+    def setUp(self):
+        self.op_type = "dropout"
+        x = np.random.random((32, 64)).astype("float32")
+        self.inputs = {"X": x}
+        self.attrs = {
+            "dropout_prob": 0.35,
+            "fix_seed": True,
+            "is_test": True,
+            "dropout_implementation": "downgrade_in_infer",
+        }
+        self.outputs = {"Out": x * (1.0 - 0.35)}
+
+    def test_check_output(self):
+        self.check_output()
+
+
+class TestDropoutAPI(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_upscale_in_train(self):
+        p = 0.3
+        x_np = np.random.random((256, 1024)).astype("float32") + 1.0
+        x = paddle.to_tensor(x_np, stop_gradient=False)
+        out = paddle.nn.functional.dropout(x, p=p, training=True)
+        out.backward(paddle.ones_like(out))
+        out_np = out.numpy()
+        kept = out_np != 0
+        self.assertAlmostEqual(kept.mean(), 1.0 - p, delta=0.01)
+        np.testing.assert_allclose(out_np[kept], x_np[kept] / (1.0 - p), rtol=1e-6)
+        np.testing.assert_allclose(x.grad.numpy(), kept / (1.0 - p), rtol=1e-6)
+
+    def test_successive_calls_differ(self):
+        x = paddle.ones([64, 128])
+        a = paddle.nn.functional.dropout(x, p=0.5).numpy()
+        b = paddle.nn.functional.dropout(x, p=0.5).numpy()
+        self.assertFalse(np.array_equal(a, b))
+
+
+if __name__ == "__main__":
+    unittest.main()
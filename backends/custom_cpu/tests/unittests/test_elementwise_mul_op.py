@@ -178,6 +178,29 @@ class TestElementwiseMulOp_broadcast_5(ElementwiseMulOp):
         self.init_kernel_type()
 
 
+class TestElementwiseMulOp_broadcast_large(ElementwiseMulOp):
+    # Large enough to be split across several threads, with a broadcast
+    # dimension in the middle so that chunks start mid-row.
+    def setUp(self):
+        self.op_type = "elementwise_mul"
+        self.inputs = {
+            "X": np.random.rand(3, 200, 129).astype(np.float64),
+            "Y": np.random.rand(200, 1).astype(np.float64),
+        }
+        self.attrs = {"axis": 1}
+        self.outputs = {"Out": self.inputs["X"] * self.inputs["Y"].reshape(1, 200, 1)}
+        self.init_kernel_type()
+
+    def test_check_grad_normal(self):
+        pass
+
+    def test_check_grad_ingore_x(self):
+        pass
+
+    def test_check_grad_ingore_y(self):
+        pass
+
+
 # @unittest.skipIf(not core.is_compiled_with_cuda(),
 #                  "core is not compiled with CUDA")
 # class TestElementwiseMulOpFp16(ElementwiseMulOp):
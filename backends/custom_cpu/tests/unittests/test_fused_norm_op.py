@@ -0,0 +1,122 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+from paddle.incubate.nn.functional import fused_layer_norm, fused_rms_norm
+
+
+def first(result):
+    return result[0] if isinstance(result, (tuple, list)) else result
+
+
+def norm_naive(z, weight, bias, epsilon, rms):
+    mean = 0.0 if rms else z.mean(axis=-1, keepdims=True)
+    var = ((z - mean) ** 2).mean(axis=-1, keepdims=True)
+    y = (z - mean) / np.sqrt(var + epsilon)
+    if weight is not None:
+        y = y * weight
+    if bias is not None:
+        y = y + bias
+    return y
+
+
+class TestFusedNorm(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        np.random.seed(2024)
+        self.rows, self.cols = 6, 96
+        shape = [self.rows, self.cols]
+        self.x = np.random.random(shape).astype("float32") - 0.5
+        self.bias = np.random.random([self.cols]).astype("float32") - 0.5
+        self.residual = np.random.random(shape).astype("float32") - 0.5
+        self.weight = np.random.random([self.cols]).astype("float32")
+        self.norm_bias = np.random.random([self.cols]).astype("float32")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def tensors(self):
+        return [
+            paddle.to_tensor(v)
+            for v in (
+                self.x,
+                self.bias,
+                self.residual,
+                self.weight,
+                self.norm_bias,
+            )
+        ]
+
+    def test_rms_norm(self):
+        x, _, _, weight, norm_bias = self.tensors()
+        out = first(fused_rms_norm(x, weight, norm_bias, 1e-6, 1))
+        expected = norm_naive(self.x, self.weight, self.norm_bias, 1e-6, True)
+        np.testing.assert_allclose(out.numpy(), expected, rtol=1e-5, atol=1e-6)
+
+    def test_rms_norm_residual(self):
+        x, bias, residual, weight, norm_bias = self.tensors()
+        out, residual_out = fused_rms_norm(
+            x, weight, norm_bias, 1e-6, 1, bias=bias, residual=residual
+        )[:2]
+        z = self.x + self.bias + self.residual
+        np.testing.assert_allclose(residual_out.numpy(), z, rtol=1e-6)
+        expected = norm_naive(z, self.weight, self.norm_bias, 1e-6, True)
+        np.testing.assert_allclose(out.numpy(), expected, rtol=1e-5, atol=1e-6)
+
+    def test_rms_norm_quant(self):
+        x, _, _, weight, norm_bias = self.tensors()
+        out = first(
+            fused_rms_norm(
+                x,
+                weight,
+                norm_bias,
+                1e-6,
+                1,
+                quant_scale=0.1,
+                quant_round_type=1,
+                quant_max_bound=127,
+                quant_min_bound=-127,
+            )
+        )
+        y = norm_naive(self.x, self.weight, self.norm_bias, 1e-6, True)
+        q = np.sign(y) * np.floor(np.abs(127 * 0.1 * y) + 0.5)
+        q = np.clip(q, -127, 127)
+        self.assertEqual(out.dtype, paddle.int8)
+        np.testing.assert_allclose(out.numpy(), q, atol=1)
+
+    def test_fused_layer_norm_residual(self):
+        x, bias, residual, weight, norm_bias = self.tensors()
+        out, residual_out = fused_layer_norm(
+            x,
+            weight,
+            norm_bias,
+            1e-5,
+            residual_alpha=0.5,
+            begin_norm_axis=1,
+            bias=bias,
+            residual=residual,
+        )[:2]
+        z = self.x + self.bias + 0.5 * self.residual
+        np.testing.assert_allclose(residual_out.numpy(), z, rtol=1e-6)
+        expected = norm_naive(z, self.weight, self.norm_bias, 1e-5, False)
+        np.testing.assert_allclose(out.numpy(), expected, rtol=1e-5, atol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
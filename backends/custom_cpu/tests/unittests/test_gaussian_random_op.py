@@ -0,0 +1,95 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestGaussianRandomOp(OpTest):
+    def setUp(self):
+        self.op_type = "gaussian_random"
+        self.python_api = paddle.normal
+        self.init_attrs()
+        self.inputs = {}
+        self.attrs = {
+            "shape": [1000, 784],
+            "mean": self.mean,
+            "std": self.std,
+            "seed": 10,
+            "dtype": self.dtype,
+        }
+        self.outputs = {"Out": np.zeros((1000, 784), dtype="float32")}
+
+    def init_attrs(self):
+        self.mean = 1.0
+        self.std = 2.0
+        self.dtype = paddle.base.core.VarDesc.VarType.FP32
+
+    def test_check_output(self):
+        self.check_output_customized(self.verify_output)
+
+    def verify_output(self, outs):
+        out = np.array(outs[0])
+        self.assertEqual(out.shape, (1000, 784))
+        self.assertTrue(np.all(np.isfinite(out)))
+        hist, _ = np.histogram(out, range=(-3, 5))
+        hist = hist.astype("float32") / float(out.size)
+        data = np.random.normal(size=(1000, 784), loc=self.mean, scale=self.std)
+        hist2, _ = np.histogram(data, range=(-3, 5))
+        hist2 = hist2.astype("float32") / float(data.size)
+        np.testing.assert_allclose(hist, hist2, rtol=0, atol=0.01)
+
+
+class TestGaussianRandomOpFP64(TestGaussianRandomOp):
+    def init_attrs(self):
+        self.mean = 1.0
+        self.std = 2.0
+        self.dtype = paddle.base.core.VarDesc.VarType.FP64
+
+
+class TestGaussianRandomAPI(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_unseeded_calls_differ(self):
+        a = paddle.normal(shape=[1000]).numpy()
+        b = paddle.normal(shape=[1000]).numpy()
+        self.assertFalse(np.array_equal(a, b))
+
+    def test_odd_size(self):
+        out = paddle.normal(mean=0.0, std=1.0, shape=[3, 5, 7]).numpy()
+        self.assertEqual(out.shape, (3, 5, 7))
+        self.assertTrue(np.all(np.isfinite(out)))
+
+
+if __name__ == "__main__":
+    unittest.main()
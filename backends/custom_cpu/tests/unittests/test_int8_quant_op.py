@@ -0,0 +1,110 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+from custom_op_utils import load_ops
+
+OPS = load_ops()
+
+
+def quant_naive(x, scale, max_bound=127.0, min_bound=-127.0):
+    return np.clip(np.rint(max_bound * scale * x), min_bound, max_bound).astype("int8")
+
+
+class TestInt8QuantOps(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        np.random.seed(2024)
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_quant_shift_smooth(self):
+        x = np.random.uniform(-1, 1, [5, 24]).astype("float32")
+        shift = np.random.uniform(-0.1, 0.1, [24]).astype("float32")
+        smooth = np.random.uniform(0.5, 2, [24]).astype("float32")
+        out = OPS["quant_int8"](
+            paddle.to_tensor(x),
+            paddle.to_tensor(shift),
+            paddle.to_tensor(smooth),
+            0.8,
+            0,
+            127.0,
+            -127.0,
+        )
+        expected = quant_naive((x + shift) * smooth, 0.8)
+        np.testing.assert_array_equal(out.numpy(), expected)
+
+    def test_quant_half(self):
+        x = np.random.uniform(-1, 1, [5, 24]).astype("float32")
+        shift = np.random.uniform(-0.1, 0.1, [24]).astype("float32")
+        smooth = np.random.uniform(0.5, 2, [24]).astype("float32")
+        for dtype in ["float16", "bfloat16"]:
+            inputs = [paddle.to_tensor(v).astype(dtype) for v in (x, shift, smooth)]
+            out = OPS["quant_int8"](*inputs, 0.8, 0, 127.0, -127.0)
+            hx, hshift, hsmooth = [t.astype("float32").numpy() for t in inputs]
+            expected = quant_naive((hx + hshift) * hsmooth, 0.8)
+            np.testing.assert_array_equal(out.numpy(), expected)
+
+    def test_gemm_dequant(self):
+        for m, n, k in [(1, 7, 33), (9, 64, 256), (67, 10, 100)]:
+            x = np.random.randint(-127, 128, [m, k]).astype("int8")
+            y = np.random.randint(-127, 128, [n, k]).astype("int8")
+            scale = np.random.uniform(1e-3, 1e-2, [n]).astype("float32")
+            out = OPS["gemm_dequant"](
+                paddle.to_tensor(x),
+                paddle.to_tensor(y),
+                paddle.to_tensor(scale),
+                "float32",
+            )
+            acc = x.astype("int32") @ y.astype("int32").T
+            np.testing.assert_allclose(out.numpy(), acc * scale, rtol=1e-6)
+
+    def test_dequant(self):
+        acc = np.random.randint(-(2**20), 2**20, [3, 16]).astype("int32")
+        scale = np.random.uniform(1e-4, 1e-3, [16]).astype("float32")
+        out = OPS["dequant_int8"](
+            paddle.to_tensor(acc), paddle.to_tensor(scale), "float32"
+        )
+        np.testing.assert_allclose(out.numpy(), acc * scale, rtol=1e-6)
+
+    def test_write_int8_cache_kv(self):
+        bsz, num_head, seq_len, max_seq_len, dim_head = 2, 3, 4, 6, 8
+        shape = [bsz, num_head, seq_len, dim_head]
+        k = np.random.uniform(-1, 1, shape).astype("float32")
+        v = np.random.uniform(-1, 1, shape).astype("float32")
+        k_scales = np.random.uniform(0.5, 1, [num_head]).astype("float32")
+        v_scales = np.random.uniform(0.5, 1, [num_head]).astype("float32")
+        cache = np.zeros([2, bsz, num_head, max_seq_len, dim_head], "int8")
+        cache_kv = paddle.to_tensor(cache)
+        OPS["write_int8_cache_kv"](
+            paddle.to_tensor(k),
+            paddle.to_tensor(v),
+            cache_kv,
+            paddle.to_tensor(k_scales),
+            paddle.to_tensor(v_scales),
+            paddle.to_tensor(1 / k_scales),
+            paddle.to_tensor(1 / v_scales),
+        )
+        cache[0, :, :, :seq_len] = quant_naive(k, k_scales[:, None, None])
+        cache[1, :, :, :seq_len] = quant_naive(v, v_scales[:, None, None])
+        np.testing.assert_array_equal(cache_kv.numpy(), cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+
+
+def layer_norm_naive(x, scale, bias, epsilon, begin_norm_axis):
+    shape = x.shape
+    x = x.reshape([int(np.prod(shape[:begin_norm_axis])), -1])
+    mean = x.mean(axis=1, keepdims=True)
+    var = x.var(axis=1, keepdims=True)
+    y = (x - mean) / np.sqrt(var + epsilon)
+    if scale is not None:
+        y = y * scale.reshape([1, -1])
+    if bias is not None:
+        y = y + bias.reshape([1, -1])
+    return y.reshape(shape)
+
+
+class TestLayerNorm(unittest.TestCase):
+    shape = [4, 7, 65]
+    begin_norm_axis = 2
+    has_scale = True
+    has_bias = True
+
+    def setUp(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        np.random.seed(2024)
+        self.x = (np.random.random(self.shape) * 3 + 5).astype("float64")
+        # Scale and bias are 1-D over the flattened normalized dims.
+        norm_shape = [int(np.prod(self.shape[self.begin_norm_axis :]))]
+        self.scale = np.random.random(norm_shape).astype("float64")
+        self.bias = np.random.random(norm_shape).astype("float64")
+        self.dy = np.random.random(self.shape).astype("float64")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_forward_and_backward(self):
+        x = paddle.to_tensor(self.x, stop_gradient=False)
+        scale = (
+            paddle.to_tensor(self.scale, stop_gradient=False)
+            if self.has_scale
+            else None
+        )
+        bias = (
+            paddle.to_tensor(self.bias, stop_gradient=False) if self.has_bias else None
+        )
+        y = paddle.nn.functional.layer_norm(
+            x,
+            self.shape[self.begin_norm_axis :],
+            weight=scale,
+            bias=bias,
+            epsilon=1e-5,
+        )
+        expected = layer_norm_naive(
+            self.x,
+            self.scale if self.has_scale else None,
+            self.bias if self.has_bias else None,
+            1e-5,
+            self.begin_norm_axis,
+        )
+        np.testing.assert_allclose(y.numpy(), expected, rtol=1e-6, atol=1e-8)
+
+        inputs = [t for t in (x, scale, bias) if t is not None]
+        grads = paddle.grad([y], inputs, [paddle.to_tensor(self.dy)])
+        rows = int(np.prod(self.shape[: self.begin_norm_axis]))
+        x2 = self.x.reshape([rows, -1])
+        dy = self.dy.reshape([rows, -1])
+        x_hat = (x2 - x2.mean(axis=1, keepdims=True)) / np.sqrt(
+            x2.var(axis=1, keepdims=True) + 1e-5
+        )
+        g = dy * (self.scale.reshape([1, -1]) if self.has_scale else 1.0)
+        rstd = 1.0 / np.sqrt(x2.var(axis=1, keepdims=True) + 1e-5)
+        ref_dx = rstd * (
+            g
+            - g.mean(axis=1, keepdims=True)
+            - x_hat * (g * x_hat).mean(axis=1, keepdims=True)
+        )
+        np.testing.assert_allclose(
+            grads[0].numpy(), ref_dx.reshape(self.shape), rtol=1e-5, atol=1e-8
+        )
+        if self.has_scale:
+            np.testing.assert_allclose(
+                grads[1].numpy().reshape([-1]),
+                (dy * x_hat).sum(axis=0),
+                rtol=1e-6,
+            )
+        if self.has_bias:
+            np.testing.assert_allclose(
+                grads[-1].numpy().reshape([-1]), dy.sum(axis=0), rtol=1e-6
+            )
+
+
+class TestLayerNormAxis1(TestLayerNorm):
+    begin_norm_axis = 1
+
+
+class TestLayerNormNoScale(TestLayerNorm):
+    has_scale = False
+
+
+class TestLayerNormNoAffine(TestLayerNorm):
+    has_scale = False
+    has_bias = False
+
+
+class TestLayerNormManyRows(TestLayerNorm):
+    shape = [300, 17]
+    begin_norm_axis = 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+from custom_op_utils import load_ops
+
+OPS = load_ops()
+
+
+def penalty_naive(
+    pre_ids, logits, penalty, frequency, presence, temperature, bad, cur, min_len, eos
+):
+    logits = logits.copy()
+    for b in range(logits.shape[0]):
+        row = logits[b]
+        if cur[b] < min_len[b]:
+            row[eos] = -1e10
+        ids = pre_ids[b]
+        ids = ids[: np.argmax(ids < 0)] if (ids < 0).any() else ids
+        counts = np.bincount(ids, minlength=row.size)
+        hit = counts > 0
+        row[hit] = np.where(row[hit] < 0, row[hit] * penalty[b], row[hit] / penalty[b])
+        row[hit] -= frequency[b] * counts[hit] + presence[b]
+        row /= temperature[b]
+        row[bad] = -1e10
+    return logits
+
+
+class TestLlamaInferOps(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+        np.random.seed(2024)
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_token_penalty(self):
+        bsz, vocab, max_len = 4, 64, 10
+        pre_ids = np.random.randint(0, 16, [bsz, max_len]).astype("int64")
+        pre_ids[1, 4:] = -1
+        logits = np.random.uniform(-2, 2, [bsz, vocab]).astype("float32")
+        penalty = np.random.uniform(1, 2, [bsz, 1]).astype("float32")
+        frequency = np.random.uniform(0, 1, [bsz, 1]).astype("float32")
+        presence = np.random.uniform(0, 1, [bsz, 1]).astype("float32")
+        temperature = np.random.uniform(0.5, 1.5, [bsz, 1]).astype("float32")
+        bad = np.array([3, 40], "int64")
+        cur = np.array([[0], [4], [9], [1]], "int64")
+        min_len = np.array([[2], [2], [2], [2]], "int64")
+        eos = np.array([5], "int64")
+        args = [
+            pre_ids,
+            logits,
+            penalty,
+            frequency,
+            presence,
+            temperature,
+            bad,
+            cur,
+            min_len,
+            eos,
+        ]
+        tensors = [paddle.to_tensor(v) for v in args]
+        OPS["get_token_penalty_multi_scores_v2"](*tensors)
+        expected = penalty_naive(
+            pre_ids,
+            logits,
+            penalty[:, 0],
+            frequency[:, 0],
+            presence[:, 0],
+            temperature[:, 0],
+            bad,
+            cur[:, 0],
+            min_len[:, 0],
+            eos,
+        )
+        np.testing.assert_allclose(tensors[1].numpy(), expected, rtol=1e-5)
+
+    def test_stop_value(self):
+        topk_ids = paddle.to_tensor(np.array([[5], [2], [9], [4]], "int64"))
+        stop_flags = paddle.to_tensor(np.array([[0], [0], [1], [1]], "bool"))
+        seq_lens = paddle.to_tensor(np.array([1, 1, 0, 3], "int32"))
+        end_ids = paddle.to_tensor(np.array([2, 4], "int64"))
+        next_tokens = paddle.to_tensor(np.zeros([4, 1], "int64"))
+        OPS["set_stop_value_multi_ends_v2"](
+            topk_ids, stop_flags, seq_lens, end_ids, next_tokens
+        )
+        np.testing.assert_array_equal(topk_ids.numpy().ravel(), [5, 2, -1, 2])
+        np.testing.assert_array_equal(stop_flags.numpy().ravel(), [0, 1, 1, 1])
+        np.testing.assert_array_equal(next_tokens.numpy().ravel(), [5, 2, 0, 2])
+
+    def test_padding_round_trip(self):
+        bsz, max_len, dim = 3, 5, 8
+        seq_lens = np.array([3, 1, 5], "int32")
+        input_ids = np.random.randint(1, 100, [bsz, max_len]).astype("int64")
+        cum_offsets = np.cumsum(max_len - seq_lens).astype("int32")
+        token_num = np.array([seq_lens.sum()], "int64")
+        (
+            x_remove_padding,
+            cum_offsets_out,
+            padding_offset,
+            cu_seqlens_q,
+            cu_seqlens_k,
+        ) = OPS["get_padding_offset_v2"](
+            paddle.to_tensor(input_ids),
+            paddle.to_tensor(cum_offsets.reshape([bsz, 1])),
+            paddle.to_tensor(token_num),
+            paddle.to_tensor(seq_lens),
+        )
+        packed = np.concatenate([input_ids[b, :n] for b, n in enumerate(seq_lens)])
+        exclusive = np.concatenate([[0], cum_offsets[:-1]])
+        np.testing.assert_array_equal(x_remove_padding.numpy(), packed)
+        np.testing.assert_array_equal(cum_offsets_out.numpy().ravel(), exclusive)
+        np.testing.assert_array_equal(
+            padding_offset.numpy(), np.repeat(exclusive, seq_lens)
+        )
+        bounds = np.concatenate([[0], np.cumsum(seq_lens)])
+        np.testing.assert_array_equal(cu_seqlens_q.numpy(), bounds)
+        np.testing.assert_array_equal(cu_seqlens_k.numpy(), bounds)
+
+        hidden = np.random.random([int(token_num[0]), dim]).astype("float32")
+        seq_lens_encoder = np.array([3, 0, 0], "int32")
+        seq_lens_decoder = np.array([0, 7, 0], "int32")
+        out = OPS["rebuild_padding_v2"](
+            paddle.to_tensor(hidden),
+            cum_offsets_out,
+            paddle.to_tensor(seq_lens_decoder),
+            paddle.to_tensor(seq_lens_encoder),
+            max_len,
+        )
+        expected = np.stack([hidden[2], hidden[3], np.zeros(dim, "float32")])
+        np.testing.assert_array_equal(out.numpy(), expected)
+
+    def test_update_inputs(self):
+        stop_flags = paddle.to_tensor(np.array([0, 1, 0, 1], "bool"))
+        not_need_stop = paddle.to_tensor(np.array([False]), place=paddle.CPUPlace())
+        seq_lens_this_time = paddle.to_tensor(np.array([5, 1, 1, 0], "int32"))
+        seq_lens_encoder = paddle.to_tensor(np.array([5, 0, 0, 0], "int32"))
+        seq_lens_decoder = paddle.to_tensor(np.array([0, 7, 9, 3], "int32"))
+        input_ids = paddle.to_tensor(np.zeros([4, 6], "int64"))
+        stop_nums = paddle.to_tensor(np.array([2], "int64"))
+        next_tokens = paddle.to_tensor(np.array([11, 12, 13, 14], "int64"))
+        is_block_step = paddle.to_tensor(np.array([0, 0, 0, 1], "bool"))
+        OPS["update_inputs"](
+            stop_flags,
+            not_need_stop,
+            seq_lens_this_time,
+            seq_lens_encoder,
+            seq_lens_decoder,
+            input_ids,
+            stop_nums,
+            next_tokens,
+            is_block_step,
+        )
+        self.assertTrue(bool(not_need_stop.numpy()[0]))
+        np.testing.assert_array_equal(seq_lens_this_time.numpy(), [1, 0, 1, 0])
+        np.testing.assert_array_equal(seq_lens_encoder.numpy(), [0, 0, 0, 0])
+        np.testing.assert_array_equal(seq_lens_decoder.numpy(), [5, 0, 10, 3])
+        np.testing.assert_array_equal(input_ids.numpy()[:, 0], [11, 12, 13, 0])
+
+    def test_set_value_by_flags(self):
+        pre_ids_all = paddle.to_tensor(np.full([3, 4], -1, "int64"))
+        input_ids = paddle.to_tensor(np.arange(1, 10, dtype="int64").reshape(3, 3))
+        seq_lens_this_time = paddle.to_tensor(np.array([3, 1, 0], "int32"))
+        seq_lens_encoder = paddle.to_tensor(np.array([3, 0, 0], "int32"))
+        seq_lens_decoder = paddle.to_tensor(np.array([0, 4, 5], "int32"))
+        step_idx = paddle.to_tensor(np.array([0, 2, 1], "int64"))
+        stop_flags = paddle.to_tensor(np.array([0, 0, 1], "bool"))
+        OPS["set_value_by_flags_and_idx_v2"](
+            pre_ids_all,
+            input_ids,
+            seq_lens_this_time,
+            seq_lens_encoder,
+            seq_lens_decoder,
+            step_idx,
+            stop_flags,
+        )
+        expected = np.full([3, 4], -1, "int64")
+        expected[0, 0] = 3
+        expected[1, 2] = 4
+        np.testing.assert_array_equal(pre_ids_all.numpy(), expected)
+
+    def test_step_paddle(self):
+        # Four blocks of 4 tokens: sequence 0 holds two and sequence 1 one,
+        # and both need another, so sequence 0 is preempted. Recovering its
+        # 8 tokens takes 2 blocks plus 1 to spare, but only 2 are free.
+        def i32(*values):
+            return paddle.to_tensor(np.array(values, "int32"))
+
+        state = {
+            "stop_flags": paddle.to_tensor(np.array([0, 0], "bool")),
+            "seq_lens_this_time": i32(1, 1),
+            "ori_seq_lens_encoder": i32(5, 4),
+            "seq_lens_encoder": i32(0, 0),
+            "seq_lens_decoder": i32(8, 4),
+            "block_tables": paddle.to_tensor(
+                np.array([[3, 2, -1, -1], [1, -1, -1, -1]], "int32")
+            ),
+            "encoder_block_lens": i32(2, 1),
+            "is_block_step": paddle.to_tensor(np.array([0, 0], "bool")),
+            "step_block_list": i32(-1, -1),
+            "step_lens": i32(0),
+            "recover_block_list": i32(-1, -1),
+            "recover_lens": i32(0),
+            "need_block_list": i32(-1, -1),
+            "need_block_len": i32(0),
+            "used_list_len": i32(0, 0),
+            "free_list": i32(0, -1, -1, -1),
+            "free_list_len": i32(1),
+            "input_ids": paddle.to_tensor(np.zeros([2, 8], "int64")),
+            "pre_ids": paddle.to_tensor(np.zeros([2, 8], "int64")),
+            "step_idx": paddle.to_tensor(np.array([3, 0], "int64")),
+            "next_tokens": paddle.to_tensor(np.array([7, 8], "int64")),
+        }
+        OPS["step_paddle"](*state.values(), 4, 1, 0)
+        expected = {
+            "stop_flags": [1, 0],
+            "is_block_step": [1, 0],
+            "seq_lens_this_time": [0, 1],
+            "seq_lens_decoder": [0, 4],
+            "block_tables": [[-1, -1, -1, -1], [1, 2, -1, -1]],
+            "encoder_block_lens": [0, 1],
+            "used_list_len": [0, 1],
+            "step_lens": [1],
+            "recover_lens": [0],
+            "need_block_len": [1],
+            "free_list_len": [2],
+        }
+        for name, value in expected.items():
+            np.testing.assert_array_equal(state[name].numpy(), value, err_msg=name)
+        np.testing.assert_array_equal(state["step_block_list"].numpy()[:1], [0])
+        np.testing.assert_array_equal(state["free_list"].numpy()[:2], [0, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
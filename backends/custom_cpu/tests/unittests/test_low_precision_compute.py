@@ -0,0 +1,89 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+import paddle
+
+np.random.seed(10)
+
+
+class TestLowPrecisionCompute(unittest.TestCase):
+    dtype = "bfloat16"
+    rtol = 1e-2
+
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tensor(self, *shape, scale=1.0):
+        x = np.random.uniform(-scale, scale, shape).astype("float32")
+        return paddle.cast(paddle.to_tensor(x), self.dtype)
+
+    def check(self, out, expected, atol=1e-3):
+        self.assertEqual(out.dtype, getattr(paddle, self.dtype))
+        np.testing.assert_allclose(
+            paddle.cast(out, "float32").numpy(), expected, self.rtol, atol
+        )
+
+    def value(self, x):
+        return paddle.cast(x, "float32").numpy()
+
+    def test_matmul(self):
+        x, y = self.tensor(33, 70), self.tensor(70, 45)
+        self.check(paddle.matmul(x, y), self.value(x) @ self.value(y), 1e-2)
+        x, y = self.tensor(3, 20, 70), self.tensor(45, 70)
+        expected = self.value(x) @ self.value(y).T
+        self.check(paddle.matmul(x, y, transpose_y=True), expected, 1e-2)
+
+    def test_softmax(self):
+        x = self.tensor(6, 50, 20, scale=8.0)
+        x.stop_gradient = False
+        for axis in [-1, 1]:
+            v = self.value(x)
+            e = np.exp(v - v.max(axis=axis, keepdims=True))
+            y = e / e.sum(axis=axis, keepdims=True)
+            out = paddle.nn.functional.softmax(x, axis=axis)
+            self.check(out, y)
+            dy = self.tensor(6, 50, 20)
+            (dx,) = paddle.grad(out, x, dy)
+            y, g = self.value(out), self.value(dy)
+            expected = (g - (g * y).sum(axis=axis, keepdims=True)) * y
+            self.check(dx, expected, 1e-2)
+
+    def test_reduce(self):
+        x = self.tensor(8, 300, 9)
+        v = self.value(x)
+        self.check(paddle.sum(x, axis=1), v.sum(axis=1), 1e-2)
+        self.check(paddle.mean(x, axis=[0, 2]), v.mean(axis=(0, 2)))
+        self.check(paddle.max(x, axis=-1), v.max(axis=-1))
+        self.check(paddle.min(x), v.min())
+
+    def test_elementwise(self):
+        x, y = self.tensor(17, 40), self.tensor(40)
+        vx, vy = self.value(x), self.value(y)
+        self.check(paddle.add(x, y), vx + vy)
+        self.check(paddle.multiply(x, y), vx * vy)
+        self.check(paddle.maximum(x, y), np.maximum(vx, vy))
+
+
+class TestFloat16Compute(TestLowPrecisionCompute):
+    dtype = "float16"
+    rtol = 2e-3
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -268,6 +268,29 @@ class TestMatMul2Dx3D_TransXY(TestMatMulOp):
         self.trans_y = True
 
 
+class TestMatMulBlocked(TestMatMulOp):
+    """
+    spans several packed K and M panels of the GEMM engine
+    """
+
+    def config(self):
+        self.x_shape = (2, 101, 300)
+        self.y_shape = (300, 37)
+        self.trans_x = False
+        self.trans_y = False
+
+    def test_check_grad(self):
+        pass
+
+
+class TestMatMulBlocked_TransXY(TestMatMulBlocked):
+    def config(self):
+        self.x_shape = (2, 300, 101)
+        self.y_shape = (37, 300)
+        self.trans_x = True
+        self.trans_y = True
+
+
 if __name__ == "__main__":
     paddle.enable_static()
     unittest.main()
@@ -0,0 +1,108 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+np.random.seed(10)
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def momentum_step(inputs, attrs):
+    param = inputs["Param"]
+    grad = inputs["Grad"] * attrs.get("rescale_grad", 1.0)
+    velocity = inputs["Velocity"]
+    lr = inputs["LearningRate"]
+    mu = attrs["mu"]
+    if attrs.get("regularization_method") == "l2_decay":
+        grad = grad + attrs["regularization_coeff"] * param
+    velocity_out = mu * velocity + grad
+    if attrs.get("use_nesterov", False):
+        param_out = param - (grad + velocity_out * mu) * lr
+    else:
+        param_out = param - lr * velocity_out
+    return param_out, velocity_out
+
+
+class TestMomentumOp(OpTest):
+    def setUp(self):
+        self.op_type = "momentum"
+        self.init_attrs()
+        shape = (123, 321)
+        self.inputs = {
+            "Param": np.random.random(shape).astype("float32"),
+            "Grad": np.random.random(shape).astype("float32"),
+            "Velocity": np.zeros(shape).astype("float32"),
+            "LearningRate": np.array([0.001]).astype("float32"),
+        }
+        param_out, velocity_out = momentum_step(self.inputs, self.attrs)
+        self.outputs = {"ParamOut": param_out, "VelocityOut": velocity_out}
+
+    def init_attrs(self):
+        self.attrs = {"mu": 0.0001}
+
+    def test_check_output(self):
+        self.check_output()
+
+
+class TestNesterovMomentumOp(TestMomentumOp):
+    def init_attrs(self):
+        self.attrs = {
+            "mu": 0.9,
+            "use_nesterov": True,
+            "regularization_method": "l2_decay",
+            "regularization_coeff": 0.01,
+            "rescale_grad": 0.5,
+        }
+
+
+class TestMultiTensorMomentum(unittest.TestCase):
+    def run_steps(self, use_multi_tensor):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        paddle.seed(10)
+        shapes = [(64, 33), (33,), (7, 5, 3), (1,)]
+        params = [paddle.create_parameter(shape, "float32") for shape in shapes]
+        opt = paddle.optimizer.Momentum(
+            learning_rate=0.01,
+            momentum=0.9,
+            parameters=params,
+            use_nesterov=True,
+            weight_decay=paddle.regularizer.L2Decay(0.01),
+            use_multi_tensor=use_multi_tensor,
+        )
+        for step in range(3):
+            loss = paddle.add_n([(p**2).sum() for p in params])
+            loss.backward()
+            opt.step()
+            opt.clear_grad()
+        return [p.numpy() for p in params]
+
+    def test_multi_tensor_matches_single(self):
+        for single, merged in zip(self.run_steps(False), self.run_steps(True)):
+            np.testing.assert_allclose(single, merged, rtol=1e-6, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
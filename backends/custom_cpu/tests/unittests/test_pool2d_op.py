@@ -0,0 +1,166 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def pool2d_naive(
+    x, ksize, strides, paddings, pool_type, exclusive, adaptive, data_format
+):
+    if data_format == "NHWC":
+        x = x.transpose([0, 3, 1, 2])
+    n, c, h, w = x.shape
+    if adaptive:
+        oh, ow = ksize
+    else:
+        oh = (h - ksize[0] + 2 * paddings[0]) // strides[0] + 1
+        ow = (w - ksize[1] + 2 * paddings[1]) // strides[1] + 1
+    out = np.zeros((n, c, oh, ow), dtype=x.dtype)
+    for i in range(oh):
+        for j in range(ow):
+            if adaptive:
+                h0, h1 = i * h // oh, -(-(i + 1) * h // oh)
+                w0, w1 = j * w // ow, -(-(j + 1) * w // ow)
+            else:
+                h0 = i * strides[0] - paddings[0]
+                w0 = j * strides[1] - paddings[1]
+                h1, w1 = min(h0 + ksize[0], h), min(w0 + ksize[1], w)
+                h0, w0 = max(h0, 0), max(w0, 0)
+            window = x[:, :, h0:h1, w0:w1]
+            if pool_type == "max":
+                out[:, :, i, j] = np.max(window, axis=(2, 3))
+            else:
+                size = (
+                    (h1 - h0) * (w1 - w0)
+                    if exclusive or adaptive
+                    else ksize[0] * ksize[1]
+                )
+                out[:, :, i, j] = np.sum(window, axis=(2, 3)) / size
+    if data_format == "NHWC":
+        out = out.transpose([0, 2, 3, 1])
+    return out
+
+
+class TestPool2DOp(OpTest):
+    def setUp(self):
+        self.op_type = "pool2d"
+        self.dtype = np.float64
+        self.pool_type = "avg"
+        self.ksize = [3, 3]
+        self.strides = [1, 1]
+        self.paddings = [0, 0]
+        self.exclusive = True
+        self.adaptive = False
+        self.global_pool = False
+        self.data_format = "NCHW"
+        self.shape = [2, 3, 5, 5]
+        self.init_test_case()
+        # Distinct values keep the max of every window unique.
+        x = np.random.permutation(np.prod(self.shape)).astype(self.dtype)
+        x = x.reshape(self.shape) / x.size
+        ksize = self.ksize
+        if self.global_pool:
+            h_axis = 2 if self.data_format == "NCHW" else 1
+            ksize = self.shape[h_axis : h_axis + 2]
+        out = pool2d_naive(
+            x,
+            ksize,
+            self.strides,
+            self.paddings,
+            self.pool_type,
+            self.exclusive,
+            self.adaptive,
+            self.data_format,
+        )
+        self.inputs = {"X": x}
+        self.attrs = {
+            "pooling_type": self.pool_type,
+            "ksize": self.ksize,
+            "strides": self.strides,
+            "paddings": self.paddings,
+            "global_pooling": self.global_pool,
+            "exclusive": self.exclusive,
+            "adaptive": self.adaptive,
+            "data_format": self.data_format,
+        }
+        self.outputs = {"Out": out}
+
+    def init_test_case(self):
+        pass
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad(["X"], "Out")
+
+
+class TestPool2DOpMax(TestPool2DOp):
+    def init_test_case(self):
+        self.pool_type = "max"
+        self.strides = [2, 2]
+        self.paddings = [1, 1]
+
+
+class TestPool2DOpAvgInclusive(TestPool2DOp):
+    def init_test_case(self):
+        self.exclusive = False
+        self.paddings = [1, 1]
+
+
+class TestPool2DOpGlobal(TestPool2DOp):
+    def init_test_case(self):
+        self.global_pool = True
+
+
+class TestPool2DOpAdaptive(TestPool2DOp):
+    def init_test_case(self):
+        self.adaptive = True
+        self.ksize = [2, 3]
+        self.shape = [2, 3, 7, 8]
+
+
+class TestPool2DOpMaxNHWC(TestPool2DOp):
+    def init_test_case(self):
+        self.pool_type = "max"
+        self.ksize = [2, 2]
+        self.strides = [2, 2]
+        self.shape = [2, 6, 6, 20]
+        self.data_format = "NHWC"
+
+
+class TestPool2DOpAvgNHWC(TestPool2DOp):
+    def init_test_case(self):
+        self.paddings = [1, 1]
+        self.shape = [2, 5, 5, 3]
+        self.data_format = "NHWC"
+
+
+if __name__ == "__main__":
+    unittest.main()
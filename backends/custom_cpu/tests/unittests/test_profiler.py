@@ -0,0 +1,61 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+import paddle.profiler as profiler
+
+
+class TestCustomCPUProfiler(unittest.TestCase):
+    def setUp(self):
+        paddle.set_device("custom_cpu")
+
+    def run_profiled(self):
+        prof = profiler.Profiler(
+            targets=[
+                profiler.ProfilerTarget.CPU,
+                profiler.ProfilerTarget.CUSTOM_DEVICE,
+            ],
+            custom_device_types=["custom_cpu"],
+        )
+        prof.start()
+        x = paddle.to_tensor(np.random.random((64, 64)).astype("float32"))
+        y = paddle.matmul(x, x)
+        out = y.numpy()
+        prof.stop()
+        self.assertEqual(out.shape, (64, 64))
+        return prof
+
+    def test_memcpy_events(self):
+        prof = self.run_profiled()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "trace.json")
+            prof.export(path=path, format="json")
+            with open(path) as f:
+                trace = json.load(f)
+        events = trace["traceEvents"] if isinstance(trace, dict) else trace
+        names = {event.get("name") for event in events}
+        self.assertIn("MEMCPY_HtoD", names)
+        self.assertIn("MEMCPY_DtoH", names)
+
+
+if __name__ == "__main__":
+    unittest.main()
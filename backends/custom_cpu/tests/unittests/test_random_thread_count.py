@@ -0,0 +1,69 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+
+def run_worker(path):
+    import paddle
+
+    paddle.set_device("custom_cpu")
+    x = paddle.ones([1000, 333])
+    outs = {
+        "uniform": paddle.uniform([1000, 333], min=-1.0, max=1.0, seed=7),
+        "uniform_default": paddle.uniform([1000, 333]),
+        "normal": paddle.normal(mean=0.0, std=0.02, shape=[1000, 333]),
+        "randint": paddle.randint(-50, 50, shape=[1000, 333]),
+        "dropout": paddle.nn.functional.dropout(x, p=0.1),
+    }
+    np.savez(path, **{k: v.numpy() for k, v in outs.items()})
+
+
+class TestRandomThreadCount(unittest.TestCase):
+    def run_with_threads(self, num_threads, path):
+        env = dict(
+            os.environ,
+            FLAGS_custom_cpu_num_threads=str(num_threads),
+            FLAGS_custom_cpu_random_seed="1234",
+        )
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", path], env=env
+        )
+        self.assertEqual(proc.returncode, 0)
+        return np.load(path)
+
+    def test_same_output_for_any_thread_count(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ref = self.run_with_threads(1, os.path.join(tmp, "1.npz"))
+            out = self.run_with_threads(4, os.path.join(tmp, "4.npz"))
+            for name in ref.files:
+                np.testing.assert_array_equal(out[name], ref[name], err_msg=name)
+            randint = ref["randint"]
+            self.assertTrue(randint.min() >= -50 and randint.max() < 50)
+            self.assertEqual(len(np.unique(randint)), 100)
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        run_worker(sys.argv[-1])
+    else:
+        unittest.main()
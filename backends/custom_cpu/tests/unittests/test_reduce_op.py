@@ -642,6 +642,31 @@ class TestKeepDimReduceSumMultiAxises(OpTest):
         self.check_grad(["X"], "Out")
 
 
+class TestReduceSumInterleavedAxises(OpTest):
+    # Reduced and kept dims alternate and the innermost dim is kept, which
+    # takes the column-wise path of the reduction engine.
+    def setUp(self):
+        self.op_type = "reduce_sum"
+        self.inputs = {"X": np.random.random((4, 3, 2048, 5)).astype("float64")}
+        self.attrs = {"dim": [0, 2]}
+        self.outputs = {"Out": self.inputs["X"].sum(axis=tuple(self.attrs["dim"]))}
+
+    def test_check_output(self):
+        self.check_output()
+
+
+class TestReduceSumLargeLastAxis(OpTest):
+    # Fewer outputs than threads, so the reduced range itself is split.
+    def setUp(self):
+        self.op_type = "reduce_sum"
+        self.inputs = {"X": np.random.random((2, 300000)).astype("float64")}
+        self.attrs = {"dim": [-1]}
+        self.outputs = {"Out": self.inputs["X"].sum(axis=-1)}
+
+    def test_check_output(self):
+        self.check_output()
+
+
 class TestReduceSumWithDimOne(OpTest):
     def setUp(self):
         self.op_type = "reduce_sum"
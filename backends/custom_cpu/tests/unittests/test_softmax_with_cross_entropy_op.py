@@ -695,6 +695,27 @@ class TestSoftmaxWithCrossEntropyOpBoundary1(TestSoftmaxWithCrossEntropyOp):
         self.use_softmax = True
 
 
+class TestSoftmaxWithCrossEntropyOpLargeVocab(TestSoftmaxWithCrossEntropyOp):
+    """
+    Test softmax with cross entropy operator on vocab-sized rows.
+    """
+
+    def initParams(self):
+        self.op_type = "softmax_with_cross_entropy"
+        self.python_api = python_api
+        self.python_out_sig = ["Loss", "Softmax"]
+        self.numeric_stable_mode = True
+        self.soft_label = False
+        self.shape = [2, 70000]
+        self.axis = -1
+        self.ignore_index = -1
+        self.dtype = np.float64
+        self.use_softmax = True
+
+    def test_check_grad(self):
+        pass
+
+
 if __name__ == "__main__":
     paddle.enable_static()
     unittest.main()
@@ -0,0 +1,115 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+
+import paddle
+from op_test import OpTest
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestSplitOp(OpTest):
+    def setUp(self):
+        self.op_type = "split"
+        self.python_api = paddle.split
+        self.dtype = self.get_dtype()
+        self.init_data()
+        self.inputs = {"X": self.x}
+        self.attrs = {"axis": self.axis, "sections": self.sections, "num": self.num}
+        out = np.split(self.x, self.indices_or_sections, self.axis)
+        self.outputs = {"Out": [("out%d" % i, out[i]) for i in range(len(out))]}
+
+    def get_dtype(self):
+        return "float64"
+
+    def init_data(self):
+        self.x = np.random.random((4, 5, 6)).astype(self.dtype)
+        self.axis = 2
+        self.sections = []
+        self.num = 3
+        self.indices_or_sections = 3
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad(["X"], ["out0", "out1", "out2"])
+
+
+class TestSplitOpSections(TestSplitOp):
+    def init_data(self):
+        self.x = np.random.random((4, 5, 6)).astype(self.dtype)
+        self.axis = 1
+        self.sections = [2, 1, -1]
+        self.num = 0
+        self.indices_or_sections = [2, 3]
+
+
+class TestSplitOpAxis0(TestSplitOp):
+    def init_data(self):
+        self.x = np.random.random((6, 5, 4)).astype(self.dtype)
+        self.axis = 0
+        self.sections = [1, 2, 3]
+        self.num = 0
+        self.indices_or_sections = [1, 3]
+
+
+class TestSplitOpInt64(TestSplitOp):
+    def get_dtype(self):
+        return "int64"
+
+    def init_data(self):
+        self.x = np.random.randint(-100, 100, (3, 9, 2)).astype(self.dtype)
+        self.axis = -2
+        self.sections = []
+        self.num = 3
+        self.indices_or_sections = 3
+
+    def test_check_grad(self):
+        pass
+
+
+class TestConcatSplitKVCache(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_append_and_split(self):
+        cache = np.random.rand(2, 4, 300, 16).astype("float32")
+        step = np.random.rand(2, 4, 1, 16).astype("float32")
+        out = paddle.concat([paddle.to_tensor(cache), paddle.to_tensor(step)], axis=2)
+        np.testing.assert_array_equal(
+            out.numpy(), np.concatenate([cache, step], axis=2)
+        )
+        head, tail = paddle.split(out, [300, 1], axis=2)
+        np.testing.assert_array_equal(head.numpy(), cache)
+        np.testing.assert_array_equal(tail.numpy(), step)
+
+
+if __name__ == "__main__":
+    unittest.main()
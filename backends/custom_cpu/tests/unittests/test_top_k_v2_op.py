@@ -0,0 +1,122 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+np.random.seed(10)
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def numpy_topk(x, k=1, axis=-1, largest=True):
+    if axis < 0:
+        axis = len(x.shape) + axis
+    if largest:
+        indices = np.argsort(-x, axis=axis, kind="stable")
+        value = -np.sort(-x, axis=axis)
+    else:
+        indices = np.argsort(x, axis=axis, kind="stable")
+        value = np.sort(x, axis=axis)
+    indices = indices.take(indices=range(0, k), axis=axis)
+    value = value.take(indices=range(0, k), axis=axis)
+    return value, indices
+
+
+class TestTopkOp(OpTest):
+    def init_args(self):
+        self.k = 3
+        self.axis = 1
+        self.largest = True
+        self.input_data = np.random.rand(10, 20)
+
+    def setUp(self):
+        self.op_type = "top_k_v2"
+        self.python_api = paddle.topk
+        self.dtype = np.float64
+        self.init_args()
+        self.inputs = {"X": self.input_data}
+        self.attrs = {"k": self.k, "axis": self.axis, "largest": self.largest}
+        output, indices = numpy_topk(
+            self.input_data, axis=self.axis, k=self.k, largest=self.largest
+        )
+        self.outputs = {"Out": output, "Indices": indices}
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad(["X"], "Out")
+
+
+class TestTopkOp1(TestTopkOp):
+    def init_args(self):
+        self.k = 3
+        self.axis = 0
+        self.largest = False
+        self.input_data = np.random.rand(16, 5, 7)
+
+
+class TestTopkOp2(TestTopkOp):
+    def init_args(self):
+        self.k = 4
+        self.axis = 1
+        self.largest = True
+        self.input_data = np.random.rand(3, 100, 7)
+
+
+class TestTopkOpLargeRow(TestTopkOp):
+    # Vocab-sized rows with k past the heap selection limit.
+    def init_args(self):
+        self.k = 100
+        self.axis = -1
+        self.largest = True
+        self.input_data = np.random.rand(4, 32000)
+
+    def test_check_grad(self):
+        # A numeric gradient over this many elements is too slow.
+        pass
+
+
+class TestTopkAPI(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_ties_and_nan(self):
+        x = np.array([[1.0, 3.0, 3.0, np.nan, 2.0, 3.0]], dtype="float32")
+        values, indices = paddle.topk(paddle.to_tensor(x), k=3)
+        np.testing.assert_array_equal(indices.numpy(), [[3, 1, 2]])
+        self.assertTrue(np.isnan(values.numpy()[0, 0]))
+        values, indices = paddle.topk(paddle.to_tensor(x), k=2, largest=False)
+        np.testing.assert_array_equal(indices.numpy(), [[0, 4]])
+        np.testing.assert_array_equal(values.numpy(), [[1.0, 2.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
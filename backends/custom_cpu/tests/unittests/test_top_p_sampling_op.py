@@ -0,0 +1,77 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+import paddle
+
+np.random.seed(10)
+
+
+def nucleus(probs, top_p):
+    order = np.argsort(-probs, kind="stable")
+    kept = np.cumsum(probs[order]) - probs[order] < top_p
+    return set(order[kept].tolist())
+
+
+class TestTopPSampling(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        logits = np.random.normal(0, 3, (8, 1000)).astype("float32")
+        probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        self.probs = probs / probs.sum(axis=-1, keepdims=True)
+
+    def sample(self, top_p, threshold=None, seed=-1, probs=None):
+        probs = self.probs if probs is None else probs
+        x = paddle.to_tensor(probs)
+        ps = paddle.full([probs.shape[0], 1], top_p, "float32")
+        if threshold is not None:
+            threshold = paddle.full([probs.shape[0], 1], threshold, "float32")
+        out, ids = paddle.tensor.top_p_sampling(x, ps, threshold, seed=seed)
+        return out.numpy().ravel(), ids.numpy().ravel()
+
+    def test_tiny_top_p_is_argmax(self):
+        out, ids = self.sample(1e-6)
+        np.testing.assert_array_equal(ids, self.probs.argmax(axis=-1))
+        np.testing.assert_allclose(out, self.probs.max(axis=-1))
+
+    def test_ids_in_nucleus(self):
+        for seed in range(20):
+            out, ids = self.sample(0.7, seed=seed)
+            for row, (p, i) in enumerate(zip(out, ids)):
+                self.assertIn(i, nucleus(self.probs[row], 0.7))
+                self.assertEqual(p, self.probs[row, i])
+
+    def test_seed_is_reproducible(self):
+        _, first = self.sample(0.9, seed=123)
+        _, second = self.sample(0.9, seed=123)
+        np.testing.assert_array_equal(first, second)
+
+    def test_threshold_excludes_tokens(self):
+        for seed in range(20):
+            out, _ = self.sample(0.99, threshold=0.01, seed=seed)
+            self.assertTrue(np.all(out >= 0.01))
+
+    def test_frequencies(self):
+        probs = np.tile(np.array([[0.4, 0.1, 0.3, 0.2]], "float32"), (4096, 1))
+        _, ids = self.sample(0.8, probs=probs)
+        counts = np.bincount(ids, minlength=4) / ids.size
+        np.testing.assert_allclose(counts, [4 / 9, 0, 3 / 9, 2 / 9], atol=0.03)
+
+
+if __name__ == "__main__":
+    unittest.main()
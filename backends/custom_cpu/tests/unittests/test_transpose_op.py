@@ -122,6 +122,18 @@ class TestCase9(TestTransposeOp):
         self.axis = (6, 1, 3, 5, 0, 2, 4, 7)
 
 
+class TestCase10(TestTransposeOp):
+    def initTestCase(self):
+        self.shape = (67, 131)
+        self.axis = (1, 0)
+
+
+class TestCase11(TestTransposeOp):
+    def initTestCase(self):
+        self.shape = (2, 70, 3, 33)
+        self.axis = (0, 3, 2, 1)
+
+
 class TestTransposeOpBool(TestTransposeOp):
     def test_check_grad(self):
         pass
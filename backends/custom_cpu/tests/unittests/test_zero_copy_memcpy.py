@@ -0,0 +1,73 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+
+def run_worker():
+    import paddle
+
+    paddle.enable_static()
+    main = paddle.static.Program()
+    startup = paddle.static.Program()
+    with paddle.static.program_guard(main, startup):
+        x = paddle.static.data(name="x", shape=[4, 1000], dtype="float32")
+        y = paddle.reshape(x, [-1])
+        z = paddle.scale(x, scale=2.0)
+    exe = paddle.static.Executor(paddle.CustomPlace("custom_cpu", 0))
+    exe.run(startup)
+    for step in range(3):
+        data = np.random.rand(4, 1000).astype("float32")
+        out_y, out_z = exe.run(main, feed={"x": data}, fetch_list=[y, z])
+        np.testing.assert_array_equal(out_y, data.reshape([-1]))
+        np.testing.assert_allclose(out_z, data * 2.0, rtol=1e-6)
+
+    # The kernels themselves: with zero copy the output must alias the input.
+    paddle.disable_static()
+    paddle.set_device("custom_cpu")
+    zero_copy = os.environ["FLAGS_custom_cpu_zero_copy_memcpy"] == "1"
+    x = paddle.rand([4, 1000], dtype="float32")
+    for memcpy in (paddle._C_ops.memcpy_h2d, paddle._C_ops.memcpy_d2h):
+        out = memcpy(x, 0)
+        np.testing.assert_array_equal(out.numpy(), x.numpy())
+        assert (out.data_ptr() == x.data_ptr()) == zero_copy
+
+
+class TestZeroCopyMemcpy(unittest.TestCase):
+    def run_with_flag(self, value):
+        env = dict(os.environ, FLAGS_custom_cpu_zero_copy_memcpy=value)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker"], env=env
+        )
+        self.assertEqual(proc.returncode, 0)
+
+    def test_copy(self):
+        self.run_with_flag("0")
+
+    def test_zero_copy(self):
+        self.run_with_flag("1")
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        run_worker()
+    else:
+        unittest.main()
@@ -0,0 +1,271 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <fcntl.h>
+#include <linux/futex.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <sys/syscall.h>
+#include <time.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <atomic>
+#include <cerrno>
+#include <chrono>
+#include <cstddef>
+#include <cstdint>
+#include <cstdlib>
+#include <cstring>
+#include <string>
+
+// Single-producer single-consumer ring of generated tokens in POSIX shared
+// memory, written by save_output and read by get_output or
+// paddle_custom_device.npu.serving.OutputRing. A message is the int32
+// array the SysV queue used to carry: {stop_flag, bsz, tokens[bsz]}.
+//
+// The producer and the consumer only touch their own counter, so a message
+// costs two cache line transfers and no system call. A side that finds
+// the ring empty (or full) polls briefly, then sleeps on a futex in the
+// segment; the other side only issues FUTEX_WAKE when a sleeper has
+// announced itself.
+//
+// The segment is configured by the process that creates it, from
+//   FLAGS_npu_output_ring_name     (default "/paddle_output_ring")
+//   FLAGS_npu_output_ring_capacity (messages, default 64)
+//   FLAGS_npu_output_ring_max_bsz  (tokens per message, default 512)
+// and the other side adopts its capacity and max_bsz. Like the SysV
+// queue, the segment outlives the processes; OutputRing::Unlink removes it.
+
+// Layout of the segment, shared with the Python reader.
+struct OutputRingHeader {
+  static constexpr uint32_t kMagic = 0x4f52474eu;  // "ORGN"
+
+  std::atomic<uint32_t> magic;  // Set last by the creator.
+  uint32_t capacity;
+  uint32_t max_bsz;
+  uint32_t reserved;
+  alignas(64) std::atomic<uint64_t> head;  // Messages written.
+  std::atomic<uint32_t> data_seq;          // Futex: bumped per message.
+  std::atomic<uint32_t> reader_waiting;
+  alignas(64) std::atomic<uint64_t> tail;  // Messages read.
+  std::atomic<uint32_t> space_seq;         // Futex: bumped per read.
+  std::atomic<uint32_t> writer_waiting;
+  alignas(64) char slots[1];
+};
+
+static_assert(offsetof(OutputRingHeader, head) == 64, "ring layout");
+static_assert(offsetof(OutputRingHeader, data_seq) == 72, "ring layout");
+static_assert(offsetof(OutputRingHeader, tail) == 128, "ring layout");
+static_assert(offsetof(OutputRingHeader, space_seq) == 136, "ring layout");
+static_assert(offsetof(OutputRingHeader, slots) == 192, "ring layout");
+
+class OutputRing {
+ public:
+  OutputRing() = default;
+  OutputRing(const OutputRing&) = delete;
+  OutputRing& operator=(const OutputRing&) = delete;
+  ~OutputRing() {
+    if (ring_) munmap(ring_, bytes_);
+  }
+
+  static std::string DefaultName() {
+    const char* env = std::getenv("FLAGS_npu_output_ring_name");
+    return env && *env ? env : "/paddle_output_ring";
+  }
+
+  // Opens the segment `name`, creating it with room for `capacity`
+  // messages of up to `max_bsz` tokens if it does not exist. Returns false
+  // and sets errno on failure.
+  bool Open(const std::string& name, uint32_t capacity, uint32_t max_bsz) {
+    if (capacity == 0 || max_bsz == 0) {
+      errno = EINVAL;
+      return false;
+    }
+    int fd = shm_open(name.c_str(), O_RDWR | O_CREAT | O_EXCL, 0666);
+    const bool creator = fd >= 0;
+    if (!creator && errno == EEXIST) fd = shm_open(name.c_str(), O_RDWR, 0);
+    if (fd < 0) return false;
+    size_t bytes = SegmentBytes(capacity, max_bsz);
+    if (creator) {
+      if (ftruncate(fd, bytes) != 0) {
+        close(fd);
+        return false;
+      }
+    } else {
+      // Wait for the creator to size the segment, then adopt its layout.
+      struct stat st;
+      do {
+        if (fstat(fd, &st) != 0) {
+          close(fd);
+          return false;
+        }
+      } while (st.st_size <
+                   static_cast<off_t>(offsetof(OutputRingHeader, slots)) &&
+               usleep(1000) == 0);
+      bytes = st.st_size;
+    }
+    void* addr =
+        mmap(nullptr, bytes, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (addr == MAP_FAILED) return false;
+    ring_ = static_cast<OutputRingHeader*>(addr);
+    bytes_ = bytes;
+    if (creator) {
+      ring_->capacity = capacity;
+      ring_->max_bsz = max_bsz;
+      ring_->magic.store(OutputRingHeader::kMagic, std::memory_order_release);
+    } else {
+      while (ring_->magic.load(std::memory_order_acquire) !=
+             OutputRingHeader::kMagic) {
+        usleep(1000);
+      }
+      if (SegmentBytes(ring_->capacity, ring_->max_bsz) > bytes_) {
+        errno = EINVAL;
+        return false;
+      }
+    }
+    return true;
+  }
+
+  // Opens the segment configured by the FLAGS_npu_output_ring_* variables.
+  bool OpenDefault() {
+    return Open(DefaultName(),
+                EnvValue("FLAGS_npu_output_ring_capacity", 64),
+                EnvValue("FLAGS_npu_output_ring_max_bsz", 512));
+  }
+
+  static bool Unlink(const std::string& name) {
+    return shm_unlink(name.c_str()) == 0;
+  }
+
+  int64_t max_bsz() const { return ring_->max_bsz; }
+
+  // Appends {stop_flag, bsz, tokens}, waiting while the ring is full.
+  // Returns false and sets errno if bsz is negative or exceeds max_bsz().
+  template <typename TokenT>
+  bool Push(int32_t stop_flag, int32_t bsz, const TokenT* tokens) {
+    if (bsz < 0 || static_cast<uint32_t>(bsz) > ring_->max_bsz) {
+      errno = EMSGSIZE;
+      return false;
+    }
+    const uint64_t h = ring_->head.load(std::memory_order_relaxed);
+    while (h - ring_->tail.load(std::memory_order_acquire) >= ring_->capacity) {
+      Sleep(&ring_->space_seq, &ring_->writer_waiting, [&] {
+        return h - ring_->tail.load() < ring_->capacity;
+      });
+    }
+    int32_t* slot = Slot(h);
+    slot[0] = stop_flag;
+    slot[1] = bsz;
+    for (int32_t i = 0; i < bsz; ++i) {
+      slot[i + 2] = static_cast<int32_t>(tokens[i]);
+    }
+    ring_->head.store(h + 1, std::memory_order_release);
+    Wake(&ring_->data_seq, &ring_->reader_waiting);
+    return true;
+  }
+
+  // Copies the oldest message into out, which has room for max_bsz() + 2
+  // values, and returns true. Returns false if the ring is empty and wait
+  // is false.
+  template <typename OutT>
+  bool Pop(OutT* out, bool wait) {
+    const uint64_t t = ring_->tail.load(std::memory_order_relaxed);
+    while (ring_->head.load(std::memory_order_acquire) == t) {
+      if (!wait) return false;
+      Sleep(&ring_->data_seq, &ring_->reader_waiting, [&] {
+        return ring_->head.load() != t;
+      });
+    }
+    const int32_t* slot = Slot(t);
+    const int32_t n =
+        std::min<int32_t>(slot[1], static_cast<int32_t>(ring_->max_bsz)) + 2;
+    for (int32_t i = 0; i < n; ++i) out[i] = static_cast<OutT>(slot[i]);
+    ring_->tail.store(t + 1, std::memory_order_release);
+    Wake(&ring_->space_seq, &ring_->writer_waiting);
+    return true;
+  }
+
+ private:
+  static size_t SegmentBytes(uint32_t capacity, uint32_t max_bsz) {
+    return offsetof(OutputRingHeader, slots) +
+           static_cast<size_t>(capacity) * (max_bsz + 2) * sizeof(int32_t);
+  }
+
+  static uint32_t EnvValue(const char* name, uint32_t fallback) {
+    const char* env = std::getenv(name);
+    return env && *env ? static_cast<uint32_t>(std::strtoul(env, nullptr, 10))
+                       : fallback;
+  }
+
+  int32_t* Slot(uint64_t n) const {
+    return reinterpret_cast<int32_t*>(ring_->slots) +
+           (n % ring_->capacity) * (ring_->max_bsz + 2);
+  }
+
+  static void CpuRelax() {
+#if defined(__x86_64__) || defined(__i386__)
+    __builtin_ia32_pause();
+#elif defined(__aarch64__)
+    asm volatile("yield");
+#endif
+  }
+
+  static long Futex(std::atomic<uint32_t>* word,  // NOLINT
+                    int op,
+                    uint32_t value,
+                    const struct timespec* timeout) {
+    return syscall(SYS_futex, word, op, value, timeout, nullptr, 0);
+  }
+
+  // Sleeps on seq until ready() holds. The waiting flag is raised before
+  // the condition is checked again, and seq is read before that, so a
+  // wakeup between the check and FUTEX_WAIT makes the wait return at once.
+  template <typename Ready>
+  static void Sleep(std::atomic<uint32_t>* seq,
+                    std::atomic<uint32_t>* waiting,
+                    Ready ready) {
+    // The other side usually answers within microseconds; polling for
+    // that long saves the two context switches of a futex round trip. On
+    // one CPU polling only delays the other side.
+    static const bool spin = sysconf(_SC_NPROCESSORS_ONLN) > 1;
+    const auto deadline =
+        std::chrono::steady_clock::now() + std::chrono::microseconds(50);
+    while (spin && std::chrono::steady_clock::now() < deadline) {
+      for (int i = 0; i < 64; ++i) {
+        if (ready()) return;
+        CpuRelax();
+      }
+    }
+    const uint32_t value = seq->load();
+    waiting->fetch_add(1);
+    if (!ready()) {
+      // The timeout bounds the wait if the other side dies mid-message.
+      struct timespec timeout = {0, 100 * 1000 * 1000};
+      Futex(seq, FUTEX_WAIT, value, &timeout);
+    }
+    waiting->fetch_sub(1);
+  }
+
+  static void Wake(std::atomic<uint32_t>* seq, std::atomic<uint32_t>* waiting) {
+    seq->fetch_add(1);
+    if (waiting->load() != 0) Futex(seq, FUTEX_WAKE, 1, nullptr);
+  }
+
+  OutputRingHeader* ring_ = nullptr;
+  size_t bytes_ = 0;
+};
@@ -12,7 +12,45 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <vector>
+
 #include "paddle/extension.h"
+#include "step_scheduler.h"  // NOLINT
+
+namespace {
+
+// The scheduler works on host memory. Tensors on a device are read through
+// host copies; the staged ones are written back in place by Finish.
+class HostTensors {
+ public:
+  template <typename T>
+  const T* Read(const paddle::Tensor& t) {
+    if (t.is_cpu()) return t.data<T>();
+    read_.push_back(t.copy_to(paddle::CPUPlace(), true));
+    return read_.back().data<T>();
+  }
+
+  template <typename T>
+  T* Stage(const paddle::Tensor& t) {
+    if (t.is_cpu()) return const_cast<T*>(t.data<T>());
+    staged_.push_back(t);
+    host_.push_back(t.copy_to(paddle::CPUPlace(), true));
+    return host_.back().data<T>();
+  }
+
+  void Finish() {
+    for (size_t i = 0; i < staged_.size(); ++i) {
+      staged_[i].copy_(host_[i], staged_[i].place(), true);
+    }
+  }
+
+ private:
+  std::vector<paddle::Tensor> staged_;
+  std::vector<paddle::Tensor> host_;
+  std::vector<paddle::Tensor> read_;
+};
+
+}  // namespace
 
 void StepPaddle(const paddle::Tensor& stop_flags,
                 const paddle::Tensor& seq_lens_this_time,
@@ -37,7 +75,45 @@ void StepPaddle(const paddle::Tensor& stop_flags,
                 const paddle::Tensor& next_tokens,
                 const int block_size,
                 const int encoder_decoder_block_num,
-                const int64_t first_token_id) {}
+                const int64_t first_token_id) {
+  // Recovered sequences replay their own tokens, so first_token_id is
+  // unused here.
+  const auto& table_shape = block_tables.shape();
+  PD_CHECK(block_size > 0, "block_size must be positive, got ", block_size);
+  HostTensors host;
+  StepSchedulerState s;
+  s.bsz = static_cast<int>(table_shape[0]);
+  s.block_num_per_seq = static_cast<int>(table_shape[1]);
+  s.block_size = block_size;
+  s.encoder_decoder_block_num = encoder_decoder_block_num;
+  s.input_ids_len = input_ids.shape()[1];
+  s.pre_ids_len = pre_ids.shape()[1];
+  s.stop_flags = host.Stage<bool>(stop_flags);
+  s.seq_lens_this_time = host.Stage<int>(seq_lens_this_time);
+  s.ori_seq_lens_encoder = host.Read<int>(ori_seq_lens_encoder);
+  s.seq_lens_encoder = host.Stage<int>(seq_lens_encoder);
+  s.seq_lens_decoder = host.Stage<int>(seq_lens_decoder);
+  s.block_tables = host.Stage<int>(block_tables);
+  s.encoder_block_lens = host.Stage<int>(encoder_block_lens);
+  s.is_block_step = host.Stage<bool>(is_block_step);
+  s.step_block_list = host.Stage<int>(step_block_list);
+  s.step_lens = host.Stage<int>(step_lens);
+  s.recover_block_list = host.Stage<int>(recover_block_list);
+  s.recover_lens = host.Stage<int>(recover_lens);
+  s.need_block_list = host.Stage<int>(need_block_list);
+  s.need_block_len = host.Stage<int>(need_block_len);
+  s.used_list_len = host.Stage<int>(used_list_len);
+  s.free_list = host.Stage<int>(free_list);
+  s.free_list_len = host.Stage<int>(free_list_len);
+  s.input_ids = host.Stage<int64_t>(input_ids);
+  s.pre_ids = host.Read<int64_t>(pre_ids);
+  s.step_idx = host.Read<int64_t>(step_idx);
+  s.next_tokens = host.Read<int64_t>(next_tokens);
+  PD_CHECK(*s.free_list_len <= free_list.numel(),
+           "free_list_len exceeds the free_list capacity");
+  StepSchedule(s);
+  host.Finish();
+}
 
 PD_BUILD_OP(step_paddle)
     .Inputs({"stop_flags",
@@ -0,0 +1,192 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstdint>
+
+// Host-side paged KV cache scheduler of step_paddle. It runs between two
+// decode steps on host copies of the serving state and does not depend on
+// Paddle, so every plugin shares it.
+//
+// Sequence b owns the blocks block_tables[b][0 .. encoder_block_lens[b] +
+// used_list_len[b]): first the blocks of its prompt, which the serving
+// loop hands out when it admits the sequence, then the blocks this
+// scheduler adds while it decodes. free_list[0 .. free_list_len) is a stack
+// of the unused block ids. A preempted sequence keeps is_block_step set
+// and waits in step_block_list[0 .. step_lens) until it is recovered.
+struct StepSchedulerState {
+  int bsz;
+  int block_num_per_seq;
+  int block_size;
+  // Blocks that must stay free after a recovery, so that a recovered
+  // sequence can decode before the next preemption.
+  int encoder_decoder_block_num;
+  int64_t input_ids_len;
+  int64_t pre_ids_len;
+
+  bool* stop_flags;
+  int* seq_lens_this_time;
+  const int* ori_seq_lens_encoder;
+  int* seq_lens_encoder;
+  int* seq_lens_decoder;
+  int* block_tables;
+  int* encoder_block_lens;
+  bool* is_block_step;
+  int* step_block_list;
+  int* step_lens;
+  int* recover_block_list;
+  int* recover_lens;
+  int* need_block_list;
+  int* need_block_len;
+  int* used_list_len;
+  int* free_list;
+  int* free_list_len;
+  int64_t* input_ids;
+  const int64_t* pre_ids;
+  const int64_t* step_idx;
+  const int64_t* next_tokens;
+};
+
+namespace step_scheduler_detail {
+
+inline int* BlockRow(const StepSchedulerState& s, int b) {
+  return s.block_tables + static_cast<int64_t>(b) * s.block_num_per_seq;
+}
+
+// Pushes every block of sequence b onto the free list.
+inline void FreeBlocks(const StepSchedulerState& s, int b) {
+  int* row = BlockRow(s, b);
+  for (int i = 0; i < s.block_num_per_seq; ++i) {
+    if (row[i] < 0) continue;
+    s.free_list[(*s.free_list_len)++] = row[i];
+    row[i] = -1;
+  }
+  s.encoder_block_lens[b] = 0;
+  s.used_list_len[b] = 0;
+}
+
+inline int HeldBlocks(const StepSchedulerState& s, int b) {
+  return s.encoder_block_lens[b] + s.used_list_len[b];
+}
+
+}  // namespace step_scheduler_detail
+
+// Runs one scheduling step:
+//  1. finished sequences return their blocks to the free list;
+//  2. decoding sequences whose next token starts a new block are queued in
+//     need_block_list; while they need more blocks than are free, the one
+//     holding the most blocks is preempted: its blocks are freed and it is
+//     queued in step_block_list to be recomputed later;
+//  3. every remaining sequence in need_block_list gets a block;
+//  4. preempted sequences are recovered in the order they were preempted
+//     while their prompt and generated tokens fit in the free blocks with
+//     encoder_decoder_block_num to spare. A recovered sequence is listed in
+//     recover_block_list and runs as a prefill of its prompt followed by
+//     the tokens it generated (pre_ids[1 ..], ending with next_tokens).
+// need_block_len, step_lens, recover_lens, free_list_len and used_list_len
+// are this step's statistics.
+inline void StepSchedule(const StepSchedulerState& s) {
+  using step_scheduler_detail::BlockRow;
+  using step_scheduler_detail::FreeBlocks;
+  using step_scheduler_detail::HeldBlocks;
+
+  for (int b = 0; b < s.bsz; ++b) {
+    if (s.stop_flags[b] && !s.is_block_step[b]) FreeBlocks(s, b);
+  }
+
+  int need = 0;
+  for (int b = 0; b < s.bsz; ++b) {
+    if (s.stop_flags[b] || s.seq_lens_encoder[b] > 0) continue;
+    const int idx = s.seq_lens_decoder[b] / s.block_size;
+    if (idx >= s.block_num_per_seq) {
+      // The block table is full: the sequence is at its maximum length.
+      s.stop_flags[b] = true;
+      s.seq_lens_this_time[b] = 0;
+      FreeBlocks(s, b);
+      continue;
+    }
+    if (BlockRow(s, b)[idx] < 0) s.need_block_list[need++] = b;
+  }
+
+  while (need > *s.free_list_len) {
+    int victim = 0;
+    for (int i = 1; i < need; ++i) {
+      if (HeldBlocks(s, s.need_block_list[i]) >=
+          HeldBlocks(s, s.need_block_list[victim])) {
+        victim = i;
+      }
+    }
+    const int b = s.need_block_list[victim];
+    for (int i = victim + 1; i < need; ++i) {
+      s.need_block_list[i - 1] = s.need_block_list[i];
+    }
+    --need;
+    FreeBlocks(s, b);
+    s.stop_flags[b] = true;
+    s.is_block_step[b] = true;
+    s.seq_lens_this_time[b] = 0;
+    s.seq_lens_decoder[b] = 0;
+    s.step_block_list[(*s.step_lens)++] = b;
+  }
+
+  for (int i = 0; i < need; ++i) {
+    const int b = s.need_block_list[i];
+    BlockRow(s, b)[s.seq_lens_decoder[b] / s.block_size] =
+        s.free_list[--*s.free_list_len];
+    ++s.used_list_len[b];
+  }
+  *s.need_block_len = need;
+
+  int recovered = 0;
+  int waiting = 0;
+  bool blocked = false;
+  for (int i = 0; i < *s.step_lens; ++i) {
+    const int b = s.step_block_list[i];
+    const int64_t steps = s.step_idx[b];
+    const int64_t seq_len = s.ori_seq_lens_encoder[b] + steps;
+    const int64_t blocks = (seq_len + s.block_size - 1) / s.block_size;
+    if (blocks > s.block_num_per_seq || seq_len > s.input_ids_len ||
+        steps > s.pre_ids_len) {
+      // Cannot be recomputed in place; it stays stopped.
+      s.is_block_step[b] = false;
+      continue;
+    }
+    // Recovering in order keeps a long sequence from starving.
+    if (blocked || blocks + s.encoder_decoder_block_num > *s.free_list_len) {
+      blocked = true;
+      s.step_block_list[waiting++] = b;
+      continue;
+    }
+    int* row = BlockRow(s, b);
+    for (int64_t j = 0; j < blocks; ++j) {
+      row[j] = s.free_list[--*s.free_list_len];
+    }
+    s.encoder_block_lens[b] = static_cast<int>(blocks);
+    s.used_list_len[b] = 0;
+    int64_t* ids = s.input_ids + static_cast<int64_t>(b) * s.input_ids_len;
+    const int64_t* pre = s.pre_ids + static_cast<int64_t>(b) * s.pre_ids_len;
+    const int64_t prompt = s.ori_seq_lens_encoder[b];
+    for (int64_t j = 0; j + 1 < steps; ++j) ids[prompt + j] = pre[j + 1];
+    if (steps > 0) ids[seq_len - 1] = s.next_tokens[b];
+    s.stop_flags[b] = false;
+    s.is_block_step[b] = false;
+    s.seq_lens_this_time[b] = static_cast<int>(seq_len);
+    s.seq_lens_encoder[b] = static_cast<int>(seq_len);
+    s.seq_lens_decoder[b] = 0;
+    s.recover_block_list[recovered++] = b;
+  }
+  *s.step_lens = waiting;
+  *s.recover_lens = recovered;
+}
@@ -0,0 +1,143 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Python reader of the shared-memory ring that save_output writes.
+
+The layout mirrors OutputRingHeader in custom_op/llama_infer/output_ring.h.
+"""
+
+import ctypes
+import mmap
+import os
+import platform
+import struct
+import time
+
+_MAGIC = 0x4F52474E
+_CAPACITY = 4
+_HEAD = 64
+_DATA_SEQ = 72
+_READER_WAITING = 76
+_TAIL = 128
+_SPACE_SEQ = 136
+_WRITER_WAITING = 140
+_SLOTS = 192
+
+_FUTEX_WAIT = 0
+_FUTEX_WAKE = 1
+_SYS_FUTEX = {"x86_64": 202, "aarch64": 98}
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+class OutputRing:
+    """Reads {stop_flag, bsz, tokens} messages, as get_output does.
+
+    Args:
+        name: the segment name, FLAGS_npu_output_ring_name by default.
+        timeout: seconds to wait for the producer to create the segment.
+    """
+
+    def __init__(self, name=None, timeout=None):
+        if name is None:
+            name = os.getenv("FLAGS_npu_output_ring_name") or "/paddle_output_ring"
+        self.name = name
+        path = os.path.join("/dev/shm", name.lstrip("/"))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(path, os.O_RDWR)
+                if os.fstat(fd).st_size >= _SLOTS:
+                    break
+                os.close(fd)
+            except FileNotFoundError:
+                pass
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("output ring {} does not exist".format(name))
+            time.sleep(0.001)
+        try:
+            self._mm = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        while struct.unpack_from("<I", self._mm, 0)[0] != _MAGIC:
+            time.sleep(0.001)
+        self.capacity, self.max_bsz = struct.unpack_from("<II", self._mm, _CAPACITY)
+        self._slot_bytes = (self.max_bsz + 2) * 4
+        self._futex = _SYS_FUTEX.get(platform.machine())
+        # x86 keeps loads and stores in order; elsewhere a FUTEX_WAKE,
+        # which the kernel runs behind a full memory barrier, orders the
+        # slot reads after the head read and before the tail write.
+        self._fence = platform.machine() != "x86_64"
+        self._words = {
+            offset: ctypes.c_uint32.from_buffer(self._mm, offset)
+            for offset in (_DATA_SEQ, _READER_WAITING, _SPACE_SEQ, _WRITER_WAITING)
+        }
+
+    def close(self):
+        self._words = {}
+        self._mm.close()
+
+    @staticmethod
+    def unlink(name=None):
+        """Removes the segment, so the next producer creates a fresh one."""
+        if name is None:
+            name = os.getenv("FLAGS_npu_output_ring_name") or "/paddle_output_ring"
+        try:
+            os.unlink(os.path.join("/dev/shm", name.lstrip("/")))
+        except FileNotFoundError:
+            pass
+
+    def _load64(self, offset):
+        return struct.unpack_from("<Q", self._mm, offset)[0]
+
+    def _call_futex(self, offset, op, value, timeout=None):
+        if self._futex is None:
+            if op == _FUTEX_WAIT:
+                time.sleep(0.0001)
+            return
+        word = self._words[offset]
+        ts = None if timeout is None else ctypes.byref(_Timespec(0, int(timeout * 1e9)))
+        _libc.syscall(self._futex, ctypes.byref(word), op, value, ts, None, 0)
+
+    def _wake(self, seq_offset, waiting_offset):
+        self._words[seq_offset].value += 1
+        if self._words[waiting_offset].value:
+            self._call_futex(seq_offset, _FUTEX_WAKE, 1)
+
+    def read(self, wait=True):
+        """Returns (stop_flag, tokens) of the oldest message, or None when
+        the ring is empty and wait is False."""
+        tail = self._load64(_TAIL)
+        while self._load64(_HEAD) == tail:
+            if not wait:
+                return None
+            seq = self._words[_DATA_SEQ].value
+            self._words[_READER_WAITING].value += 1
+            if self._load64(_HEAD) == tail:
+                self._call_futex(_DATA_SEQ, _FUTEX_WAIT, seq, 0.1)
+            self._words[_READER_WAITING].value -= 1
+        if self._fence:
+            self._call_futex(_DATA_SEQ, _FUTEX_WAKE, 0)
+        offset = _SLOTS + (tail % self.capacity) * self._slot_bytes
+        stop_flag, bsz = struct.unpack_from("<ii", self._mm, offset)
+        bsz = min(bsz, self.max_bsz)
+        tokens = list(struct.unpack_from("<{}i".format(bsz), self._mm, offset + 8))
+        if self._fence:
+            self._call_futex(_DATA_SEQ, _FUTEX_WAKE, 0)
+        struct.pack_into("<Q", self._mm, _TAIL, tail + 1)
+        self._wake(_SPACE_SEQ, _WRITER_WAITING)
+        return stop_flag, tokens
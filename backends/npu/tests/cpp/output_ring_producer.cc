@@ -0,0 +1,73 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Producer side of tests/unittests/test_output_ring.py.
+//
+//   output_ring_producer layout
+//     prints "<field> <offset>" for each field of OutputRingHeader.
+//   output_ring_producer push NAME CAPACITY MAX_BSZ BSZ...
+//     pushes one message per BSZ, message i being {i, bsz, i * 1000 + j},
+//     and prints "pushed i" after each. Exits with 2 if Push fails.
+
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <vector>
+
+#include "output_ring.h"  // NOLINT
+
+int main(int argc, char** argv) {
+  if (argc == 2 && std::strcmp(argv[1], "layout") == 0) {
+#define PRINT_OFFSET(field) \
+  std::printf(#field " %zu\n", offsetof(OutputRingHeader, field))
+    PRINT_OFFSET(magic);
+    PRINT_OFFSET(capacity);
+    PRINT_OFFSET(max_bsz);
+    PRINT_OFFSET(head);
+    PRINT_OFFSET(data_seq);
+    PRINT_OFFSET(reader_waiting);
+    PRINT_OFFSET(tail);
+    PRINT_OFFSET(space_seq);
+    PRINT_OFFSET(writer_waiting);
+    PRINT_OFFSET(slots);
+#undef PRINT_OFFSET
+    return 0;
+  }
+  if (argc < 5 || std::strcmp(argv[1], "push") != 0) {
+    std::fprintf(stderr,
+                 "usage: %s layout\n"
+                 "       %s push NAME CAPACITY MAX_BSZ BSZ...\n",
+                 argv[0],
+                 argv[0]);
+    return 1;
+  }
+  OutputRing ring;
+  if (!ring.Open(argv[2], std::atoi(argv[3]), std::atoi(argv[4]))) {
+    std::perror("Open");
+    return 1;
+  }
+  for (int i = 0; i + 5 < argc; ++i) {
+    const int bsz = std::atoi(argv[i + 5]);
+    std::vector<int64_t> tokens(bsz);
+    for (int j = 0; j < bsz; ++j) tokens[j] = i * 1000 + j;
+    if (!ring.Push(i, bsz, tokens.data())) {
+      std::fprintf(
+          stderr, "Push of bsz %d failed: %s\n", bsz, std::strerror(errno));
+      return 2;
+    }
+    std::printf("pushed %d\n", i);
+    std::fflush(stdout);
+  }
+  return 0;
+}
@@ -0,0 +1,340 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "step_scheduler.h"  // NOLINT
+
+#include <gtest/gtest.h>
+
+#include <memory>
+#include <random>
+#include <vector>
+
+namespace {
+
+// Host buffers of the serving state, laid out as step_paddle gets them.
+// The free list starts as the stack 0 .. total_blocks - 1, so block
+// total_blocks - 1 is handed out first.
+class Scheduler {
+ public:
+  Scheduler(int bsz,
+            int block_num_per_seq,
+            int block_size,
+            int total_blocks,
+            int encoder_decoder_block_num,
+            int64_t max_len = 64)
+      : total_blocks_(total_blocks),
+        stop_flags_(new bool[bsz]()),
+        is_block_step_(new bool[bsz]()),
+        seq_lens_this_time_(bsz),
+        ori_seq_lens_encoder_(bsz),
+        seq_lens_encoder_(bsz),
+        seq_lens_decoder_(bsz),
+        block_tables_(bsz * block_num_per_seq, -1),
+        encoder_block_lens_(bsz),
+        step_block_list_(bsz),
+        recover_block_list_(bsz),
+        need_block_list_(bsz),
+        used_list_len_(bsz),
+        free_list_(total_blocks),
+        input_ids_(bsz * max_len),
+        pre_ids_(bsz * max_len),
+        step_idx_(bsz),
+        next_tokens_(bsz) {
+    for (int i = 0; i < total_blocks; ++i) free_list_[i] = i;
+    free_list_len_ = total_blocks;
+    s_.bsz = bsz;
+    s_.block_num_per_seq = block_num_per_seq;
+    s_.block_size = block_size;
+    s_.encoder_decoder_block_num = encoder_decoder_block_num;
+    s_.input_ids_len = max_len;
+    s_.pre_ids_len = max_len;
+    s_.stop_flags = stop_flags_.get();
+    s_.seq_lens_this_time = seq_lens_this_time_.data();
+    s_.ori_seq_lens_encoder = ori_seq_lens_encoder_.data();
+    s_.seq_lens_encoder = seq_lens_encoder_.data();
+    s_.seq_lens_decoder = seq_lens_decoder_.data();
+    s_.block_tables = block_tables_.data();
+    s_.encoder_block_lens = encoder_block_lens_.data();
+    s_.is_block_step = is_block_step_.get();
+    s_.step_block_list = step_block_list_.data();
+    s_.step_lens = &step_lens_;
+    s_.recover_block_list = recover_block_list_.data();
+    s_.recover_lens = &recover_lens_;
+    s_.need_block_list = need_block_list_.data();
+    s_.need_block_len = &need_block_len_;
+    s_.used_list_len = used_list_len_.data();
+    s_.free_list = free_list_.data();
+    s_.free_list_len = &free_list_len_;
+    s_.input_ids = input_ids_.data();
+    s_.pre_ids = pre_ids_.data();
+    s_.step_idx = step_idx_.data();
+    s_.next_tokens = next_tokens_.data();
+  }
+
+  // Hands sequence b the prompt blocks of `prompt` tokens, as the serving
+  // loop does when it admits a request.
+  void Admit(int b, int prompt) {
+    const int blocks = (prompt + s_.block_size - 1) / s_.block_size;
+    for (int i = 0; i < blocks; ++i) Row(b)[i] = free_list_[--free_list_len_];
+    encoder_block_lens_[b] = blocks;
+    used_list_len_[b] = 0;
+    ori_seq_lens_encoder_[b] = prompt;
+    seq_lens_encoder_[b] = prompt;
+    seq_lens_this_time_[b] = prompt;
+    seq_lens_decoder_[b] = 0;
+    step_idx_[b] = 0;
+    stop_flags_[b] = false;
+    is_block_step_[b] = false;
+  }
+
+  // Puts sequence b in the decode phase with `decoded` tokens cached.
+  void Decode(int b, int decoded) {
+    seq_lens_encoder_[b] = 0;
+    seq_lens_decoder_[b] = decoded;
+    seq_lens_this_time_[b] = 1;
+  }
+
+  void Step() { StepSchedule(s_); }
+
+  int* Row(int b) { return s_.block_tables + b * s_.block_num_per_seq; }
+  int Held(int b) const { return encoder_block_lens_[b] + used_list_len_[b]; }
+
+  // Every block is either free or held by exactly one sequence, and each
+  // sequence holds a prefix of its block table row.
+  void ExpectConsistent() {
+    std::vector<int> owners(total_blocks_);
+    int held = 0;
+    for (int b = 0; b < s_.bsz; ++b) {
+      held += Held(b);
+      for (int i = 0; i < s_.block_num_per_seq; ++i) {
+        const int block = Row(b)[i];
+        EXPECT_EQ(block >= 0, i < Held(b)) << "seq " << b << " slot " << i;
+        if (block < 0) continue;
+        ASSERT_LT(block, total_blocks_);
+        ++owners[block];
+      }
+      if (is_block_step_[b]) {
+        EXPECT_EQ(Held(b), 0) << "seq " << b;
+      }
+    }
+    for (int i = 0; i < free_list_len_; ++i) ++owners[free_list_[i]];
+    EXPECT_EQ(free_list_len_ + held, total_blocks_);
+    for (int i = 0; i < total_blocks_; ++i) {
+      EXPECT_EQ(owners[i], 1) << "block " << i;
+    }
+  }
+
+  StepSchedulerState s_;
+  int total_blocks_;
+  std::unique_ptr<bool[]> stop_flags_;
+  std::unique_ptr<bool[]> is_block_step_;
+  std::vector<int> seq_lens_this_time_;
+  std::vector<int> ori_seq_lens_encoder_;
+  std::vector<int> seq_lens_encoder_;
+  std::vector<int> seq_lens_decoder_;
+  std::vector<int> block_tables_;
+  std::vector<int> encoder_block_lens_;
+  std::vector<int> step_block_list_;
+  int step_lens_ = 0;
+  std::vector<int> recover_block_list_;
+  int recover_lens_ = 0;
+  std::vector<int> need_block_list_;
+  int need_block_len_ = 0;
+  std::vector<int> used_list_len_;
+  std::vector<int> free_list_;
+  int free_list_len_ = 0;
+  std::vector<int64_t> input_ids_;
+  std::vector<int64_t> pre_ids_;
+  std::vector<int64_t> step_idx_;
+  std::vector<int64_t> next_tokens_;
+};
+
+TEST(StepScheduler, FinishedBlocksAreReused) {
+  Scheduler s(2, 4, 4, 3, 0);
+  s.Admit(0, 8);
+  s.Admit(1, 4);
+  s.Decode(0, 8);
+  s.Decode(1, 4);
+  ASSERT_EQ(s.free_list_len_, 0);
+  s.stop_flags_[0] = true;
+
+  s.Step();
+
+  // Sequence 0 freed blocks {2, 1} and sequence 1 took the top one.
+  EXPECT_EQ(s.need_block_len_, 1);
+  EXPECT_EQ(s.need_block_list_[0], 1);
+  EXPECT_EQ(s.Row(1)[1], 1);
+  EXPECT_EQ(s.used_list_len_[1], 1);
+  EXPECT_EQ(s.Held(0), 0);
+  EXPECT_EQ(s.Row(0)[0], -1);
+  EXPECT_EQ(s.free_list_len_, 1);
+  EXPECT_EQ(s.free_list_[0], 2);
+  EXPECT_EQ(s.step_lens_, 0);
+  s.ExpectConsistent();
+}
+
+TEST(StepScheduler, PreemptsTheLargestWhenBlocksRunOut) {
+  Scheduler s(2, 4, 4, 4, 1);
+  s.Admit(0, 5);
+  s.Admit(1, 4);
+  s.Decode(0, 8);
+  s.Decode(1, 4);
+  s.step_idx_[0] = 3;
+  ASSERT_EQ(s.free_list_len_, 1);
+
+  s.Step();
+
+  // Both need a block but one is free: sequence 0 holds more and goes.
+  EXPECT_TRUE(s.stop_flags_[0]);
+  EXPECT_TRUE(s.is_block_step_[0]);
+  EXPECT_EQ(s.seq_lens_this_time_[0], 0);
+  EXPECT_EQ(s.seq_lens_decoder_[0], 0);
+  EXPECT_EQ(s.Held(0), 0);
+  EXPECT_FALSE(s.stop_flags_[1]);
+  EXPECT_EQ(s.need_block_len_, 1);
+  EXPECT_EQ(s.need_block_list_[0], 1);
+  EXPECT_EQ(s.Held(1), 2);
+  // 8 tokens take 2 blocks, plus 1 to spare, but only 2 are free.
+  EXPECT_EQ(s.step_lens_, 1);
+  EXPECT_EQ(s.step_block_list_[0], 0);
+  EXPECT_EQ(s.recover_lens_, 0);
+  EXPECT_EQ(s.free_list_len_, 2);
+  s.ExpectConsistent();
+}
+
+TEST(StepScheduler, RecoversInPreemptionOrder) {
+  Scheduler s(3, 4, 4, 5, 1);
+  for (int b : {1, 0}) {
+    s.stop_flags_[b] = true;
+    s.is_block_step_[b] = true;
+    s.step_block_list_[s.step_lens_++] = b;
+  }
+  // Sequence 1 replays 9 tokens (3 blocks), sequence 0 4 tokens (1 block).
+  s.ori_seq_lens_encoder_[1] = 6;
+  s.step_idx_[1] = 3;
+  s.ori_seq_lens_encoder_[0] = 2;
+  s.step_idx_[0] = 2;
+  const int64_t max_len = s.s_.input_ids_len;
+  for (int j = 0; j < 3; ++j) s.pre_ids_[1 * max_len + j] = 100 + j;
+  for (int j = 0; j < 2; ++j) s.pre_ids_[0 * max_len + j] = 200 + j;
+  s.next_tokens_[1] = 109;
+  s.next_tokens_[0] = 209;
+  for (int j = 0; j < 6; ++j) s.input_ids_[1 * max_len + j] = j;
+  s.Admit(2, 8);
+  s.Decode(2, 5);
+
+  s.Step();
+
+  // Sequence 1 needs 4 of the 3 free blocks; sequence 0 would fit but
+  // waits behind it.
+  EXPECT_EQ(s.step_lens_, 2);
+  EXPECT_EQ(s.step_block_list_[0], 1);
+  EXPECT_EQ(s.step_block_list_[1], 0);
+  EXPECT_EQ(s.recover_lens_, 0);
+  EXPECT_EQ(s.free_list_len_, 3);
+  s.ExpectConsistent();
+
+  s.stop_flags_[2] = true;
+  s.Step();
+
+  EXPECT_EQ(s.step_lens_, 0);
+  ASSERT_EQ(s.recover_lens_, 2);
+  EXPECT_EQ(s.recover_block_list_[0], 1);
+  EXPECT_EQ(s.recover_block_list_[1], 0);
+  EXPECT_EQ(s.free_list_len_, 1);
+  EXPECT_EQ(s.encoder_block_lens_[1], 3);
+  EXPECT_EQ(s.encoder_block_lens_[0], 1);
+  for (int b : {1, 0}) {
+    EXPECT_FALSE(s.stop_flags_[b]);
+    EXPECT_FALSE(s.is_block_step_[b]);
+    EXPECT_EQ(s.seq_lens_decoder_[b], 0);
+  }
+  EXPECT_EQ(s.seq_lens_encoder_[1], 9);
+  EXPECT_EQ(s.seq_lens_this_time_[1], 9);
+  EXPECT_EQ(s.seq_lens_encoder_[0], 4);
+  // The prompt is kept and followed by pre_ids[1 ..] and next_tokens.
+  const std::vector<int64_t> ids1(s.input_ids_.begin() + 1 * max_len,
+                                  s.input_ids_.begin() + 1 * max_len + 9);
+  EXPECT_EQ(ids1, (std::vector<int64_t>{0, 1, 2, 3, 4, 5, 101, 102, 109}));
+  EXPECT_EQ(s.input_ids_[0 * max_len + 2], 201);
+  EXPECT_EQ(s.input_ids_[0 * max_len + 3], 209);
+  s.ExpectConsistent();
+}
+
+TEST(StepScheduler, StopsWhenTheBlockTableIsFull) {
+  Scheduler s(1, 2, 4, 3, 0);
+  s.Admit(0, 8);
+  s.Decode(0, 8);
+
+  s.Step();
+
+  EXPECT_TRUE(s.stop_flags_[0]);
+  EXPECT_FALSE(s.is_block_step_[0]);
+  EXPECT_EQ(s.seq_lens_this_time_[0], 0);
+  EXPECT_EQ(s.Held(0), 0);
+  EXPECT_EQ(s.need_block_len_, 0);
+  EXPECT_EQ(s.step_lens_, 0);
+  EXPECT_EQ(s.free_list_len_, 3);
+  s.ExpectConsistent();
+}
+
+// Runs a serving loop with random prompts and stops and checks the block
+// accounting after every step.
+TEST(StepScheduler, KeepsBlockAccountingAcrossSteps) {
+  const int bsz = 8;
+  const int block_size = 4;
+  Scheduler s(bsz, 8, block_size, 20, 1);
+  std::mt19937 rng(2024);
+  for (int b = 0; b < bsz; ++b) s.stop_flags_[b] = true;
+  int waiting = 0;
+  int recovered = 0;
+  for (int step = 0; step < 2000; ++step) {
+    for (int b = 0; b < bsz; ++b) {
+      if (!s.stop_flags_[b] || s.is_block_step_[b] || s.Held(b) > 0) continue;
+      const int prompt = 1 + rng() % 12;
+      const int blocks = (prompt + block_size - 1) / block_size;
+      if (blocks + 1 <= s.free_list_len_) s.Admit(b, prompt);
+    }
+    for (int b = 0; b < bsz; ++b) {
+      if (s.stop_flags_[b]) continue;
+      if (s.seq_lens_encoder_[b] > 0) {
+        s.seq_lens_decoder_[b] = s.seq_lens_encoder_[b];
+        s.seq_lens_encoder_[b] = 0;
+      } else {
+        ++s.seq_lens_decoder_[b];
+      }
+      s.pre_ids_[b * s.s_.pre_ids_len + s.step_idx_[b]] = rng();
+      s.next_tokens_[b] = rng();
+      ++s.step_idx_[b];
+      s.seq_lens_this_time_[b] = 1;
+      if (rng() % 32 == 0) s.stop_flags_[b] = true;
+    }
+
+    s.Step();
+
+    waiting += s.step_lens_;
+    recovered += s.recover_lens_;
+    s.ExpectConsistent();
+    for (int b = 0; b < bsz; ++b) {
+      if (s.stop_flags_[b] || s.seq_lens_encoder_[b] > 0) continue;
+      EXPECT_GE(s.Row(b)[s.seq_lens_decoder_[b] / block_size], 0)
+          << "seq " << b << " has no block for its next token";
+    }
+    if (HasFailure()) break;
+  }
+  EXPECT_GT(waiting, 0);
+  EXPECT_GT(recovered, 0);
+}
+
+}  // namespace
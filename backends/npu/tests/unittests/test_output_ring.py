@@ -0,0 +1,111 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import time
+import unittest
+import uuid
+
+from paddle_custom_device.npu.serving import OutputRing
+from paddle_custom_device.npu.serving import output_ring
+
+# Built from tests/cpp/output_ring_producer.cc; it pushes through the C++
+# OutputRing that save_output uses.
+PRODUCER = os.getenv("OUTPUT_RING_PRODUCER")
+
+
+@unittest.skipUnless(PRODUCER, "OUTPUT_RING_PRODUCER is not set")
+class TestOutputRing(unittest.TestCase):
+    def setUp(self):
+        self.name = "/test_output_ring_{}".format(uuid.uuid4().hex)
+
+    def tearDown(self):
+        OutputRing.unlink(self.name)
+
+    def push(self, capacity, max_bsz, sizes):
+        args = [PRODUCER, "push", self.name, str(capacity), str(max_bsz)]
+        producer = subprocess.Popen(
+            args + [str(bsz) for bsz in sizes],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        self.addCleanup(producer.stdout.close)
+        self.addCleanup(producer.stderr.close)
+        return producer
+
+    def expected(self, i, bsz):
+        return i, [i * 1000 + j for j in range(bsz)]
+
+    def test_layout(self):
+        out = subprocess.check_output([PRODUCER, "layout"], universal_newlines=True)
+        layout = {
+            field: int(offset)
+            for field, offset in (line.split() for line in out.splitlines())
+        }
+        self.assertEqual(layout["magic"], 0)
+        self.assertEqual(layout["capacity"], output_ring._CAPACITY)
+        self.assertEqual(layout["max_bsz"], output_ring._CAPACITY + 4)
+        self.assertEqual(layout["head"], output_ring._HEAD)
+        self.assertEqual(layout["data_seq"], output_ring._DATA_SEQ)
+        self.assertEqual(layout["reader_waiting"], output_ring._READER_WAITING)
+        self.assertEqual(layout["tail"], output_ring._TAIL)
+        self.assertEqual(layout["space_seq"], output_ring._SPACE_SEQ)
+        self.assertEqual(layout["writer_waiting"], output_ring._WRITER_WAITING)
+        self.assertEqual(layout["slots"], output_ring._SLOTS)
+
+    def test_wrap_around(self):
+        sizes = [i % 5 for i in range(11)]
+        producer = self.push(3, 4, sizes)
+        ring = OutputRing(self.name, timeout=10)
+        self.assertEqual((ring.capacity, ring.max_bsz), (3, 4))
+        size = os.stat("/dev/shm" + self.name).st_size
+        self.assertEqual(size, output_ring._SLOTS + 3 * (4 + 2) * 4)
+        for i, bsz in enumerate(sizes):
+            self.assertEqual(ring.read(), self.expected(i, bsz))
+        self.assertEqual(producer.wait(), 0)
+        self.assertIsNone(ring.read(wait=False))
+        ring.close()
+
+    def test_full_ring_blocks(self):
+        producer = self.push(2, 4, [1, 2, 3])
+        ring = OutputRing(self.name, timeout=10)
+        self.assertEqual(producer.stdout.readline(), "pushed 0\n")
+        self.assertEqual(producer.stdout.readline(), "pushed 1\n")
+        time.sleep(0.5)
+        # The third message waits for a free slot instead of overwriting
+        # the oldest one.
+        self.assertIsNone(producer.poll())
+        self.assertEqual(ring._load64(output_ring._HEAD), 2)
+        self.assertEqual(ring.read(), self.expected(0, 1))
+        self.assertEqual(producer.stdout.readline(), "pushed 2\n")
+        self.assertEqual(ring.read(), self.expected(1, 2))
+        self.assertEqual(ring.read(), self.expected(2, 3))
+        self.assertEqual(producer.wait(), 0)
+        ring.close()
+
+    def test_oversized_bsz(self):
+        producer = self.push(2, 4, [4, 5])
+        ring = OutputRing(self.name, timeout=10)
+        self.assertEqual(ring.read(), self.expected(0, 4))
+        _, err = producer.communicate()
+        self.assertEqual(producer.returncode, 2)
+        self.assertIn("bsz 5", err)
+        self.assertIsNone(ring.read(wait=False))
+        ring.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
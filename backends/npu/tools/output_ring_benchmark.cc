@@ -0,0 +1,156 @@
+// Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Latency of handing one step of generated tokens to the serving process:
+// the SysV message queue save_output used to send through, against the
+// shared-memory ring it sends through now. A child process echoes every
+// message back, and the one-way latency is half the round trip. The cost
+// of polling an empty channel, which get_output does with wait_flag off,
+// is measured separately.
+//
+//   g++ -O2 -std=c++14 -I custom_op/llama_infer
+//       tools/output_ring_benchmark.cc -o output_ring_benchmark -lrt
+//   ./output_ring_benchmark [bsz] [messages]
+
+#include <sys/ipc.h>
+#include <sys/msg.h>
+#include <sys/wait.h>
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <vector>
+
+#include "output_ring.h"  // NOLINT
+
+namespace {
+
+constexpr int kMaxBsz = 512;
+
+struct MsgData {
+  long mtype;  // NOLINT
+  int32_t mtext[kMaxBsz + 2];
+};
+
+double NowUs() {
+  return std::chrono::duration<double, std::micro>(
+             std::chrono::steady_clock::now().time_since_epoch())
+      .count();
+}
+
+void Report(const char* name, std::vector<double>* us) {
+  std::sort(us->begin(), us->end());
+  auto at = [&](double q) { return (*us)[(us->size() - 1) * q]; };
+  std::printf("%-10s p50 %7.2f us  p99 %7.2f us  max %8.2f us\n",
+              name,
+              at(0.5) / 2,
+              at(0.99) / 2,
+              us->back() / 2);
+}
+
+// The previous save_output/get_output transport: mtype 1 carries messages
+// to the child and mtype 2 back.
+void BenchMsgQueue(int bsz, int messages) {
+  int msgid = msgget(IPC_PRIVATE, IPC_CREAT | 0600);
+  if (msgid < 0) {
+    std::perror("msgget");
+    return;
+  }
+  const size_t bytes = (kMaxBsz + 2) * sizeof(int32_t);
+  pid_t child = fork();
+  if (child == 0) {
+    MsgData msg;
+    for (int i = 0; i < messages; ++i) {
+      msgrcv(msgid, &msg, bytes, 1, 0);
+      msg.mtype = 2;
+      msgsnd(msgid, &msg, bytes, 0);
+    }
+    _exit(0);
+  }
+  MsgData msg, reply;
+  std::vector<double> us;
+  for (int i = 0; i < messages; ++i) {
+    msg.mtype = 1;
+    msg.mtext[0] = 1;
+    msg.mtext[1] = bsz;
+    for (int j = 0; j < bsz; ++j) msg.mtext[j + 2] = i + j;
+    double start = NowUs();
+    msgsnd(msgid, &msg, bytes, 0);
+    msgrcv(msgid, &reply, bytes, 2, 0);
+    us.push_back(NowUs() - start);
+  }
+  waitpid(child, nullptr, 0);
+  Report("msg queue", &us);
+  double start = NowUs();
+  for (int i = 0; i < messages; ++i) {
+    msgrcv(msgid, &reply, bytes, 0, IPC_NOWAIT);
+  }
+  std::printf(
+      "%-10s empty poll %.3f us\n", "msg queue", (NowUs() - start) / messages);
+  msgctl(msgid, IPC_RMID, nullptr);
+}
+
+void BenchRing(int bsz, int messages) {
+  const std::string to_child = "/output_ring_benchmark_a";
+  const std::string to_parent = "/output_ring_benchmark_b";
+  OutputRing::Unlink(to_child);
+  OutputRing::Unlink(to_parent);
+  pid_t child = fork();
+  if (child == 0) {
+    OutputRing in, out;
+    if (!in.Open(to_child, 64, kMaxBsz) || !out.Open(to_parent, 64, kMaxBsz)) {
+      _exit(1);
+    }
+    std::vector<int32_t> buf(kMaxBsz + 2);
+    for (int i = 0; i < messages; ++i) {
+      in.Pop(buf.data(), true);
+      out.Push(buf[0], buf[1], buf.data() + 2);
+    }
+    _exit(0);
+  }
+  OutputRing out, in;
+  if (!out.Open(to_child, 64, kMaxBsz) || !in.Open(to_parent, 64, kMaxBsz)) {
+    std::perror("shm_open");
+    return;
+  }
+  std::vector<int64_t> tokens(bsz), reply(kMaxBsz + 2);
+  std::vector<double> us;
+  for (int i = 0; i < messages; ++i) {
+    for (int j = 0; j < bsz; ++j) tokens[j] = i + j;
+    double start = NowUs();
+    out.Push(1, bsz, tokens.data());
+    in.Pop(reply.data(), true);
+    us.push_back(NowUs() - start);
+  }
+  waitpid(child, nullptr, 0);
+  Report("shm ring", &us);
+  double start = NowUs();
+  for (int i = 0; i < messages; ++i) in.Pop(reply.data(), false);
+  std::printf(
+      "%-10s empty poll %.3f us\n", "shm ring", (NowUs() - start) / messages);
+  OutputRing::Unlink(to_child);
+  OutputRing::Unlink(to_parent);
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+  int bsz = argc > 1 ? std::atoi(argv[1]) : 64;
+  int messages = argc > 2 ? std::atoi(argv[2]) : 20000;
+  bsz = std::min(std::max(bsz, 0), kMaxBsz);
+  std::printf("one-way latency, bsz %d, %d messages\n", bsz, messages);
+  BenchMsgQueue(bsz, messages);
+  BenchRing(bsz, messages);
+  return 0;
+}